@@ -0,0 +1 @@
+"""Performance benchmarks of the simulator stack (no RL training needed)."""
@@ -0,0 +1,332 @@
+"""Measures the per-step latency of the Flow/Aimsun socket API.
+
+A mock Aimsun server (see MockAimsunServer) serves fake vehicles through the
+same socket protocol as flow/utils/aimsun/run.py, such that no Aimsun
+instance is needed. For every vehicle count, the exchanges of one step of the
+Aimsun vehicle kernel are timed with:
+
+- the legacy commands: the entered and exited vehicles, the tracking info,
+  leader and next section of every vehicle, and the speed of every vehicle,
+  each in a separate request/acknowledgement/response exchange
+- the framed commands: the entered and exited vehicles in one pipeline, the
+  tracking info, leaders and next sections in one VEH_GET_BULK message, and
+  the speeds in one pipeline
+
+A latency can be added to every reply of the server to emulate a remote or
+loaded Aimsun instance. The responses of both protocols are also compared.
+"""
+import argparse
+import json
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+from flow.core.kernel.vehicle.aimsun import INFOS_ATTR_BY_INDEX
+from flow.utils.aimsun.api import FlowAimsunAPI
+import flow.utils.aimsun.constants as ac
+import flow.utils.aimsun.protocol as protocol
+
+EXAMPLE_USAGE = """
+example usage:
+    python aimsun_protocol.py --num_vehicles 10 100 1000 --latency 0.0001
+Here the arguments are:
+num_vehicles - vehicle counts at which a step is timed
+latency - time (in s) the mock server waits before every reply
+"""
+
+# tracking info collected by the Aimsun vehicle kernel
+TRACKED_INFOS = {
+    'CurrentPos', 'distance2End',
+    'xCurrentPos', 'yCurrentPos', 'xCurrentPosBack', 'yCurrentPosBack',
+    'CurrentSpeed', 'numberLane',
+    'idSection', 'idJunction', 'idSectionFrom', 'idSectionTo'
+}
+
+
+def create_parser():
+    """Create the parser to capture CLI arguments."""
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="[Flow] Measures the per-step latency of the Aimsun "
+                    "socket API against a mock server.",
+        epilog=EXAMPLE_USAGE)
+    parser.add_argument(
+        "--num_vehicles", type=int, nargs="+", default=[10, 100, 1000],
+        help="Vehicle counts at which a step is timed.")
+    parser.add_argument(
+        "--latency", type=float, default=0.,
+        help="Time (in s) the mock server waits before every reply.")
+    parser.add_argument(
+        "--num_steps", type=int, default=5,
+        help="Number of timed steps per vehicle count and protocol. The "
+             "median duration is reported.")
+    parser.add_argument(
+        "--output", type=str,
+        help="Path of a json file results are written to.")
+    return parser
+
+
+class MockAimsunServer(object):
+    """Mock of the server run by flow/utils/aimsun/run.py.
+
+    The server holds vehicles 0 to num_vehicles - 1, all in section 1 (except
+    for every fifth vehicle, in junction 2), and led by the next vehicle. The
+    last vehicle is led by an untracked vehicle. Two vehicles enter and exit
+    the network at every request of the entered and exited vehicles.
+    """
+
+    def __init__(self, num_vehicles, latency=0.):
+        """Start the server on a free port, in a background thread.
+
+        Parameters
+        ----------
+        num_vehicles : int
+            number of vehicles in the network
+        latency : float, optional
+            time (in s) waited before every reply
+        """
+        self.num_vehicles = num_vehicles
+        self.latency = latency
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(('localhost', 0))
+        self._socket.listen(1)
+        self.port = self._socket.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def tracking_data(self, veh_id):
+        """Return the tracking info of a vehicle, in bitmap order."""
+        in_section = veh_id % 5 != 0
+        return (float(veh_id), 100. - veh_id, 10. * veh_id, 1., 0.,
+                10. * veh_id - 5., 1., 0., 20. + veh_id % 7, 3. * veh_id, 0.,
+                0., 0., 1 if in_section else -1, 0, veh_id % 3,
+                -1 if in_section else 2, 1, 0, 3, 0)
+
+    def leader(self, veh_id):
+        """Return the leader of a vehicle."""
+        return veh_id + 1
+
+    def next_section(self, veh_id, section):
+        """Return the next section of a vehicle."""
+        return section + 2
+
+    def _reply(self, conn, data):
+        if self.latency > 0:
+            time.sleep(self.latency)
+        conn.sendall(data)
+
+    def _send_str(self, conn, value):
+        """Send a string as the send_message function of run.py."""
+        value = value.encode()
+        while len(value) > 256:
+            self._reply(conn, value[:256])
+            value = value[256:]
+            conn.recv(2048)
+            self._reply(conn, struct.pack('i', 1))
+        self._reply(conn, value)
+        conn.recv(2048)
+        self._reply(conn, struct.pack('i', 0))
+
+    def _bulk_info(self, veh_ids, info_bitmap):
+        packer = struct.Struct(protocol.bulk_record_format(info_bitmap))
+        indices = [i for i, bit in enumerate(info_bitmap) if bit == '1']
+        requested = set(veh_ids)
+        records = []
+        for veh_id in veh_ids:
+            data = self.tracking_data(veh_id)
+            leader = self.leader(veh_id)
+            next_section = self.next_section(veh_id, data[13]) \
+                if data[13] != -1 else -1
+            if leader not in requested:
+                leader_data = self.tracking_data(leader)
+                leader_data = tuple(leader_data[i] for i in
+                                    (0, 1, 13, 16, 17, 19)) + (4.,)
+            else:
+                leader_data = (0,) * 7
+            records.append(packer.pack(*(
+                [data[i] for i in indices] + [leader, next_section] +
+                list(leader_data))))
+        return b''.join(records)
+
+    def _execute(self, command_type, values):
+        if command_type in (ac.VEH_GET_ENTERED_IDS, ac.VEH_GET_EXITED_IDS):
+            return [self.num_vehicles + 1, self.num_vehicles + 2]
+        elif command_type == ac.VEH_GET_LEADER:
+            return (self.leader(values[0]),)
+        elif command_type == ac.VEH_GET_NEXT_SECTION:
+            return (self.next_section(*values),)
+        return None
+
+    def _serve(self):
+        conn, _ = self._socket.accept()
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn.send(b'Ready.')
+
+        while True:
+            data = conn.recv(2048)
+            if not data:
+                break
+            command_type = int(data)
+            self._reply(conn, struct.pack('i', 0))
+
+            if command_type == ac.SIMULATION_TERMINATE:
+                break
+
+            elif command_type in (ac.VEH_GET_ENTERED_IDS,
+                                  ac.VEH_GET_EXITED_IDS):
+                conn.recv(256)
+                ids = self._execute(command_type, None)
+                self._send_str(conn, ':'.join(str(v) for v in ids))
+
+            elif command_type == ac.VEH_GET_TRACKING:
+                message = conn.recv(2048).decode()
+                veh_id, info_bitmap = message.split(':')
+                info_bitmap = info_bitmap[:-1]
+                data = self.tracking_data(int(veh_id))
+                self._reply(conn, struct.pack(
+                    protocol.tracking_format(info_bitmap),
+                    *[data[i] for i, bit in enumerate(info_bitmap)
+                      if bit == '1']))
+
+            elif command_type in (ac.VEH_GET_LEADER, ac.VEH_GET_NEXT_SECTION):
+                in_format = 'i' if command_type == ac.VEH_GET_LEADER \
+                    else 'i i'
+                values = struct.unpack(
+                    in_format, conn.recv(struct.calcsize(in_format)))
+                self._reply(conn, struct.pack(
+                    'i', *self._execute(command_type, values)))
+
+            elif command_type == ac.VEH_SET_SPEED:
+                conn.recv(struct.calcsize('i f'))
+                self._reply(conn, struct.pack('i', 0))
+
+            elif command_type == ac.VEH_GET_BULK:
+                veh_ids, info_bitmap = protocol.unpack_bulk_request(
+                    protocol.recv_frame(conn))
+                self._reply(conn, protocol.pack_frame(
+                    self._bulk_info(veh_ids, info_bitmap)))
+
+            elif command_type == ac.PIPELINE:
+                commands = protocol.unpack_commands(protocol.recv_frame(conn))
+                responses = [(c, self._execute(c, values))
+                             for c, values in commands]
+                self._reply(conn, protocol.pack_frame(
+                    protocol.pack_responses(responses)))
+
+        conn.close()
+        self._socket.close()
+
+
+def legacy_step(api, veh_ids, info_bitmap):
+    """Run the exchanges of a step with the legacy commands."""
+    entered = api.get_entered_ids()
+    exited = api.get_exited_ids()
+    infos = []
+    for veh_id in veh_ids:
+        info = api.get_vehicle_tracking_info(veh_id, info_bitmap)
+        leader = api.get_vehicle_leader(veh_id)
+        next_section = api.get_next_section(veh_id, info.idSection) \
+            if info.idSection != -1 else -1
+        infos.append((vars(info), leader, next_section))
+    for veh_id in veh_ids:
+        api.set_speed(veh_id, 10.)
+    return entered, exited, infos
+
+
+def framed_step(api, veh_ids, info_bitmap):
+    """Run the exchanges of a step with the framed commands."""
+    pipeline = api.pipeline()
+    pipeline.get_entered_ids()
+    pipeline.get_exited_ids()
+    entered, exited = pipeline.flush()
+    infos = [(vars(info), leader, next_section) for
+             info, leader, next_section, _, _ in
+             api.get_vehicles_bulk_info(veh_ids, info_bitmap)]
+    for veh_id in veh_ids:
+        pipeline.set_speed(veh_id, 10.)
+    pipeline.flush()
+    return entered, exited, infos
+
+
+def measure(num_vehicles, args):
+    """Time a step of both protocols for a number of vehicles.
+
+    Parameters
+    ----------
+    num_vehicles : int
+        number of vehicles
+    args : argparse.Namespace
+        parsed command-line arguments (see create_parser)
+
+    Returns
+    -------
+    dict < str, float or bool >
+        median duration (in s) of a step with every protocol, and whether
+        both protocols returned the same responses
+    """
+    server = MockAimsunServer(num_vehicles, latency=args.latency)
+    api = FlowAimsunAPI(server.port)
+    api.s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    info_bitmap = ''.join('1' if attr in TRACKED_INFOS else '0'
+                          for attr in INFOS_ATTR_BY_INDEX)
+    veh_ids = list(range(num_vehicles))
+
+    durations = {"legacy": [], "framed": []}
+    responses = {}
+    for _ in range(args.num_steps):
+        for name, step in (("legacy", legacy_step), ("framed", framed_step)):
+            t = time.perf_counter()
+            responses[name] = step(api, veh_ids, info_bitmap)
+            durations[name].append(time.perf_counter() - t)
+    api.stop_simulation()
+
+    results = {name: float(np.median(values))
+               for name, values in durations.items()}
+    results["speedup"] = results["legacy"] / results["framed"]
+    results["consistent"] = _same_responses(
+        responses["legacy"], responses["framed"])
+    return results
+
+
+def _same_responses(legacy, framed):
+    """Check that both protocols returned the same responses.
+
+    Floats are sent in single precision by both protocols.
+    """
+    if legacy[:2] != framed[:2] or len(legacy[2]) != len(framed[2]):
+        return False
+    for (info1, leader1, next1), (info2, leader2, next2) in \
+            zip(legacy[2], framed[2]):
+        if (leader1, next1) != (leader2, next2):
+            return False
+        for attr, value in info1.items():
+            if value is not None and not np.isclose(value, info2[attr]):
+                return False
+    return True
+
+
+if __name__ == "__main__":
+    args = create_parser().parse_args()
+
+    results = []
+    for num_vehicles in args.num_vehicles:
+        print("Measuring {} vehicles".format(num_vehicles))
+        results.append(measure(num_vehicles, args))
+
+    print("\n{:>12}{:>14}{:>14}{:>10}{:>12}".format(
+        "vehicles", "legacy (ms)", "framed (ms)", "speedup", "consistent"))
+    for num_vehicles, result in zip(args.num_vehicles, results):
+        print("{:>12}{:>14.3f}{:>14.3f}{:>10.1f}{:>12}".format(
+            num_vehicles, result["legacy"] * 1e3, result["framed"] * 1e3,
+            result["speedup"], str(result["consistent"])))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"num_vehicles": args.num_vehicles,
+                       "latency": args.latency,
+                       "results": results}, f, indent=2)
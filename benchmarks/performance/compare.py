@@ -0,0 +1,137 @@
+"""Compares two performance benchmark result files, and flags regressions.
+
+Results are matched by benchmark name and fleet scale. A metric is flagged as
+a regression if it worsened by more than a relative threshold: steps per
+second are expected to increase, and times and memory usage to decrease.
+
+The script exits with a non-zero status if any regression is found, so that it
+can be used in continuous integration.
+"""
+import argparse
+import json
+import sys
+
+EXAMPLE_USAGE = """
+example usage:
+    python compare.py baseline.json results.json --threshold 0.1
+Here the arguments are:
+baseline - result file of the reference run
+results - result file of the run to compare against the reference
+threshold - relative change above which a metric is flagged
+"""
+
+# metrics compared between runs, and whether larger values are better
+METRICS = {
+    "construction_time": False,
+    "reset_time": False,
+    "steps_per_second": True,
+    "simulator_calls_per_step": False,
+    "peak_rss_mb": False,
+    "simulator_peak_rss_mb": False,
+}
+
+
+def create_parser():
+    """Create the parser to capture CLI arguments."""
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="[Flow] Compares two performance benchmark result "
+                    "files.",
+        epilog=EXAMPLE_USAGE)
+
+    parser.add_argument(
+        "baseline", type=str, help="Result file of the reference run.")
+    parser.add_argument(
+        "results", type=str, help="Result file of the run to compare.")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1,
+        help="Relative change above which a metric is flagged.")
+    parser.add_argument(
+        "--phases", action="store_true",
+        help="Also compare the mean duration of every step phase.")
+    return parser
+
+
+def _metrics(result, phases):
+    """Return the compared metrics of a benchmark result."""
+    metrics = {key: (result[key], larger_is_better)
+               for key, larger_is_better in METRICS.items() if key in result}
+    if phases:
+        for name, hist in result.get("phases", {}).items():
+            metrics["phase:" + name] = (hist["mean"], False)
+    return metrics
+
+
+def compare(baseline, results, threshold=0.1, phases=False):
+    """Compare the results of two runs.
+
+    Parameters
+    ----------
+    baseline : dict
+        content of the result file of the reference run
+    results : dict
+        content of the result file of the run to compare
+    threshold : float, optional
+        relative change above which a metric is flagged
+    phases : bool, optional
+        whether to also compare the mean duration of every step phase
+
+    Returns
+    -------
+    list of dict
+        comparison of every metric of every benchmark present in both runs,
+        with keys benchmark, scale, metric, baseline, value, change (relative
+        change), and status ("regression", "improvement" or "ok")
+    """
+    reference = {(r["benchmark"], r["scale"]): r
+                 for r in baseline["results"] if "error" not in r}
+
+    rows = []
+    for result in results["results"]:
+        key = (result["benchmark"], result["scale"])
+        if "error" in result or key not in reference:
+            continue
+        ref_metrics = _metrics(reference[key], phases)
+        for metric, (value, larger_is_better) in sorted(
+                _metrics(result, phases).items()):
+            if metric not in ref_metrics:
+                continue
+            ref_value = ref_metrics[metric][0]
+            change = (value - ref_value) / ref_value if ref_value else 0
+            worse = -change if larger_is_better else change
+            if worse > threshold:
+                status = "regression"
+            elif worse < -threshold:
+                status = "improvement"
+            else:
+                status = "ok"
+            rows.append({
+                "benchmark": key[0], "scale": key[1], "metric": metric,
+                "baseline": ref_value, "value": value, "change": change,
+                "status": status,
+            })
+
+    return rows
+
+
+if __name__ == "__main__":
+    args = create_parser().parse_args()
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.results) as f:
+        results = json.load(f)
+
+    rows = compare(baseline, results, args.threshold, args.phases)
+
+    print("{:<14} {:>6} {:<32} {:>12} {:>12} {:>8}  {}".format(
+        "benchmark", "scale", "metric", "baseline", "value", "change", ""))
+    for row in rows:
+        print("{:<14} {:>6} {:<32} {:>12.4g} {:>12.4g} {:>+7.1%}  {}".format(
+            row["benchmark"], row["scale"], row["metric"], row["baseline"],
+            row["value"], row["change"],
+            "" if row["status"] == "ok" else row["status"].upper()))
+
+    regressions = [row for row in rows if row["status"] == "regression"]
+    print("\n{} regression(s) above {:.0%}".format(
+        len(regressions), args.threshold))
+    sys.exit(1 if regressions else 0)
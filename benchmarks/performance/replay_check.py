@@ -0,0 +1,155 @@
+"""Checks that recorded TraCI traces replay through the profiling proxies.
+
+A fake TraCI connection (see FakeConnection) serves deterministic responses,
+such that no sumo instance is needed. The calls of a short episode are
+recorded with a TraCIRecorder, and the trace is then replayed with a
+ReplayKernelAPI, both directly and wrapped by the proxies installed by the
+kernel when ``profile=True`` (CountingAPI) or ``trace_api=True``
+(TraCITracer) are combined with ``replay_api``. The responses of every replay
+are compared with the recorded ones.
+"""
+import argparse
+import os
+import tempfile
+
+from flow.core.kernel.recording import TraCIRecorder, ReplayKernelAPI
+from flow.core.profiling import CountingAPI, StepProfiler, TraCITracer
+
+EXAMPLE_USAGE = """
+example usage:
+    python replay_check.py --num_steps 100 --num_vehicles 20
+"""
+
+
+def create_parser():
+    """Create the parser to capture CLI arguments."""
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="[Flow] Checks that recorded TraCI traces replay through "
+                    "the profiling proxies.",
+        epilog=EXAMPLE_USAGE)
+    parser.add_argument(
+        "--num_steps", type=int, default=100,
+        help="Number of steps of the recorded episode.")
+    parser.add_argument(
+        "--num_vehicles", type=int, default=20,
+        help="Number of vehicles in the fake network.")
+    return parser
+
+
+class _FakeDomain(object):
+    """Domain of a FakeConnection, serving responses from a function."""
+
+    def __init__(self, responses):
+        self._responses = responses
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def method(*args, **kwargs):
+            return self._responses(name, args)
+
+        return method
+
+
+class FakeConnection(object):
+    """Fake TraCI connection with vehicles moving along a single edge."""
+
+    def __init__(self, num_vehicles):
+        """Instantiate the connection.
+
+        Parameters
+        ----------
+        num_vehicles : int
+            number of vehicles in the network
+        """
+        self.num_vehicles = num_vehicles
+        self.time = 0
+        self.vehicle = _FakeDomain(self._vehicle)
+        self.simulation = _FakeDomain(self._simulation)
+
+    def simulationStep(self):
+        """Advance the fake simulation by one step."""
+        self.time += 1
+
+    def close(self):
+        """Close the fake connection."""
+        pass
+
+    def _vehicle(self, name, args):
+        if name == 'getIDList':
+            return tuple('veh_{}'.format(i) for i in range(self.num_vehicles))
+        elif name == 'getSpeed':
+            return float(int(args[0].split('_')[1]) + self.time) / 10.
+        elif name == 'getSubscriptionResults':
+            return {args[0]: {'speed': self.time}}
+        return None
+
+    def _simulation(self, name, args):
+        if name == 'getTime':
+            return float(self.time)
+        return None
+
+
+def run_episode(kernel_api, num_steps):
+    """Issue the calls of an episode and return their responses."""
+    responses = []
+    for _ in range(num_steps):
+        kernel_api.simulationStep()
+        responses.append(kernel_api.simulation.getTime())
+        for veh_id in kernel_api.vehicle.getIDList():
+            responses.append(kernel_api.vehicle.getSpeed(veh_id))
+            responses.append(
+                kernel_api.vehicle.getSubscriptionResults(veh_id))
+    kernel_api.close()
+    return responses
+
+
+def check(num_steps, num_vehicles):
+    """Record an episode and replay it through every proxy.
+
+    Parameters
+    ----------
+    num_steps : int
+        number of steps of the episode
+    num_vehicles : int
+        number of vehicles in the fake network
+
+    Returns
+    -------
+    dict < str, bool >
+        whether every replay returned the recorded responses
+    """
+    path = os.path.join(tempfile.mkdtemp(), 'check.trace')
+
+    recorder = TraCIRecorder(path)
+    expected = run_episode(
+        recorder.wrap(FakeConnection(num_vehicles)), num_steps)
+    recorder.close()
+
+    profiler = StepProfiler()
+    tracer = TraCITracer()
+    proxies = {
+        "replay": lambda api: api,
+        "replay + profile": lambda api: CountingAPI(api, profiler),
+        "replay + trace_api": tracer.wrap,
+    }
+
+    results = {}
+    for name, wrap in proxies.items():
+        replay_api = ReplayKernelAPI(path)
+        results[name] = \
+            run_episode(wrap(replay_api), num_steps) == expected
+
+    os.remove(path)
+    return results
+
+
+if __name__ == "__main__":
+    args = create_parser().parse_args()
+    results = check(args.num_steps, args.num_vehicles)
+    for name, consistent in results.items():
+        print("{:>20}: {}".format(name, "ok" if consistent else "FAILED"))
+    if not all(results.values()):
+        raise SystemExit(1)
@@ -0,0 +1,290 @@
+"""Measures the throughput of the simulator stack on the Flow benchmarks.
+
+For every benchmark and fleet scale, a fresh process constructs the
+environment, performs a number of rollouts with a fixed (zero or random)
+policy, and reports:
+
+- the environment construction time
+- the mean reset time
+- the number of steps per second
+- the per-phase breakdown of a step (see flow.core.profiling.StepProfiler)
+- the peak resident set size of the Flow process and of the simulator
+
+Fleet scales multiply the number of vehicles initially placed in the network
+and the rate of every inflow. Results are written to a json file, which can be
+compared with the results of another run using compare.py.
+
+No RL library is needed to run the benchmarks.
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import resource
+import sys
+import time
+from copy import deepcopy
+from datetime import datetime
+
+import numpy as np
+
+EXAMPLE_USAGE = """
+example usage:
+    python runner.py --benchmarks figureeight0 merge0 --scales 1 2 4 \
+        --output results.json
+Here the arguments are:
+benchmarks - names of the benchmarks in flow/benchmarks to run
+scales - fleet scales at which every benchmark is run
+output - path of the json file results are written to
+"""
+
+# benchmarks run by default
+DEFAULT_BENCHMARKS = [
+    "bottleneck0", "bottleneck1", "bottleneck2",
+    "figureeight0", "figureeight1", "figureeight2",
+    "grid0", "grid1",
+    "merge0", "merge1",
+]
+
+
+def create_parser():
+    """Create the parser to capture CLI arguments."""
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="[Flow] Measures the performance of the simulator stack "
+                    "on the Flow benchmarks.",
+        epilog=EXAMPLE_USAGE)
+
+    parser.add_argument(
+        "--benchmarks", type=str, nargs="+", default=DEFAULT_BENCHMARKS,
+        help="Names of the benchmarks to run.")
+    parser.add_argument(
+        "--scales", type=float, nargs="+", default=[1],
+        help="Fleet scales at which every benchmark is run.")
+    parser.add_argument(
+        "--num_steps", type=int, default=1000,
+        help="Number of steps per rollout. Defaults to 1000, and is capped "
+             "by the horizon of the benchmark.")
+    parser.add_argument(
+        "--num_rollouts", type=int, default=1,
+        help="Number of rollouts per benchmark and scale.")
+    parser.add_argument(
+        "--policy", type=str, default="zero", choices=["zero", "random"],
+        help="Policy computing the actions of the RL agents.")
+    parser.add_argument(
+        "--seed", type=int, default=0,
+        help="Seed of the simulator and of the random policy.")
+    parser.add_argument(
+        "--output", type=str, default="performance.json",
+        help="Path of the json file results are written to.")
+    return parser
+
+
+def scale_fleet(flow_params, scale):
+    """Return a copy of flow_params with a scaled number of vehicles.
+
+    The number of vehicles of every type initially placed in the network, and
+    the rate (or probability) of every inflow, are multiplied by the scale.
+
+    Parameters
+    ----------
+    flow_params : dict
+        flow-specific parameters of the benchmark
+    scale : float
+        fleet scale
+
+    Returns
+    -------
+    dict
+        the scaled flow-specific parameters
+    """
+    from flow.core.params import VehicleParams
+
+    flow_params = deepcopy(flow_params)
+    if scale == 1:
+        return flow_params
+
+    vehicles = VehicleParams()
+    for veh_type in flow_params["veh"].initial:
+        veh_type = dict(veh_type)
+        veh_type["num_vehicles"] = int(round(veh_type["num_vehicles"] * scale))
+        veh_type["color"] = flow_params["veh"].type_parameters[
+            veh_type["veh_id"]].get("color")
+        vehicles.add(**veh_type)
+    flow_params["veh"] = vehicles
+
+    if flow_params["net"].inflows is not None:
+        for inflow in flow_params["net"].inflows.get():
+            if "vehsPerHour" in inflow:
+                inflow["vehsPerHour"] *= scale
+            elif "probability" in inflow:
+                inflow["probability"] = min(1, inflow["probability"] * scale)
+            elif "period" in inflow:
+                inflow["period"] /= scale
+
+    return flow_params
+
+
+def _peak_rss_mb(who):
+    """Return the peak resident set size of a process (in MB)."""
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def _action(space, policy):
+    """Return the action of a fixed policy in an action space."""
+    if policy == "random":
+        return space.sample()
+    return np.zeros(space.shape)
+
+
+def run_benchmark(benchmark_name, scale, num_steps, num_rollouts, policy,
+                  seed):
+    """Measure the performance of the simulator stack on a benchmark.
+
+    This is meant to be run in a fresh process, so that peak memory usage is
+    not shared with other benchmarks.
+
+    Parameters
+    ----------
+    benchmark_name : str
+        name of the benchmark in flow/benchmarks
+    scale : float
+        fleet scale (see scale_fleet)
+    num_steps : int
+        maximum number of steps per rollout
+    num_rollouts : int
+        number of rollouts
+    policy : str
+        "zero" or "random"
+    seed : int
+        seed of the simulator and of the random policy
+
+    Returns
+    -------
+    dict
+        measurements of the benchmark
+    """
+    from flow.utils.registry import make_create_env
+
+    random.seed(seed)
+    np.random.seed(seed)
+
+    benchmark = __import__(
+        "flow.benchmarks.%s" % benchmark_name, fromlist=["flow_params"])
+    flow_params = scale_fleet(benchmark.flow_params, scale)
+    flow_params["sim"].render = False
+    flow_params["sim"].seed = seed
+    flow_params["sim"].profile = True
+
+    # construct the environment
+    t = time.time()
+    create_env, _ = make_create_env(flow_params)
+    env = create_env()
+    construction_time = time.time() - t
+    env.action_space.seed(seed)
+
+    num_steps = min(num_steps, env.env_params.horizon)
+    reset_times = []
+    steps = 0
+    step_time = 0
+    for _ in range(num_rollouts):
+        t = time.time()
+        state = env.reset()
+        reset_times.append(time.time() - t)
+
+        t = time.time()
+        for _ in range(num_steps):
+            if isinstance(state, dict):
+                action = {key: _action(env.action_space, policy)
+                          for key in state.keys()}
+            else:
+                action = _action(env.action_space, policy)
+            state, _, done, _ = env.step(action)
+            steps += 1
+            if done is True or (isinstance(done, dict) and done["__all__"]):
+                break
+        step_time += time.time() - t
+
+    num_vehicles = len(env.k.vehicle.get_ids())
+    phases = env.k.profiler.summary()
+    cache = env.k.cache.stats()
+    env.terminate()
+
+    return {
+        "benchmark": benchmark_name,
+        "scale": scale,
+        "initial_vehicles": flow_params["veh"].num_vehicles,
+        "final_vehicles": num_vehicles,
+        "construction_time": construction_time,
+        "reset_time": float(np.mean(reset_times)),
+        "steps": steps,
+        "steps_per_second": steps / step_time if step_time > 0 else 0,
+        "phases": {name: {key: hist[key] for key in
+                          ("mean", "p50", "p90", "p99", "total")}
+                   for name, hist in phases["phases"].items()},
+        "simulator_calls_per_step": phases["simulator_calls"]["mean"],
+        "cache_hit_rate": cache["hit_rate"],
+        "peak_rss_mb": _peak_rss_mb(resource.RUSAGE_SELF),
+        "simulator_peak_rss_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def run_all(args):
+    """Run every benchmark at every scale, each in a fresh process.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        parsed command-line arguments (see create_parser)
+
+    Returns
+    -------
+    dict
+        * meta: description of the run
+        * results: measurements of every benchmark and scale (see
+          run_benchmark). Benchmarks that failed are reported with an "error"
+          key instead.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for benchmark_name in args.benchmarks:
+        for scale in args.scales:
+            print("Running {} at scale {}".format(benchmark_name, scale))
+            with ctx.Pool(processes=1) as pool:
+                try:
+                    result = pool.apply(run_benchmark, (
+                        benchmark_name, scale, args.num_steps,
+                        args.num_rollouts, args.policy, args.seed))
+                    print("    {:.1f} steps/s, reset {:.3f} s, peak RSS "
+                          "{:.1f} MB".format(result["steps_per_second"],
+                                             result["reset_time"],
+                                             result["peak_rss_mb"]))
+                except Exception as e:
+                    result = {"benchmark": benchmark_name, "scale": scale,
+                              "error": repr(e)}
+                    print("    failed: {}".format(repr(e)))
+            results.append(result)
+
+    return {
+        "meta": {
+            "date": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "num_steps": args.num_steps,
+            "num_rollouts": args.num_rollouts,
+            "policy": args.policy,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    args = create_parser().parse_args()
+    output = run_all(args)
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+    print("Results written to {}".format(args.output))
@@ -0,0 +1,285 @@
+"""Measures how the kernel hot paths scale with the number of vehicles.
+
+The TraCI kernels are connected to synthetic traffic served by a fake TraCI
+connection (see flow.core.kernel.synthetic), so that no sumo instance is
+needed. For every vehicle count, the following are timed:
+
+- the traffic source step (the cost of producing the subscription results,
+  reported for reference)
+- the vehicle kernel update, including the multi-lane headway computations
+- the multi-lane headway computations alone
+- get_ids_by_edge over all edges
+- the traffic light kernel update
+- the reward functions in flow.core.rewards taking the environment as input
+- the get_state and compute_reward methods of the requested environments
+
+The scaling exponent of every measurement (the slope of the log-log fit of
+its duration against the number of vehicles) is reported along with the
+durations. If --check is set, the consistency of the vehicle kernel with the
+served traffic is also verified at every step.
+"""
+import argparse
+import json
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from flow.core import rewards
+from flow.core.kernel.synthetic import SyntheticNetwork, SyntheticTraffic, \
+    make_synthetic_kernel, check_vehicle_kernel
+from flow.core.params import EnvParams, SumoParams
+
+EXAMPLE_USAGE = """
+example usage:
+    python scaling.py --num_vehicles 10 100 1000 10000 50000 --envs AccelEnv
+Here the arguments are:
+num_vehicles - vehicle counts at which the hot paths are timed
+envs - names of the environments in flow.envs whose observations and rewards
+       are timed
+"""
+
+# reward functions timed by default, with the additional arguments they need
+REWARD_FUNCTIONS = {
+    "desired_velocity": lambda env: rewards.desired_velocity(env),
+    "average_velocity": lambda env: rewards.average_velocity(env),
+    "min_delay": lambda env: rewards.min_delay(env),
+    "penalize_standstill": lambda env: rewards.penalize_standstill(env),
+    "energy_consumption": lambda env: rewards.energy_consumption(env),
+}
+
+
+def create_parser():
+    """Create the parser to capture CLI arguments."""
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="[Flow] Measures how the kernel hot paths scale with "
+                    "the number of vehicles, without sumo.",
+        epilog=EXAMPLE_USAGE)
+
+    parser.add_argument(
+        "--num_vehicles", type=int, nargs="+",
+        default=[10, 100, 1000, 10000, 50000],
+        help="Vehicle counts at which the hot paths are timed.")
+    parser.add_argument(
+        "--num_lanes", type=int, default=3,
+        help="Number of lanes of every edge of the synthetic network.")
+    parser.add_argument(
+        "--density", type=float, default=0.05,
+        help="Number of vehicles per meter of lane, from which the length "
+             "of the network is deduced.")
+    parser.add_argument(
+        "--edge_length", type=float, default=500,
+        help="Length of every edge of the synthetic network.")
+    parser.add_argument(
+        "--num_traffic_lights", type=int, default=10,
+        help="Number of traffic lights of the synthetic traffic.")
+    parser.add_argument(
+        "--num_steps", type=int, default=5,
+        help="Number of timed steps per vehicle count. The median duration "
+             "is reported.")
+    parser.add_argument(
+        "--envs", type=str, nargs="*", default=[],
+        help="Names of the environments in flow.envs whose get_state and "
+             "compute_reward methods are timed.")
+    parser.add_argument(
+        "--check", action="store_true",
+        help="Check the consistency of the vehicle kernel at every step.")
+    parser.add_argument(
+        "--seed", type=int, default=0,
+        help="Seed of the synthetic traffic.")
+    parser.add_argument(
+        "--output", type=str,
+        help="Path of a json file results are written to.")
+    return parser
+
+
+def bind_env(env_cls, k, horizon=1000):
+    """Create an environment bound to an existing kernel.
+
+    The constructor of the environment is skipped (it would start a
+    simulation), and the attributes set by the constructor of the base
+    environment are set instead. The additional parameters of the environment
+    default to the ADDITIONAL_ENV_PARAMS of its module, if any.
+
+    Parameters
+    ----------
+    env_cls : type
+        the environment class
+    k : flow.core.kernel.Kernel
+        the kernel, see flow.core.kernel.synthetic.make_synthetic_kernel
+    horizon : int, optional
+        horizon of the environment
+
+    Returns
+    -------
+    flow.envs.Env
+        the environment
+    """
+    module = sys.modules[env_cls.__module__]
+    additional_params = dict(getattr(module, "ADDITIONAL_ENV_PARAMS", {}))
+
+    env = env_cls.__new__(env_cls)
+    env.k = k
+    env.env_params = EnvParams(horizon=horizon,
+                               additional_params=additional_params)
+    env.sim_params = SumoParams(sim_step=k.simulation.sim_step)
+    env.sim_step = k.simulation.sim_step
+    env.simulator = "traci"
+    env.network = k.network.network
+    env.time_counter = 0
+    env.step_counter = 0
+    env.initial_state = {}
+    env.state = None
+    env.obs_var_labels = []
+    env.available_routes = k.network.rts
+    env.initial_ids = list(k.vehicle.get_ids())
+    return env
+
+
+def _time(func, repeat=1):
+    """Return the duration of a call to func (in s)."""
+    t = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - t) / repeat
+
+
+def measure(num_vehicles, args):
+    """Time the hot paths of the kernels for a number of vehicles.
+
+    Parameters
+    ----------
+    num_vehicles : int
+        number of vehicles
+    args : argparse.Namespace
+        parsed command-line arguments (see create_parser)
+
+    Returns
+    -------
+    dict < str, float or str >
+        median duration (in s) of every measurement, or the error raised by
+        the measured function
+    """
+    # the length of the network is adapted to the number of vehicles
+    lane_length = num_vehicles / args.num_lanes / args.density
+    num_edges = max(2, int(np.ceil(lane_length / args.edge_length)))
+    network = SyntheticNetwork(num_edges=num_edges, num_lanes=args.num_lanes,
+                               edge_length=args.edge_length)
+    traffic = SyntheticTraffic(network, num_vehicles,
+                               num_traffic_lights=args.num_traffic_lights,
+                               seed=args.seed)
+    k = make_synthetic_kernel(network, traffic)
+
+    measurements = {
+        "traffic.step": lambda: k.simulation.simulation_step(),
+        "vehicle.update": lambda: k.vehicle.update(reset=False),
+        "vehicle.multi_lane_headways": k.vehicle._multi_lane_headways,
+        "vehicle.get_ids_by_edge": lambda: k.vehicle.get_ids_by_edge(
+            k.network.get_edge_list()),
+        "traffic_light.update": lambda: k.traffic_light.update(reset=False),
+    }
+
+    # the reward functions only need the kernel and parameters of the env
+    env = SimpleNamespace(
+        k=k, sim_step=k.simulation.sim_step,
+        env_params=EnvParams(additional_params={"target_velocity": 25}))
+    for name, func in REWARD_FUNCTIONS.items():
+        measurements["rewards." + name] = (lambda f: lambda: f(env))(func)
+
+    for env_name in args.envs:
+        env_i = bind_env(_env_class(env_name), k)
+        measurements[env_name + ".get_state"] = env_i.get_state
+        measurements[env_name + ".compute_reward"] = \
+            (lambda e: lambda: e.compute_reward(None, fail=False))(env_i)
+
+    durations = {name: [] for name in measurements}
+    errors = {}
+    for _ in range(args.num_steps):
+        for name, func in measurements.items():
+            if name in errors:
+                continue
+            # the kernel is not updated through k.update, so the values
+            # cached by the previous measurement are invalidated by hand,
+            # such that every measurement includes the cost of computing them
+            k.cache.clear()
+            try:
+                durations[name].append(_time(func))
+            except Exception as e:
+                errors[name] = repr(e)
+        if args.check:
+            check_vehicle_kernel(k, traffic)
+
+    results = {name: float(np.median(values))
+               for name, values in durations.items() if values}
+    results.update(errors)
+    return results
+
+
+def _env_class(name):
+    """Return an environment class of flow.envs by name."""
+    import flow.envs
+    return getattr(flow.envs, name)
+
+
+def scaling_exponents(counts, results):
+    """Compute the scaling exponent of every measurement.
+
+    Parameters
+    ----------
+    counts : list of int
+        vehicle counts
+    results : list of dict
+        measurements for every vehicle count (see measure)
+
+    Returns
+    -------
+    dict < str, float >
+        slope of the log-log fit of the duration of every measurement against
+        the number of vehicles
+    """
+    exponents = {}
+    for name in results[0]:
+        points = [(n, r[name]) for n, r in zip(counts, results)
+                  if isinstance(r.get(name), float) and r[name] > 0]
+        if len(points) >= 2:
+            n, t = zip(*points)
+            exponents[name] = float(np.polyfit(np.log(n), np.log(t), 1)[0])
+    return exponents
+
+
+if __name__ == "__main__":
+    args = create_parser().parse_args()
+
+    results = []
+    for num_vehicles in args.num_vehicles:
+        print("Measuring {} vehicles".format(num_vehicles))
+        results.append(measure(num_vehicles, args))
+    exponents = scaling_exponents(args.num_vehicles, results)
+
+    # print the durations (in ms) of every measurement and vehicle count
+    names = sorted(set().union(*results))
+    print("\n{:<40}".format("duration (ms)") + "".join(
+        "{:>12}".format(n) for n in args.num_vehicles) + "{:>10}".format("exp"))
+    for name in names:
+        row = "{:<40}".format(name)
+        for result in results:
+            value = result.get(name)
+            row += "{:>12.3f}".format(value * 1e3) \
+                if isinstance(value, float) else "{:>12}".format("error")
+        row += "{:>10.2f}".format(exponents[name]) \
+            if name in exponents else "{:>10}".format("-")
+        print(row)
+
+    for name in names:
+        errors = {n: r[name] for n, r in zip(args.num_vehicles, results)
+                  if isinstance(r.get(name), str)}
+        if errors:
+            print("\n{} failed: {}".format(name, next(iter(errors.values()))))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"num_vehicles": args.num_vehicles,
+                       "results": results,
+                       "exponents": exponents}, f, indent=2)
@@ -28,7 +28,7 @@ from flow.controllers.lane_change_controllers import StaticLaneChanger, \
 # routing controllers
 from flow.controllers.base_routing_controller import BaseRouter
 from flow.controllers.routing_controllers import ContinuousRouter, \
-    GridRouter, BayBridgeRouter, I210Router
+    GridRouter, BayBridgeRouter, I210Router, ShortestPathRouter
 
 #RL routing controller
 from flow.controllers.rlroutecontroller import RLRoutingController
@@ -42,5 +42,5 @@ __all__ = [
     "PISaturation", "StaticLaneChanger", "SimLaneChangeController",
     "ContinuousRouter", "GridRouter", "BayBridgeRouter", "LACController",
     "GippsController", "NonLocalFollowerStopper", "BandoFTLController",
-    "I210Router", "CityNetworkRouter", "RLRoutingController", "MinicityRouter", "BristolRouter", "LondonRouter", "TriangleRouter"
+    "I210Router", "ShortestPathRouter", "CityNetworkRouter", "RLRoutingController", "MinicityRouter", "BristolRouter", "LondonRouter", "TriangleRouter"
 ]
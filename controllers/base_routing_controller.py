@@ -25,8 +25,23 @@ class BaseRouter(metaclass=ABCMeta):
         ID of the vehicle this controller is used for
     router_params : dict
         Dictionary of router params
+
+    Attributes
+    ----------
+    final_edge_only : bool
+        if set to True, the environment only calls ``choose_route`` when the
+        vehicle is on the last edge of its current route (or on one of the
+        ``trigger_edges``), and otherwise assumes no routing action is taken.
+        Routers that act on vehicles in the middle of their routes must leave
+        this as False.
+    trigger_edges : frozenset of str
+        edges on which ``choose_route`` is always called, even if
+        ``final_edge_only`` is set to True
     """
 
+    final_edge_only = False
+    trigger_edges = frozenset()
+
     def __init__(self, veh_id, router_params):
         """Instantiate the base class for routing controllers."""
         self.veh_id = veh_id
@@ -1,11 +1,44 @@
 """Contains a list of custom routing controllers."""
-import random
 import numpy as np
-from gym.spaces.box import Box 
 
 from flow.controllers.base_routing_controller import BaseRouter
 
 
+def _random_junction_route(env, veh_id):
+    """Extend a vehicle's route by a random edge once it reaches its end.
+
+    The successor edge is chosen uniformly at random from the non-internal
+    edges reachable from the vehicle's current edge/lane pair, as stored in
+    the network's routing table.
+
+    Parameters
+    ----------
+    env : flow.envs.Env
+        see flow/envs/base.py
+    veh_id : str
+        name of the vehicle
+
+    Returns
+    -------
+    list of str or None
+        the vehicle's current edge followed by the chosen successor edge, or
+        None if the vehicle is not on the last edge of its route or there are
+        no successors
+    """
+    veh_edge = env.k.vehicle.get_edge(veh_id)
+    veh_route = env.k.vehicle.get_route(veh_id)
+
+    if len(veh_route) == 0 or veh_route[-1] != veh_edge:
+        return None
+
+    next_edge = env.k.network.routing_table.random_successor(
+        veh_edge, env.k.vehicle.get_lane(veh_id))
+    if next_edge is None:
+        return None
+
+    return [veh_edge, next_edge]
+
+
 class ContinuousRouter(BaseRouter):
     """A router used to continuously re-route of the vehicle in a closed ring.
 
@@ -17,6 +50,8 @@ class ContinuousRouter(BaseRouter):
     See base class for usage example.
     """
 
+    final_edge_only = True
+
     def choose_route(self, env):
         """See parent class.
 
@@ -43,28 +78,24 @@ class ContinuousRouter(BaseRouter):
             return None
 
 class LondonRouter(BaseRouter):
+    """A router used to continuously re-route vehicles in the London network.
+
+    This class allows the vehicle to pick a random route at junctions, and
+    assigns fixed loops to the buses.
+
+    Usage
+    -----
+    See base class for usage example.
+    """
+
+    final_edge_only = True
+    trigger_edges = frozenset(["edge_SN_6", "edge_NS_8"])
+
     def choose_route(self, env):
         """See parent class."""
-        vehicles = env.k.vehicle
         veh_id = self.veh_id
-        veh_edge = vehicles.get_edge(veh_id)
-        veh_route = vehicles.get_route(veh_id)
-        veh_next_edge = env.k.network.next_edge(veh_edge,
-                                                vehicles.get_lane(veh_id))
-        not_an_edge = ":"
-        no_next = 0
-
-        if len(veh_next_edge) == no_next:
-            next_route = None
-        elif veh_route[-1] == veh_edge:
-            random_route = random.randint(0, len(veh_next_edge) - 1)
-            while veh_next_edge[0][0][0] == not_an_edge:
-                veh_next_edge = env.k.network.next_edge(
-                    veh_next_edge[random_route][0],
-                    veh_next_edge[random_route][1])
-            next_route = [veh_edge, veh_next_edge[0][0]]
-        else:
-            next_route = None
+        veh_edge = env.k.vehicle.get_edge(veh_id)
+        next_route = _random_junction_route(env, veh_id)
 
         if veh_id=="bus_0":
             if veh_edge in ["edge_SN_6"]:
@@ -85,27 +116,14 @@ class MinicityRouter(BaseRouter):
     See base class for usage example.
     """
 
+    final_edge_only = True
+    trigger_edges = frozenset(['e_37', 'e_51'])
+
     def choose_route(self, env):
         """See parent class."""
-        vehicles = env.k.vehicle
         veh_id = self.veh_id
-        veh_edge = vehicles.get_edge(veh_id)
-        veh_route = vehicles.get_route(veh_id)
-        veh_next_edge = env.k.network.next_edge(veh_edge,
-                                                vehicles.get_lane(veh_id))
-        not_an_edge = ":"
-        no_next = 0
-        if len(veh_next_edge) == no_next:
-            next_route = None
-        elif veh_route[-1] == veh_edge:
-            random_route = random.randint(0, len(veh_next_edge) - 1)
-            while veh_next_edge[0][0][0] == not_an_edge:
-                veh_next_edge = env.k.network.next_edge(
-                    veh_next_edge[random_route][0],
-                    veh_next_edge[random_route][1])
-            next_route = [veh_edge, veh_next_edge[0][0]]
-        else:
-            next_route = None
+        veh_edge = env.k.vehicle.get_edge(veh_id)
+        next_route = _random_junction_route(env, veh_id)
 
         if veh_edge in ['e_37', 'e_51']:
             next_route = [veh_edge, 'e_29_u', 'e_21']
@@ -122,29 +140,14 @@ class TriangleRouter(BaseRouter):
     See base class for usage example.
     """
 
+    final_edge_only = True
+    trigger_edges = frozenset(["edge_6", "edge_21"])
+
     def choose_route(self, env):
         """See parent class."""
-        vehicles = env.k.vehicle
         veh_id = self.veh_id
-        veh_edge = vehicles.get_edge(veh_id)
-        veh_route = vehicles.get_route(veh_id)
-        veh_next_edge = env.k.network.next_edge(veh_edge,
-                                                vehicles.get_lane(veh_id))
-        not_an_edge = ":"
-        no_next = 0
-        
-        
-        if len(veh_next_edge) == no_next:
-            next_route = None
-        elif veh_route[-1] == veh_edge:
-            random_route = random.randint(0, len(veh_next_edge) - 1)
-            while veh_next_edge[0][0][0] == not_an_edge:
-                veh_next_edge = env.k.network.next_edge(
-                    veh_next_edge[random_route][0],
-                    veh_next_edge[random_route][1])
-            next_route = [veh_edge, veh_next_edge[0][0]]
-        else:
-            next_route = None
+        veh_edge = env.k.vehicle.get_edge(veh_id)
+        next_route = _random_junction_route(env, veh_id)
 
         if veh_id=="bus_0":
             if veh_edge in ["edge_6"]:
@@ -158,6 +161,49 @@ class TriangleRouter(BaseRouter):
 
 
 
+class ShortestPathRouter(BaseRouter):
+    """A router that sends vehicles to a destination along the fastest route.
+
+    Routes are computed by the network's route planner (see
+    flow/core/kernel/network/route_planner.py), using travel times derived
+    from the live mean speeds on every edge. Once a vehicle reaches the last
+    edge of its route, it is rerouted towards its destination.
+
+    Usage
+    -----
+    >>> from flow.core.params import VehicleParams
+    >>> from flow.controllers import ShortestPathRouter
+    >>> vehicles = VehicleParams()
+    >>> vehicles.add("human", routing_controller=(
+    >>>     ShortestPathRouter, {"destination": "edge_5"}))
+
+    Parameters
+    ----------
+    veh_id : str
+        ID of the vehicle this controller is used for
+    router_params : dict
+        Dictionary of router params, containing:
+
+        * destination (str): edge the vehicle is routed towards
+    """
+
+    final_edge_only = True
+
+    def choose_route(self, env):
+        """See parent class."""
+        edge = env.k.vehicle.get_edge(self.veh_id)
+        destination = self.router_params['destination']
+
+        if edge == destination or \
+                len(env.k.vehicle.get_route(self.veh_id)) == 0:
+            return None
+
+        route, _ = env.k.network.route_planner.shortest_path(
+            edge, destination)
+
+        return route
+
+
 class GridRouter(BaseRouter):
     """A router used to re-route a vehicle in a traffic light grid environment.
 
@@ -166,6 +212,8 @@ class GridRouter(BaseRouter):
     See base class for usage example.
     """
 
+    final_edge_only = True
+
     def choose_route(self, env):
         """See parent class."""
         if len(env.k.vehicle.get_route(self.veh_id)) == 0:
@@ -189,6 +237,9 @@ class BayBridgeRouter(ContinuousRouter):
     See base class for usage example.
     """
 
+    # vehicles on select edges/lanes are rerouted mid-route
+    final_edge_only = False
+
     def choose_route(self, env):
         """See parent class."""
         edge = env.k.vehicle.get_edge(self.veh_id)
@@ -213,6 +264,9 @@ class I210Router(ContinuousRouter):
     See base class for usage example.
     """
 
+    # vehicles on select edges/lanes are rerouted mid-route
+    final_edge_only = False
+
     def choose_route(self, env):
         """See parent class."""
         edge = env.k.vehicle.get_edge(self.veh_id)
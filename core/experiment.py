@@ -2,6 +2,7 @@
 from flow.utils.registry import make_create_env
 from datetime import datetime
 import logging
+import os
 import time
 import numpy as np
 
@@ -245,6 +246,35 @@ class Experiment:
 
         print("Total time:", time.time() - t)
         print("steps/second:", np.mean(times))
+
+        # print the per-phase timing information, and export it next to the
+        # emission files, if profiling was enabled in the simulation params
+        profiler = self.env.k.profiler
+        if profiler.enabled:
+            summary = profiler.summary()
+            info_dict["profile"] = summary
+            print("\nPer-phase step timing (mean / p99, ms):")
+            for name, phase in summary["phases"].items():
+                print("  {:<28} {:9.3f} {:9.3f}".format(
+                    name, 1e3 * phase["mean"], 1e3 * phase["p99"]))
+            print("  simulator calls per step:",
+                  summary["simulator_calls"]["mean"])
+            if self.env.sim_params.emission_path is not None:
+                profiler.to_json(os.path.join(
+                    self.env.sim_params.emission_path,
+                    "{}-profile.json".format(self.env.network.name)))
+
+        # print the most expensive TraCI calls if tracing was enabled
+        tracer = self.env.k.tracer
+        if tracer is not None:
+            tracer.end_episode()
+            info_dict["traci_trace"] = tracer.summary(top=20)
+            print("\n" + tracer.report())
+            if self.env.sim_params.emission_path is not None:
+                tracer.to_json(os.path.join(
+                    self.env.sim_params.emission_path,
+                    "{}-traci_trace.json".format(self.env.network.name)))
+
         self.env.terminate()
 
 
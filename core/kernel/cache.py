@@ -0,0 +1,127 @@
+"""Per-step cache of quantities shared by observations and rewards.
+
+Several environments compute the same system-level quantities more than once
+per step, e.g. multi-agent reward functions computing the average speed of
+the network once per RL vehicle. The StepCache held by the kernel memoizes
+such quantities for the duration of a simulation step, and is cleared every
+time the kernel is updated:
+
+    >>> speeds = env.k.cache.speeds()  # computed
+    >>> speeds = env.k.cache.speeds()  # served from the cache
+    >>> value = env.k.cache.get(('my_quantity', edge), compute, env, edge)
+
+The hit and miss counters of the cache can be used to check that a quantity
+is indeed shared when profiling an environment.
+"""
+
+import numpy as np
+
+
+class StepCache(object):
+    """Memoization of quantities for the duration of a simulation step.
+
+    Attributes
+    ----------
+    hits : int
+        number of values served from the cache since its creation
+    misses : int
+        number of values computed since the creation of the cache
+    """
+
+    def __init__(self, master_kernel):
+        """Instantiate the cache.
+
+        Parameters
+        ----------
+        master_kernel : flow.core.kernel.Kernel
+            the higher level kernel, from which the shared quantities are
+            computed
+        """
+        self.master_kernel = master_kernel
+        self.hits = 0
+        self.misses = 0
+        self._values = dict()
+        self._key_misses = dict()
+
+    def get(self, key, func, *args):
+        """Return the value stored under key, computing it if necessary.
+
+        Parameters
+        ----------
+        key : hashable
+            key of the value. Keys must account for the arguments of func,
+            e.g. ``('outflow', time_span)``
+        func : callable
+            function computing the value from args if it is not cached
+        args : tuple
+            arguments of func
+
+        Returns
+        -------
+        Any
+            the cached or computed value. Mutable values are shared between
+            callers, and should not be modified
+        """
+        try:
+            value = self._values[key]
+        except KeyError:
+            self.misses += 1
+            self._key_misses[key] = self._key_misses.get(key, 0) + 1
+            value = self._values[key] = func(*args)
+            return value
+        self.hits += 1
+        return value
+
+    def clear(self):
+        """Invalidate all cached values."""
+        self._values.clear()
+
+    def stats(self):
+        """Return the hit and miss counters of the cache.
+
+        Returns
+        -------
+        dict
+            * hits: number of values served from the cache
+            * misses: number of values computed
+            * hit_rate: fraction of the values served from the cache
+            * keys: number of times each key was computed
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total > 0 else 0.,
+            "keys": {str(key): count
+                     for key, count in self._key_misses.items()},
+        }
+
+    def speeds(self):
+        """Return the speeds of all vehicles in the network, as an array."""
+        return self.get('speeds', self._speeds)
+
+    def mean_speed(self):
+        """Return the average speed of all vehicles in the network.
+
+        Zero is returned if the network is empty, or if any speed is invalid
+        (e.g. if a collision occurred).
+        """
+        return self.get('mean_speed', self._mean_speed)
+
+    def rl_ids(self):
+        """Return the set of RL vehicle IDs in the network."""
+        return self.get('rl_ids', self._rl_ids)
+
+    def _speeds(self):
+        vehicle = self.master_kernel.vehicle
+        return np.array(vehicle.get_speed(vehicle.get_ids()), dtype=float)
+
+    def _mean_speed(self):
+        vel = self.speeds()
+        if len(vel) == 0 or np.any(vel < -100):
+            return 0.
+        return float(np.mean(vel))
+
+    def _rl_ids(self):
+        return frozenset(self.master_kernel.vehicle.get_rl_ids())
+
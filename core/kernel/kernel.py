@@ -1,11 +1,16 @@
 """Script containing the Flow kernel object for interacting with simulators."""
 
+import atexit
 import warnings
 from flow.core.kernel.simulation import TraCISimulation, AimsunKernelSimulation
 from flow.core.kernel.network import TraCIKernelNetwork, AimsunKernelNetwork
 from flow.core.kernel.vehicle import TraCIVehicle, AimsunKernelVehicle
 from flow.core.kernel.traffic_light import TraCITrafficLight, \
     AimsunKernelTrafficLight
+from flow.core.profiling import StepProfiler, NullProfiler, CountingAPI, \
+    TraCITracer
+from flow.core.kernel.recording import TraCIRecorder, ReplayKernelAPI
+from flow.core.kernel.cache import StepCache
 from flow.utils.exceptions import FatalFlowError
 
 
@@ -43,6 +48,20 @@ class Kernel(object):
 
     These subclasses can be modified and recycled to support various different
     traffic simulators, e.g. SUMO, AIMSUN, TruckSim, etc...
+
+    Finally, the kernel holds a ``profiler`` object used to time the phases of
+    every environment step. This is a flow.core.profiling.StepProfiler if the
+    ``profile`` attribute of the simulation parameters is set to True, and a
+    flow.core.profiling.NullProfiler (which performs no work) otherwise. If the
+    ``trace_api`` attribute is set, the ``tracer`` attribute additionally holds
+    a flow.core.profiling.TraCITracer recording every call issued to sumo.
+    If the ``record_api`` (or ``replay_api``) attribute is set, the responses
+    of sumo are recorded to (or replayed from) a trace, see
+    flow/core/kernel/recording.py.
+
+    Quantities shared by the observations and rewards of a step (e.g. the
+    average speed of the network) are memoized by the ``cache`` object (a
+    flow.core.kernel.cache.StepCache), which is cleared on every update.
     """
 
     def __init__(self, simulator, sim_params):
@@ -61,6 +80,27 @@ class Kernel(object):
             if the specified input simulator is not a valid type
         """
         self.kernel_api = None
+        self.cache = StepCache(self)
+
+        if getattr(sim_params, 'profile', False):
+            self.profiler = StepProfiler()
+        else:
+            self.profiler = NullProfiler()
+
+        if getattr(sim_params, 'trace_api', False) and simulator == 'traci':
+            self.tracer = TraCITracer(self.profiler)
+        else:
+            self.tracer = None
+
+        # record the responses of sumo, or replay previously recorded ones
+        self.recorder = None
+        self.replay_api = None
+        if simulator == 'traci':
+            if getattr(sim_params, 'record_api', None) is not None:
+                self.recorder = TraCIRecorder(sim_params.record_api)
+                atexit.register(self.recorder.close)
+            if getattr(sim_params, 'replay_api', None) is not None:
+                self.replay_api = ReplayKernelAPI(sim_params.replay_api)
 
         if simulator == "traci":
             self.simulation = TraCISimulation(self)
@@ -78,6 +118,16 @@ class Kernel(object):
 
     def pass_api(self, kernel_api):
         """Pass the kernel API to all kernel subclasses."""
+        # record or count the calls issued to the simulator if tracing or
+        # profiling are enabled
+        if self.tracer is not None:
+            kernel_api = self.tracer.wrap(kernel_api)
+        elif self.profiler.enabled and \
+                isinstance(self.simulation, TraCISimulation):
+            kernel_api = CountingAPI(kernel_api, self.profiler)
+        if self.recorder is not None:
+            kernel_api = self.recorder.wrap(kernel_api)
+
         self.kernel_api = kernel_api
         self.simulation.pass_api(kernel_api)
         self.network.pass_api(kernel_api)
@@ -98,15 +148,22 @@ class Kernel(object):
             specifies whether the simulator was reset in the last simulation
             step
         """
-        self.vehicle.update(reset)
-        self.traffic_light.update(reset)
-        self.network.update(reset)
-        self.simulation.update(reset)
+        self.cache.clear()
+        with self.profiler.phase('update.vehicle'):
+            self.vehicle.update(reset)
+        with self.profiler.phase('update.traffic_light'):
+            self.traffic_light.update(reset)
+        with self.profiler.phase('update.network'):
+            self.network.update(reset)
+        with self.profiler.phase('update.simulation'):
+            self.simulation.update(reset)
 
     def close(self):
         """Terminate all components within the simulation and network."""
         self.network.close()
         self.simulation.close()
+        if self.recorder is not None:
+            self.recorder.flush()
 
     @property
     def scenario(self):
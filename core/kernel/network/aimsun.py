@@ -54,6 +54,12 @@ class AimsunKernelNetwork(BaseKernelNetwork):
         """See parent class."""
         self.network = network
 
+        # successor edges, routes and starting position tables are recomputed
+        # for the new network when requested
+        self._routing_table = None
+        self._route_planner = None
+        self._start_position_table = None
+
         output = {
             "edges": network.edges,
             "nodes": network.nodes,
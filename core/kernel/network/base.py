@@ -5,6 +5,9 @@ import random
 import numpy as np
 from copy import deepcopy
 from flow.utils.exceptions import FatalFlowError
+from flow.core.kernel.network.routing_table import RoutingTable
+from flow.core.kernel.network.route_planner import RoutePlanner
+from flow.core.kernel.network.start_positions import StartPositionTable
 
 # length of vehicles in the network, in meters
 VEHICLE_LENGTH = 5
@@ -73,6 +76,12 @@ class BaseKernelNetwork(object):
         self.total_edgestarts = None
         self.total_edgestarts_dict = None
 
+        # precomputed successor edges, generated the first time they are
+        # requested (see the `routing_table` property)
+        self._routing_table = None
+        self._route_planner = None
+        self._start_position_table = None
+
     def generate_network(self, network):
         """Generate the necessary prerequisites for the simulating a network.
 
@@ -203,6 +212,54 @@ class BaseKernelNetwork(object):
         """
         raise NotImplementedError
 
+    @property
+    def routing_table(self):
+        """Return the routing table of the current network.
+
+        The table is computed the first time it is requested, and cached until
+        a new network is generated.
+
+        Returns
+        -------
+        flow.core.kernel.network.routing_table.RoutingTable
+            the reachable non-internal successor edges of every edge/lane pair
+        """
+        if self._routing_table is None:
+            self._routing_table = RoutingTable(self)
+        return self._routing_table
+
+    @property
+    def route_planner(self):
+        """Return the route planning service of the current network.
+
+        The planner is created the first time it is requested, and cached
+        until a new network is generated.
+
+        Returns
+        -------
+        flow.core.kernel.network.route_planner.RoutePlanner
+            shortest and k-shortest path queries over the network's edges
+        """
+        if self._route_planner is None:
+            self._route_planner = RoutePlanner(self)
+        return self._route_planner
+
+    @property
+    def start_position_table(self):
+        """Return the cumulative lane lengths used to place vehicles.
+
+        The table is created the first time it is requested, and cached until
+        a new network is generated.
+
+        Returns
+        -------
+        flow.core.kernel.network.start_positions.StartPositionTable
+            vectorised placement of vehicles along the edges of the network
+        """
+        if self._start_position_table is None:
+            self._start_position_table = StartPositionTable(self)
+        return self._start_position_table
+
     ###########################################################################
     #            Methods for generating initial vehicle positions.            #
     ###########################################################################
@@ -311,197 +368,77 @@ class BaseKernelNetwork(object):
         if num_vehicles == 0:
             return [], []
 
-        increment = available_length / num_vehicles
+        table = self.start_position_table
 
         # when consecutive edges do not have the same number of lanes, vehicles
         # are not allowed to be in between edges (as a lane might not exist on
-        # the other side)
-        flag = False
-        lanes = [self.num_lanes(edge) for edge in self.get_edge_list()]
-        if any(lanes[0] != lanes[i] for i in range(1, len(lanes))):
-            flag = True
-
-        x = x0
-        car_count = 0
-        startpositions, startlanes = [], []
+        # the other side), and start a vehicle's length away from the start of
+        # every edge
+        _, lanes = table.edge_arrays(self.get_edge_list())
+        front_space = VEHICLE_LENGTH if np.any(lanes != lanes[0]) else 0
+
+        # vehicles are placed in rows along the available edges, in the order
+        # of their positions in the network, such that the space freed at the
+        # start of the edges is not available anymore
+        edges = sorted(available_edges, key=lambda edge: self.get_x(edge, 0))
+        seg = table.segments(edges, lanes_distr, front_space)
+        available_length -= front_space * np.sum(seg.lanes)
+        increment = available_length / num_vehicles
 
         # generate uniform starting positions
-        while car_count < num_vehicles:
-            # collect the position and lane number of each new vehicle
-            pos = self.get_edge(x)
-
-            # ensures that vehicles are not placed in an internal junction
-            while pos[0] in dict(self.internal_edgestarts).keys():
-                # find the location of the internal edge in total_edgestarts,
-                # which has the edges ordered by position
-                edges = [tup[0] for tup in self.total_edgestarts]
-                indx_edge = next(
-                    i for i, edge in enumerate(edges) if edge == pos[0])
-
-                # take the next edge in the list, and place the car at the
-                # beginning of this edge
-                if indx_edge == len(edges) - 1:
-                    next_edge_pos = self.total_edgestarts[0]
-                else:
-                    next_edge_pos = self.total_edgestarts[indx_edge + 1]
-
-                x = next_edge_pos[1]
-                pos = (next_edge_pos[0], 0)
-
-            # ensures that you are in an acceptable edge
-            while pos[0] not in available_edges:
-                x = (x + self.edge_length(pos[0])) % self.non_internal_length()
-                pos = self.get_edge(x)
-
-            # ensure that in variable lane settings vehicles always start a
-            # vehicle's length away from the start of the edge. This, however,
-            # prevents the spacing to be completely uniform.
-            if flag and pos[1] < VEHICLE_LENGTH:
-                pos0, pos1 = pos
-                pos = (pos0, VEHICLE_LENGTH)
-                x += VEHICLE_LENGTH
-                increment -= (VEHICLE_LENGTH * self.num_lanes(pos0)) / \
-                             (num_vehicles - car_count)
-
-            # place vehicles side-by-side in all available lanes on this edge
-            for lane in range(min([self.num_lanes(pos[0]), lanes_distr])):
-                car_count += 1
-                startpositions.append(pos)
-                startlanes.append(lane)
-
-                if car_count == num_vehicles:
-                    break
-
-            x = (x + increment + VEHICLE_LENGTH + min_gap) % self.non_internal_length()
+        edge_index, pos, lanes = table.even(
+            edges, lanes_distr, front_space, x0,
+            increment + VEHICLE_LENGTH + min_gap, num_vehicles)
 
         # add a perturbation to each vehicle, while not letting the vehicle
         # leave its current edge
         if initial_config.perturbation > 0:
-            for i in range(num_vehicles):
-                perturb = np.random.normal(0, initial_config.perturbation)
-                edge, pos = startpositions[i]
-                pos = max(0, min(self.edge_length(edge), pos + perturb))
-                startpositions[i] = (edge, pos)
+            perturb = np.random.normal(
+                0, initial_config.perturbation, num_vehicles)
+            pos = np.clip(pos + perturb, 0,
+                          seg.lengths[edge_index] + front_space)
+
+        startpositions = list(zip(seg.names[edge_index].tolist(),
+                                  pos.tolist()))
+        startlanes = lanes.tolist()
 
         return startpositions, startlanes
 
     def gen_testing_bus_start_pos(self, initial_config, num_vehicles):
-        (x0, min_gap, bunching, lanes_distr, available_length,
-         available_edges, initial_config) = \
-            self._get_start_pos_util(initial_config, num_vehicles)
-        if isinstance(initial_config.edges_distribution, dict):
-            # check that the number of vehicle in edges_distribution matches
-            # that of the vehicles class
-            num_vehicles_e = sum(initial_config.edges_distribution[k]
-                                 for k in initial_config.edges_distribution)
-            assert num_vehicles == num_vehicles_e, \
-                'Number of vehicles in edges_distribution and the Vehicles ' \
-                'class do not match: {}, {}'.format(num_vehicles,
-                                                    num_vehicles_e)
+        """Generate uniformly spaced starting positions for the bus network.
 
-            # add starting positions and lanes
-            edges_distribution = deepcopy(initial_config.edges_distribution)
-            startpositions, startlanes = [], []
-            for key in edges_distribution:
-                # set the edge distribution to only include the next edge
-                initial_config.edges_distribution = [key]
-                # set the number of vehicles that this edge can carry
-                num_vehicles = edges_distribution[key]
-                # recursively collect the next starting positions and lanes
-                pos, lane = self.gen_even_start_pos(
-                    initial_config, num_vehicles)
-                startpositions.extend(pos)
-                startlanes.extend(lane)
-            return startpositions, startlanes
+        The positions are generated as in gen_even_start_pos, after which the
+        first two vehicles are placed on the second lane of edges gneE2 and
+        gneE4.
 
-        (x0, min_gap, bunching, lanes_distr, available_length,
-         available_edges, initial_config) = \
-            self._get_start_pos_util(initial_config, num_vehicles)
-
-        # return an empty list of starting positions and lanes if there are no
-        # vehicles to be placed
-        if num_vehicles == 0:
-            return [], []
+        Parameters
+        ----------
+        initial_config : flow.core.params.InitialConfig
+            see flow/core/params.py
+        num_vehicles : int
+            number of vehicles to be placed on the network
 
-        increment = available_length / num_vehicles
+        Returns
+        -------
+        list of tuple (float, float)
+            list of start positions [(edge0, pos0), (edge1, pos1), ...]
+        list of int
+            list of start lanes
+        """
+        if isinstance(initial_config.edges_distribution, dict) or \
+                num_vehicles == 0:
+            return self.gen_even_start_pos(initial_config, num_vehicles)
 
-        # when consecutive edges do not have the same number of lanes, vehicles
-        # are not allowed to be in between edges (as a lane might not exist on
-        # the other side)
-        flag = False
-        lanes = [self.num_lanes(edge) for edge in self.get_edge_list()]
-        if any(lanes[0] != lanes[i] for i in range(1, len(lanes))):
-            flag = True
+        startpositions, startlanes = self.gen_even_start_pos(
+            initial_config, num_vehicles)
 
-        x = x0
-        car_count = 0
-        startpositions, startlanes = [], []
+        startpositions[0] = ('gneE2', 50)
+        startlanes[0] = 1
 
-        # generate uniform starting positions
-        while car_count < num_vehicles:
-            # collect the position and lane number of each new vehicle
-            pos = self.get_edge(x)
-
-            # ensures that vehicles are not placed in an internal junction
-            while pos[0] in dict(self.internal_edgestarts).keys():
-                # find the location of the internal edge in total_edgestarts,
-                # which has the edges ordered by position
-                edges = [tup[0] for tup in self.total_edgestarts]
-                indx_edge = next(
-                    i for i, edge in enumerate(edges) if edge == pos[0])
-
-                # take the next edge in the list, and place the car at the
-                # beginning of this edge
-                if indx_edge == len(edges) - 1:
-                    next_edge_pos = self.total_edgestarts[0]
-                else:
-                    next_edge_pos = self.total_edgestarts[indx_edge + 1]
-
-                x = next_edge_pos[1]
-                pos = (next_edge_pos[0], 0)
-
-            # ensures that you are in an acceptable edge
-            while pos[0] not in available_edges:
-                x = (x + self.edge_length(pos[0])) % self.non_internal_length()
-                pos = self.get_edge(x)
-
-            # ensure that in variable lane settings vehicles always start a
-            # vehicle's length away from the start of the edge. This, however,
-            # prevents the spacing to be completely uniform.
-            if flag and pos[1] < VEHICLE_LENGTH:
-                pos0, pos1 = pos
-                pos = (pos0, VEHICLE_LENGTH)
-                x += VEHICLE_LENGTH
-                increment -= (VEHICLE_LENGTH * self.num_lanes(pos0)) / \
-                             (num_vehicles - car_count)
-
-            # place vehicles side-by-side in all available lanes on this edge
-            for lane in range(min([self.num_lanes(pos[0]), lanes_distr])):
-                car_count += 1
-                startpositions.append(pos)
-                startlanes.append(lane)
-
-                if car_count == num_vehicles:
-                    break
-
-            x = (x + increment + VEHICLE_LENGTH + min_gap) % self.non_internal_length()
+        startpositions[1] = ('gneE4', 50)
+        startlanes[1] = 1
 
-        # add a perturbation to each vehicle, while not letting the vehicle
-        # leave its current edge
-        if initial_config.perturbation > 0:
-            for i in range(num_vehicles):
-                perturb = np.random.normal(0, initial_config.perturbation)
-                edge, pos = startpositions[i]
-                pos = max(0, min(self.edge_length(edge), pos + perturb))
-                startpositions[i] = (edge, pos)
-
-        startpositions[0]=('gneE2',50)
-        startlanes[0]=1
-
-        startpositions[1]=('gneE4',50)
-        startlanes[1]=1
-        print(available_length)
-        return startpositions, startlanes 
+        return startpositions, startlanes
 
     def gen_random_start_pos(self, initial_config, num_vehicles):
         """Generate random starting positions.
@@ -549,65 +486,45 @@ class BaseKernelNetwork(object):
          available_edges, initial_config) = self._get_start_pos_util(
             initial_config, num_vehicles)
 
+        # return an empty list of starting positions and lanes if there are no
+        # vehicles to be placed
+        if num_vehicles == 0:
+            return [], []
+
         # extra space a vehicle needs to cover from the start of an edge to be
         # fully in the edge and not risk having a gap with a vehicle behind it
         # that is smaller than min_gap
         efs = min_gap + VEHICLE_LENGTH  # extra front space
 
-        for edge in available_edges:
-            available_length -= efs * min([self.num_lanes(edge), lanes_distr])
+        table = self.start_position_table
+        seg = table.segments(available_edges, lanes_distr, efs)
+        available_length -= efs * np.sum(seg.lanes)
 
         # choose random positions for each vehicle
-        init_absolute_pos = [random.random() * available_length
-                             for _ in range(num_vehicles)]
-        init_absolute_pos.sort()
+        init_absolute_pos = np.sort(
+            [random.random() for _ in range(num_vehicles)]) * available_length
 
         # these positions do not include the length of the vehicle, which need
         # to be added
-        for i in range(num_vehicles):
-            init_absolute_pos[i] += (VEHICLE_LENGTH + min_gap) * i
-
-        decrement = 0
-        edge_indx = 0
-        startpositions = []
-        startlanes = []
-
-
-        for i in range(num_vehicles):
-            edge_i = available_edges[edge_indx]
-            pos_i = (init_absolute_pos[i] - decrement) % (
-                    self.edge_length(edge_i) - efs)
-            lane_i = int(((init_absolute_pos[i] - decrement) - pos_i) /
-                         (self.edge_length(edge_i) - efs))
-
-            pos_i += efs
-
-            while lane_i > min([self.num_lanes(edge_i), lanes_distr]) - 1:
-                decrement += min([self.num_lanes(edge_i), lanes_distr]) \
-                             * (self.edge_length(edge_i) - efs)
-                edge_indx += 1
+        init_absolute_pos += (VEHICLE_LENGTH + min_gap) * np.arange(
+            num_vehicles)
 
-                edge_i = available_edges[edge_indx]
-                pos_i = (init_absolute_pos[i] - decrement) % (
-                        self.edge_length(edge_i) - efs)
+        # place the vehicles along the lanes of the available edges, laid end
+        # to end
+        edge_index, pos, lanes = table.unroll(
+            available_edges, lanes_distr, efs, init_absolute_pos)
 
-                lane_i = int(((init_absolute_pos[i] - decrement) - pos_i) /
-                             (self.edge_length(edge_i) - efs))
-
-                pos_i += efs
-
-            startpositions.append((edge_i, pos_i))
-            startlanes.append(lane_i)
+        startpositions = list(zip(seg.names[edge_index].tolist(),
+                                  pos.tolist()))
+        startlanes = lanes.tolist()
 
         return startpositions, startlanes
 
     def gen_custom_Triangle_start_pos(self, initial_config, num_vehicles):
         """Generate uniformly spaced starting positions.
 
-        If the perturbation term in initial_config is set to some positive
-        value, then the start positions are perturbed from a uniformly spaced
-        distribution by a gaussian whose std is equal to this perturbation
-        term.
+        The positions are generated as in gen_even_start_pos, after which the
+        first vehicle is placed at the start of edge_6.
 
         Parameters
         ----------
@@ -623,238 +540,52 @@ class BaseKernelNetwork(object):
         list of int
             list of start lanes
         """
-        if isinstance(initial_config.edges_distribution, dict):
-            # check that the number of vehicle in edges_distribution matches
-            # that of the vehicles class
-            num_vehicles_e = sum(initial_config.edges_distribution[k]
-                                 for k in initial_config.edges_distribution)
-            assert num_vehicles == num_vehicles_e, \
-                'Number of vehicles in edges_distribution and the Vehicles ' \
-                'class do not match: {}, {}'.format(num_vehicles,
-                                                    num_vehicles_e)
-
-            # add starting positions and lanes
-            edges_distribution = deepcopy(initial_config.edges_distribution)
-            startpositions, startlanes = [], []
-            for key in edges_distribution:
-                # set the edge distribution to only include the next edge
-                initial_config.edges_distribution = [key]
-                # set the number of vehicles that this edge can carry
-                num_vehicles = edges_distribution[key]
-                # recursively collect the next starting positions and lanes
-                pos, lane = self.gen_even_start_pos(
-                    initial_config, num_vehicles)
-                startpositions.extend(pos)
-                startlanes.extend(lane)
-            return startpositions, startlanes
-
-        (x0, min_gap, bunching, lanes_distr, available_length,
-         available_edges, initial_config) = \
-            self._get_start_pos_util(initial_config, num_vehicles)
-
-        # return an empty list of starting positions and lanes if there are no
-        # vehicles to be placed
-        if num_vehicles == 0:
-            return [], []
-
-        increment = available_length / num_vehicles
+        if isinstance(initial_config.edges_distribution, dict) or \
+                num_vehicles == 0:
+            return self.gen_even_start_pos(initial_config, num_vehicles)
 
-        # when consecutive edges do not have the same number of lanes, vehicles
-        # are not allowed to be in between edges (as a lane might not exist on
-        # the other side)
-        flag = False
-        lanes = [self.num_lanes(edge) for edge in self.get_edge_list()]
-        if any(lanes[0] != lanes[i] for i in range(1, len(lanes))):
-            flag = True
+        startpositions, startlanes = self.gen_even_start_pos(
+            initial_config, num_vehicles)
 
-        x = x0
-        car_count = 0
-        startpositions, startlanes = [], []
+        startpositions[0] = ('edge_6', 5)
+        startlanes[0] = 0
 
-        # generate uniform starting positions
-        while car_count < num_vehicles:
-            # collect the position and lane number of each new vehicle
-            pos = self.get_edge(x)
-
-            # ensures that vehicles are not placed in an internal junction
-            while pos[0] in dict(self.internal_edgestarts).keys():
-                # find the location of the internal edge in total_edgestarts,
-                # which has the edges ordered by position
-                edges = [tup[0] for tup in self.total_edgestarts]
-                indx_edge = next(
-                    i for i, edge in enumerate(edges) if edge == pos[0])
-
-                # take the next edge in the list, and place the car at the
-                # beginning of this edge
-                if indx_edge == len(edges) - 1:
-                    next_edge_pos = self.total_edgestarts[0]
-                else:
-                    next_edge_pos = self.total_edgestarts[indx_edge + 1]
-
-                x = next_edge_pos[1]
-                pos = (next_edge_pos[0], 0)
-
-            # ensures that you are in an acceptable edge
-            while pos[0] not in available_edges:
-                x = (x + self.edge_length(pos[0])) % self.non_internal_length()
-                pos = self.get_edge(x)
-
-            # ensure that in variable lane settings vehicles always start a
-            # vehicle's length away from the start of the edge. This, however,
-            # prevents the spacing to be completely uniform.
-            if flag and pos[1] < VEHICLE_LENGTH:
-                pos0, pos1 = pos
-                pos = (pos0, VEHICLE_LENGTH)
-                x += VEHICLE_LENGTH
-                increment -= (VEHICLE_LENGTH * self.num_lanes(pos0)) / \
-                             (num_vehicles - car_count)
-
-            # place vehicles side-by-side in all available lanes on this edge
-            for lane in range(min([self.num_lanes(pos[0]), lanes_distr])):
-                car_count += 1
-                startpositions.append(pos)
-                startlanes.append(lane)
-
-                if car_count == num_vehicles:
-                    break
-
-            x = (x + increment + VEHICLE_LENGTH + min_gap) % self.non_internal_length()
-
-        # add a perturbation to each vehicle, while not letting the vehicle
-        # leave its current edge
-        if initial_config.perturbation > 0:
-            for i in range(num_vehicles):
-                perturb = np.random.normal(0, initial_config.perturbation)
-                edge, pos = startpositions[i]
-                pos = max(0, min(self.edge_length(edge), pos + perturb))
-                startpositions[i] = (edge, pos)
-
-        startpositions[0]=('edge_6',5)
-        startlanes[0]=0
         return startpositions, startlanes
 
-
-        
-       
     def gen_grid_London_start_pos(self, initial_config, num_vehicles):
-        (x0, min_gap, bunching, lanes_distr, available_length,
-         available_edges, initial_config) = \
-            self._get_start_pos_util(initial_config, num_vehicles)
-        if isinstance(initial_config.edges_distribution, dict):
-            # check that the number of vehicle in edges_distribution matches
-            # that of the vehicles class
-            num_vehicles_e = sum(initial_config.edges_distribution[k]
-                                 for k in initial_config.edges_distribution)
-            assert num_vehicles == num_vehicles_e, \
-                'Number of vehicles in edges_distribution and the Vehicles ' \
-                'class do not match: {}, {}'.format(num_vehicles,
-                                                    num_vehicles_e)
+        """Generate uniformly spaced starting positions for the London grid.
 
-            # add starting positions and lanes
-            edges_distribution = deepcopy(initial_config.edges_distribution)
-            startpositions, startlanes = [], []
-            for key in edges_distribution:
-                # set the edge distribution to only include the next edge
-                initial_config.edges_distribution = [key]
-                # set the number of vehicles that this edge can carry
-                num_vehicles = edges_distribution[key]
-                # recursively collect the next starting positions and lanes
-                pos, lane = self.gen_even_start_pos(
-                    initial_config, num_vehicles)
-                startpositions.extend(pos)
-                startlanes.extend(lane)
-            return startpositions, startlanes
-
-        (x0, min_gap, bunching, lanes_distr, available_length,
-         available_edges, initial_config) = \
-            self._get_start_pos_util(initial_config, num_vehicles)
-
-        # return an empty list of starting positions and lanes if there are no
-        # vehicles to be placed
-        if num_vehicles == 0:
-            return [], []
-
-        increment = available_length / num_vehicles
-
-        # when consecutive edges do not have the same number of lanes, vehicles
-        # are not allowed to be in between edges (as a lane might not exist on
-        # the other side)
-        flag = False
-        lanes = [self.num_lanes(edge) for edge in self.get_edge_list()]
-        if any(lanes[0] != lanes[i] for i in range(1, len(lanes))):
-            flag = True
+        The positions are generated as in gen_even_start_pos, after which the
+        21st and 22nd vehicles are placed on edges edge_SN_6 and edge_NS_8.
 
-        x = x0
-        car_count = 0
-        startpositions, startlanes = [], []
-
-        # generate uniform starting positions
-        while car_count < num_vehicles:
-            # collect the position and lane number of each new vehicle
-            pos = self.get_edge(x)
-
-            # ensures that vehicles are not placed in an internal junction
-            while pos[0] in dict(self.internal_edgestarts).keys():
-                # find the location of the internal edge in total_edgestarts,
-                # which has the edges ordered by position
-                edges = [tup[0] for tup in self.total_edgestarts]
-                indx_edge = next(
-                    i for i, edge in enumerate(edges) if edge == pos[0])
-
-                # take the next edge in the list, and place the car at the
-                # beginning of this edge
-                if indx_edge == len(edges) - 1:
-                    next_edge_pos = self.total_edgestarts[0]
-                else:
-                    next_edge_pos = self.total_edgestarts[indx_edge + 1]
-
-                x = next_edge_pos[1]
-                pos = (next_edge_pos[0], 0)
-
-            # ensures that you are in an acceptable edge
-            while pos[0] not in available_edges:
-                x = (x + self.edge_length(pos[0])) % self.non_internal_length()
-                pos = self.get_edge(x)
-
-            # ensure that in variable lane settings vehicles always start a
-            # vehicle's length away from the start of the edge. This, however,
-            # prevents the spacing to be completely uniform.
-            if flag and pos[1] < VEHICLE_LENGTH:
-                pos0, pos1 = pos
-                pos = (pos0, VEHICLE_LENGTH)
-                x += VEHICLE_LENGTH
-                increment -= (VEHICLE_LENGTH * self.num_lanes(pos0)) / \
-                             (num_vehicles - car_count)
-
-            # place vehicles side-by-side in all available lanes on this edge
-            for lane in range(min([self.num_lanes(pos[0]), lanes_distr])):
-                car_count += 1
-                startpositions.append(pos)
-                startlanes.append(lane)
-
-                if car_count == num_vehicles:
-                    break
-
-            x = (x + increment + VEHICLE_LENGTH + min_gap) % self.non_internal_length()
+        Parameters
+        ----------
+        initial_config : flow.core.params.InitialConfig
+            see flow/core/params.py
+        num_vehicles : int
+            number of vehicles to be placed on the network
 
-        # add a perturbation to each vehicle, while not letting the vehicle
-        # leave its current edge
-        if initial_config.perturbation > 0:
-            for i in range(num_vehicles):
-                perturb = np.random.normal(0, initial_config.perturbation)
-                edge, pos = startpositions[i]
-                pos = max(0, min(self.edge_length(edge), pos + perturb))
-                startpositions[i] = (edge, pos)
+        Returns
+        -------
+        list of tuple (float, float)
+            list of start positions [(edge0, pos0), (edge1, pos1), ...]
+        list of int
+            list of start lanes
+        """
+        if isinstance(initial_config.edges_distribution, dict) or \
+                num_vehicles == 0:
+            return self.gen_even_start_pos(initial_config, num_vehicles)
 
-        startpositions[20]=('edge_SN_6',10)
-        startlanes[20]=0
+        startpositions, startlanes = self.gen_even_start_pos(
+            initial_config, num_vehicles)
 
-        startpositions[21]=('edge_NS_8',10)
-        startlanes[21]=1
+        startpositions[20] = ('edge_SN_6', 10)
+        startlanes[20] = 0
 
-        print(available_length)
+        startpositions[21] = ('edge_NS_8', 10)
+        startlanes[21] = 1
 
-        return startpositions, startlanes 
+        return startpositions, startlanes
 
     def _get_start_pos_util(self, initial_config, num_vehicles):
         """Prepare initial_config data for starting position methods.
@@ -902,13 +633,11 @@ class BaseKernelNetwork(object):
 
         # compute the lanes distribution (adjust of edge cases)
         if initial_config.edges_distribution == 'all':
-            max_lane = max(
-                [self.num_lanes(edge_id) for edge_id in self.get_edge_list()])
+            edges = self.get_edge_list()
         else:
-            max_lane = max([
-                self.num_lanes(edge_id)
-                for edge_id in initial_config.edges_distribution
-            ])
+            edges = list(initial_config.edges_distribution)
+        lengths, lanes = self.start_position_table.edge_arrays(edges)
+        max_lane = int(np.max(lanes))
 
         if initial_config.lanes_distribution > max_lane:
             lanes_distribution = max_lane
@@ -918,27 +647,13 @@ class BaseKernelNetwork(object):
         else:
             lanes_distribution = initial_config.lanes_distribution
 
-        if initial_config.edges_distribution == 'all':
-            distribution_length = \
-                sum(self.edge_length(edge_id) *
-                    min([self.num_lanes(edge_id), lanes_distribution])
-                    for edge_id in self.get_edge_list()
-                    if self.edge_length(edge_id) > min_gap + VEHICLE_LENGTH)
-        else:
-            distribution_length = \
-                sum(self.edge_length(edge_id) *
-                    min(self.num_lanes(edge_id), lanes_distribution)
-                    for edge_id in initial_config.edges_distribution
-                    if self.edge_length(edge_id) > min_gap + VEHICLE_LENGTH)
-
-        if initial_config.edges_distribution == 'all':
-            available_edges = [
-                edge for edge in self.get_edge_list()
-                if self.edge_length(edge) > min_gap + VEHICLE_LENGTH]
-        else:
-            available_edges = [
-                edge for edge in initial_config.edges_distribution
-                if self.edge_length(edge) > min_gap + VEHICLE_LENGTH]
+        # edges too short to hold a vehicle are not available
+        available = lengths > min_gap + VEHICLE_LENGTH
+        distribution_length = float(np.sum(
+            lengths[available] *
+            np.minimum(lanes[available], lanes_distribution)))
+        available_edges = [edge for edge, is_available
+                           in zip(edges, available) if is_available]
 
         available_length = \
             distribution_length - lanes_distribution * bunching - \
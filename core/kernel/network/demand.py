@@ -0,0 +1,299 @@
+"""Script containing the generation of origin-destination demand."""
+
+import hashlib
+import os
+import tempfile
+import warnings
+from xml.sax.saxutils import quoteattr
+
+import numpy as np
+
+from flow.core.kernel.network.route_planner import RoutePlanner
+from flow.core.util import ensure_dir
+
+# version of the format of the generated files. This is part of the cache key,
+# such that files generated by previous versions are not reused
+FORMAT_VERSION = 1
+
+# entry keys that are not written as attributes of the flows
+ENTRY_KEYS = {"name", "origin", "destination", "vtype", "trips"}
+
+
+def _attribute(value):
+    """Return the string written for the value of a flow attribute.
+
+    Numpy scalars (e.g. taken from the arrays passed to ODMatrix.add_matrix)
+    are converted to Python numbers first, as their repr is not understood by
+    sumo.
+    """
+    if isinstance(value, (bool, np.bool_)):
+        return str(bool(value)).lower()
+    elif isinstance(value, (int, np.integer)):
+        return str(int(value))
+    elif isinstance(value, (float, np.floating)):
+        return str(float(value))
+    return str(value)
+
+
+class DemandGenerator(object):
+    """Generates the routes and flows of an origin-destination matrix.
+
+    The routes of every origin-destination pair are assigned on the edge graph
+    of the network (see flow.core.kernel.network.route_planner.RoutePlanner)
+    with free-flow travel times, using a single search per origin. The trips
+    of every entry of the matrix are split among the intervals of its time
+    profile, and emitted as one flow per entry and interval rather than as one
+    vehicle per trip.
+
+    The generated routes file is streamed to disk, with all routes first and
+    the flows sorted by departure time, as required by sumo. Files are cached
+    in ``cache_dir`` under a hash of the demand and of the edge graph, such
+    that the routes of a given demand on a given network are only assigned
+    once.
+
+    Usage
+    -----
+    >>> from flow.core.params import ODMatrix
+    >>> demand = ODMatrix(profile=[0.2, 0.5, 0.3], interval=1200)
+    >>> demand.add('edge_0', 'edge_5', veh_type='human', trips=300)
+    >>> generator = DemandGenerator(env.k.network)
+    >>> generator.generate(demand)
+    '/tmp/flow/demand/5b1e....rou.xml'
+    """
+
+    def __init__(self, network, cache_dir=None):
+        """Instantiate the demand generator.
+
+        Parameters
+        ----------
+        network : flow.core.kernel.network.BaseKernelNetwork
+            the network kernel whose edges and connections are used to assign
+            routes
+        cache_dir : str, optional
+            directory in which generated files are cached. Defaults to a
+            directory in the temporary directory of the system
+        """
+        self.network = network
+        self.cache_dir = cache_dir or os.path.join(
+            tempfile.gettempdir(), 'flow/demand/')
+        self._planner = None
+
+    @property
+    def planner(self):
+        """Return the route planner used to assign routes.
+
+        Edge costs are never refreshed, such that routes are assigned with
+        free-flow travel times.
+        """
+        if self._planner is None:
+            self._planner = RoutePlanner(self.network, refresh_interval=None)
+        return self._planner
+
+    def generate(self, demand):
+        """Return the routes file of a demand, generating it if needed.
+
+        Parameters
+        ----------
+        demand : flow.core.params.ODMatrix
+            the origin-destination demand
+
+        Returns
+        -------
+        str
+            path to the routes file
+        """
+        path = os.path.join(
+            self.cache_dir, '{}.rou.xml'.format(self.cache_key(demand)))
+
+        if not os.path.exists(path):
+            ensure_dir(self.cache_dir)
+            # the file is moved to its final path once complete, such that
+            # processes sharing the cache never read a partial file
+            tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+            with open(tmp_path, 'w') as f:
+                self.write(demand, f)
+            os.replace(tmp_path, path)
+
+        return path
+
+    def cache_key(self, demand):
+        """Return a hash of a demand and of the edge graph of the network.
+
+        Parameters
+        ----------
+        demand : flow.core.params.ODMatrix
+            the origin-destination demand
+
+        Returns
+        -------
+        str
+            hexadecimal digest of the hash
+        """
+        key = hashlib.sha1()
+        key.update(repr((FORMAT_VERSION, demand.profile, demand.interval,
+                         demand.begin, demand.num_routes,
+                         demand.logit_scale)).encode())
+        for entry in demand.get():
+            key.update(repr(sorted(entry.items())).encode())
+
+        # routes only depend on the edges, their travel times and successors
+        planner = self.planner
+        for edge in sorted(self.network.get_edge_list()):
+            key.update(repr((edge, planner.edge_cost(edge),
+                             planner.successors(edge))).encode())
+
+        return key.hexdigest()
+
+    def assign(self, demand):
+        """Assign routes to the origin-destination pairs of a demand.
+
+        Parameters
+        ----------
+        demand : flow.core.params.ODMatrix
+            the origin-destination demand
+
+        Returns
+        -------
+        dict < (str, str), list of (list of str, float) >
+            routes of every reachable pair, and the probability every route
+            is chosen
+        """
+        destinations = dict()
+        for entry in demand.get():
+            destinations.setdefault(entry['origin'], set()).add(
+                entry['destination'])
+
+        assignment = dict()
+        for origin in destinations:
+            if demand.num_routes > 1:
+                for destination in destinations[origin]:
+                    routes = self.planner.k_shortest_paths(
+                        origin, destination, demand.num_routes)
+                    if len(routes) > 0:
+                        assignment[origin, destination] = \
+                            self._route_choice(routes, demand.logit_scale)
+            else:
+                routes = self.planner.shortest_paths(
+                    origin, destinations[origin])
+                for destination, (route, _) in routes.items():
+                    assignment[origin, destination] = [(route, 1.)]
+
+        return assignment
+
+    @staticmethod
+    def _route_choice(routes, logit_scale):
+        """Return the probability of choosing every route with a logit model.
+
+        Parameters
+        ----------
+        routes : list of (list of str, float)
+            routes and their travel times
+        logit_scale : float
+            difference in travel time with the fastest route for which a route
+            is chosen e times less often
+
+        Returns
+        -------
+        list of (list of str, float)
+            routes and their probabilities
+        """
+        costs = np.array([cost for _, cost in routes])
+        weights = np.exp(-(costs - costs.min()) / logit_scale)
+        weights /= weights.sum()
+        return [(route, float(w)) for (route, _), w in zip(routes, weights)]
+
+    @staticmethod
+    def split_trips(demand):
+        """Split the trips of every entry among the intervals of the profile.
+
+        The cumulative number of trips of every entry is rounded, such that
+        the total number of trips of every entry is preserved.
+
+        Parameters
+        ----------
+        demand : flow.core.params.ODMatrix
+            the origin-destination demand
+
+        Returns
+        -------
+        np.ndarray of int
+            number of trips of every entry (row) in every interval (column)
+        """
+        trips = np.array([entry['trips'] for entry in demand.get()],
+                         dtype=float)
+        profile = np.array(demand.profile, dtype=float)
+        profile /= profile.sum()
+
+        cum_trips = np.round(np.cumsum(np.outer(trips, profile), axis=1))
+        return np.diff(cum_trips, axis=1, prepend=0).astype(int)
+
+    def write(self, demand, f):
+        """Write the routes and flows of a demand.
+
+        Parameters
+        ----------
+        demand : flow.core.params.ODMatrix
+            the origin-destination demand
+        f : file
+            file the routes are written to
+        """
+        entries = demand.get()
+        assignment = self.assign(demand)
+        counts = self.split_trips(demand)
+
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<routes '
+                'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+                'xsi:noNamespaceSchemaLocation='
+                '"http://sumo.dlr.de/xsd/routes_file.xsd">\n')
+
+        # routes of every pair, shared by all entries of the pair. Pairs with
+        # several routes are written as route distributions
+        route_ids = dict()
+        for i, (pair, routes) in enumerate(assignment.items()):
+            route_id = 'odroute{}'.format(i)
+            route_ids[pair] = route_id
+            if len(routes) == 1:
+                f.write('    <route id="{}" edges={}/>\n'.format(
+                    route_id, quoteattr(' '.join(routes[0][0]))))
+            else:
+                f.write('    <routeDistribution id="{}">\n'.format(route_id))
+                for k, (route, probability) in enumerate(routes):
+                    f.write('        <route id="{}_{}" edges={} '
+                            'probability="{!r}"/>\n'.format(
+                                route_id, k, quoteattr(' '.join(route)),
+                                probability))
+                f.write('    </routeDistribution>\n')
+
+        # attributes of the flows of every entry with a route
+        attributes = [None] * len(entries)
+        num_unassigned = 0
+        for i, entry in enumerate(entries):
+            pair = (entry['origin'], entry['destination'])
+            if pair not in route_ids:
+                num_unassigned += 1
+                continue
+            attributes[i] = ' type={} route="{}"'.format(
+                quoteattr(str(entry['vtype'])), route_ids[pair]) + ''.join(
+                ' {}={}'.format(key, quoteattr(_attribute(value)))
+                for key, value in entry.items() if key not in ENTRY_KEYS)
+
+        if num_unassigned > 0:
+            warnings.warn(
+                '{} origin-destination entries have no route and are '
+                'ignored.'.format(num_unassigned))
+
+        # flows are sorted by departure time, as sumo reads route files
+        # incrementally
+        assigned = np.array([attr is not None for attr in attributes])
+        for t in range(counts.shape[1]):
+            begin = demand.begin + t * demand.interval
+            end = begin + demand.interval
+            for i in np.flatnonzero(assigned & (counts[:, t] > 0)):
+                f.write('    <flow id={} begin="{!r}" end="{!r}" '
+                        'number="{}"{}/>\n'.format(
+                            quoteattr('{}_{}'.format(entries[i]['name'], t)),
+                            float(begin), float(end), counts[i, t],
+                            attributes[i]))
+
+        f.write('</routes>\n')
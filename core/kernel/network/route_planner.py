@@ -0,0 +1,381 @@
+"""Script containing the route planning service of the network kernel."""
+
+import collections
+import heapq
+import itertools
+
+# lower bound on the speed used when computing edge travel times, in m/s. This
+# prevents edges with stopped vehicles from being assigned infinite costs.
+MIN_SPEED = 0.1
+
+
+class RoutePlanner(object):
+    """Shortest and k-shortest path queries over the edges of a network.
+
+    The planner operates on the edge graph of the network, in which every
+    non-internal edge is a node, and two edges are connected if a vehicle can
+    move from one to the other through a junction (see
+    flow.core.kernel.network.routing_table.RoutingTable). The cost of an edge
+    is its travel time, computed from its length and the mean speed of the
+    vehicles currently on it (or its speed limit if it is empty).
+
+    Edge costs are refreshed every ``refresh_interval`` seconds of simulation
+    time, or whenever ``update_costs`` is called. Every refresh starts a new
+    cost epoch. Query results are stored in an LRU cache keyed by the origin,
+    destination, and cost epoch, so that repeated queries within an epoch are
+    served without searching the graph.
+
+    Usage
+    -----
+    >>> from flow.envs.base import Env
+    >>> env = Env(...)
+    >>> planner = env.k.network.route_planner
+    >>> route, cost = planner.shortest_path('edge_0', 'edge_5')
+    >>> routes = planner.k_shortest_paths('edge_0', 'edge_5', k=3)
+    """
+
+    def __init__(self, network, cache_size=1024, refresh_interval=30):
+        """Instantiate the route planner.
+
+        Parameters
+        ----------
+        network : flow.core.kernel.network.BaseKernelNetwork
+            the network kernel whose edges and connections are used to build
+            the edge graph
+        cache_size : int, optional
+            maximum number of query results stored in the LRU cache
+        refresh_interval : float or None, optional
+            simulation time (in seconds) after which edge costs are
+            automatically recomputed from live edge speeds. If set to None,
+            costs are only updated through calls to ``update_costs``.
+        """
+        self.network = network
+        self.cache_size = cache_size
+        self.refresh_interval = refresh_interval
+
+        # Key = edge name
+        # Element = list of non-internal edges reachable from the edge
+        self._graph = dict()
+
+        table = network.routing_table
+        for edge in network.get_edge_list():
+            successors = []
+            for lane in range(network.num_lanes(edge)):
+                for next_edge in table.successor_edges(edge, lane):
+                    if next_edge not in successors:
+                        successors.append(next_edge)
+            self._graph[edge] = successors
+
+        self._lengths = {
+            edge: network.edge_length(edge) for edge in self._graph}
+        self._speed_limits = {
+            edge: network.speed_limit(edge) for edge in self._graph}
+
+        # free-flow travel times of every edge
+        self._costs = {
+            edge: self._lengths[edge] / max(self._speed_limits[edge],
+                                            MIN_SPEED)
+            for edge in self._graph}
+
+        # cost epoch, incremented every time edge costs are modified
+        self.epoch = 0
+        self._last_refresh = self._current_time()
+
+        # cached query results, ordered from least to most recently used
+        self._cache = collections.OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _current_time(self):
+        """Return the current simulation time, in seconds."""
+        return getattr(self.network.master_kernel.simulation, 'time', 0)
+
+    def update_costs(self, edge_speeds=None):
+        """Recompute the travel time of every edge and start a new epoch.
+
+        Parameters
+        ----------
+        edge_speeds : dict, optional
+            Key = edge name, Element = speed used to compute the travel time
+            of the edge, in m/s. If not specified, the mean speed of the
+            vehicles on every edge is collected from the vehicle kernel, with
+            empty edges assigned their speed limit.
+        """
+        if edge_speeds is None:
+            vehicles = self.network.master_kernel.vehicle
+            edges = list(self._graph)
+            num_vehicles = vehicles.get_num_vehicles_by_edge(edges)
+            mean_speeds = vehicles.get_mean_speed_by_edge(edges)
+            edge_speeds = {edge: speed for edge, speed, num in
+                           zip(edges, mean_speeds, num_vehicles) if num > 0}
+
+        for edge in self._graph:
+            speed = edge_speeds.get(edge, self._speed_limits[edge])
+            self._costs[edge] = self._lengths[edge] / max(speed, MIN_SPEED)
+
+        self.epoch += 1
+        self._last_refresh = self._current_time()
+
+    def edge_cost(self, edge):
+        """Return the current travel time of an edge, in seconds."""
+        return self._costs[edge]
+
+    def successors(self, edge):
+        """Return the non-internal edges reachable from an edge."""
+        return self._graph.get(edge, [])
+
+    def _maybe_refresh(self):
+        """Update the edge costs if the refresh interval has elapsed.
+
+        Costs are also updated if the simulation time moved backwards, which
+        occurs when the simulation is reset.
+        """
+        if self.refresh_interval is None:
+            return
+        elapsed = self._current_time() - self._last_refresh
+        if elapsed < 0 or elapsed >= self.refresh_interval:
+            self.update_costs()
+
+    def _cached(self, key, compute):
+        """Return a cached query result, computing it on a cache miss."""
+        if key in self._cache:
+            self.cache_hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        self.cache_misses += 1
+        value = compute()
+        self._cache[key] = value
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return value
+
+    def shortest_path(self, origin, destination, heuristic=None):
+        """Return the fastest route between two edges.
+
+        Parameters
+        ----------
+        origin : str
+            name of the starting edge
+        destination : str
+            name of the target edge
+        heuristic : callable, optional
+            function mapping an edge name to a lower bound on the travel time
+            from that edge to the destination. If specified, an A* search is
+            performed instead of Dijkstra's algorithm. Results computed with a
+            heuristic are not cached.
+
+        Returns
+        -------
+        list of str or None
+            the edges of the route, starting with the origin and ending with
+            the destination, or None if the destination cannot be reached
+        float
+            travel time of the route, excluding the origin edge. Set to
+            infinity if the destination cannot be reached.
+        """
+        self._maybe_refresh()
+
+        if heuristic is not None:
+            return self._search(origin, destination, heuristic=heuristic)
+
+        return self._cached(
+            (origin, destination, self.epoch),
+            lambda: self._search(origin, destination))
+
+    def shortest_paths(self, origin, destinations):
+        """Return the fastest routes from an edge to several edges.
+
+        A single Dijkstra search is performed from the origin, which stops
+        once all destinations are reached. This is faster than querying every
+        destination with shortest_path when many routes share an origin, e.g.
+        when assigning the routes of an origin-destination matrix. Results are
+        not cached.
+
+        Parameters
+        ----------
+        origin : str
+            name of the starting edge
+        destinations : collection of str
+            names of the target edges
+
+        Returns
+        -------
+        dict < str, (list of str, float) >
+            route and travel time (excluding the origin edge) to every
+            reachable destination. Unreachable destinations are omitted.
+        """
+        self._maybe_refresh()
+
+        if origin not in self._graph:
+            return {}
+
+        remaining = set(destinations)
+        routes = {}
+        counter = itertools.count()  # tie-breaker for the heap
+        dist = {origin: 0}
+        prev = {}
+        heap = [(0, next(counter), origin)]
+        visited = set()
+
+        while heap and remaining:
+            cost, _, edge = heapq.heappop(heap)
+            if edge in visited:
+                continue
+            visited.add(edge)
+
+            if edge in remaining:
+                remaining.discard(edge)
+                route = [edge]
+                while route[-1] in prev:
+                    route.append(prev[route[-1]])
+                route.reverse()
+                routes[edge] = (route, cost)
+
+            for next_edge in self._graph[edge]:
+                if next_edge in visited:
+                    continue
+                next_cost = cost + self._costs[next_edge]
+                if next_cost < dist.get(next_edge, float('inf')):
+                    dist[next_edge] = next_cost
+                    prev[next_edge] = edge
+                    heapq.heappush(heap, (next_cost, next(counter), next_edge))
+
+        return routes
+
+    def k_shortest_paths(self, origin, destination, k):
+        """Return the k fastest loopless routes between two edges.
+
+        Routes are computed with Yen's algorithm.
+
+        Parameters
+        ----------
+        origin : str
+            name of the starting edge
+        destination : str
+            name of the target edge
+        k : int
+            maximum number of routes to return
+
+        Returns
+        -------
+        list of (list of str, float)
+            routes and their travel times, sorted from fastest to slowest. May
+            contain fewer than k elements if fewer routes are available.
+        """
+        self._maybe_refresh()
+
+        return self._cached(
+            (origin, destination, self.epoch, k),
+            lambda: self._yen(origin, destination, k))
+
+    def _search(self, origin, destination, heuristic=None,
+                blocked_edges=(), blocked_arcs=()):
+        """Perform a Dijkstra (or A*) search over the edge graph.
+
+        Parameters
+        ----------
+        origin : str
+            name of the starting edge
+        destination : str
+            name of the target edge
+        heuristic : callable, optional
+            admissible heuristic used for an A* search
+        blocked_edges : collection of str
+            edges that may not be traversed
+        blocked_arcs : collection of (str, str)
+            edge-to-edge transitions that may not be used
+
+        Returns
+        -------
+        list of str or None
+            the edges of the route, or None if no route exists
+        float
+            travel time of the route
+        """
+        if origin not in self._graph or destination not in self._graph:
+            return None, float('inf')
+
+        counter = itertools.count()  # tie-breaker for the heap
+        dist = {origin: 0}
+        prev = {}
+        h = heuristic(origin) if heuristic is not None else 0
+        heap = [(h, next(counter), origin)]
+        visited = set()
+
+        while heap:
+            _, _, edge = heapq.heappop(heap)
+            if edge in visited:
+                continue
+            visited.add(edge)
+
+            if edge == destination:
+                route = [edge]
+                while edge in prev:
+                    edge = prev[edge]
+                    route.append(edge)
+                route.reverse()
+                return route, dist[destination]
+
+            for next_edge in self._graph[edge]:
+                if next_edge in visited or next_edge in blocked_edges \
+                        or (edge, next_edge) in blocked_arcs:
+                    continue
+                cost = dist[edge] + self._costs[next_edge]
+                if cost < dist.get(next_edge, float('inf')):
+                    dist[next_edge] = cost
+                    prev[next_edge] = edge
+                    h = heuristic(next_edge) if heuristic is not None else 0
+                    heapq.heappush(heap, (cost + h, next(counter), next_edge))
+
+        return None, float('inf')
+
+    def _route_cost(self, route):
+        """Return the travel time of a route, excluding its first edge."""
+        return sum(self._costs[edge] for edge in route[1:])
+
+    def _yen(self, origin, destination, k):
+        """Compute the k shortest loopless routes with Yen's algorithm."""
+        route, cost = self._search(origin, destination)
+        if route is None or k < 1:
+            return []
+
+        routes = [(route, cost)]
+        candidates = []
+        seen = {tuple(route)}
+        counter = itertools.count()
+
+        while len(routes) < k:
+            last_route = routes[-1][0]
+            for i in range(len(last_route) - 1):
+                spur_edge = last_route[i]
+                root = last_route[:i + 1]
+
+                # remove the transitions used by previous routes sharing the
+                # same root, as well as the edges of the root itself
+                blocked_arcs = {
+                    (r[i], r[i + 1]) for r, _ in routes
+                    if len(r) > i + 1 and r[:i + 1] == root}
+                blocked_edges = set(root[:-1])
+
+                spur, _ = self._search(
+                    spur_edge, destination,
+                    blocked_edges=blocked_edges,
+                    blocked_arcs=blocked_arcs)
+                if spur is None:
+                    continue
+
+                candidate = root[:-1] + spur
+                if tuple(candidate) not in seen:
+                    seen.add(tuple(candidate))
+                    heapq.heappush(
+                        candidates,
+                        (self._route_cost(candidate), next(counter),
+                         candidate))
+
+            if not candidates:
+                break
+            cost, _, route = heapq.heappop(candidates)
+            routes.append((route, cost))
+
+        return routes
@@ -0,0 +1,176 @@
+"""Script containing the precomputed routing table used by routers."""
+
+import numpy as np
+
+# number of uniform random samples drawn at a time by the routing table
+RANDOM_BATCH_SIZE = 1024
+
+
+class RoutingTable(object):
+    """Precomputed successor table for the non-internal edges of a network.
+
+    Routers such as the LondonRouter or the TriangleRouter choose a random
+    edge to continue onto once a vehicle reaches the last edge of its route.
+    Doing so requires walking the ``next_edge`` chain through the internal
+    links (junctions) of the network, which is identical every time it is
+    performed for a given edge/lane pair. This class performs this walk once
+    for every edge/lane pair in the network, so that routers may recover the
+    reachable successor edges through a single dictionary lookup.
+
+    Random choices are served from batches of uniform samples drawn with
+    numpy, rather than by calling the random module once per decision.
+
+    Usage
+    -----
+    >>> from flow.envs.base import Env
+    >>> env = Env(...)
+    >>> table = env.k.network.routing_table
+    >>> table.successors('edge_0', 0)
+    [('edge_1', 0, ((':node_1_0', 0),))]
+    >>> table.random_successor('edge_0', 0)
+    'edge_1'
+    """
+
+    def __init__(self, network):
+        """Instantiate the routing table.
+
+        Parameters
+        ----------
+        network : flow.core.kernel.network.BaseKernelNetwork
+            the network kernel whose connections are used to compute the
+            successor edges
+        """
+        # Key = (edge, lane) pair of a non-internal edge
+        # Element = list of (edge, lane, path) tuples, where edge/lane is the
+        #           next non-internal edge/lane pair reachable from the key,
+        #           and path is the tuple of internal edge/lane pairs that are
+        #           traversed to reach it
+        self._successors = dict()
+
+        # Key = (edge, lane) pair of a non-internal edge
+        # Element = list of names of the reachable non-internal edges, in the
+        #           same order as self._successors
+        self._successor_edges = dict()
+
+        # buffer of uniform random samples used when choosing successors
+        self._samples = np.array([])
+        self._sample_index = 0
+
+        max_depth = len(network.get_edge_list()) + \
+            len(network.get_junction_list())
+
+        for edge in network.get_edge_list():
+            for lane in range(network.num_lanes(edge)):
+                successors = []
+                for next_pair in network.next_edge(edge, lane):
+                    next_edge, next_lane, path = self._follow_internal_links(
+                        network, next_pair, max_depth)
+                    if next_edge is not None:
+                        successors.append((next_edge, next_lane, path))
+
+                self._successors[edge, lane] = successors
+                self._successor_edges[edge, lane] = \
+                    [succ[0] for succ in successors]
+
+    @staticmethod
+    def _follow_internal_links(network, next_pair, max_depth):
+        """Walk through internal links until a non-internal edge is reached.
+
+        Parameters
+        ----------
+        network : flow.core.kernel.network.BaseKernelNetwork
+            the network kernel
+        next_pair : (str, int)
+            the edge/lane pair immediately following the starting edge/lane
+        max_depth : int
+            maximum number of internal links that may be traversed. Used to
+            guard against cycles of internal links.
+
+        Returns
+        -------
+        str or None
+            the next non-internal edge, or None if the chain of internal links
+            leads to a dead end
+        int or None
+            the lane index on the next non-internal edge
+        tuple of (str, int)
+            the internal edge/lane pairs traversed along the way
+        """
+        path = []
+        edge, lane = next_pair
+        for _ in range(max_depth):
+            if edge[0] != ':':
+                return edge, lane, tuple(path)
+            path.append((edge, lane))
+            following = network.next_edge(edge, lane)
+            if len(following) == 0:
+                break
+            edge, lane = following[0]
+
+        return None, None, tuple(path)
+
+    def successors(self, edge, lane):
+        """Return the reachable non-internal successors of an edge/lane pair.
+
+        Parameters
+        ----------
+        edge : str
+            name of the edge
+        lane : int
+            lane index
+
+        Returns
+        -------
+        list of (str, int, tuple)
+            next edge, next lane, and the internal edge/lane pairs traversed to
+            reach them. Returns an empty list if there are no successors.
+        """
+        return self._successors.get((edge, lane), [])
+
+    def successor_edges(self, edge, lane):
+        """Return the names of the reachable non-internal successor edges.
+
+        Parameters
+        ----------
+        edge : str
+            name of the edge
+        lane : int
+            lane index
+
+        Returns
+        -------
+        list of str
+            names of the successor edges. Returns an empty list if there are
+            no successors.
+        """
+        return self._successor_edges.get((edge, lane), [])
+
+    def random_successor(self, edge, lane):
+        """Return a successor edge chosen uniformly at random.
+
+        Parameters
+        ----------
+        edge : str
+            name of the edge
+        lane : int
+            lane index
+
+        Returns
+        -------
+        str or None
+            name of the chosen successor edge, or None if there are no
+            successors
+        """
+        edges = self._successor_edges.get((edge, lane))
+        if not edges:
+            return None
+        return edges[int(self._next_sample() * len(edges))]
+
+    def _next_sample(self):
+        """Return the next uniform sample, redrawing the batch if needed."""
+        if self._sample_index >= len(self._samples):
+            self._samples = np.random.random(RANDOM_BATCH_SIZE)
+            self._sample_index = 0
+        sample = self._samples[self._sample_index]
+        self._sample_index += 1
+        return sample
@@ -0,0 +1,226 @@
+"""Script containing the vectorised placement of starting positions."""
+
+import numpy as np
+
+
+class EdgeSegments(object):
+    """Usable segments of an ordered set of edges.
+
+    Attributes
+    ----------
+    names : np.ndarray of str
+        names of the edges
+    lengths : np.ndarray of float
+        usable length of every lane of the edges, i.e. their length minus the
+        front space kept free at their start
+    lanes : np.ndarray of int
+        number of usable lanes of the edges
+    starts : np.ndarray of float
+        cumulative usable length of the edges preceding every edge
+    lane_starts : np.ndarray of float
+        cumulative usable lane-length of the edges preceding every edge
+    total_length : float
+        usable length of all edges
+    total_lane_length : float
+        usable lane-length of all edges
+    """
+
+    def __init__(self, names, lengths, lanes):
+        """Instantiate the segments, and compute the cumulative lengths."""
+        self.names = np.array(names, dtype=object)
+        self.lengths = lengths
+        self.lanes = lanes
+
+        cum_length = np.cumsum(lengths)
+        cum_lane_length = np.cumsum(lengths * lanes)
+        self.starts = np.concatenate(([0.], cum_length[:-1]))
+        self.lane_starts = np.concatenate(([0.], cum_lane_length[:-1]))
+        self.total_length = float(cum_length[-1]) if len(names) else 0.
+        self.total_lane_length = \
+            float(cum_lane_length[-1]) if len(names) else 0.
+
+
+class StartPositionTable(object):
+    """Cumulative lane lengths used to place vehicles on a network.
+
+    Placing vehicles one at a time requires mapping every position along the
+    network to an edge, a relative position and a lane, which is linear in the
+    number of edges for every vehicle. This class computes the cumulative
+    usable lengths and lane-lengths of a set of edges once, from which the
+    edges, positions and lanes of all vehicles are found with a single call to
+    np.searchsorted. The arrays are cached for every set of edges, lanes
+    distribution and front space, and remain valid until a new network is
+    generated.
+
+    Usage
+    -----
+    >>> from flow.envs.base import Env
+    >>> env = Env(...)
+    >>> table = env.k.network.start_position_table
+    >>> table.even(['bottom', 'right'], lanes_distribution=1, front_space=0,
+    ...            x0=0, spacing=10, num_vehicles=3)
+    (array([0, 0, 0]), array([ 0., 10., 20.]), array([0, 0, 0]))
+    """
+
+    def __init__(self, network):
+        """Instantiate the table.
+
+        Parameters
+        ----------
+        network : flow.core.kernel.network.BaseKernelNetwork
+            the network kernel whose edge lengths and numbers of lanes are
+            used to place vehicles
+        """
+        self.network = network
+        self._edge_arrays = dict()
+        self._segments = dict()
+
+    def edge_arrays(self, edges):
+        """Return the lengths and numbers of lanes of a list of edges.
+
+        Parameters
+        ----------
+        edges : list of str
+            names of the edges
+
+        Returns
+        -------
+        np.ndarray of float
+            length of every edge
+        np.ndarray of int
+            number of lanes of every edge
+        """
+        key = tuple(edges)
+        if key not in self._edge_arrays:
+            self._edge_arrays[key] = (
+                np.array([self.network.edge_length(edge) for edge in edges],
+                         dtype=float),
+                np.array([self.network.num_lanes(edge) for edge in edges],
+                         dtype=int))
+        return self._edge_arrays[key]
+
+    def segments(self, edges, lanes_distribution, front_space):
+        """Return the usable segments of an ordered list of edges.
+
+        Parameters
+        ----------
+        edges : list of str
+            names of the edges, in the order vehicles are placed on them
+        lanes_distribution : int
+            maximum number of lanes vehicles are placed on, per edge
+        front_space : float
+            space kept free at the start of every edge
+
+        Returns
+        -------
+        EdgeSegments
+            the usable segments of the edges
+        """
+        key = (tuple(edges), lanes_distribution, front_space)
+        if key not in self._segments:
+            lengths, lanes = self.edge_arrays(edges)
+            self._segments[key] = EdgeSegments(
+                edges, lengths - front_space,
+                np.minimum(lanes, lanes_distribution))
+        return self._segments[key]
+
+    def even(self, edges, lanes_distribution, front_space, x0, spacing,
+             num_vehicles):
+        """Place vehicles in evenly spaced rows along a list of edges.
+
+        Rows are placed every ``spacing`` meters along the usable length of
+        the edges, starting at x0 and wrapping around the end of the last
+        edge. Every row contains one vehicle per usable lane of its edge,
+        until num_vehicles vehicles are placed.
+
+        Parameters
+        ----------
+        edges : list of str
+            names of the edges, in the order vehicles are placed on them
+        lanes_distribution : int
+            maximum number of lanes vehicles are placed on, per edge
+        front_space : float
+            space kept free at the start of every edge
+        x0 : float
+            position of the first row along the usable length of the edges
+        spacing : float
+            distance between consecutive rows
+        num_vehicles : int
+            number of vehicles to place
+
+        Returns
+        -------
+        np.ndarray of int
+            index of the edge of every vehicle in edges
+        np.ndarray of float
+            position of every vehicle on its edge
+        np.ndarray of int
+            lane of every vehicle
+        """
+        seg = self.segments(edges, lanes_distribution, front_space)
+
+        # every row contains at least one vehicle, so that at most
+        # num_vehicles rows are needed
+        x = (x0 + spacing * np.arange(num_vehicles)) % seg.total_length
+        row_edges = np.searchsorted(seg.starts, x, side='right') - 1
+
+        # keep the rows needed to place all vehicles
+        row_ends = np.cumsum(seg.lanes[row_edges])
+        num_rows = int(np.searchsorted(row_ends, num_vehicles)) + 1
+        row_edges = row_edges[:num_rows]
+        row_sizes = seg.lanes[row_edges]
+        row_sizes[-1] -= row_ends[num_rows - 1] - num_vehicles
+        row_starts = np.concatenate(([0], row_ends[:num_rows - 1]))
+
+        edge_index = np.repeat(row_edges, row_sizes)
+        pos = np.repeat(x[:num_rows] - seg.starts[row_edges] + front_space,
+                        row_sizes)
+        lanes = np.arange(num_vehicles) - np.repeat(row_starts, row_sizes)
+
+        return edge_index, pos, lanes
+
+    def unroll(self, edges, lanes_distribution, front_space, x):
+        """Place vehicles at positions along the unrolled lanes of edges.
+
+        The lanes of every edge are laid end to end, in the order of the
+        edges, such that a position x along them corresponds to a single
+        edge, lane and relative position.
+
+        Parameters
+        ----------
+        edges : list of str
+            names of the edges, in the order vehicles are placed on them
+        lanes_distribution : int
+            maximum number of lanes vehicles are placed on, per edge
+        front_space : float
+            space kept free at the start of every lane
+        x : np.ndarray of float
+            positions of the vehicles along the unrolled lanes
+
+        Returns
+        -------
+        np.ndarray of int
+            index of the edge of every vehicle in edges
+        np.ndarray of float
+            position of every vehicle on its edge
+        np.ndarray of int
+            lane of every vehicle
+        """
+        seg = self.segments(edges, lanes_distribution, front_space)
+
+        edge_index = np.searchsorted(seg.lane_starts, x, side='right') - 1
+        edge_index = np.clip(edge_index, 0, len(seg.names) - 1)
+        offset = x - seg.lane_starts[edge_index]
+        lengths = seg.lengths[edge_index]
+        lanes = (offset // lengths).astype(int)
+        pos = np.mod(offset, lengths)
+
+        # positions beyond the last edge are placed on its last lane
+        max_lanes = seg.lanes[edge_index] - 1
+        beyond = lanes > max_lanes
+        lanes[beyond] = max_lanes[beyond]
+        pos[beyond] = offset[beyond] - lanes[beyond] * lengths[beyond]
+
+        pos += front_space
+
+        return edge_index, pos, lanes
@@ -2,6 +2,7 @@
 import tempfile
 
 from flow.core.kernel.network import BaseKernelNetwork
+from flow.core.kernel.network.demand import DemandGenerator
 from flow.core.util import makexml, printxml, ensure_dir
 import time
 import os
@@ -98,6 +99,12 @@ class TraCIKernelNetwork(BaseKernelNetwork):
         """
         # store the network object in the network variable
         self.network = network
+
+        # successor edges, routes and starting position tables are recomputed
+        # for the new network when requested
+        self._routing_table = None
+        self._route_planner = None
+        self._start_position_table = None
         self.orig_name = network.orig_name
         self.name = network.name
 
@@ -639,6 +646,60 @@ class TraCIKernelNetwork(BaseKernelNetwork):
             Element = list of edges a vehicle starting from this edge must
             traverse.
         """
+        # the types of vehicles and traffic lights are passed to the *.add.xml
+        # file
+        self.generate_additional(traffic_lights)
+
+        # this is the data that we will pass to the *.gui.cfg file
+        gui = E('viewsettings')
+        gui.append(E('scheme', name='real world'))
+        gui.append(
+            E('background',
+              backgroundColor='100,100,100',
+              showGrid='0',
+              gridXSize='100.00',
+              gridYSize='100.00'))
+        printxml(gui, self.cfg_path + self.guifn)
+
+        # the routes and inflows are passed to the *.rou.xml file
+        self.generate_routes(routes)
+        route_files = self.roufn
+
+        # the trips of the origin-destination demand (if any) are passed to a
+        # separate, cached routes file
+        if self.network.net_params.demand is not None:
+            route_files += ',' + DemandGenerator(self).generate(
+                self.network.net_params.demand)
+
+        # this is the data that we will pass to the *.sumo.cfg file
+        cfg = makexml('configuration',
+                      'http://sumo.dlr.de/xsd/sumoConfiguration.xsd')
+
+        cfg.append(
+            _inputs(
+                net=self.netfn,
+                add=self.addfn,
+                rou=route_files,
+                gui=self.guifn))
+        t = E('time')
+        t.append(E('begin', value=repr(0)))
+        cfg.append(t)
+
+        printxml(cfg, self.cfg_path + self.sumfn)
+        return self.sumfn
+
+    def generate_additional(self, traffic_lights):
+        """Generate the .add.xml file of the network.
+
+        This file contains the sumo-specific properties of the types of
+        vehicles of the network, and the properties of the traffic lights.
+
+        Parameters
+        ----------
+        traffic_lights : flow.core.params.TrafficLightParams
+            traffic light information, used to determine which nodes are
+            treated as traffic lights
+        """
         # this is the data that we will pass to the *.add.xml file
         add = makexml('additional',
                       'http://sumo.dlr.de/xsd/additional_file.xsd')
@@ -722,17 +783,19 @@ class TraCIKernelNetwork(BaseKernelNetwork):
 
         printxml(add, self.cfg_path + self.addfn)
 
-        # this is the data that we will pass to the *.gui.cfg file
-        gui = E('viewsettings')
-        gui.append(E('scheme', name='real world'))
-        gui.append(
-            E('background',
-              backgroundColor='100,100,100',
-              showGrid='0',
-              gridXSize='100.00',
-              gridYSize='100.00'))
-        printxml(gui, self.cfg_path + self.guifn)
+    def generate_routes(self, routes):
+        """Generate the .rou.xml file of the network.
+
+        This file contains the routes vehicles can traverse, and the inflows
+        of vehicles as specified by the inflows of the network's net_params.
 
+        Parameters
+        ----------
+        routes : dict
+            Key = name of the starting edge
+            Element = list of edges a vehicle starting from this edge must
+            traverse.
+        """
         # this is the data that we will pass to the *.rou.xml file
         routes_data = makexml('routes',
                               'http://sumo.dlr.de/xsd/routes_file.xsd')
@@ -790,22 +853,25 @@ class TraCIKernelNetwork(BaseKernelNetwork):
 
         printxml(routes_data, self.cfg_path + self.roufn)
 
-        # this is the data that we will pass to the *.sumo.cfg file
-        cfg = makexml('configuration',
-                      'http://sumo.dlr.de/xsd/sumoConfiguration.xsd')
+    def update_inflows(self, inflows):
+        """Replace the inflows of the network.
 
-        cfg.append(
-            _inputs(
-                net=self.netfn,
-                add=self.addfn,
-                rou=self.roufn,
-                gui=self.guifn))
-        t = E('time')
-        t.append(E('begin', value=repr(0)))
-        cfg.append(t)
+        Only the .rou.xml and .add.xml files are regenerated, such that the
+        new inflows (and vehicle types) may be loaded by a running sumo
+        instance without rebuilding the network (see
+        TraCISimulation.load_simulation).
 
-        printxml(cfg, self.cfg_path + self.sumfn)
-        return self.sumfn
+        Parameters
+        ----------
+        inflows : flow.core.params.InFlows
+            the new inflows of the network
+        """
+        self.network.net_params.inflows = inflows
+        self.generate_routes(self.network.routes)
+
+        # the vehicle types are regenerated as well, as they may have been
+        # replaced along with the inflows (see Env.set_inflows)
+        self.generate_additional(self.network.traffic_lights)
 
     def _import_edges_from_net(self, net_params):
         """Import edges from a configuration file.
@@ -0,0 +1,234 @@
+"""Record and replay the responses of a TraCI connection.
+
+When the ``record_api`` attribute of SumoParams is set to a path, every call
+issued to sumo through the kernel API (subscription results, ID lists,
+getters, and commands) is recorded with its response in a compact binary trace
+at this path. When the ``replay_api`` attribute is set to the path of such a
+trace, no sumo instance is started, and a ReplayKernelAPI serves the recorded
+responses instead, in the order they were recorded.
+
+Provided that the Flow side issues the same sequence of calls (e.g. that the
+same seeds are used), the kernels and environments are then fed bit-identical
+inputs, at a speed bounded only by the Python side. This allows their
+overhead to be profiled and optimized separately from sumo:
+
+    >>> sim_params = SumoParams(record_api='/tmp/ring.trace')
+    >>> ...  # run an episode
+    >>> sim_params = SumoParams(replay_api='/tmp/ring.trace', profile=True)
+    >>> ...  # run the same episode again, without sumo
+
+Traces are gzip-compressed streams of pickled chunks. Every chunk contains the
+names of the methods called for the first time in the chunk, followed by the
+(method index, response) pairs of the recorded calls.
+"""
+import gzip
+import pickle
+import zlib
+
+from flow.utils.exceptions import FatalFlowError
+
+# number of calls per chunk of a trace
+CHUNK_SIZE = 10000
+
+# names of the domains of a TraCI connection. All other attributes of a
+# connection (simulationStep, setOrder, load, close, ...) are methods
+TRACI_DOMAINS = {
+    'busstop', 'calibrator', 'chargingstation', 'edge', 'gui',
+    'inductionloop', 'junction', 'lane', 'lanearea', 'meandata',
+    'multientryexit', 'overheadwire', 'parkingarea', 'person', 'poi',
+    'polygon', 'rerouter', 'route', 'routeprobe', 'simulation',
+    'trafficlight', 'variablespeedsign', 'vehicle', 'vehicletype'
+}
+
+
+class _RecordedDomain(object):
+    """Proxy of a TraCI domain (or connection) recording its responses."""
+
+    def __init__(self, obj, prefix, recorder):
+        self._obj = obj
+        self._prefix = prefix
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        attr = getattr(self._obj, name)
+        if name.startswith('_'):
+            return attr
+
+        key = self._prefix + name
+        if callable(attr):
+            wrapped = self._recorder.record(attr, key)
+        else:
+            wrapped = _RecordedDomain(attr, key + '.', self._recorder)
+        # cache the wrapper, so that __getattr__ is skipped on the next access
+        setattr(self, name, wrapped)
+        return wrapped
+
+
+class TraCIRecorder(object):
+    """Recorder of the responses of a TraCI connection.
+
+    Calls are appended to an in-memory chunk, which is written to the trace
+    once it contains CHUNK_SIZE calls, and when the recorder is closed.
+    """
+
+    def __init__(self, path):
+        """Instantiate the recorder.
+
+        Parameters
+        ----------
+        path : str
+            path of the trace
+        """
+        self.path = path
+        self.num_calls = 0
+        self._file = gzip.open(path, 'wb')
+        self._methods = {}
+        self._new_methods = []
+        self._calls = []
+
+    def wrap(self, kernel_api):
+        """Return a proxy of a TraCI connection recording its responses."""
+        return _RecordedDomain(kernel_api, '', self)
+
+    def record(self, func, key):
+        """Return a wrapper of func recording its responses."""
+        if key not in self._methods:
+            self._methods[key] = len(self._methods)
+            self._new_methods.append(key)
+        index = self._methods[key]
+        calls = self._calls
+        recorder = self
+
+        def recorded(*args, **kwargs):
+            response = func(*args, **kwargs)
+            calls.append((index, response))
+            if len(calls) >= CHUNK_SIZE:
+                recorder.flush()
+            return response
+
+        return recorded
+
+    def flush(self):
+        """Write the pending calls to the trace.
+
+        The compressed stream is flushed as well, such that the calls
+        recorded so far can be replayed before the recorder is closed.
+        """
+        if self._file is None or (not self._calls and not self._new_methods):
+            return
+        pickle.dump((self._new_methods, list(self._calls)), self._file,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+        self._file.flush(zlib.Z_SYNC_FLUSH)
+        self.num_calls += len(self._calls)
+        self._new_methods = []
+        # the list is cleared in place, since wrappers hold a reference to it
+        del self._calls[:]
+
+    def close(self):
+        """Write the pending calls and close the trace."""
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+
+class _ReplayMethod(object):
+    """Method of a ReplayKernelAPI, serving the next recorded response."""
+
+    def __init__(self, key, api):
+        self._key = key
+        self._api = api
+
+    def __call__(self, *args, **kwargs):
+        return self._api.next_response(self._key)
+
+
+class _ReplayDomain(object):
+    """Domain of a ReplayKernelAPI (vehicle, simulation, ...).
+
+    Domains are not callable, such that proxies wrapping the kernel API (see
+    flow.core.profiling) treat them as the domains of a TraCI connection.
+    """
+
+    def __init__(self, name, api):
+        self._name = name
+        self._api = api
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        attr = _ReplayMethod(self._name + '.' + name, self._api)
+        setattr(self, name, attr)
+        return attr
+
+
+class ReplayKernelAPI(object):
+    """Kernel API serving the responses recorded by a TraCIRecorder.
+
+    Every call returns the response of the next recorded call. A
+    FatalFlowError is raised if the called method differs from the recorded
+    one, i.e. if the Flow side diverged from the recorded episode.
+    """
+
+    def __init__(self, path):
+        """Instantiate the API.
+
+        Parameters
+        ----------
+        path : str
+            path of the trace
+        """
+        self.path = path
+        self.num_calls = 0
+        self._file = gzip.open(path, 'rb')
+        self._methods = []
+        self._calls = iter(())
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name in TRACI_DOMAINS:
+            attr = _ReplayDomain(name, self)
+        else:
+            attr = _ReplayMethod(name, self)
+        setattr(self, name, attr)
+        return attr
+
+    def _next_call(self):
+        """Return the next recorded (method index, response) pair."""
+        for call in self._calls:
+            return call
+        while True:
+            try:
+                new_methods, calls = pickle.load(self._file)
+            except EOFError:
+                raise FatalFlowError(
+                    'The trace {} ended after {} calls.'.format(
+                        self.path, self.num_calls))
+            self._methods.extend(new_methods)
+            self._calls = iter(calls)
+            for call in self._calls:
+                return call
+
+    def next_response(self, key):
+        """Return the response of the next recorded call.
+
+        Parameters
+        ----------
+        key : str
+            name of the called method, e.g. "vehicle.getSpeed"
+
+        Raises
+        ------
+        flow.utils.exceptions.FatalFlowError
+            if the next recorded call is not a call to this method, or if the
+            trace ended
+        """
+        index, response = self._next_call()
+        if self._methods[index] != key:
+            raise FatalFlowError(
+                'Call {} to {} diverged from the trace {}, which recorded a '
+                'call to {}.'.format(self.num_calls, key, self.path,
+                                     self._methods[index]))
+        self.num_calls += 1
+        return response
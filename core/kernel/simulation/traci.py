@@ -1,7 +1,7 @@
 """Script containing the TraCI simulation kernel class."""
 
 from flow.core.kernel.simulation import KernelSimulation
-from flow.core.util import ensure_dir
+from flow.core.util import ensure_dir, save_edge_starts
 import flow.config as config
 import traci.constants as tc
 import traci
@@ -48,6 +48,9 @@ class TraCISimulation(KernelSimulation):
         * acceleration (actual): the actual acceleration by the vehicle,
           collected by computing the difference between the speeds of the
           vehicle and dividing it by the sim_step term
+    num_loads : int
+        number of simulations loaded in the running sumo instance (see
+        load_simulation), used to number the emission files of every load
     """
 
     def __init__(self, master_kernel):
@@ -66,6 +69,7 @@ class TraCISimulation(KernelSimulation):
         self.emission_path = None
         self.time = 0
         self.stored_data = dict()
+        self.num_loads = 0
 
     def pass_api(self, kernel_api):
         """See parent class.
@@ -144,9 +148,11 @@ class TraCISimulation(KernelSimulation):
 
     def close(self):
         """See parent class."""
-        # Save the emission data to a csv.
+        # Save the emission data to a csv. The runs of previous loads are
+        # saved with the preceding run ids (see load_simulation), so the last
+        # run does not overwrite the first one.
         if self.emission_path is not None:
-            self.save_emission()
+            self.save_emission(run_id=self.num_loads)
 
         self.kernel_api.close()
 
@@ -175,6 +181,11 @@ class TraCISimulation(KernelSimulation):
         if self.emission_path is not None:
             ensure_dir(self.emission_path)
 
+        # serve the responses of a recorded trace instead of starting sumo
+        if self.master_kernel.replay_api is not None:
+            self.sumo_proc = None
+            return self.master_kernel.replay_api
+
         error = None
         for _ in range(RETRIES_ON_ERROR):
             try:
@@ -186,45 +197,10 @@ class TraCISimulation(KernelSimulation):
 
                 # command used to start sumo
                 sumo_call = [
-                    sumo_binary, "-c", network.cfg,
+                    sumo_binary,
                     "--remote-port", str(sim_params.port),
-                    "--num-clients", str(sim_params.num_clients),
-                    "--step-length", str(sim_params.sim_step)
-                ]
-
-                # use a ballistic integration step (if request)
-                if sim_params.use_ballistic:
-                    sumo_call.append("--step-method.ballistic")
-
-                # ignore step logs (if requested)
-                if sim_params.no_step_log:
-                    sumo_call.append("--no-step-log")
-
-                # add the lateral resolution of the sublanes (if requested)
-                if sim_params.lateral_resolution is not None:
-                    sumo_call.append("--lateral-resolution")
-                    sumo_call.append(str(sim_params.lateral_resolution))
-
-                if sim_params.overtake_right:
-                    sumo_call.append("--lanechange.overtake-right")
-                    sumo_call.append("true")
-
-                # specify a simulation seed (if requested)
-                if sim_params.seed is not None:
-                    sumo_call.append("--seed")
-                    sumo_call.append(str(sim_params.seed))
-
-                if not sim_params.print_warnings:
-                    sumo_call.append("--no-warnings")
-                    sumo_call.append("true")
-
-                # set the time it takes for a gridlock teleport to occur
-                sumo_call.append("--time-to-teleport")
-                sumo_call.append(str(int(sim_params.teleport_time)))
-
-                # check collisions at intersections
-                sumo_call.append("--collision.check-junctions")
-                sumo_call.append("true")
+                    "--num-clients", str(sim_params.num_clients)
+                ] + self._sumo_options(network, sim_params)
 
                 logging.info(" Starting SUMO on port " + str(port))
                 logging.debug(" Cfg file: " + str(network.cfg))
@@ -258,6 +234,96 @@ class TraCISimulation(KernelSimulation):
                 self.teardown_sumo()
         raise error
 
+    def load_simulation(self, network, sim_params):
+        """Load the configuration files of a network in the running sumo.
+
+        The files referenced by the sumo configuration file of the network
+        (including the routes and inflows) are reloaded by the running sumo
+        instance via ``traci.load``, which is much faster than starting a new
+        sumo process. All vehicles and subscriptions are cleared by the load,
+        and the traci connection is kept. Any emission data collected before
+        the load is saved first (see save_emission).
+
+        Parameters
+        ----------
+        network : flow.core.kernel.network.TraCIKernelNetwork
+            the network kernel, with up-to-date configuration files
+        sim_params : flow.core.params.SimParams
+            simulation-specific parameters
+        """
+        # the simulation time and the ids of inflow vehicles start over after
+        # the load, so the emission data collected so far is saved (and
+        # cleared) first. Every load is saved as a separate run.
+        self.save_emission(run_id=self.num_loads)
+        self.num_loads += 1
+
+        self.sim_step = sim_params.sim_step
+
+        logging.debug(" Loading cfg file: " + str(network.cfg))
+        self.kernel_api.load(self._sumo_options(network, sim_params))
+        self.kernel_api.simulationStep()
+
+    @staticmethod
+    def _sumo_options(network, sim_params):
+        """Return the sumo command line options of a simulation.
+
+        The options used to connect with traci (the port and number of
+        clients) are not included, as they are not needed when loading a
+        simulation in a running sumo instance.
+
+        Parameters
+        ----------
+        network : flow.core.kernel.network.TraCIKernelNetwork
+            the network kernel, whose sumo configuration file is used
+        sim_params : flow.core.params.SimParams
+            simulation-specific parameters
+
+        Returns
+        -------
+        list of str
+            the command line options
+        """
+        sumo_options = [
+            "-c", network.cfg,
+            "--step-length", str(sim_params.sim_step)
+        ]
+
+        # use a ballistic integration step (if request)
+        if sim_params.use_ballistic:
+            sumo_options.append("--step-method.ballistic")
+
+        # ignore step logs (if requested)
+        if sim_params.no_step_log:
+            sumo_options.append("--no-step-log")
+
+        # add the lateral resolution of the sublanes (if requested)
+        if sim_params.lateral_resolution is not None:
+            sumo_options.append("--lateral-resolution")
+            sumo_options.append(str(sim_params.lateral_resolution))
+
+        if sim_params.overtake_right:
+            sumo_options.append("--lanechange.overtake-right")
+            sumo_options.append("true")
+
+        # specify a simulation seed (if requested)
+        if sim_params.seed is not None:
+            sumo_options.append("--seed")
+            sumo_options.append(str(sim_params.seed))
+
+        if not sim_params.print_warnings:
+            sumo_options.append("--no-warnings")
+            sumo_options.append("true")
+
+        # set the time it takes for a gridlock teleport to occur
+        sumo_options.append("--time-to-teleport")
+        sumo_options.append(str(int(sim_params.teleport_time)))
+
+        # check collisions at intersections
+        sumo_options.append("--collision.check-junctions")
+        sumo_options.append("true")
+
+        return sumo_options
+
     def teardown_sumo(self):
         """Kill the sumo subprocess instance."""
         try:
@@ -324,6 +390,11 @@ class TraCISimulation(KernelSimulation):
             writer.writerow(final_data.keys())
             writer.writerows(zip(*final_data.values()))
 
+        # store the edge starts of the network next to the emission file, so
+        # that absolute positions can be recovered when post-processing it
+        save_edge_starts(os.path.join(self.emission_path, name),
+                         self.master_kernel.network.total_edgestarts_dict)
+
         # Clear all memory from the stored data. This is useful if this
         # function is called in between resets.
         self.stored_data.clear()
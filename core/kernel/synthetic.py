@@ -0,0 +1,641 @@
+"""Synthetic networks and traffic served through a fake TraCI connection.
+
+This module allows the TraCI kernels (and the environments built on top of
+them) to be exercised without a running sumo instance. Subscription results
+are produced by a traffic source, either:
+
+* SyntheticTraffic: vehicles driving on the lanes of a generated ring of
+  multi-lane edges, with vectorized leader computations and simple
+  car-following dynamics. This scales to tens of thousands of vehicles.
+* RecordedTraffic: a sequence of previously recorded subscription results.
+
+and served by a FakeKernelAPI, which implements the subset of the TraCI
+connection interface used by the kernels. For example:
+
+    >>> network = SyntheticNetwork(num_edges=8, num_lanes=3)
+    >>> traffic = SyntheticTraffic(network, num_vehicles=1000)
+    >>> k = make_synthetic_kernel(network, traffic)
+    >>> k.simulation.simulation_step()
+    >>> k.update(reset=False)
+    >>> k.vehicle.get_ids_by_edge('edge0')
+
+The consistency of the vehicle kernel with the served traffic can then be
+checked with ``check_vehicle_kernel``.
+"""
+import numpy as np
+import traci.constants as tc
+
+from flow.controllers import IDMController, RLController
+from flow.core.kernel.kernel import Kernel
+from flow.core.kernel.network.traci import TraCIKernelNetwork
+from flow.core.params import SumoParams, VehicleParams
+
+# default minimum gap of sumo vehicles, subtracted from the leader headways
+MIN_GAP = 2.5
+# distance up to which leaders are reported (see TraCIVehicle.subscribeLeader)
+LEADER_DISTANCE = 2000
+
+
+class SyntheticNetwork(object):
+    """Ring of multi-lane edges, with every lane connected to the same lane of
+    the next edge.
+
+    Attributes
+    ----------
+    edges : dict < str, dict >
+        length, number of lanes, and speed limit of every edge
+    connections : dict < str, dict >
+        next and previous edge/lane pairs of every edge/lane pair (see
+        TraCIKernelNetwork._import_edges_from_net)
+    edgestarts : list of (str, float)
+        edges and the absolute position at which they start
+    length : float
+        total length of the ring
+    """
+
+    def __init__(self, num_edges=4, num_lanes=3, edge_length=250,
+                 speed_limit=30):
+        """Instantiate the network.
+
+        Parameters
+        ----------
+        num_edges : int, optional
+            number of edges in the ring
+        num_lanes : int, optional
+            number of lanes of every edge
+        edge_length : float, optional
+            length of every edge (in m)
+        speed_limit : float, optional
+            speed limit of every edge (in m/s)
+        """
+        self.name = 'synthetic_{}x{}'.format(num_edges, num_lanes)
+        self.num_lanes = num_lanes
+        self.edge_length = float(edge_length)
+        self.edge_list = ['edge{}'.format(i) for i in range(num_edges)]
+        self.length = self.edge_length * num_edges
+
+        self.edges = {edge: {'length': self.edge_length, 'lanes': num_lanes,
+                             'speed': speed_limit}
+                      for edge in self.edge_list}
+        self.edgestarts = [(edge, i * self.edge_length)
+                           for i, edge in enumerate(self.edge_list)]
+
+        next_conn = {}
+        prev_conn = {}
+        for i, edge in enumerate(self.edge_list):
+            next_edge = self.edge_list[(i + 1) % num_edges]
+            next_conn[edge] = {lane: [(next_edge, lane)]
+                               for lane in range(num_lanes)}
+            prev_conn[next_edge] = {lane: [(edge, lane)]
+                                    for lane in range(num_lanes)}
+        self.connections = {'next': next_conn, 'prev': prev_conn}
+
+        # routes covering the whole ring from every edge
+        self.routes = {
+            edge: self.edge_list[i:] + self.edge_list[:i]
+            for i, edge in enumerate(self.edge_list)}
+
+
+class SyntheticKernelNetwork(TraCIKernelNetwork):
+    """TraCI network kernel generated from a SyntheticNetwork.
+
+    No configuration files are written, and no sumo process is needed.
+    """
+
+    def generate_network(self, network):
+        """See parent class."""
+        self.network = network
+        self._routing_table = None
+        self._route_planner = None
+        self.orig_name = network.name
+        self.name = network.name
+
+        self._edges = network.edges
+        self._connections = network.connections
+        self._edge_list = list(network.edge_list)
+        self._junction_list = []
+
+        self.edgestarts = list(network.edgestarts)
+        self.internal_edgestarts = []
+        self.internal_edgestarts_dict = {}
+        self.total_edgestarts = list(self.edgestarts)
+        self.total_edgestarts_dict = dict(self.total_edgestarts)
+        self.rts = network.routes
+
+    def max_speed(self):
+        """See parent class."""
+        return max(edge['speed'] for edge in self._edges.values())
+
+    def length(self):
+        """See parent class."""
+        return self.network.length
+
+    def non_internal_length(self):
+        """See parent class."""
+        return self.network.length
+
+    def close(self):
+        """See parent class."""
+        pass
+
+
+class SyntheticTraffic(object):
+    """Vehicles driving on the lanes of a SyntheticNetwork.
+
+    Vehicles are evenly distributed over the lanes of the ring, and follow
+    a simplified Intelligent Driver Model with random lane changes. Speeds and
+    lane changes requested through the fake TraCI connection are applied
+    during the next step.
+
+    Attributes
+    ----------
+    ids : list of str
+        ids of the vehicles, "rl_<i>" for the RL vehicles and "human_<i>" for
+        the others
+    types : dict < str, str >
+        type of every vehicle ("rl" or "human")
+    lengths : dict < str, float >
+        length of every vehicle
+    sim_obs : dict
+        simulation subscription results of the current step
+    vehicle_obs : dict < str, dict >
+        vehicle subscription results of the current step
+    tl_ids : list of str
+        ids of the traffic lights
+    tl_obs : dict < str, dict >
+        traffic light subscription results of the current step
+    """
+
+    def __init__(self, network, num_vehicles, rl_fraction=0.1,
+                 num_traffic_lights=0, lane_change_prob=0.01, sim_step=0.1,
+                 seed=None):
+        """Instantiate the traffic.
+
+        Parameters
+        ----------
+        network : SyntheticNetwork
+            the network the vehicles drive on
+        num_vehicles : int
+            number of vehicles
+        rl_fraction : float, optional
+            fraction of the vehicles that are RL vehicles
+        num_traffic_lights : int, optional
+            number of (fixed-time) traffic lights, which only affect the
+            traffic light subscription results
+        lane_change_prob : float, optional
+            probability that a vehicle changes lanes at every step
+        sim_step : float, optional
+            duration of a step (in s)
+        seed : int, optional
+            seed of the random number generator
+        """
+        self.network = network
+        self.num_vehicles = num_vehicles
+        self.lane_change_prob = lane_change_prob
+        self.sim_step = sim_step
+        self.rng = np.random.RandomState(seed)
+
+        num_rl = int(round(rl_fraction * num_vehicles))
+        self.ids = ['rl_{}'.format(i) for i in range(num_rl)] + \
+            ['human_{}'.format(i) for i in range(num_vehicles - num_rl)]
+        self.types = {veh_id: veh_id.split('_')[0] for veh_id in self.ids}
+        self.lengths = dict.fromkeys(self.ids, 5.)
+        self._length = np.full(num_vehicles, 5.)
+        self._index = {veh_id: i for i, veh_id in enumerate(self.ids)}
+
+        self.tl_ids = ['tl{}'.format(i) for i in range(num_traffic_lights)]
+        self.tl_obs = {}
+
+        # requested speeds and lanes, applied during the next step
+        self._speed_commands = {}
+        self._lane_commands = {}
+
+        self.sim_obs = None
+        self.vehicle_obs = None
+        self.time_step = 0
+
+    def reset(self):
+        """Place all vehicles in the network, and compute their observations.
+
+        All vehicles are reported as departed.
+        """
+        n = self.num_vehicles
+        num_lanes = self.network.num_lanes
+        per_lane = int(np.ceil(n / num_lanes))
+        spacing = self.network.length / max(per_lane, 1)
+
+        index = np.arange(n)
+        self._lane = index % num_lanes
+        self._pos = (index // num_lanes) * spacing + \
+            self.rng.uniform(0, 0.1 * spacing, n)
+        self._speed = self.rng.uniform(0, 10, n)
+        self._v0 = self.rng.uniform(20, 30, n)
+        self._distance = np.zeros(n)
+        self._speed_commands.clear()
+        self._lane_commands.clear()
+        self.time_step = 0
+
+        self._observe(departed=list(self.ids))
+
+    def step(self):
+        """Advance the vehicles by one step, and compute their observations."""
+        dt = self.sim_step
+        gap = self._leader_gaps()[1]
+
+        # simplified intelligent driver model
+        v = self._speed
+        s_star = 2 + v * 1.0
+        accel = 1.0 * (1 - (v / self._v0) ** 4 -
+                       (s_star / np.maximum(gap, 0.1)) ** 2)
+        speed = np.clip(v + accel * dt, 0, None)
+        for veh_id, target in self._speed_commands.items():
+            speed[self._index[veh_id]] = target
+        self._speed_commands.clear()
+
+        # random and requested lane changes
+        num_lanes = self.network.num_lanes
+        change = self.rng.rand(self.num_vehicles) < self.lane_change_prob
+        direction = self.rng.choice([-1, 1], self.num_vehicles)
+        self._lane = np.where(
+            change, np.clip(self._lane + direction, 0, num_lanes - 1),
+            self._lane)
+        for veh_id, lane in self._lane_commands.items():
+            self._lane[self._index[veh_id]] = min(max(lane, 0), num_lanes - 1)
+        self._lane_commands.clear()
+
+        self._speed = speed
+        self._pos = (self._pos + speed * dt) % self.network.length
+        self._distance += speed * dt
+        self.time_step += 1
+
+        self._observe(departed=[])
+
+    def set_speed(self, veh_id, speed):
+        """Request the speed of a vehicle in the next step."""
+        self._speed_commands[veh_id] = speed
+
+    def change_lane(self, veh_id, lane):
+        """Request a lane change of a vehicle in the next step."""
+        self._lane_commands[veh_id] = lane
+
+    def _leader_gaps(self):
+        """Return the index of the leader of every vehicle, and its gap.
+
+        The leader of a vehicle is the closest vehicle ahead of it in the same
+        lane (wrapping around the ring). Vehicles alone in their lane have a
+        leader index of -1 and an infinite gap.
+        """
+        n = self.num_vehicles
+        length = self.network.length
+        order = np.lexsort((self._pos, self._lane))
+        lanes = self._lane[order]
+
+        # index (in the sorted order) of the first vehicle of every lane
+        new_lane = np.r_[True, lanes[1:] != lanes[:-1]]
+        starts = np.flatnonzero(new_lane)
+        group_start = starts[np.cumsum(new_lane) - 1]
+        last = np.r_[lanes[1:] != lanes[:-1], True]
+        nxt = np.where(last, group_start, np.arange(n) + 1)
+
+        leader = np.empty(n, dtype=int)
+        leader[order] = order[nxt]
+        gap = (self._pos[leader] - self._pos - self._length[leader]) % length
+        alone = leader == np.arange(n)
+        leader[alone] = -1
+        gap[alone] = np.inf
+        return leader, gap
+
+    def _observe(self, departed):
+        """Compute the subscription results of the current step."""
+        network = self.network
+        leader, gap = self._leader_gaps()
+        edge_index = (self._pos // network.edge_length).astype(int)
+        lane_pos = self._pos - edge_index * network.edge_length
+        theta = 2 * np.pi * self._pos / network.length
+        radius = network.length / (2 * np.pi)
+        x = radius * np.cos(theta)
+        y = radius * np.sin(theta)
+        # sumo angles are clockwise from the north
+        angle = -np.degrees(theta) % 360
+
+        edges = network.edge_list
+        routes = {edge: tuple(route) for edge, route in network.routes.items()}
+        vehicle_obs = {}
+        for i, veh_id in enumerate(self.ids):
+            edge = edges[edge_index[i]]
+            if leader[i] < 0 or gap[i] > LEADER_DISTANCE:
+                lead = None
+            else:
+                lead = (self.ids[leader[i]], float(gap[i]) - MIN_GAP)
+            vehicle_obs[veh_id] = {
+                tc.VAR_LANE_INDEX: int(self._lane[i]),
+                tc.VAR_LANEPOSITION: float(lane_pos[i]),
+                tc.VAR_ROAD_ID: edge,
+                tc.VAR_SPEED: float(self._speed[i]),
+                tc.VAR_EDGES: routes[edge],
+                tc.VAR_POSITION: (float(x[i]), float(y[i])),
+                tc.VAR_ANGLE: float(angle[i]),
+                tc.VAR_SPEED_WITHOUT_TRACI: float(self._speed[i]),
+                tc.VAR_FUELCONSUMPTION: 0.,
+                tc.VAR_DISTANCE: float(self._distance[i]),
+                tc.VAR_LEADER: lead,
+            }
+        self.vehicle_obs = vehicle_obs
+
+        self.sim_obs = {
+            tc.VAR_DEPARTED_VEHICLES_IDS: departed,
+            tc.VAR_ARRIVED_VEHICLES_IDS: [],
+            tc.VAR_TELEPORT_STARTING_VEHICLES_IDS: [],
+            tc.VAR_TIME_STEP: self.time_step * self.sim_step,
+            tc.VAR_DELTA_T: self.sim_step,
+            tc.VAR_LOADED_VEHICLES_NUMBER: len(departed),
+            tc.VAR_DEPARTED_VEHICLES_NUMBER: len(departed),
+            tc.VAR_ARRIVED_VEHICLES_NUMBER: 0,
+        }
+
+        # fixed-time traffic lights, switching every 30 seconds
+        phase = int(self.time_step * self.sim_step // 30) % 2
+        self.tl_obs = {tl_id: {tc.TL_RED_YELLOW_GREEN_STATE:
+                               'GGrr' if phase == 0 else 'rrGG'}
+                       for tl_id in self.tl_ids}
+
+
+class RecordedTraffic(object):
+    """Replay of previously recorded subscription results.
+
+    Every frame is a dict with the following keys:
+
+    * simulation: simulation subscription results
+    * vehicles: vehicle subscription results, keyed by vehicle id
+    * traffic_lights (optional): traffic light subscription results, keyed by
+      traffic light id
+    * types (optional): types of the vehicles departing in the frame
+
+    Commands issued through the fake TraCI connection are ignored. Once all
+    frames have been replayed, the last frame is served indefinitely.
+    """
+
+    def __init__(self, frames, lengths=None):
+        """Instantiate the replay.
+
+        Parameters
+        ----------
+        frames : list of dict
+            the recorded frames
+        lengths : dict < str, float >, optional
+            length of the vehicles, 5 m by default
+        """
+        self.frames = frames
+        self.types = {}
+        self.lengths = lengths or {}
+        self.tl_ids = sorted(frames[0].get('traffic_lights', {}).keys())
+        self.ids = []
+        self._index = 0
+        self.sim_obs = None
+        self.vehicle_obs = None
+        self.tl_obs = None
+
+    def reset(self):
+        """Serve the first frame."""
+        self._index = 0
+        self._load()
+
+    def step(self):
+        """Serve the next frame."""
+        self._index = min(self._index + 1, len(self.frames) - 1)
+        self._load()
+
+    def set_speed(self, veh_id, speed):
+        """Ignore the command."""
+        pass
+
+    def change_lane(self, veh_id, lane):
+        """Ignore the command."""
+        pass
+
+    def _load(self):
+        """Load the current frame."""
+        frame = self.frames[self._index]
+        self.sim_obs = frame['simulation']
+        self.vehicle_obs = frame['vehicles']
+        self.tl_obs = frame.get('traffic_lights', {})
+        self.types.update(frame.get('types', {}))
+        self.ids = list(self.vehicle_obs.keys())
+        for veh_id in self.ids:
+            self.lengths.setdefault(veh_id, 5.)
+
+
+class _FakeVehicleDomain(object):
+    """Vehicle domain of the fake TraCI connection."""
+
+    def __init__(self, traffic):
+        self.traffic = traffic
+
+    def getIDList(self):
+        return list(self.traffic.vehicle_obs.keys())
+
+    def getSubscriptionResults(self, veh_id):
+        return self.traffic.vehicle_obs.get(veh_id)
+
+    def getTypeID(self, veh_id):
+        return self.traffic.types[veh_id]
+
+    def getLength(self, veh_id):
+        return self.traffic.lengths[veh_id]
+
+    def getRoadID(self, veh_id):
+        return self.traffic.vehicle_obs[veh_id][tc.VAR_ROAD_ID]
+
+    def getLanePosition(self, veh_id):
+        return self.traffic.vehicle_obs[veh_id][tc.VAR_LANEPOSITION]
+
+    def getLaneIndex(self, veh_id):
+        return self.traffic.vehicle_obs[veh_id][tc.VAR_LANE_INDEX]
+
+    def getSpeed(self, veh_id):
+        return self.traffic.vehicle_obs[veh_id][tc.VAR_SPEED]
+
+    def getFuelConsumption(self, veh_id):
+        return self.traffic.vehicle_obs[veh_id].get(tc.VAR_FUELCONSUMPTION, 0)
+
+    def getMaxSpeed(self, veh_id):
+        return 30.
+
+    def getColor(self, veh_id):
+        return 255, 255, 255, 255
+
+    def setSpeed(self, veh_id, speed):
+        self.traffic.set_speed(veh_id, speed)
+
+    def slowDown(self, veh_id, speed, duration):
+        self.traffic.set_speed(veh_id, speed)
+
+    def changeLane(self, veh_id, lane, duration):
+        self.traffic.change_lane(veh_id, lane)
+
+    def _ignore(self, *args, **kwargs):
+        pass
+
+    # commands without effect on the served traffic
+    subscribe = subscribeLeader = unsubscribe = remove = addFull = \
+        setSpeedMode = setLaneChangeMode = setRoute = setColor = \
+        setMaxSpeed = _ignore
+
+
+class _FakeSimulationDomain(object):
+    """Simulation domain of the fake TraCI connection."""
+
+    def __init__(self, traffic):
+        self.traffic = traffic
+
+    def subscribe(self, var_ids):
+        pass
+
+    def getSubscriptionResults(self):
+        return self.traffic.sim_obs
+
+    def getStartingTeleportNumber(self):
+        return len(self.traffic.sim_obs[tc.VAR_TELEPORT_STARTING_VEHICLES_IDS])
+
+    def getTime(self):
+        return self.traffic.sim_obs[tc.VAR_TIME_STEP]
+
+
+class _FakeTrafficLightDomain(object):
+    """Traffic light domain of the fake TraCI connection."""
+
+    def __init__(self, traffic):
+        self.traffic = traffic
+
+    def getIDList(self):
+        return list(self.traffic.tl_ids)
+
+    def subscribe(self, tl_id, var_ids):
+        pass
+
+    def getSubscriptionResults(self, tl_id):
+        return self.traffic.tl_obs[tl_id]
+
+    def setRedYellowGreenState(self, tlsID, state):
+        pass
+
+    def setLinkState(self, tlsID, tlsLinkIndex, state):
+        pass
+
+
+class FakeKernelAPI(object):
+    """Fake TraCI connection serving the results of a traffic source.
+
+    Implements the subset of the traci.connection.Connection interface used
+    by the TraCI kernels. ``simulationStep`` advances the traffic source by
+    one step.
+    """
+
+    def __init__(self, traffic):
+        """Instantiate the connection.
+
+        Parameters
+        ----------
+        traffic : SyntheticTraffic or RecordedTraffic
+            the traffic source
+        """
+        self.traffic = traffic
+        self.vehicle = _FakeVehicleDomain(traffic)
+        self.simulation = _FakeSimulationDomain(traffic)
+        self.trafficlight = _FakeTrafficLightDomain(traffic)
+
+    def simulationStep(self, step=0.):
+        """Advance the traffic source by one step."""
+        self.traffic.step()
+
+    def close(self):
+        """Close the connection."""
+        pass
+
+
+def make_synthetic_kernel(network, traffic, sim_params=None):
+    """Create a TraCI kernel connected to a synthetic traffic source.
+
+    The traffic source is reset, and the kernel is updated once, such that all
+    departed vehicles are added to the vehicle kernel.
+
+    Parameters
+    ----------
+    network : SyntheticNetwork
+        the network the vehicles drive on
+    traffic : SyntheticTraffic or RecordedTraffic
+        the traffic source
+    sim_params : flow.core.params.SumoParams, optional
+        simulation parameters. Defaults to SumoParams(sim_step=0.1).
+
+    Returns
+    -------
+    flow.core.kernel.Kernel
+        the kernel
+    """
+    sim_params = sim_params or SumoParams(sim_step=0.1)
+
+    k = Kernel(simulator='traci', sim_params=sim_params)
+    k.network = SyntheticKernelNetwork(k, sim_params)
+    k.network.generate_network(network)
+
+    vehicles = VehicleParams()
+    vehicles.add('human', acceleration_controller=(IDMController, {}))
+    vehicles.add('rl', acceleration_controller=(RLController, {}))
+    k.vehicle.initialize(vehicles)
+    k.simulation.sim_step = sim_params.sim_step
+
+    traffic.reset()
+    k.pass_api(FakeKernelAPI(traffic))
+    k.update(reset=True)
+
+    return k
+
+
+def check_vehicle_kernel(k, traffic):
+    """Check that the vehicle kernel is consistent with the served traffic.
+
+    Parameters
+    ----------
+    k : flow.core.kernel.Kernel
+        a kernel created with make_synthetic_kernel, and updated since the last
+        step of the traffic
+    traffic : SyntheticTraffic or RecordedTraffic
+        the traffic source
+
+    Raises
+    ------
+    AssertionError
+        if the state of the vehicle kernel differs from the traffic
+    """
+    kv = k.vehicle
+    ids = set(traffic.vehicle_obs.keys())
+    assert set(kv.get_ids()) == ids, 'vehicle ids differ'
+
+    for veh_id, obs in traffic.vehicle_obs.items():
+        assert kv.get_speed(veh_id) == obs[tc.VAR_SPEED], veh_id
+        assert kv.get_edge(veh_id) == obs[tc.VAR_ROAD_ID], veh_id
+        assert kv.get_lane(veh_id) == obs[tc.VAR_LANE_INDEX], veh_id
+        assert kv.get_position(veh_id) == obs[tc.VAR_LANEPOSITION], veh_id
+        lead = obs.get(tc.VAR_LEADER)
+        assert kv.get_leader(veh_id) == (lead[0] if lead else None), veh_id
+
+    # vehicles are partitioned by edge
+    edges = k.network.get_edge_list()
+    by_edge = [veh_id for edge in edges for veh_id in kv.get_ids_by_edge(edge)]
+    assert sorted(by_edge) == sorted(ids), 'ids by edge are not a partition'
+    for edge in edges:
+        for veh_id in kv.get_ids_by_edge(edge):
+            assert kv.get_edge(veh_id) == edge, veh_id
+
+    # lane leaders of the rl vehicles are the closest vehicles ahead of them
+    for veh_id in kv.get_rl_ids():
+        edge = kv.get_edge(veh_id)
+        pos = kv.get_position(veh_id)
+        for lane, leader in enumerate(kv.get_lane_leaders(veh_id)):
+            ahead = [(kv.get_position(other), other)
+                     for other in kv.get_ids_by_edge(edge)
+                     if kv.get_lane(other) == lane and other != veh_id
+                     and kv.get_position(other) >= pos]
+            if ahead:
+                assert leader == min(ahead)[1], (veh_id, lane)
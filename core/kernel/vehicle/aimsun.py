@@ -172,17 +172,34 @@ class AimsunKernelVehicle(KernelVehicle):
         #           self.total_num_type[veh_type])
 
         # collect the entered and exited vehicle_ids
-        added_vehicles = self.kernel_api.get_entered_ids()
-        exited_vehicles = self.kernel_api.get_exited_ids()
+        pipeline = self.kernel_api.pipeline()
+        pipeline.get_entered_ids()
+        pipeline.get_exited_ids()
+        added_vehicles, exited_vehicles = pipeline.flush()
+
+        # collect the types of the new vehicles
+        for aimsun_id in added_vehicles:
+            pipeline.get_vehicle_type_name(aimsun_id)
+        veh_types = pipeline.flush()
+
+        # collect the static info of the new vehicles that should be tracked,
+        # and set them as tracked
+        departed = [aimsun_id for aimsun_id, veh_type
+                    in zip(added_vehicles, veh_types)
+                    if veh_type in self.tracked_vehicle_types]
+        for aimsun_id in departed:
+            pipeline.get_vehicle_static_info(aimsun_id)
+            pipeline.set_vehicle_tracked(aimsun_id)
+        static_info = dict(zip(departed, pipeline.flush()[::2]))
 
         # keep track of arrived rl vehicles
         arrived_rl_ids = []
 
         # add the new vehicles if they should be tracked
-        for aimsun_id in added_vehicles:
-            veh_type = self.kernel_api.get_vehicle_type_name(aimsun_id)
+        for aimsun_id, veh_type in zip(added_vehicles, veh_types):
             if veh_type in self.tracked_vehicle_types:
-                self._add_departed(aimsun_id)
+                self._add_departed(
+                    aimsun_id, veh_type, static_info[aimsun_id])
             if aimsun_id in self.get_rl_ids():
                 arrived_rl_ids.append(aimsun_id)
         self._arrived_rl_ids.append(arrived_rl_ids)
@@ -195,23 +212,26 @@ class AimsunKernelVehicle(KernelVehicle):
 
         # start = time.time()
 
-        for veh_id in self.__ids:
-            aimsun_id = self._id_flow2aimsun[veh_id]
+        # collect the tracking info, leader and next section of all tracked
+        # vehicles (and the tracking info of their untracked leaders) in a
+        # single exchange with the server
+        bulk_info = self.kernel_api.get_vehicles_bulk_info(
+            [self._id_flow2aimsun[veh_id] for veh_id in self.__ids],
+            self.tracked_info_bitmap)
 
-            # update the vehicle's tracking information
-            self.__vehicles[veh_id]['tracking_info'] = \
-                self.kernel_api.get_vehicle_tracking_info(
-                    aimsun_id, self.tracked_info_bitmap
-                )
+        # update the vehicles' tracking information
+        for veh_id, info in zip(self.__ids, bulk_info):
+            self.__vehicles[veh_id]['tracking_info'] = info[0]
+
+        for veh_id, info in zip(self.__ids, bulk_info):
+            inf_veh, lead_id_aimsun, next_section, inf_veh_leader, \
+                leader_length = info
 
             # get the leader, follower, and headway for each tracked vehicle
-            lead_id_aimsun = self.kernel_api.get_vehicle_leader(aimsun_id)
             if lead_id_aimsun < -1:
                 self.__vehicles[veh_id]['leader'] = None
                 self.__vehicles[veh_id]['headway'] = 1000
             else:
-                inf_veh = self.__vehicles[veh_id]['tracking_info']
-
                 if lead_id_aimsun in self._id_aimsun2flow:
                     lead_id = self._id_aimsun2flow[lead_id_aimsun]
                     inf_veh_leader = self.__vehicles[lead_id]['tracking_info']
@@ -220,24 +240,10 @@ class AimsunKernelVehicle(KernelVehicle):
                     self.__vehicles[veh_id]['leader'] = lead_id
                     self.__vehicles[lead_id]['follower'] = veh_id
                 else:
-                    # TODO can be hardcoded when we won't change it anymore
-                    tracked_info_leader = self.make_bitmap_for_tracking({
-                        'CurrentPos', 'distance2End',
-                        'idSection', 'idJunction',
-                        'idSectionFrom', 'idSectionTo'
-                    })
-
-                    inf_veh_leader = self.kernel_api.get_vehicle_tracking_info(
-                        lead_id_aimsun, tracked_info_leader, tracked=False
-                    )
-                    leader_length = self.kernel_api.\
-                        get_vehicle_length(lead_id_aimsun)
                     self.__vehicles[veh_id]['leader'] = -1
 
                 # FIXME can be simplified
                 if inf_veh.idSection != -1:  # vehicle is in a section
-                    next_section = self.kernel_api.get_next_section(
-                        aimsun_id, inf_veh.idSection)
                     # leader is in a section
                     if inf_veh_leader.idSection != -1:
                         # veh in section and leader in same section
@@ -286,21 +292,26 @@ class AimsunKernelVehicle(KernelVehicle):
 
                 self.__vehicles[veh_id]['headway'] = gap
 
+        # update the number of vehicles and their speeds on every edge
+        self._update_edge_aggregates()
+
         # end = time.time()
         # if len(self.__ids) > 0:
         #     print("update time per tracked vehicle (ms):",
         #           1000 * (end - start) / len(self.__ids))
 
-    def _add_departed(self, aimsun_id):
-        """See parent class."""
-        # get vehicle information from API
-        static_inf_veh = self.kernel_api.get_vehicle_static_info(aimsun_id)
-
-        # get the vehicle's type
-        type_id = self.kernel_api.get_vehicle_type_name(aimsun_id)
-
-        self.kernel_api.set_vehicle_tracked(aimsun_id)
+    def _add_departed(self, aimsun_id, type_id, static_inf_veh):
+        """Add a tracked vehicle that entered the network to the kernel.
 
+        Parameters
+        ----------
+        aimsun_id : int
+            name of the vehicle in Aimsun
+        type_id : str
+            Aimsun type name of the vehicle
+        static_inf_veh : flow.utils.aimsun.struct.StaticInfVeh
+            static info of the vehicle
+        """
         # get the vehicle ID, or create a new vehicle ID if one doesn't exist
         # for the vehicle
         if aimsun_id not in self._id_aimsun2flow.keys():
@@ -449,12 +460,15 @@ class AimsunKernelVehicle(KernelVehicle):
             veh_id = [veh_id]
             acc = [acc]
 
+        # send the new speeds of all vehicles in a single message
+        pipeline = self.kernel_api.pipeline()
         for i, veh_id in enumerate(veh_id):
             if acc[i] is not None:
                 this_vel = self.get_speed(veh_id)
                 next_vel = max(this_vel + acc[i] * self.sim_step, 0)
                 aimsun_id = self._id_flow2aimsun[veh_id]
-                self.kernel_api.set_speed(aimsun_id, next_vel)
+                pipeline.set_speed(aimsun_id, next_vel)
+        pipeline.flush()
 
     def apply_lane_change(self, veh_id, direction):
         """Apply an instantaneous lane-change to a set of vehicles.
@@ -490,6 +504,8 @@ class AimsunKernelVehicle(KernelVehicle):
                 "Direction values for lane changes may only be: -2, -1, 0, \
                 or 1.")
 
+        # send the lane changes of all vehicles in a single message
+        pipeline = self.kernel_api.pipeline()
         for i, veh_id in enumerate(veh_id):
             # check for no lane change
             if direction[i] == 0:
@@ -506,11 +522,12 @@ class AimsunKernelVehicle(KernelVehicle):
             # perform the requested lane action action in Aimsun
             if target_lane != this_lane:
                 aimsun_id = self._id_flow2aimsun[veh_id]
-                self.kernel_api.apply_lane_change(aimsun_id, int(target_lane))
+                pipeline.apply_lane_change(aimsun_id, int(target_lane))
 
                 if veh_id in self.get_rl_ids():
                     self.prev_last_lc[veh_id] = \
                         self.__vehicles[veh_id]["last_lc"]
+        pipeline.flush()
 
     def choose_routes(self, veh_id, route_choices):
         """Update the route choice of vehicles in the network.
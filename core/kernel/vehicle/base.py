@@ -2,6 +2,8 @@
 
 from abc import ABCMeta, abstractmethod
 
+import numpy as np
+
 
 class KernelVehicle(object, metaclass=ABCMeta):
     """Flow vehicle kernel.
@@ -34,7 +36,16 @@ class KernelVehicle(object, metaclass=ABCMeta):
         >>> speed = env.k.vehicle.get_speed(veh_id)
 
     All methods in this class are abstract, and must be filled in by the child
-    vehicle kernel of separate simulators.
+    vehicle kernel of separate simulators, with the exception of the per-edge
+    aggregates (number of vehicles, sum of speeds, and number of RL vehicles
+    on every edge and lane), which child kernels maintain by calling
+    ``_update_edge_aggregates`` at the end of every ``update``. Aggregates are
+    returned as arrays, so that observations and rewards over all edges do
+    not need to query the vehicles one by one:
+
+        >>> edges = env.k.network.get_edge_list()
+        >>> num_vehicles = env.k.vehicle.get_num_vehicles_by_edge(edges)
+        >>> mean_speeds = env.k.vehicle.get_mean_speed_by_edge(edges)
     """
 
     def __init__(self,
@@ -54,6 +65,16 @@ class KernelVehicle(object, metaclass=ABCMeta):
         self.kernel_api = None
         self.sim_step = sim_params.sim_step
 
+        # index of every edge (and junction) in the per-edge aggregates
+        self._edge_index = dict()
+        # number of vehicles, sum of their speeds, and number of RL vehicles
+        # on every edge, and on every lane of every edge
+        self._edge_num_vehicles = np.zeros(0)
+        self._edge_speed_sums = np.zeros(0)
+        self._edge_num_rl = np.zeros(0)
+        self._lane_num_vehicles = np.zeros((0, 1))
+        self._lane_speed_sums = np.zeros((0, 1))
+
     def pass_api(self, kernel_api):
         """Acquire the kernel api that was generated by the simulation kernel.
 
@@ -127,6 +148,48 @@ class KernelVehicle(object, metaclass=ABCMeta):
         """
         pass
 
+    def add_many(self, veh_ids, type_ids, edges, pos, lanes, speeds):
+        """Add several vehicles to the network.
+
+        This is used to reintroduce the initial vehicles when an environment
+        is reset. By default, the vehicles are added one at a time via `add`.
+
+        Parameters
+        ----------
+        veh_ids : list of str
+            unique identifiers of the vehicles to be added
+        type_ids : list of str
+            vehicle types of the added vehicles
+        edges : list of str
+            starting edges of the added vehicles
+        pos : list of float
+            starting positions of the added vehicles
+        lanes : list of int
+            starting lanes of the added vehicles
+        speeds : list of float
+            starting speeds of the added vehicles
+        """
+        for args in zip(veh_ids, type_ids, edges, pos, lanes, speeds):
+            self.add(*args)
+
+    def remove_all(self, tracked=True):
+        """Remove all vehicles from the network and the vehicles kernel.
+
+        This is used to clear the network when an environment is reset. By
+        default, the vehicles of the kernel are removed one at a time via
+        `remove`.
+
+        Parameters
+        ----------
+        tracked : bool, optional
+            whether the vehicles of the kernel that are not in the network
+            should be removed as well. This is not needed in the first step
+            after initializing the network, as there will be no vehicles
+        """
+        if tracked:
+            for veh_id in list(self.get_ids()):
+                self.remove(veh_id)
+
     @abstractmethod
     def apply_acceleration(self, veh_id, acc, smooth=True):
         """Apply the acceleration requested by a vehicle in the simulator.
@@ -184,6 +247,33 @@ class KernelVehicle(object, metaclass=ABCMeta):
         """
         pass
 
+    def get_routing_ids(self):
+        """Return the ids of vehicles whose routers should be queried.
+
+        A vehicle is included if it has a routing controller and either the
+        router's ``final_edge_only`` attribute is False, the vehicle is on the
+        last edge of its current route, or the vehicle is on one of the
+        router's ``trigger_edges``. Kernels may override this method to keep
+        this set up to date incrementally.
+
+        Returns
+        -------
+        list of str
+            vehicle ids
+        """
+        routing_ids = []
+        for veh_id in self.get_ids():
+            router = self.get_routing_controller(veh_id)
+            if router is None:
+                continue
+            edge = self.get_edge(veh_id)
+            route = self.get_route(veh_id)
+            if not router.final_edge_only \
+                    or edge in router.trigger_edges \
+                    or (len(route) > 0 and edge == route[-1]):
+                routing_ids.append(veh_id)
+        return routing_ids
+
     @abstractmethod
     def set_max_speed(self, veh_id, max_speed):
         """Update the maximum allowable speed by a vehicles in the network.
@@ -294,6 +384,159 @@ class KernelVehicle(object, metaclass=ABCMeta):
         """
         pass
 
+    def get_edge_index(self, edges):
+        """Return the index of the specified edge(s) in the edge aggregates.
+
+        The edges of the network are indexed in the order of
+        ``network.get_edge_list() + network.get_junction_list()``. Edges that
+        were not seen so far are assigned a new index.
+
+        Parameters
+        ----------
+        edges : str or list of str
+            edge (or junction) ID(s)
+
+        Returns
+        -------
+        int or np.ndarray
+            index (or indices) of the edge(s)
+        """
+        index = self._edge_index
+        if isinstance(edges, (list, tuple, np.ndarray)):
+            for edge in edges:
+                if edge not in index:
+                    index[edge] = len(index)
+            return np.array([index[edge] for edge in edges], dtype=int)
+        if edges not in index:
+            index[edges] = len(index)
+        return index[edges]
+
+    def get_num_vehicles_by_edge(self, edges):
+        """Return the number of vehicles on the specified edge(s).
+
+        Parameters
+        ----------
+        edges : str or list of str
+            edge (or junction) ID(s)
+
+        Returns
+        -------
+        int or np.ndarray
+            number of vehicles on every edge
+        """
+        return self._by_edge(self._edge_num_vehicles, edges)
+
+    def get_speed_sum_by_edge(self, edges):
+        """Return the sum of the speeds of the vehicles on the edge(s)."""
+        return self._by_edge(self._edge_speed_sums, edges)
+
+    def get_mean_speed_by_edge(self, edges, error=0.):
+        """Return the average speed of the vehicles on the specified edge(s).
+
+        Parameters
+        ----------
+        edges : str or list of str
+            edge (or junction) ID(s)
+        error : float, optional
+            value returned for edges containing no vehicles
+
+        Returns
+        -------
+        float or np.ndarray
+            average speed on every edge
+        """
+        num_vehicles = self.get_num_vehicles_by_edge(edges)
+        speed_sums = self.get_speed_sum_by_edge(edges)
+        return np.where(num_vehicles > 0,
+                        speed_sums / np.maximum(num_vehicles, 1), error)
+
+    def get_num_rl_by_edge(self, edges):
+        """Return the number of RL vehicles on the specified edge(s)."""
+        return self._by_edge(self._edge_num_rl, edges)
+
+    def get_num_vehicles_by_lane(self, edges):
+        """Return the number of vehicles on every lane of the edge(s).
+
+        Parameters
+        ----------
+        edges : str or list of str
+            edge (or junction) ID(s)
+
+        Returns
+        -------
+        np.ndarray
+            number of vehicles on every lane, indexed by lane for a single
+            edge, and by (edge, lane) for a list of edges. The number of
+            columns is the largest lane index in use in the network plus one.
+        """
+        return self._by_edge(self._lane_num_vehicles, edges)
+
+    def get_speed_sum_by_lane(self, edges):
+        """Return the sum of the speeds of the vehicles on every lane.
+
+        See get_num_vehicles_by_lane.
+        """
+        return self._by_edge(self._lane_speed_sums, edges)
+
+    def _by_edge(self, aggregate, edges):
+        """Return the elements of an edge aggregate at the specified edges."""
+        index = self.get_edge_index(edges)
+        if len(aggregate) < len(self._edge_index):
+            # edges added since the last update contain no vehicles
+            padding = [(0, len(self._edge_index) - len(aggregate))] + \
+                [(0, 0)] * (aggregate.ndim - 1)
+            aggregate = np.pad(aggregate, padding, mode='constant')
+        return aggregate[index]
+
+    def _update_edge_aggregates(self):
+        """Recompute the per-edge aggregates from the current vehicle states.
+
+        Edge IDs are interned into integer indices, such that the aggregates
+        are computed with a single np.bincount each.
+        """
+        index = self._edge_index
+        if not index:
+            network = self.master_kernel.network
+            self.get_edge_index(
+                list(network.get_edge_list()) +
+                list(network.get_junction_list()))
+
+        veh_ids = self.get_ids()
+        rl_ids = set(self.get_rl_ids())
+        edges = self.get_edge(veh_ids)
+        for edge in set(edges) - index.keys():
+            if edge:
+                index[edge] = len(index)
+
+        edge_ids = np.array([index.get(edge, -1) for edge in edges],
+                            dtype=int)
+        lanes = np.array(self.get_lane(veh_ids), dtype=int)
+        speeds = np.array(self.get_speed(veh_ids), dtype=float)
+        is_rl = np.array([veh_id in rl_ids for veh_id in veh_ids],
+                         dtype=bool)
+
+        # ignore vehicles that are not on any edge (e.g. teleporting)
+        valid = edge_ids >= 0
+        edge_ids = edge_ids[valid]
+        num_edges = len(index)
+        self._edge_num_vehicles = np.bincount(edge_ids, minlength=num_edges)
+        self._edge_speed_sums = np.bincount(
+            edge_ids, weights=speeds[valid], minlength=num_edges)
+        self._edge_num_rl = np.bincount(
+            edge_ids[is_rl[valid]], minlength=num_edges)
+
+        lanes = lanes[valid]
+        on_lane = lanes >= 0
+        num_lanes = max(self._lane_num_vehicles.shape[1],
+                        lanes.max() + 1 if np.any(on_lane) else 1)
+        lane_ids = edge_ids[on_lane] * num_lanes + lanes[on_lane]
+        self._lane_num_vehicles = np.bincount(
+            lane_ids, minlength=num_edges * num_lanes).reshape(
+                num_edges, num_lanes)
+        self._lane_speed_sums = np.bincount(
+            lane_ids, weights=speeds[valid][on_lane],
+            minlength=num_edges * num_lanes).reshape(num_edges, num_lanes)
+
     @abstractmethod
     def get_inflow_rate(self, time_span):
         """Return the inflow rate (in veh/hr) of vehicles from the network.
@@ -68,6 +68,14 @@ class TraCIVehicle(KernelVehicle):
         # list of vehicle ids located in each edge in the network
         self._ids_by_edge = dict()
 
+        # ids of vehicles whose routing controllers need to be queried, i.e.
+        # vehicles on the last edge of their routes (see `get_routing_ids`).
+        # A dict is used as an insertion-ordered set.
+        self._routing_ids = dict()
+        # (current edge, final edge of the route) of vehicles with routing
+        # controllers, used to detect changes in the above set
+        self._routing_keys = dict()
+
         # number of vehicles that entered the network for every time-step
         self._num_departed = []
         self._departed_ids = 0
@@ -251,12 +259,47 @@ class TraCIVehicle(KernelVehicle):
         # update the sumo observations variable
         self.__sumo_obs = vehicle_obs.copy()
 
+        # update the set of vehicles that need to be routed
+        self._update_routing_ids()
+
         # update the lane leaders data for each vehicle
-        self._multi_lane_headways()
+        with self.master_kernel.profiler.phase('update.multi_lane_headways'):
+            self._multi_lane_headways()
+
+        # update the number of vehicles and their speeds on every edge
+        with self.master_kernel.profiler.phase('update.edge_aggregates'):
+            self._update_edge_aggregates()
 
         # make sure the rl vehicle list is still sorted
         self.__rl_ids.sort()
 
+    def _update_routing_ids(self):
+        """Update the ids of vehicles whose routers should be queried.
+
+        The routing status of a vehicle is only recomputed when its current
+        edge or the final edge of its route changed since the last update.
+        """
+        for veh_id in self.__ids:
+            router = self.__vehicles[veh_id].get("router")
+            if router is None:
+                continue
+
+            obs = self.__sumo_obs.get(veh_id) or {}
+            edge = obs.get(tc.VAR_ROAD_ID, "")
+            route = obs.get(tc.VAR_EDGES, ())
+            key = (edge, route[-1] if len(route) > 0 else None)
+
+            # no edge-change event occurred for this vehicle
+            if self._routing_keys.get(veh_id) == key:
+                continue
+            self._routing_keys[veh_id] = key
+
+            if not router.final_edge_only or edge in router.trigger_edges \
+                    or edge == key[1]:
+                self._routing_ids[veh_id] = True
+            else:
+                self._routing_ids.pop(veh_id, None)
+
     def _add_departed(self, veh_id, veh_type):
         """Add a vehicle that entered the network from an inflow or reset.
         Parameters
@@ -300,6 +343,8 @@ class TraCIVehicle(KernelVehicle):
             lc_controller[0](veh_id=veh_id, **lc_controller[1])
 
         # specify the routing controller class
+        self._routing_keys.pop(veh_id, None)
+        self._routing_ids.pop(veh_id, None)
         rt_controller = self.type_parameters[veh_type]["routing_controller"]
         if rt_controller is not None:
             self.__vehicles[veh_id]["router"] = \
@@ -397,6 +442,9 @@ class TraCIVehicle(KernelVehicle):
         if veh_id in self.__sumo_obs:
             del self.__sumo_obs[veh_id]
 
+        self._routing_ids.pop(veh_id, None)
+        self._routing_keys.pop(veh_id, None)
+
         # remove it from all other id lists (if it is there)
         if veh_id in self.__human_ids:
             self.__human_ids.remove(veh_id)
@@ -413,6 +461,42 @@ class TraCIVehicle(KernelVehicle):
         self.num_vehicles = len(self.get_ids())
         self.num_rl_vehicles = len(self.get_rl_ids())
 
+    def remove_all(self, tracked=True):
+        """See parent class.
+
+        The vehicles in the network are removed from sumo in a single
+        traversal, after which the state of all removed vehicles is cleared
+        from the kernel at once (`remove` checks the presence of every vehicle
+        in sumo, which is quadratic in the number of vehicles).
+        """
+        removed = set()
+        for veh_id in self.kernel_api.vehicle.getIDList():
+            try:
+                self.kernel_api.vehicle.unsubscribe(veh_id)
+                self.kernel_api.vehicle.remove(veh_id)
+            except (FatalTraCIError, TraCIException):
+                print(traceback.format_exc())
+            else:
+                removed.add(veh_id)
+
+        if tracked:
+            removed.update(self.__ids)
+
+        # remove the vehicles from the vehicles kernel. The id lists are
+        # modified in place, as they are returned by the getters
+        for veh_id in removed:
+            self.__vehicles.pop(veh_id, None)
+            self.__sumo_obs.pop(veh_id, None)
+            self._routing_ids.pop(veh_id, None)
+            self._routing_keys.pop(veh_id, None)
+        for ids in (self.__ids, self.__human_ids, self.__controlled_ids,
+                    self.__controlled_lc_ids, self.__rl_ids):
+            ids[:] = [veh_id for veh_id in ids if veh_id not in removed]
+
+        # modify the number of vehicles and RL vehicles
+        self.num_vehicles = len(self.get_ids())
+        self.num_rl_vehicles = len(self.get_rl_ids())
+
     def test_set_speed(self, veh_id, speed):
         """Set the speed of the specified vehicle."""
         self.__sumo_obs[veh_id][tc.VAR_SPEED] = speed
@@ -483,6 +567,10 @@ class TraCIVehicle(KernelVehicle):
         """See parent class."""
         return self.__observed_ids
 
+    def get_routing_ids(self):
+        """See parent class."""
+        return list(self._routing_ids)
+
     def get_ids_by_edge(self, edges):
         """See parent class."""
         if isinstance(edges, (list, np.ndarray)):
@@ -996,10 +1084,13 @@ class TraCIVehicle(KernelVehicle):
             veh_ids = [veh_ids]
             route_choices = [route_choices]
 
-        for i, veh_id in enumerate(veh_ids):
-            if route_choices[i] is not None:
-                self.kernel_api.vehicle.setRoute(
-                    vehID=veh_id, edgeList=route_choices[i])
+        for veh_id, route in zip(veh_ids, route_choices):
+            # skip vehicles with no routing action, or whose route would not
+            # change, to avoid unnecessary calls to sumo
+            if route is None or \
+                    tuple(route) == tuple(self.get_route(veh_id)):
+                continue
+            self.kernel_api.vehicle.setRoute(vehID=veh_id, edgeList=route)
 
     def get_x_by_id(self, veh_id):
         """See parent class."""
@@ -1101,6 +1192,81 @@ class TraCIVehicle(KernelVehicle):
             departPos=str(pos),
             departSpeed=str(speed))
 
+    def add_many(self, veh_ids, type_ids, edges, pos, lanes, speeds):
+        """See parent class.
+
+        The routes of all vehicles are sampled at once (see _sample_routes).
+        Vehicles that could not be added, e.g. because they were not removed
+        from sumo, are removed and added again.
+        """
+        route_ids = self._sample_routes(veh_ids, edges)
+
+        failed = []
+        for i, veh_id in enumerate(veh_ids):
+            try:
+                self.kernel_api.vehicle.addFull(
+                    veh_id,
+                    route_ids[i],
+                    typeID=str(type_ids[i]),
+                    departLane=str(lanes[i]),
+                    departPos=str(pos[i]),
+                    departSpeed=str(speeds[i]))
+            except (FatalTraCIError, TraCIException):
+                failed.append(i)
+
+        # if a vehicle was not removed in the first attempt, remove it now and
+        # then reintroduce it
+        for i in failed:
+            self.remove(veh_ids[i])
+            self.kernel_api.vehicle.remove(veh_ids[i])
+            self.kernel_api.vehicle.addFull(
+                veh_ids[i],
+                route_ids[i],
+                typeID=str(type_ids[i]),
+                departLane=str(lanes[i]),
+                departPos=str(pos[i]),
+                departSpeed=str(speeds[i]))
+
+    def _sample_routes(self, veh_ids, edges):
+        """Sample the routes of vehicles starting on some edges.
+
+        Routes are chosen as in `add`: vehicles with their own route use it,
+        and the route of other vehicles is sampled among the routes of their
+        starting edge. The uniform samples of all vehicles are drawn at once,
+        and mapped to routes edge by edge, such that the chosen routes are
+        identical to the ones chosen by calling `add` for every vehicle.
+
+        Parameters
+        ----------
+        veh_ids : list of str
+            vehicle identifiers
+        edges : list of str
+            starting edges of the vehicles
+
+        Returns
+        -------
+        list of str
+            route identifier of every vehicle
+        """
+        rts = self.master_kernel.network.rts
+        route_ids = ['route{}_0'.format(veh_id) for veh_id in veh_ids]
+
+        sampled = [i for i, veh_id in enumerate(veh_ids) if veh_id not in rts]
+        samples = np.random.random_sample(len(sampled))
+
+        by_edge = collections.defaultdict(list)
+        for j, i in enumerate(sampled):
+            by_edge[edges[i]].append(j)
+
+        for edge, indices in by_edge.items():
+            cdf = np.cumsum([val[1] for val in rts[edge]], dtype=float)
+            cdf /= cdf[-1]
+            choices = cdf.searchsorted(samples[indices], side='right')
+            for j, choice in zip(indices, choices):
+                route_ids[sampled[j]] = 'route{}_{}'.format(edge, choice)
+
+        return route_ids
+
     def get_max_speed(self, veh_id, error=-1001):
         """See parent class."""
         if isinstance(veh_id, (list, np.ndarray)):
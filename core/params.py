@@ -414,6 +414,24 @@ class SimParams(object):
         specifies rendering resolution (pixel / meter)
     force_color_update : bool, optional
         whether or not to automatically color vehicles according to their types
+    render_backend : str, optional
+        renderer used by the "gray", "dgray", "rgb", and "drgb" rendering
+        modes
+
+        * "pyglet": OpenGL rendering through pyglet, which requires a display
+        * "numpy": headless, CPU-only rendering through numpy
+
+    profile : bool, optional
+        specifies whether to time the individual phases of every environment
+        step and count the calls issued to the simulator (see
+        flow/core/profiling.py). Collected statistics are available through
+        the ``profiler`` attribute of the kernel.
+    trace_api : bool, optional
+        specifies whether to record every call issued to the simulator by
+        command and call site, with its latency and the number of bytes
+        exchanged (see flow.core.profiling.TraCITracer). Only supported by
+        sumo. The report is available through the ``tracer`` attribute of
+        the kernel.
     """
 
     def __init__(self,
@@ -425,7 +443,10 @@ class SimParams(object):
                  sight_radius=25,
                  show_radius=False,
                  pxpm=2,
-                 force_color_update=False):
+                 force_color_update=False,
+                 profile=False,
+                 trace_api=False,
+                 render_backend="pyglet"):
         """Instantiate SimParams."""
         self.sim_step = sim_step
         self.render = render
@@ -436,6 +457,9 @@ class SimParams(object):
         self.pxpm = pxpm
         self.show_radius = show_radius
         self.force_color_update = force_color_update
+        self.profile = profile
+        self.trace_api = trace_api
+        self.render_backend = render_backend
 
 
 class AimsunParams(SimParams):
@@ -493,6 +517,9 @@ class AimsunParams(SimParams):
         Aimsun template containing a subnetwork in order to only load
         the objects contained in this subnetwork. If set to None or if the
         specified subnetwork does not exist, the whole network will be loaded.
+    profile : bool, optional
+        specifies whether to time the individual phases of every environment
+        step and count the calls issued to the simulator
     """
 
     def __init__(self,
@@ -511,11 +538,12 @@ class AimsunParams(SimParams):
                  # set to match Flow_Aimsun.ang's replication name
                  replication_name="Replication 870",
                  centroid_config_name=None,
-                 subnetwork_name=None):
+                 subnetwork_name=None,
+                 profile=False):
         """Instantiate AimsunParams."""
         super(AimsunParams, self).__init__(
             sim_step, render, restart_instance, emission_path, save_render,
-            sight_radius, show_radius, pxpm)
+            sight_radius, show_radius, pxpm, profile=profile)
         self.network_name = network_name
         self.experiment_name = experiment_name
         self.replication_name = replication_name
@@ -569,6 +597,9 @@ class SumoParams(SimParams):
         specifies rendering resolution (pixel / meter)
     force_color_update : bool, optional
         whether or not to automatically color vehicles according to their types
+    render_backend : str, optional
+        renderer used by the pixel-based rendering modes, one of "pyglet" or
+        "numpy" (headless)
     overtake_right : bool, optional
         whether vehicles are allowed to overtake on the right as well as
         the left
@@ -591,6 +622,18 @@ class SumoParams(SimParams):
         current time step
     use_ballistic: bool, optional
         If true, use a ballistic integration step instead of an euler step
+    profile : bool, optional
+        specifies whether to time the individual phases of every environment
+        step and count the calls issued to the simulator
+    trace_api : bool, optional
+        specifies whether to record every TraCI call by command and call
+        site, with its latency and the number of bytes exchanged
+    record_api : str, optional
+        path of a trace to which the responses of every TraCI call are
+        recorded (see flow/core/kernel/recording.py)
+    replay_api : str, optional
+        path of a trace recorded with ``record_api``. If specified, no sumo
+        instance is started, and the recorded responses are replayed instead
     """
 
     def __init__(self,
@@ -612,11 +655,18 @@ class SumoParams(SimParams):
                  teleport_time=-1,
                  num_clients=1,
                  color_by_speed=False,
-                 use_ballistic=False):
+                 use_ballistic=False,
+                 profile=False,
+                 trace_api=False,
+                 render_backend="pyglet",
+                 record_api=None,
+                 replay_api=None):
         """Instantiate SumoParams."""
         super(SumoParams, self).__init__(
             sim_step, render, restart_instance, emission_path, save_render,
-            sight_radius, show_radius, pxpm, force_color_update)
+            sight_radius, show_radius, pxpm, force_color_update,
+            profile=profile, trace_api=trace_api,
+            render_backend=render_backend)
         self.port = port
         self.lateral_resolution = lateral_resolution
         self.no_step_log = no_step_log
@@ -627,6 +677,8 @@ class SumoParams(SimParams):
         self.num_clients = num_clients
         self.color_by_speed = color_by_speed
         self.use_ballistic = use_ballistic
+        self.record_api = record_api
+        self.replay_api = replay_api
 
 
 class EnvParams:
@@ -709,18 +761,23 @@ class NetParams:
     additional_params : dict, optional
         network specific parameters; see each subclass for a description of
         what is needed
+    demand : ODMatrix type, optional
+        specifies the trips between pairs of edges of the network, whose
+        routes are assigned when the network is generated (sumo only)
     """
 
     def __init__(self,
                  inflows=None,
                  osm_path=None,
                  template=None,
-                 additional_params=None):
+                 additional_params=None,
+                 demand=None):
         """Instantiate NetParams."""
         self.inflows = inflows or InFlows()
         self.osm_path = osm_path
         self.template = template
         self.additional_params = additional_params or {}
+        self.demand = demand
 
 
 class InitialConfig:
@@ -1286,3 +1343,140 @@ class InFlows:
     def get(self):
         """Return the inflows of each edge."""
         return self.__flows
+
+
+class ODMatrix:
+    """Used to add origin-destination demand to a network.
+
+    Every entry of the matrix specifies a number of trips between two edges,
+    which are distributed over time according to a common time profile. The
+    routes of the trips are assigned from the edge graph of the network, and
+    the trips are emitted as flows when the network is generated (see
+    flow.core.kernel.network.demand.DemandGenerator). This is only supported
+    by sumo.
+
+    Usage
+    -----
+    >>> from flow.core.params import ODMatrix, NetParams
+    >>> demand = ODMatrix(profile=[0.2, 0.5, 0.3], interval=1200)
+    >>> demand.add_matrix(
+    ...     origins=['a', 'b'], destinations=['c', 'd'],
+    ...     trips=[[100, 50], [20, 0]], veh_type='human')
+    >>> net_params = NetParams(demand=demand)
+    """
+
+    def __init__(self,
+                 profile=None,
+                 interval=3600,
+                 begin=1,
+                 num_routes=1,
+                 logit_scale=60):
+        """Instantiate ODMatrix.
+
+        Parameters
+        ----------
+        profile : list of float, optional
+            relative share of the trips departing in every time interval.
+            Defaults to a single interval.
+        interval : float, optional
+            duration of every time interval of the profile (in seconds).
+            Defaults to one hour
+        begin : float, optional
+            start of the first time interval (in seconds, minimum 1 second).
+            Defaults to 1 second
+        num_routes : int, optional
+            number of alternative routes assigned to every origin-destination
+            pair. If greater than 1, the trips of a pair are split among its
+            k fastest routes with a logit model. Defaults to 1, in which case
+            all trips follow the fastest route
+        logit_scale : float, optional
+            difference in travel time (in seconds) with the fastest route for
+            which a route is chosen e times less often. Only used if
+            num_routes is greater than 1. Defaults to 60 seconds
+        """
+        if begin < 1:
+            raise ValueError(
+                "ODMatrix called with parameter 'begin' set to {}, but begin "
+                "should be greater or equal than 1 second.".format(begin))
+
+        self.profile = list(profile) if profile is not None else [1]
+        self.interval = interval
+        self.begin = begin
+        self.num_routes = num_routes
+        self.logit_scale = logit_scale
+        self.__entries = []
+
+    def add(self,
+            origin,
+            destination,
+            veh_type,
+            trips,
+            depart_lane="best",
+            depart_speed=0,
+            name="od",
+            **kwargs):
+        r"""Specify the trips of a given type of vehicles between two edges.
+
+        Parameters
+        ----------
+        origin : str
+            starting edge of the trips
+        destination : str
+            final edge of the trips
+        veh_type : str
+            type of the vehicles performing the trips. Must match one of the
+            types set in the Vehicles class
+        trips : float
+            total number of trips over all time intervals. The number of trips
+            of every interval is rounded such that the total is preserved
+        depart_lane : int or str, optional
+            the lane on which the vehicles shall be inserted (see
+            InFlows.add). Defaults to "best"
+        depart_speed : float or str, optional
+            the speed with which the vehicles shall enter the network (see
+            InFlows.add). Defaults to 0
+        name : str, optional
+            prefix for the id of the vehicles performing the trips. Defaults
+            to "od"
+        kwargs : dict, optional
+            other sumo flow parameters, see InFlows.add
+        """
+        entry = {
+            "name": "%s_%d" % (name, len(self.__entries)),
+            "origin": origin,
+            "destination": destination,
+            "vtype": veh_type,
+            "trips": trips,
+            "departLane": depart_lane,
+            "departSpeed": depart_speed
+        }
+        entry.update(kwargs)
+
+        self.__entries.append(entry)
+
+    def add_matrix(self, origins, destinations, trips, veh_type, **kwargs):
+        """Specify the trips of a given type of vehicles between sets of edges.
+
+        Parameters
+        ----------
+        origins : list of str
+            starting edges, corresponding to the rows of the matrix
+        destinations : list of str
+            final edges, corresponding to the columns of the matrix
+        trips : array_like
+            number of trips from every origin (row) to every destination
+            (column). Pairs without trips are skipped
+        veh_type : str
+            type of the vehicles performing the trips
+        kwargs : dict, optional
+            other parameters of every entry, see add
+        """
+        for i, origin in enumerate(origins):
+            for j, destination in enumerate(destinations):
+                if trips[i][j] > 0:
+                    self.add(origin, destination, veh_type, trips[i][j],
+                             **kwargs)
+
+    def get(self):
+        """Return the entries of the matrix."""
+        return self.__entries
@@ -0,0 +1,701 @@
+"""Utilities for profiling the phases of a simulation step.
+
+Profiling is enabled by setting ``profile=True`` in SimParams. When enabled,
+the kernel holds a StepProfiler, which the environment and kernel subclasses
+use to time each phase of ``Env.step`` (controllers, routing, simulation
+step, kernel updates, observations, rewards, ...) and count the number of
+calls issued to the simulator per step. When disabled, the kernel holds a
+NullProfiler, whose methods perform no work.
+
+A more detailed record of the calls issued to sumo, broken down by command
+and call site, is collected by the TraCITracer when ``trace_api=True`` is set
+in SimParams.
+
+    >>> from flow.core.params import SumoParams
+    >>> sim_params = SumoParams(profile=True)
+    >>> env = Env(..., sim_params=sim_params)
+    >>> ...  # perform some steps
+    >>> env.k.profiler.to_json("profile.json")
+    >>> env.k.profiler.to_csv("profile.csv")
+"""
+
+import contextlib
+import csv
+import json
+import math
+import sys
+import time
+
+# methods of the TraCI domains that read locally cached data, and therefore
+# do not result in a call to the simulator
+LOCAL_METHODS = ('getSubscriptionResults', 'getAllSubscriptionResults',
+                 'getContextSubscriptionResults',
+                 'getAllContextSubscriptionResults')
+
+
+class Histogram(object):
+    """Log-binned histogram of non-negative samples.
+
+    Samples are assigned to logarithmically spaced bins, so that durations
+    spanning several orders of magnitude (microseconds to seconds) can be
+    aggregated in constant memory.
+
+    Attributes
+    ----------
+    count : int
+        number of samples
+    total : float
+        sum of all samples
+    min : float
+        smallest sample
+    max : float
+        largest sample
+    """
+
+    def __init__(self, bins_per_decade=10, min_value=1e-7):
+        """Instantiate an empty histogram.
+
+        Parameters
+        ----------
+        bins_per_decade : int, optional
+            number of bins per power of ten
+        min_value : float, optional
+            lower edge of the first bin. Smaller samples are added to the
+            first bin.
+        """
+        self.bins_per_decade = bins_per_decade
+        self.min_value = min_value
+        self.bins = dict()
+        self.count = 0
+        self.total = 0.
+        self.min = float('inf')
+        self.max = 0.
+
+    def add(self, value):
+        """Add a sample to the histogram."""
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+        if value <= self.min_value:
+            index = 0
+        else:
+            index = int(math.log10(value / self.min_value) *
+                        self.bins_per_decade)
+        self.bins[index] = self.bins.get(index, 0) + 1
+
+    def bin_edges(self, index):
+        """Return the lower and upper edges of a bin."""
+        return (self.min_value * 10 ** (index / self.bins_per_decade),
+                self.min_value * 10 ** ((index + 1) / self.bins_per_decade))
+
+    @property
+    def mean(self):
+        """Return the mean of all samples."""
+        return self.total / self.count if self.count > 0 else 0.
+
+    def percentile(self, q):
+        """Return an approximation of the q-th percentile of the samples.
+
+        The upper edge of the bin containing the percentile is returned.
+
+        Parameters
+        ----------
+        q : float
+            percentile, between 0 and 100
+        """
+        if self.count == 0:
+            return 0.
+        target = q / 100 * self.count
+        cumulative = 0
+        for index in sorted(self.bins):
+            cumulative += self.bins[index]
+            if cumulative >= target:
+                return min(self.bin_edges(index)[1], self.max)
+        return self.max
+
+    def to_dict(self):
+        """Return a serializable summary of the histogram."""
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.mean,
+            'min': self.min if self.count > 0 else 0.,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'bins': [[*self.bin_edges(index), self.bins[index]]
+                     for index in sorted(self.bins)],
+        }
+
+
+class _Phase(object):
+    """Context manager timing a single named phase."""
+
+    __slots__ = ('histogram', 't0')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.t0 = 0.
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.histogram.add(time.perf_counter() - self.t0)
+        return False
+
+
+class StepProfiler(object):
+    """Collect timing information on the phases of simulation steps.
+
+    Phases are timed with a monotonic clock using the ``phase`` context
+    manager, and aggregated into one histogram per phase. In addition, the
+    number of calls issued to the simulator in every step is aggregated into
+    the "simulator_calls" histogram.
+
+    Attributes
+    ----------
+    enabled : bool
+        True for this class
+    phases : dict < str, Histogram >
+        durations of every phase, in seconds
+    num_steps : int
+        number of steps completed since the profiler was created or reset
+    """
+
+    enabled = True
+
+    def __init__(self):
+        """Instantiate an empty profiler."""
+        self.phases = dict()
+        self._contexts = dict()
+        self.call_counts = Histogram(bins_per_decade=10, min_value=1)
+        self.num_steps = 0
+        self._step_calls = 0
+        self._step_start = None
+
+    def phase(self, name):
+        """Return a context manager timing the phase with the given name."""
+        try:
+            return self._contexts[name]
+        except KeyError:
+            self.phases[name] = Histogram()
+            self._contexts[name] = _Phase(self.phases[name])
+            return self._contexts[name]
+
+    def record(self, name, duration):
+        """Add a duration (in seconds) to the histogram of a phase."""
+        if name not in self.phases:
+            self.phase(name)
+        self.phases[name].add(duration)
+
+    def count_call(self, num_calls=1):
+        """Count calls issued to the simulator during the current step."""
+        self._step_calls += num_calls
+
+    def begin_step(self):
+        """Mark the start of an environment step."""
+        self._step_start = time.perf_counter()
+        self._step_calls = 0
+
+    def end_step(self):
+        """Mark the end of an environment step.
+
+        This records the duration of the step under the "step" phase, and the
+        number of simulator calls issued during the step.
+        """
+        if self._step_start is not None:
+            self.record('step', time.perf_counter() - self._step_start)
+        self.call_counts.add(self._step_calls)
+        self.num_steps += 1
+        self._step_start = None
+        self._step_calls = 0
+
+    def reset(self):
+        """Clear all collected data."""
+        self.__init__()
+
+    def summary(self):
+        """Return a serializable summary of the collected data.
+
+        Returns
+        -------
+        dict
+            * num_steps: number of profiled steps
+            * phases: summary of the duration histogram of every phase
+            * simulator_calls: summary of the per-step call histogram
+        """
+        return {
+            'num_steps': self.num_steps,
+            'phases': {name: hist.to_dict()
+                       for name, hist in sorted(self.phases.items())},
+            'simulator_calls': self.call_counts.to_dict(),
+        }
+
+    def to_json(self, path):
+        """Export the summary of the collected data to a json file."""
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def to_csv(self, path):
+        """Export per-phase statistics to a csv file.
+
+        Every row corresponds to a phase, with the per-step simulator calls
+        stored under the "simulator_calls" row.
+        """
+        keys = ['count', 'total', 'mean', 'min', 'max', 'p50', 'p90', 'p99']
+        rows = [(name, hist) for name, hist in sorted(self.phases.items())]
+        rows.append(('simulator_calls', self.call_counts))
+
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['phase'] + keys)
+            for name, hist in rows:
+                data = hist.to_dict()
+                writer.writerow([name] + [data[key] for key in keys])
+
+
+class NullProfiler(object):
+    """Profiler used when profiling is disabled.
+
+    All methods return immediately, so that instrumented code paths incur no
+    measurable overhead.
+    """
+
+    enabled = False
+
+    _null_context = contextlib.nullcontext()
+
+    def phase(self, name):
+        """See StepProfiler."""
+        return self._null_context
+
+    def record(self, name, duration):
+        """See StepProfiler."""
+        pass
+
+    def count_call(self, num_calls=1):
+        """See StepProfiler."""
+        pass
+
+    def begin_step(self):
+        """See StepProfiler."""
+        pass
+
+    def end_step(self):
+        """See StepProfiler."""
+        pass
+
+    def reset(self):
+        """See StepProfiler."""
+        pass
+
+
+class _CountingDomain(object):
+    """Proxy around a TraCI domain, counting calls issued to the simulator."""
+
+    def __init__(self, domain, profiler):
+        self._domain = domain
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        attr = getattr(self._domain, name)
+        if not callable(attr) or name in LOCAL_METHODS:
+            return attr
+
+        profiler = self._profiler
+
+        def counted(*args, **kwargs):
+            profiler.count_call()
+            return attr(*args, **kwargs)
+
+        # cache the wrapper so that later lookups skip __getattr__
+        setattr(self, name, counted)
+        return counted
+
+
+class CountingAPI(object):
+    """Proxy around a TraCI connection, counting calls issued to sumo.
+
+    Every domain of the connection (vehicle, simulation, trafficlight, ...)
+    is wrapped so that each command sent to the simulator increments the
+    profiler's per-step call counter. Methods that read locally cached
+    subscription results are not counted.
+    """
+
+    def __init__(self, kernel_api, profiler):
+        """Instantiate the proxy.
+
+        Parameters
+        ----------
+        kernel_api : traci.connection.Connection
+            the connection to wrap
+        profiler : StepProfiler
+            the profiler collecting the call counts
+        """
+        self._kernel_api = kernel_api
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        attr = getattr(self._kernel_api, name)
+
+        if callable(attr):
+            profiler = self._profiler
+
+            def counted(*args, **kwargs):
+                profiler.count_call()
+                return attr(*args, **kwargs)
+
+            wrapped = counted
+        else:
+            wrapped = _CountingDomain(attr, self._profiler)
+
+        # cache the wrapper so that later lookups skip __getattr__
+        setattr(self, name, wrapped)
+        return wrapped
+
+
+class _CountingSocket(object):
+    """Proxy around a socket, counting the bytes sent and received."""
+
+    def __init__(self, sock, tracer):
+        self._sock = sock
+        self._tracer = tracer
+
+    def send(self, data, *args):
+        num_bytes = self._sock.send(data, *args)
+        self._tracer.num_bytes += num_bytes
+        return num_bytes
+
+    def sendall(self, data, *args):
+        self._tracer.num_bytes += len(data)
+        return self._sock.sendall(data, *args)
+
+    def recv(self, bufsize, *args):
+        data = self._sock.recv(bufsize, *args)
+        self._tracer.num_bytes += len(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+class _TracedDomain(object):
+    """Proxy around a TraCI domain, recording every call with the tracer."""
+
+    def __init__(self, domain, domain_name, tracer):
+        self._domain = domain
+        self._domain_name = domain_name
+        self._tracer = tracer
+
+    def __getattr__(self, name):
+        attr = getattr(self._domain, name)
+        if not callable(attr) or name in LOCAL_METHODS:
+            return attr
+
+        traced = self._tracer.trace(attr, self._domain_name, name)
+
+        # cache the wrapper so that later lookups skip __getattr__
+        setattr(self, name, traced)
+        return traced
+
+
+class _TracedAPI(object):
+    """Proxy around a TraCI connection, recording every call with a tracer."""
+
+    def __init__(self, kernel_api, tracer):
+        self._kernel_api = kernel_api
+        self._tracer = tracer
+
+    def __getattr__(self, name):
+        attr = getattr(self._kernel_api, name)
+
+        if callable(attr):
+            wrapped = self._tracer.trace(attr, 'connection', name)
+        else:
+            wrapped = _TracedDomain(attr, name, self._tracer)
+
+        # cache the wrapper so that later lookups skip __getattr__
+        setattr(self, name, wrapped)
+        return wrapped
+
+
+class TraCITracer(object):
+    """Record the calls issued to sumo through a TraCI connection.
+
+    Every command is recorded by domain and method (e.g. "vehicle.getSpeed"),
+    and by call site (the file, line, and function issuing the command), with
+    its call count, number of bytes exchanged over the socket, and cumulative
+    latency. Totals are additionally aggregated per environment step and per
+    episode. The resulting report ranks the most expensive commands and call
+    sites, which are the primary candidates for subscriptions or batching.
+
+    Tracing is enabled by setting ``trace_api=True`` in SimParams, in which
+    case the kernel's ``tracer`` attribute holds an instance of this class.
+
+        >>> env = Env(..., sim_params=SumoParams(trace_api=True))
+        >>> ...  # perform some steps
+        >>> print(env.k.tracer.report())
+        >>> env.k.tracer.to_json("traci_trace.json")
+
+    Attributes
+    ----------
+    commands : dict < str, list >
+        Key = "domain.method", Element = [count, bytes, latency]
+    call_sites : dict < str, list >
+        Key = "file:line (function) domain.method",
+        Element = [count, bytes, latency]
+    step_calls : Histogram
+        number of calls issued per environment step
+    step_latency : Histogram
+        cumulative latency of the calls issued per environment step, in
+        seconds
+    reset_calls : list
+        count, bytes, and latency of the calls issued while constructing and
+        resetting the environment, which are excluded from the per-step
+        statistics
+    episodes : list of dict
+        count, bytes, latency, and number of steps of every completed episode
+    num_bytes : int
+        total number of bytes exchanged with the simulator
+    """
+
+    def __init__(self, profiler=None, track_call_sites=True):
+        """Instantiate the tracer.
+
+        Parameters
+        ----------
+        profiler : StepProfiler or NullProfiler, optional
+            profiler whose per-step call counter is incremented with every
+            recorded call
+        track_call_sites : bool, optional
+            specifies whether to record the call site of every command. This
+            requires inspecting the calling frame, and may be disabled to
+            reduce the overhead of tracing.
+        """
+        self.profiler = profiler or NullProfiler()
+        self.track_call_sites = track_call_sites
+        self.commands = dict()
+        self.call_sites = dict()
+        self._step = [0, 0, 0.]
+        self.reset()
+
+    def reset(self):
+        """Clear all recorded data."""
+        # the command statistics and the per-step totals are shared with the
+        # wrappers of previously wrapped connections, so they are cleared in
+        # place
+        for stats in self.commands.values():
+            stats[:] = [0, 0, 0.]
+        self.call_sites.clear()
+        self._step[:] = [0, 0, 0.]
+        self.step_calls = Histogram(bins_per_decade=10, min_value=1)
+        self.step_latency = Histogram()
+        self.reset_calls = [0, 0, 0.]
+        self.episodes = []
+        self.num_bytes = 0
+        self._episode = [0, 0, 0., 0]
+
+    def wrap(self, kernel_api):
+        """Return a proxy of a TraCI connection recording its calls.
+
+        Parameters
+        ----------
+        kernel_api : traci.connection.Connection
+            the connection to wrap
+
+        Returns
+        -------
+        object
+            a proxy exposing the same domains and methods as the connection
+        """
+        # count the bytes exchanged over the socket of the connection, if any
+        sock = getattr(kernel_api, '_socket', None)
+        if sock is not None and not isinstance(sock, _CountingSocket):
+            kernel_api._socket = _CountingSocket(sock, self)
+
+        return _TracedAPI(kernel_api, self)
+
+    def trace(self, func, domain_name, method_name):
+        """Return a wrapper of func recording its calls with the tracer."""
+        key = '{}.{}'.format(domain_name, method_name)
+        stats = self.commands.setdefault(key, [0, 0, 0.])
+        step = self._step
+        call_sites = self.call_sites
+        tracer = self
+        perf_counter = time.perf_counter
+
+        def traced(*args, **kwargs):
+            t0 = perf_counter()
+            b0 = tracer.num_bytes
+            try:
+                return func(*args, **kwargs)
+            finally:
+                latency = perf_counter() - t0
+                num_bytes = tracer.num_bytes - b0
+                stats[0] += 1
+                stats[1] += num_bytes
+                stats[2] += latency
+                step[0] += 1
+                step[1] += num_bytes
+                step[2] += latency
+                tracer.profiler.count_call()
+
+                if tracer.track_call_sites:
+                    frame = sys._getframe(1)
+                    code = frame.f_code
+                    site = '{}:{} ({}) {}'.format(
+                        code.co_filename, frame.f_lineno, code.co_name, key)
+                    site_stats = call_sites.get(site)
+                    if site_stats is None:
+                        site_stats = call_sites[site] = [0, 0, 0.]
+                    site_stats[0] += 1
+                    site_stats[1] += num_bytes
+                    site_stats[2] += latency
+
+        return traced
+
+    def end_step(self):
+        """Mark the end of an environment step."""
+        count, num_bytes, latency = self._step
+        self.step_calls.add(count)
+        self.step_latency.add(latency)
+        self._episode[0] += count
+        self._episode[1] += num_bytes
+        self._episode[2] += latency
+        self._episode[3] += 1
+        # the step list is shared with the wrappers, so it is reset in place
+        self._step[:] = [0, 0, 0.]
+
+    def end_reset(self):
+        """Mark the end of an environment reset.
+
+        The calls issued since the last step (i.e. while constructing or
+        resetting the environment) are recorded in ``reset_calls`` and in the
+        totals of the episode the reset starts, but not in the per-step
+        statistics. This is called before the warm-up steps of the reset, if
+        any, and once more at the end of the reset.
+        """
+        count, num_bytes, latency = self._step
+        self.reset_calls[0] += count
+        self.reset_calls[1] += num_bytes
+        self.reset_calls[2] += latency
+        self._episode[0] += count
+        self._episode[1] += num_bytes
+        self._episode[2] += latency
+        self._step[:] = [0, 0, 0.]
+
+    def end_episode(self):
+        """Mark the end of an episode.
+
+        This is called at the start of every reset. Calls issued after the
+        last step of an episode and before the next reset are attributed to
+        the episode they follow. Nothing is recorded if no step was performed
+        since the last reset, such that constructing the environment and
+        resetting it several times in a row does not produce empty episodes.
+        """
+        if self._episode[3] == 0:
+            return
+
+        count, num_bytes, latency = self._step
+        self._episode[0] += count
+        self._episode[1] += num_bytes
+        self._episode[2] += latency
+        self._step[:] = [0, 0, 0.]
+
+        self.episodes.append({
+            'calls': self._episode[0],
+            'bytes': self._episode[1],
+            'latency': self._episode[2],
+            'steps': self._episode[3],
+        })
+        self._episode = [0, 0, 0., 0]
+
+    @staticmethod
+    def _ranked(table, top):
+        """Return the entries of a table sorted by decreasing latency."""
+        ranked = sorted(table.items(), key=lambda item: -item[1][2])
+        if top is not None:
+            ranked = ranked[:top]
+        return [{'name': name, 'calls': count, 'bytes': num_bytes,
+                 'latency': latency}
+                for name, (count, num_bytes, latency) in ranked]
+
+    def summary(self, top=None):
+        """Return a serializable summary of the recorded data.
+
+        Parameters
+        ----------
+        top : int, optional
+            number of commands and call sites to include. All are included if
+            not specified.
+
+        Returns
+        -------
+        dict
+            * commands: commands sorted by decreasing cumulative latency
+            * call_sites: call sites sorted by decreasing cumulative latency
+            * per_step: histograms of the per-step call count and latency
+            * reset: totals of the calls issued by environment resets
+            * episodes: totals of every completed episode
+        """
+        return {
+            'commands': self._ranked(self.commands, top),
+            'call_sites': self._ranked(self.call_sites, top),
+            'per_step': {
+                'calls': self.step_calls.to_dict(),
+                'latency': self.step_latency.to_dict(),
+            },
+            'reset': dict(zip(('calls', 'bytes', 'latency'),
+                              self.reset_calls)),
+            'episodes': list(self.episodes),
+        }
+
+    def report(self, top=20):
+        """Return a human-readable report of the most expensive calls.
+
+        Parameters
+        ----------
+        top : int, optional
+            number of commands and call sites to list
+
+        Returns
+        -------
+        str
+            the report
+        """
+        total = sum(stats[2] for stats in self.commands.values())
+        lines = [
+            'TraCI calls per step: mean {:.1f}, p99 {:.0f}'.format(
+                self.step_calls.mean, self.step_calls.percentile(99)),
+            'TraCI latency per step: mean {:.3f} ms, p99 {:.3f} ms'.format(
+                1e3 * self.step_latency.mean,
+                1e3 * self.step_latency.percentile(99)),
+            'TraCI calls in resets: {}, latency {:.3f} s'.format(
+                self.reset_calls[0], self.reset_calls[2]),
+        ]
+
+        for title, table in (('commands', self.commands),
+                             ('call sites', self.call_sites)):
+            lines.append('')
+            lines.append('Most expensive {}:'.format(title))
+            lines.append('{:>10} {:>12} {:>12} {:>7}  {}'.format(
+                'calls', 'bytes', 'latency (s)', 'share', 'name'))
+            for entry in self._ranked(table, top):
+                share = entry['latency'] / total if total > 0 else 0.
+                lines.append('{:>10} {:>12} {:>12.4f} {:>6.1%}  {}'.format(
+                    entry['calls'], entry['bytes'], entry['latency'], share,
+                    entry['name']))
+
+        return '\n'.join(lines)
+
+    def to_json(self, path, top=None):
+        """Export the summary of the recorded data to a json file."""
+        with open(path, 'w') as f:
+            json.dump(self.summary(top), f, indent=2)
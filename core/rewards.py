@@ -35,15 +35,25 @@ def desired_velocity(env, fail=False, edge_list=None):
     float
         reward value
     """
+    if fail:
+        return 0.
+
     if edge_list is None:
-        veh_ids = env.k.vehicle.get_ids()
-    else:
-        veh_ids = env.k.vehicle.get_ids_by_edge(edge_list)
+        # the system-level reward is shared by all callers of a step
+        return env.k.cache.get(
+            ('desired_velocity', env.env_params.additional_params.get(
+                'target_velocity')),
+            _desired_velocity, env, env.k.cache.speeds())
+
+    veh_ids = env.k.vehicle.get_ids_by_edge(edge_list)
+    return _desired_velocity(env, np.array(env.k.vehicle.get_speed(veh_ids)))
 
-    vel = np.array(env.k.vehicle.get_speed(veh_ids))
-    num_vehicles = len(veh_ids)
 
-    if any(vel < -100) or fail or num_vehicles == 0:
+def _desired_velocity(env, vel):
+    """Compute the desired velocity reward from the speeds of vehicles."""
+    num_vehicles = len(vel)
+
+    if any(vel < -100) or num_vehicles == 0:
         return 0.
 
     target_vel = env.env_params.additional_params['target_velocity']
@@ -78,14 +88,11 @@ def average_velocity(env, fail=False):
     float
         reward value
     """
-    vel = np.array(env.k.vehicle.get_speed(env.k.vehicle.get_ids()))
-
-    if any(vel < -100) or fail:
-        return 0.
-    if len(vel) == 0:
+    if fail:
         return 0.
 
-    return np.mean(vel)
+    # the average speed is computed once per step, and shared by all callers
+    return env.k.cache.mean_speed()
 
 
 def rl_forward_progress(env, gain=0.1):
@@ -163,11 +170,10 @@ def avg_delay_specified_vehicles(env, veh_ids):
     float
         average delay
     """
-    sum = 0
-    for edge in env.k.network.get_edge_list():
-        for veh_id in env.k.vehicle.get_ids_by_edge(edge):
-            v_top = env.k.network.speed_limit(edge)
-            sum += (v_top - env.k.vehicle.get_speed(veh_id)) / v_top
+    edge_list = env.k.network.get_edge_list()
+    v_top = np.array([env.k.network.speed_limit(edge) for edge in edge_list])
+    sum = np.sum((v_top * env.k.vehicle.get_num_vehicles_by_edge(edge_list) -
+                  env.k.vehicle.get_speed_sum_by_edge(edge_list)) / v_top)
     time_step = env.sim_step
     try:
         cost = time_step * sum
@@ -2,6 +2,7 @@
 
 import csv
 import errno
+import json
 import os
 from lxml import etree
 from xml.etree import ElementTree
@@ -32,6 +33,63 @@ def ensure_dir(path):
     return path
 
 
+def edge_starts_path(emission_path):
+    """Return the path of the edge starts file stored with an emission file.
+
+    The edge starts file is a json file mapping the name of every edge
+    (including internal edges) to its starting position in the network, and
+    is used to compute the absolute positions of vehicles when processing the
+    emission file (see flow/visualize/time_space_diagram.py).
+
+    Parameters
+    ----------
+    emission_path : str
+        path to the emission file
+
+    Returns
+    -------
+    str
+        path to the edge starts file
+    """
+    return os.path.splitext(emission_path)[0] + '_edgestarts.json'
+
+
+def save_edge_starts(emission_path, edge_starts):
+    """Store the edge starts of a network next to an emission file.
+
+    Parameters
+    ----------
+    emission_path : str
+        path to the emission file
+    edge_starts : dict < str, float >
+        starting position of every edge, e.g. the ``total_edgestarts_dict``
+        attribute of the network kernel
+    """
+    with open(edge_starts_path(emission_path), 'w') as f:
+        json.dump(dict(edge_starts), f)
+
+
+def load_edge_starts(emission_path):
+    """Load the edge starts stored next to an emission file.
+
+    Parameters
+    ----------
+    emission_path : str
+        path to the emission file
+
+    Returns
+    -------
+    dict < str, float > or None
+        starting position of every edge, or None if no edge starts file was
+        stored with the emission file
+    """
+    path = edge_starts_path(emission_path)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
 def emission_to_csv(emission_path, output_path=None):
     """Convert an emission file generated by sumo into a csv file.
 
@@ -20,11 +20,10 @@ def avg_delay_specified_vehicles(env, veh_ids):
     float
         average delay
     """
-    sum = 0
-    for edge in env.k.network.get_edge_list():
-        for veh_id in env.k.vehicle.get_ids_by_edge(edge):
-            v_top = env.k.network.speed_limit(edge)
-            sum += (v_top - env.k.vehicle.get_speed(veh_id)) / v_top
+    edge_list = env.k.network.get_edge_list()
+    v_top = np.array([env.k.network.speed_limit(edge) for edge in edge_list])
+    sum = np.sum((v_top * env.k.vehicle.get_num_vehicles_by_edge(edge_list) -
+                  env.k.vehicle.get_speed_sum_by_edge(edge_list)) / v_top)
     time_step = env.sim_step
     try:
         cost = time_step * sum
@@ -145,28 +144,20 @@ class RouterEnv(Env):
                 sampled_action=2
             veh_edge = self.k.vehicle.get_edge(veh_id)
             veh_route = self.k.vehicle.get_route(veh_id)
-            veh_next_edge = self.k.network.next_edge(veh_edge,
-                                                    self.k.vehicle.get_lane(veh_id))
-            not_an_edge = ":"
-            no_next = 0
+            # non-internal edges reachable from the current edge/lane pair
+            successors = self.k.network.routing_table.successor_edges(
+                veh_edge, self.k.vehicle.get_lane(veh_id))
 
-            if len(veh_next_edge) == no_next:
+            if len(successors) == 0:
                 next_route = None
             elif veh_route[-1] == veh_edge:
-                if len(veh_next_edge)==3:
-                    veh_action=sampled_action
-                elif len(veh_next_edge)==2:
-                    if sampled_action==2:
-                        veh_action=0
-                    else:
-                        veh_action=sampled_action
-                elif len(veh_next_edge)==1:
-                    veh_action=0
-                while veh_next_edge[0][0][0] == not_an_edge:
-                    veh_next_edge = self.k.network.next_edge(
-                    veh_next_edge[veh_action][0],
-                    veh_next_edge[veh_action][1])
-                next_route = [veh_edge, veh_next_edge[0][0]]
+                # actions beyond the number of available successors default
+                # to the first successor
+                if sampled_action < len(successors):
+                    veh_action = sampled_action
+                else:
+                    veh_action = 0
+                next_route = [veh_edge, successors[veh_action]]
             else:
                 next_route = None
             self.k.vehicle.choose_routes(veh_id, next_route)
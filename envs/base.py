@@ -10,7 +10,9 @@ import numpy as np
 import random
 import shutil
 import subprocess
-from flow.renderer.pyglet_renderer import PygletRenderer as Renderer
+from flow.renderer.pyglet_renderer import PygletRenderer
+from flow.renderer.numpy_renderer import NumpyRenderer
+from flow.renderer.ring_buffer import RingBuffer
 from flow.utils.flow_warnings import deprecated_attribute
 
 import gym
@@ -26,6 +28,10 @@ from flow.core.util import ensure_dir
 from flow.core.kernel import Kernel
 from flow.utils.exceptions import FatalFlowError
 
+# multiplier of the playback speed of saved renderings: `RENDER_SPEEDUP`
+# seconds of simulation are rendered in 1 second of video
+RENDER_SPEEDUP = 10
+
 
 class Env(gym.Env, metaclass=ABCMeta):
     """Base environment class.
@@ -94,7 +100,7 @@ class Env(gym.Env, metaclass=ABCMeta):
         the available_routes variable contains a dictionary of routes vehicles
         can traverse; to be used when routes need to be chosen dynamically.
         Equivalent to `network.rts`.
-    renderer : flow.renderer.pyglet_renderer.PygletRenderer or None
+    renderer : flow.renderer.PygletRenderer or NumpyRenderer or None
         renderer class, used to collect image-based representations of the
         traffic network. This attribute is set to None if `sim_params.render`
         is set to True or False.
@@ -191,6 +197,10 @@ class Env(gym.Env, metaclass=ABCMeta):
         self.k.vehicle.kernel_api = self.k.kernel_api
         self.k.vehicle.master_kernel = self.k
 
+        # inflows loaded in the simulation upon the next reset, if any (see
+        # set_inflows)
+        self._next_inflows = None
+
         self.setup_initial_state()
 
         # use pyglet to render the simulation
@@ -208,14 +218,24 @@ class Env(gym.Env, metaclass=ABCMeta):
                 lane_poly = [i for pt in _lane_poly for i in pt]
                 network.append(lane_poly)
 
-            # instantiate a pyglet renderer
+            # instantiate a pyglet renderer, or a headless numpy renderer
+            render_backend = getattr(
+                self.sim_params, 'render_backend', 'pyglet')
+            if render_backend == 'pyglet':
+                Renderer = PygletRenderer
+            elif render_backend == 'numpy':
+                Renderer = NumpyRenderer
+            else:
+                raise FatalFlowError(
+                    'Render backend %s is not supported!' % render_backend)
             self.renderer = Renderer(
                 network,
                 self.sim_params.render,
                 save_render,
                 sight_radius=sight_radius,
                 pxpm=pxpm,
-                show_radius=show_radius)
+                show_radius=show_radius,
+                fps=RENDER_SPEEDUP / self.sim_step)
 
             # render a frame
             self.render(reset=True)
@@ -248,7 +268,8 @@ class Env(gym.Env, metaclass=ABCMeta):
         self.k.close()
 
         # killed the sumo process if using sumo/TraCI
-        if self.simulator == 'traci':
+        if self.simulator == 'traci' and \
+                self.k.simulation.sumo_proc is not None:
             self.k.simulation.sumo_proc.kill()
 
         if render is not None:
@@ -266,6 +287,61 @@ class Env(gym.Env, metaclass=ABCMeta):
 
         self.setup_initial_state()
 
+    def set_inflows(self, inflows, vehicles=None):
+        """Replace the inflows of the network from the next reset on.
+
+        This is used to change the demand between rollouts, e.g. to train
+        policies that are robust to the inflow rate, without rebuilding the
+        network (see reload_simulation).
+
+        Parameters
+        ----------
+        inflows : flow.core.params.InFlows
+            the new inflows of the network
+        vehicles : flow.core.params.VehicleParams, optional
+            the new vehicle types and initial vehicles of the network. The
+            current ones are kept if not specified.
+
+        Raises
+        ------
+        flow.utils.exceptions.FatalFlowError
+            if the simulator does not support replacing the inflows
+        """
+        if self.simulator != 'traci':
+            raise FatalFlowError(
+                'Inflows can only be replaced during a run with sumo.')
+        self._next_inflows = inflows
+        if vehicles is not None:
+            self.network.vehicles = vehicles
+
+    def reload_simulation(self, inflows):
+        """Load new inflows in an already initialized simulation instance.
+
+        Contrary to restart_simulation, the network files and the sumo process
+        are kept. Only the .rou.xml and .add.xml files of the network are
+        regenerated, and the simulation is loaded anew by the running sumo
+        instance. Like a restart, this clears all vehicles from the
+        simulation.
+
+        Parameters
+        ----------
+        inflows : flow.core.params.InFlows
+            the new inflows of the network
+        """
+        self.k.network.update_inflows(inflows)
+        self.k.simulation.load_simulation(self.k.network, self.sim_params)
+        self.k.vehicle.initialize(deepcopy(self.network.vehicles))
+
+        # the initial vehicles may have been replaced (see set_inflows)
+        self.initial_ids = deepcopy(self.network.vehicles.ids)
+
+        # the subscriptions are cleared by the load, and are started again
+        self.k.simulation.pass_api(self.k.kernel_api)
+        self.k.vehicle.pass_api(self.k.kernel_api)
+        self.k.traffic_light.pass_api(self.k.kernel_api)
+
+        self.setup_initial_state()
+
     def setup_initial_state(self):
         """Store information on the initial state of vehicles in the network.
 
@@ -322,54 +398,55 @@ class Env(gym.Env, metaclass=ABCMeta):
         info : dict
             contains other diagnostic information from the previous action
         """
+        prof = self.k.profiler
+        prof.begin_step()
+
         for _ in range(self.env_params.sims_per_step):
             self.time_counter += 1
             self.step_counter += 1
 
             # perform acceleration actions for controlled human-driven vehicles
-            if len(self.k.vehicle.get_controlled_ids()) > 0:
-                accel = []
-                for veh_id in self.k.vehicle.get_controlled_ids():
-                    action = self.k.vehicle.get_acc_controller(
-                        veh_id).get_action(self)
-                    accel.append(action)
-                self.k.vehicle.apply_acceleration(
-                    self.k.vehicle.get_controlled_ids(), accel)
+            with prof.phase('controllers'):
+                if len(self.k.vehicle.get_controlled_ids()) > 0:
+                    accel = []
+                    for veh_id in self.k.vehicle.get_controlled_ids():
+                        action = self.k.vehicle.get_acc_controller(
+                            veh_id).get_action(self)
+                        accel.append(action)
+                    self.k.vehicle.apply_acceleration(
+                        self.k.vehicle.get_controlled_ids(), accel)
 
             # perform lane change actions for controlled human-driven vehicles
-            if len(self.k.vehicle.get_controlled_lc_ids()) > 0:
-                direction = []
-                for veh_id in self.k.vehicle.get_controlled_lc_ids():
-                    target_lane = self.k.vehicle.get_lane_changing_controller(
-                        veh_id).get_action(self)
-                    direction.append(target_lane)
-                self.k.vehicle.apply_lane_change(
-                    self.k.vehicle.get_controlled_lc_ids(),
-                    direction=direction)
+            with prof.phase('lane_change'):
+                if len(self.k.vehicle.get_controlled_lc_ids()) > 0:
+                    direction = []
+                    for veh_id in self.k.vehicle.get_controlled_lc_ids():
+                        target_lane = \
+                            self.k.vehicle.get_lane_changing_controller(
+                                veh_id).get_action(self)
+                        direction.append(target_lane)
+                    self.k.vehicle.apply_lane_change(
+                        self.k.vehicle.get_controlled_lc_ids(),
+                        direction=direction)
 
             # perform (optionally) routing actions for all vehicles in the
             # network, including RL and SUMO-controlled vehicles
-            routing_ids = []
-            routing_actions = []
-            for veh_id in self.k.vehicle.get_ids():
-                if self.k.vehicle.get_routing_controller(veh_id) \
-                        is not None:
-                    routing_ids.append(veh_id)
-                    route_contr = self.k.vehicle.get_routing_controller(
-                        veh_id)
-                    routing_actions.append(route_contr.choose_route(self))
-
-            self.k.vehicle.choose_routes(routing_ids, routing_actions)
+            with prof.phase('routing'):
+                self.apply_routing_actions()
 
-            self.apply_rl_actions(rl_actions)
+            with prof.phase('apply_rl_actions'):
+                self.apply_rl_actions(rl_actions)
 
-            self.additional_command()
+            with prof.phase('additional_command'):
+                self.additional_command()
 
             # advance the simulation in the simulator by one step
-            self.k.simulation.simulation_step()
+            with prof.phase('simulation_step'):
+                self.k.simulation.simulation_step()
 
             # store new observations in the vehicles and traffic lights class
-            self.k.update(reset=False)
+            with prof.phase('update'):
+                self.k.update(reset=False)
 
             # update the colors of vehicles
             if self.sim_params.render:
@@ -383,9 +460,11 @@ class Env(gym.Env, metaclass=ABCMeta):
                 break
 
             # render a frame
-            self.render()
+            with prof.phase('render'):
+                self.render()
 
-        states = self.get_state()
+        with prof.phase('get_state'):
+            states = self.get_state()
 
         # collect information of the state of the network based on the
         # environment class used
@@ -404,11 +483,16 @@ class Env(gym.Env, metaclass=ABCMeta):
         infos = {}
 
         # compute the reward
-        if self.env_params.clip_actions:
-            rl_clipped = self.clip_actions(rl_actions)
-            reward = self.compute_reward(rl_clipped, fail=crash)
-        else:
-            reward = self.compute_reward(rl_actions, fail=crash)
+        with prof.phase('compute_reward'):
+            if self.env_params.clip_actions:
+                rl_clipped = self.clip_actions(rl_actions)
+                reward = self.compute_reward(rl_clipped, fail=crash)
+            else:
+                reward = self.compute_reward(rl_actions, fail=crash)
+
+        prof.end_step()
+        if self.k.tracer is not None:
+            self.k.tracer.end_step()
 
         return next_observation, reward, done, infos
 
@@ -431,6 +515,10 @@ class Env(gym.Env, metaclass=ABCMeta):
         # reset the time counter
         self.time_counter = 0
 
+        # close the episode recorded by the TraCI tracer, if any
+        if self.k.tracer is not None:
+            self.k.tracer.end_episode()
+
         # Now that we've passed the possibly fake init steps some rl libraries
         # do, we can feel free to actually render things
         if self.should_render:
@@ -438,9 +526,11 @@ class Env(gym.Env, metaclass=ABCMeta):
             # got to restart the simulation to make it actually display anything
             self.restart_simulation(self.sim_params)
 
-        # warn about not using restart_instance when using inflows
+        # warn about not using restart_instance when using inflows (loading
+        # new inflows also starts a new simulation)
         if len(self.net_params.inflows.get()) > 0 and \
-                not self.sim_params.restart_instance:
+                not self.sim_params.restart_instance and \
+                self._next_inflows is None:
             print(
                 "**********************************************************\n"
                 "**********************************************************\n"
@@ -453,7 +543,18 @@ class Env(gym.Env, metaclass=ABCMeta):
                 "**********************************************************"
             )
 
-        if self.sim_params.restart_instance or \
+        if self._next_inflows is not None:
+            self.step_counter = 0
+            # issue a random seed to induce randomness into the next rollout
+            self.sim_params.seed = random.randint(0, 1e5)
+
+            self.k.vehicle = deepcopy(self.initial_vehicles)
+            self.k.vehicle.master_kernel = self.k
+            # load the new inflows in the running sumo instance
+            self.reload_simulation(self._next_inflows)
+            self._next_inflows = None
+
+        elif self.sim_params.restart_instance or \
                 (self.step_counter > 2e6 and self.simulator != 'aimsun'):
             self.step_counter = 0
             # issue a random seed to induce randomness into the next rollout
@@ -468,55 +569,29 @@ class Env(gym.Env, metaclass=ABCMeta):
         elif self.initial_config.shuffle:
             self.setup_initial_state()
 
-        # clear all vehicles from the network and the vehicles class
-        if self.simulator == 'traci':
-            for veh_id in self.k.kernel_api.vehicle.getIDList():  # FIXME: hack
-                try:
-                    self.k.vehicle.remove(veh_id)
-                except (FatalTraCIError, TraCIException):
-                    print(traceback.format_exc())
-
-        # clear all vehicles from the network and the vehicles class
-        # FIXME (ev, ak) this is weird and shouldn't be necessary
-        for veh_id in list(self.k.vehicle.get_ids()):
-            # do not try to remove the vehicles from the network in the first
-            # step after initializing the network, as there will be no vehicles
-            if self.step_counter == 0:
-                continue
-            try:
-                self.k.vehicle.remove(veh_id)
-            except (FatalTraCIError, TraCIException):
-                print("Error during start: {}".format(traceback.format_exc()))
+        # clear all vehicles from the network and the vehicles class. The
+        # vehicles of the vehicles class are not removed from the network in
+        # the first step after initializing the network, as there will be no
+        # vehicles
+        try:
+            self.k.vehicle.remove_all(tracked=self.step_counter > 0)
+        except (FatalTraCIError, TraCIException):
+            print("Error during start: {}".format(traceback.format_exc()))
 
         # do any additional resetting of the vehicle class needed
         self.k.vehicle.reset()
 
         # reintroduce the initial vehicles to the network
-        for veh_id in self.initial_ids:
-            type_id, edge, lane_index, pos, speed = \
-                self.initial_state[veh_id]
-
-            try:
-                self.k.vehicle.add(
-                    veh_id=veh_id,
-                    type_id=type_id,
-                    edge=edge,
-                    lane=lane_index,
-                    pos=pos,
-                    speed=speed)
-            except (FatalTraCIError, TraCIException):
-                # if a vehicle was not removed in the first attempt, remove it
-                # now and then reintroduce it
-                self.k.vehicle.remove(veh_id)
-                if self.simulator == 'traci':
-                    self.k.kernel_api.vehicle.remove(veh_id)  # FIXME: hack
-                self.k.vehicle.add(
-                    veh_id=veh_id,
-                    type_id=type_id,
-                    edge=edge,
-                    lane=lane_index,
-                    pos=pos,
-                    speed=speed)
+        if len(self.initial_ids) > 0:
+            type_ids, edges, lanes, pos, speeds = zip(
+                *[self.initial_state[veh_id] for veh_id in self.initial_ids])
+            self.k.vehicle.add_many(
+                veh_ids=self.initial_ids,
+                type_ids=type_ids,
+                edges=edges,
+                pos=pos,
+                lanes=lanes,
+                speeds=speeds)
 
         # advance the simulation in the simulator by one step
         self.k.simulation.simulation_step()
@@ -551,6 +626,10 @@ class Env(gym.Env, metaclass=ABCMeta):
         # observation associated with the reset (no warm-up steps)
         observation = np.copy(states)
 
+        # the calls issued so far are not part of the warm-up steps
+        if self.k.tracer is not None:
+            self.k.tracer.end_reset()
+
         # perform (optional) warm-up steps before training
         for _ in range(self.env_params.warmup_steps):
             observation, _, _, _ = self.step(rl_actions=None)
@@ -558,12 +637,33 @@ class Env(gym.Env, metaclass=ABCMeta):
         # render a frame
         self.render(reset=True)
 
+        # attribute the calls issued by the reset to the reset, rather than
+        # to the first step of the episode
+        if self.k.tracer is not None:
+            self.k.tracer.end_reset()
+
         return observation
 
     def additional_command(self):
         """Additional commands that may be performed by the step method."""
         pass
 
+    def apply_routing_actions(self):
+        """Query the routing controllers of vehicles and apply their routes.
+
+        Only vehicles returned by the vehicle kernel's ``get_routing_ids``
+        method are routed. Routers whose ``final_edge_only`` attribute is set
+        to True are therefore only queried for vehicles on the last edge of
+        their current route (or on one of the router's ``trigger_edges``), as
+        they perform no routing action otherwise.
+        """
+        routing_ids = self.k.vehicle.get_routing_ids()
+        routing_actions = [
+            self.k.vehicle.get_routing_controller(veh_id).choose_route(self)
+            for veh_id in routing_ids
+        ]
+        self.k.vehicle.choose_routes(routing_ids, routing_actions)
+
     def clip_actions(self, rl_actions=None):
         """Clip the actions passed from the RL agent.
 
@@ -694,11 +794,13 @@ class Env(gym.Env, metaclass=ABCMeta):
             # close pyglet renderer
             if self.sim_params.render in ['gray', 'dgray', 'rgb', 'drgb']:
                 self.renderer.close()
-            # generate video
+            # generate video. The frames of sumo-gui are screenshots written
+            # to disk by sumo itself, so they cannot be streamed through the
+            # RenderRecorder of the pyglet and numpy renderers, and are
+            # encoded once the simulation is closed
             elif (self.sim_params.render is True) and self.sim_params.save_render:
                 images_dir = self.path.split('/')[-1]
-                speedup = 10  # multiplier: renders video so that `speedup` seconds is rendered in 1 real second
-                fps = speedup//self.sim_step
+                fps = RENDER_SPEEDUP / self.sim_step
                 p = subprocess.Popen(["ffmpeg", "-y", "-r", str(fps), "-i", self.path+"/frame_%06d.png",
                                       "-pix_fmt", "yuv420p", "%s/../%s.mp4" % (self.path, images_dir)])
                 p.wait()
@@ -721,17 +823,15 @@ class Env(gym.Env, metaclass=ABCMeta):
             # render a frame
             self.pyglet_render()
 
-            # cache rendering
+            # cache rendering in preallocated ring buffers
             if reset:
-                self.frame_buffer = [self.frame.copy() for _ in range(5)]
-                self.sights_buffer = [self.sights.copy() for _ in range(5)]
-            else:
-                if self.step_counter % int(1/self.sim_step) == 0:
-                    self.frame_buffer.append(self.frame.copy())
-                    self.sights_buffer.append(self.sights.copy())
-                if len(self.frame_buffer) > buffer_length:
-                    self.frame_buffer.pop(0)
-                    self.sights_buffer.pop(0)
+                self.frame_buffer = RingBuffer(buffer_length)
+                self.sights_buffer = RingBuffer(buffer_length, ragged=True)
+                self.frame_buffer.fill(self.frame)
+                self.sights_buffer.fill(self.sights)
+            elif self.step_counter % int(1/self.sim_step) == 0:
+                self.frame_buffer.append(self.frame)
+                self.sights_buffer.append(self.sights)
         elif (self.sim_params.render is True) and self.sim_params.save_render:
             # sumo-gui render
             self.k.kernel_api.gui.screenshot("View #0", self.path+"/frame_%06d.png" % self.time_counter)
@@ -787,18 +887,9 @@ class Env(gym.Env, metaclass=ABCMeta):
                                           human_logs,
                                           machine_logs)
 
-        # get local observation of RL vehicles
-        self.sights = []
-        for id in human_idlist:
-            # Force tracking human vehicles by adding "track" in vehicle id.
-            # The tracked human vehicles will be treated as machine vehicles.
-            if "track" in id:
-                orientation = self.k.vehicle.get_orientation(id)
-                sight = self.renderer.get_sight(
-                    orientation, id)
-                self.sights.append(sight)
-        for id in machine_idlist:
-            orientation = self.k.vehicle.get_orientation(id)
-            sight = self.renderer.get_sight(
-                orientation, id)
-            self.sights.append(sight)
+        # get local observation of RL vehicles (and tracked human vehicles)
+        sight_ids = [id for id in human_idlist if "track" in id] + \
+            list(machine_idlist)
+        self.sights = self.renderer.get_sights(
+            [self.k.vehicle.get_orientation(id) for id in sight_ids],
+            sight_ids)
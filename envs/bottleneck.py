@@ -442,16 +442,19 @@ class BottleneckEnv(Env):
         If no lanes are specified, this function calculates the
         density of all vehicles on all lanes of the bottleneck edges.
         """
-        bottleneck_ids = self.k.vehicle.get_ids_by_edge(['3', '4'])
         if lanes:
-            veh_ids = [
-                veh_id for veh_id in bottleneck_ids
-                if str(self.k.vehicle.get_edge(veh_id)) + "_" +
-                str(self.k.vehicle.get_lane(veh_id)) in lanes
-            ]
+            num_vehicles = 0
+            for lane_id in set(lanes):
+                edge, lane = lane_id.rsplit("_", 1)
+                if edge not in ['3', '4']:
+                    continue
+                lane_counts = self.k.vehicle.get_num_vehicles_by_lane(edge)
+                if int(lane) < len(lane_counts):
+                    num_vehicles += lane_counts[int(lane)]
         else:
-            veh_ids = self.k.vehicle.get_ids_by_edge(['3', '4'])
-        return len(veh_ids) / BOTTLE_NECK_LEN
+            num_vehicles = np.sum(
+                self.k.vehicle.get_num_vehicles_by_edge(['3', '4']))
+        return num_vehicles / BOTTLE_NECK_LEN
 
     # Dummy action and observation spaces
     @property
@@ -626,16 +629,12 @@ class BottleneckAccelEnv(BottleneckEnv):
                                            np.zeros(4 * MAX_LANES * diff)))
 
         # per edge data (average speed, density
-        edge_obs = []
-        for edge in self.k.network.get_edge_list():
-            veh_ids = self.k.vehicle.get_ids_by_edge(edge)
-            if len(veh_ids) > 0:
-                avg_speed = (sum(self.k.vehicle.get_speed(veh_ids)) /
-                             len(veh_ids)) / self.max_speed
-                density = len(veh_ids) / self.k.network.edge_length(edge)
-                edge_obs += [avg_speed, density]
-            else:
-                edge_obs += [0, 0]
+        edge_list = self.k.network.get_edge_list()
+        avg_speed = \
+            self.k.vehicle.get_mean_speed_by_edge(edge_list) / self.max_speed
+        density = self.k.vehicle.get_num_vehicles_by_edge(edge_list) / \
+            np.array([self.k.network.edge_length(edge) for edge in edge_list])
+        edge_obs = np.column_stack((avg_speed, density)).flatten()
 
         return np.concatenate((rl_obs, relative_obs, edge_obs))
 
@@ -992,15 +991,55 @@ class BottleneckDesiredVelocityEnv(BottleneckEnv):
                 (2000.0 * self.scaling)
         return reward
 
+    def _inflow_vehicles(self):
+        """Return the vehicle types of the inflows used when resetting.
+
+        Returns
+        -------
+        flow.core.params.VehicleParams
+            "human" and "followerstopper" vehicle types, with 1 * scaling
+            initial vehicles each
+        """
+        vehicles = VehicleParams()
+        vehicles.add(
+            veh_id="human",  # FIXME: make generic
+            car_following_params=SumoCarFollowingParams(
+                speed_mode=9,
+            ),
+            lane_change_controller=(SimLaneChangeController, {}),
+            routing_controller=(ContinuousRouter, {}),
+            lane_change_params=SumoLaneChangeParams(
+                lane_change_mode=0,  # 1621,#0b100000101,
+            ),
+            num_vehicles=1 * self.scaling)
+        vehicles.add(
+            veh_id="followerstopper",
+            acceleration_controller=(RLController, {}),
+            lane_change_controller=(SimLaneChangeController, {}),
+            routing_controller=(ContinuousRouter, {}),
+            car_following_params=SumoCarFollowingParams(
+                speed_mode=9,
+            ),
+            lane_change_params=SumoLaneChangeParams(
+                lane_change_mode=0,
+            ),
+            num_vehicles=1 * self.scaling)
+        return vehicles
+
     def reset(self):
         """Reset the environment with a new inflow rate.
 
         The diverse set of inflows are used to generate a policy that is more
-        robust with respect to the inflow rate. The inflow rate is update by
-        creating a new network similar to the previous one, but with a new
-        Inflow object with a rate within the additional environment parameter
-        "inflow_range", which is a list consisting of the smallest and largest
-        allowable inflow rates.
+        robust with respect to the inflow rate. The inflow rate is sampled
+        within the additional environment parameter "inflow_range", which is a
+        list consisting of the smallest and largest allowable inflow rates.
+
+        With sumo, the new inflows are loaded in the running simulation (see
+        Env.set_inflows), such that the network is not rebuilt at every
+        rollout. With other simulators, the inflow rate is updated by creating
+        a new network similar to the previous one, but with the new Inflow
+        object. In both cases, the vehicle types are replaced by the ones of
+        _inflow_vehicles.
 
         **WARNING**: The inflows assume there are vehicles of type
         "followerstopper" and "human" within the VehicleParams object.
@@ -1011,77 +1050,58 @@ class BottleneckDesiredVelocityEnv(BottleneckEnv):
             flow_rate = np.random.uniform(
                 min(inflow_range), max(inflow_range)) * self.scaling
 
-            # We try this for 100 trials in case unexpected errors during
-            # instantiation.
-            for _ in range(100):
-                try:
-                    # introduce new inflows within the pre-defined inflow range
-                    inflow = InFlows()
-                    inflow.add(
-                        veh_type="followerstopper",  # FIXME: make generic
-                        edge="1",
-                        vehs_per_hour=flow_rate * .1,
-                        departLane="random",
-                        departSpeed=10)
-                    inflow.add(
-                        veh_type="human",
-                        edge="1",
-                        vehs_per_hour=flow_rate * .9,
-                        departLane="random",
-                        departSpeed=10)
-
-                    # all other network parameters should match the previous
-                    # environment (we only want to change the inflow)
-                    additional_net_params = {
-                        "scaling": self.scaling,
-                        "speed_limit": self.net_params.
-                        additional_params['speed_limit']
-                    }
-                    net_params = NetParams(
-                        inflows=inflow,
-                        additional_params=additional_net_params)
-
-                    vehicles = VehicleParams()
-                    vehicles.add(
-                        veh_id="human",  # FIXME: make generic
-                        car_following_params=SumoCarFollowingParams(
-                            speed_mode=9,
-                        ),
-                        lane_change_controller=(SimLaneChangeController, {}),
-                        routing_controller=(ContinuousRouter, {}),
-                        lane_change_params=SumoLaneChangeParams(
-                            lane_change_mode=0,  # 1621,#0b100000101,
-                        ),
-                        num_vehicles=1 * self.scaling)
-                    vehicles.add(
-                        veh_id="followerstopper",
-                        acceleration_controller=(RLController, {}),
-                        lane_change_controller=(SimLaneChangeController, {}),
-                        routing_controller=(ContinuousRouter, {}),
-                        car_following_params=SumoCarFollowingParams(
-                            speed_mode=9,
-                        ),
-                        lane_change_params=SumoLaneChangeParams(
-                            lane_change_mode=0,
-                        ),
-                        num_vehicles=1 * self.scaling)
-
-                    # recreate the network object
-                    self.network = self.network.__class__(
-                        name=self.network.orig_name,
-                        vehicles=vehicles,
-                        net_params=net_params,
-                        initial_config=self.initial_config,
-                        traffic_lights=self.network.traffic_lights)
-                    observation = super().reset()
-
-                    # reset the timer to zero
-                    self.time_counter = 0
-
-                    return observation
-
-                except Exception as e:
-                    print('error on reset ', e)
+            # introduce new inflows within the pre-defined inflow range
+            inflow = InFlows()
+            inflow.add(
+                veh_type="followerstopper",  # FIXME: make generic
+                edge="1",
+                vehs_per_hour=flow_rate * .1,
+                departLane="random",
+                departSpeed=10)
+            inflow.add(
+                veh_type="human",
+                edge="1",
+                vehs_per_hour=flow_rate * .9,
+                departLane="random",
+                departSpeed=10)
+
+            if self.simulator == 'traci':
+                # only the demand and the vehicle types are replaced, the
+                # network and the sumo instance are kept
+                self.set_inflows(inflow, vehicles=self._inflow_vehicles())
+            else:
+                # We try this for 100 trials in case unexpected errors during
+                # instantiation.
+                for _ in range(100):
+                    try:
+                        # all other network parameters should match the
+                        # previous environment (we only want to change the
+                        # inflow)
+                        additional_net_params = {
+                            "scaling": self.scaling,
+                            "speed_limit": self.net_params.
+                            additional_params['speed_limit']
+                        }
+                        net_params = NetParams(
+                            inflows=inflow,
+                            additional_params=additional_net_params)
+
+                        # recreate the network object
+                        self.network = self.network.__class__(
+                            name=self.network.orig_name,
+                            vehicles=self._inflow_vehicles(),
+                            net_params=net_params,
+                            initial_config=self.initial_config,
+                            traffic_lights=self.network.traffic_lights)
+                        observation = super().reset()
+
+                        # reset the timer to zero
+                        self.time_counter = 0
+
+                        return observation
+
+                    except Exception as e:
+                        print('error on reset ', e)
 
         # perform the generic reset function
         observation = super().reset()
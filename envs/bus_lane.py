@@ -127,11 +127,9 @@ def avg_delay_specified_vehicles(env, veh_ids):
     float
         average delay
     """
-    sum = 0
-    for edge in env.k.network.get_edge_list():
-        for veh_id in env.k.vehicle.get_ids_by_edge(edge):
-            v_top = env.k.network.speed_limit(edge)
-            sum += (7.0 - env.k.vehicle.get_speed(veh_id)) / 7.0
+    edge_list = env.k.network.get_edge_list()
+    sum = np.sum(7.0 * env.k.vehicle.get_num_vehicles_by_edge(edge_list) -
+                 env.k.vehicle.get_speed_sum_by_edge(edge_list)) / 7.0
     time_step = env.sim_step
     try:
         cost = time_step * sum
@@ -46,16 +46,14 @@ class SharedMultiAgentBristolEnv(MultiEnv):
 
     def get_state(self):
         """See class definition."""
-        veh_info = {}
-        for rl_id in self.k.vehicle.get_rl_ids():
-            speed = self.k.vehicle.get_speed(rl_id)
-            headway = self.k.vehicle.get_headway(rl_id)
-            lead_speed = self.k.vehicle.get_speed(self.k.vehicle.get_leader(rl_id))
-            if lead_speed == -1001:
-                lead_speed = 0
-            veh_info.update({rl_id: np.array([speed / 50.0, headway / 1000.0, lead_speed / 50.0])})
+        return self.get_batched_state().to_dict()
+
+    def get_batched_state(self):
+        """See parent class.
 
-        return veh_info
+        The observations of all RL vehicles are filled in a single pass.
+        """
+        return self._batched_lead_obs(self.k.vehicle.get_rl_ids())
 
     def compute_reward(self, rl_actions, **kwargs):
         if rl_actions is None:
@@ -112,7 +110,7 @@ class SharedMultiAgentBristolEnv(MultiEnv):
         lane_follower_speed = veh.get_lane_followers_speed(rl_id).copy()
         leader_ids = veh.get_lane_leaders(rl_id).copy()
         follower_ids = veh.get_lane_followers(rl_id).copy()
-        rl_ids = self.k.vehicle.get_rl_ids()
+        rl_ids = self.k.cache.rl_ids()
         is_leader_rl = [1 if l_id in rl_ids else 0 for l_id in leader_ids]
         is_follow_rl = [1 if f_id in rl_ids else 0 for f_id in follower_ids]
         diff = MAX_LANES - len(is_leader_rl)
@@ -1,5 +1,6 @@
 """Environment for training multi-agent experiments."""
 
+from collections.abc import MutableMapping
 from copy import deepcopy
 import numpy as np
 import random
@@ -15,8 +16,93 @@ from flow.envs.base import Env
 from flow.utils.exceptions import FatalFlowError
 
 
+class BatchedObservations(MutableMapping):
+    """Observations of all agents of a step, stored as a single array.
+
+    Row i of ``obs`` contains the observation of the agent ``ids[i]``. The
+    object behaves as a dict of observations, whose values are views of the
+    rows of the batch, and can be converted to a dict with ``to_dict`` when
+    needed. Shared-policy learners can instead consume ``obs`` directly.
+
+    Attributes
+    ----------
+    ids : list of str
+        agent IDs, in the order of the rows of the batch
+    obs : np.ndarray
+        observations of the agents, of shape (number of agents, obs_dim). The
+        observations are stored as float64, as the arrays returned by
+        ``get_state``
+    index : dict <str, int>
+        row of every agent in the batch
+    """
+
+    def __init__(self, ids, obs):
+        """Instantiate the batch.
+
+        Parameters
+        ----------
+        ids : list of str
+            agent IDs
+        obs : np.ndarray
+            observations of the agents, one row per agent
+        """
+        self.ids = list(ids)
+        self.obs = obs
+        self.index = {agent_id: i for i, agent_id in enumerate(self.ids)}
+
+    @classmethod
+    def from_dict(cls, observations, obs_dim):
+        """Stack a dict of observations into a batch.
+
+        Parameters
+        ----------
+        observations : dict <str, array_like>
+            observation of every agent
+        obs_dim : int
+            size of the observation of an agent
+        """
+        obs = np.zeros((len(observations), obs_dim))
+        for i, value in enumerate(observations.values()):
+            obs[i] = value
+        return cls(observations.keys(), obs)
+
+    def to_dict(self):
+        """Return the observations as a dict of arrays."""
+        # one copy of the batch, such that the returned rows remain valid if
+        # the buffer of the environment is reused in the next step
+        return dict(zip(self.ids, self.obs.copy()))
+
+    def __getitem__(self, agent_id):
+        return self.obs[self.index[agent_id]]
+
+    def __setitem__(self, agent_id, value):
+        if agent_id in self.index:
+            self.obs[self.index[agent_id]] = value
+        else:
+            self.index[agent_id] = len(self.ids)
+            self.ids.append(agent_id)
+            self.obs = np.vstack((self.obs, np.reshape(value, (1, -1))))
+
+    def __delitem__(self, agent_id):
+        row = self.index.pop(agent_id)
+        del self.ids[row]
+        self.obs = np.delete(self.obs, row, axis=0)
+        self.index = {agent_id: i for i, agent_id in enumerate(self.ids)}
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+
 class MultiEnv(MultiAgentEnv, Env):
-    """Multi-agent version of base env. See parent class for info."""
+    """Multi-agent version of base env. See parent class for info.
+
+    If the "batch_obs" term of the additional environment parameters is set
+    to True, ``step`` and ``reset`` return the observations of all agents as a
+    BatchedObservations object (see ``get_batched_state``) instead of a dict.
+    """
 
     def step(self, rl_actions):
         """Advance the environment by one step.
@@ -48,51 +134,55 @@ class MultiEnv(MultiAgentEnv, Env):
         info : dict
             contains other diagnostic information from the previous action
         """
+        prof = self.k.profiler
+        prof.begin_step()
+
         for _ in range(self.env_params.sims_per_step):
             self.time_counter += 1
             self.step_counter += 1
 
             # perform acceleration actions for controlled human-driven vehicles
-            if len(self.k.vehicle.get_controlled_ids()) > 0:
-                accel = []
-                for veh_id in self.k.vehicle.get_controlled_ids():
-                    accel_contr = self.k.vehicle.get_acc_controller(veh_id)
-                    action = accel_contr.get_action(self)
-                    accel.append(action)
-                self.k.vehicle.apply_acceleration(
-                    self.k.vehicle.get_controlled_ids(), accel)
+            with prof.phase('controllers'):
+                if len(self.k.vehicle.get_controlled_ids()) > 0:
+                    accel = []
+                    for veh_id in self.k.vehicle.get_controlled_ids():
+                        accel_contr = self.k.vehicle.get_acc_controller(veh_id)
+                        action = accel_contr.get_action(self)
+                        accel.append(action)
+                    self.k.vehicle.apply_acceleration(
+                        self.k.vehicle.get_controlled_ids(), accel)
 
             # perform lane change actions for controlled human-driven vehicles
-            if len(self.k.vehicle.get_controlled_lc_ids()) > 0:
-                direction = []
-                for veh_id in self.k.vehicle.get_controlled_lc_ids():
-                    target_lane = self.k.vehicle.get_lane_changing_controller(
-                        veh_id).get_action(self)
-                    direction.append(target_lane)
-                self.k.vehicle.apply_lane_change(
-                    self.k.vehicle.get_controlled_lc_ids(),
-                    direction=direction)
+            with prof.phase('lane_change'):
+                if len(self.k.vehicle.get_controlled_lc_ids()) > 0:
+                    direction = []
+                    for veh_id in self.k.vehicle.get_controlled_lc_ids():
+                        target_lane = \
+                            self.k.vehicle.get_lane_changing_controller(
+                                veh_id).get_action(self)
+                        direction.append(target_lane)
+                    self.k.vehicle.apply_lane_change(
+                        self.k.vehicle.get_controlled_lc_ids(),
+                        direction=direction)
 
             # perform (optionally) routing actions for all vehicle in the
             # network, including rl and sumo-controlled vehicles
-            routing_ids = []
-            routing_actions = []
-            for veh_id in self.k.vehicle.get_ids():
-                if self.k.vehicle.get_routing_controller(veh_id) is not None:
-                    routing_ids.append(veh_id)
-                    route_contr = self.k.vehicle.get_routing_controller(veh_id)
-                    routing_actions.append(route_contr.choose_route(self))
-            self.k.vehicle.choose_routes(routing_ids, routing_actions)
+            with prof.phase('routing'):
+                self.apply_routing_actions()
 
-            self.apply_rl_actions(rl_actions)
+            with prof.phase('apply_rl_actions'):
+                self.apply_rl_actions(rl_actions)
 
-            self.additional_command()
+            with prof.phase('additional_command'):
+                self.additional_command()
 
             # advance the simulation in the simulator by one step
-            self.k.simulation.simulation_step()
+            with prof.phase('simulation_step'):
+                self.k.simulation.simulation_step()
 
             # store new observations in the vehicles and traffic lights class
-            self.k.update(reset=False)
+            with prof.phase('update'):
+                self.k.update(reset=False)
 
             # update the colors of vehicles
             if self.sim_params.render:
@@ -105,7 +195,8 @@ class MultiEnv(MultiAgentEnv, Env):
             if crash:
                 break
 
-        states = self.get_state()
+        with prof.phase('get_state'):
+            states = self._observe()
         done = {key: key in self.k.vehicle.get_arrived_ids()
                 for key in states.keys()}
         if crash or (self.time_counter >= self.env_params.sims_per_step *
@@ -116,17 +207,22 @@ class MultiEnv(MultiAgentEnv, Env):
         infos = {key: {} for key in states.keys()}
 
         # compute the reward
-        if self.env_params.clip_actions:
-            clipped_actions = self.clip_actions(rl_actions)
-            reward = self.compute_reward(clipped_actions, fail=crash)
-        else:
-            reward = self.compute_reward(rl_actions, fail=crash)
+        with prof.phase('compute_reward'):
+            if self.env_params.clip_actions:
+                clipped_actions = self.clip_actions(rl_actions)
+                reward = self.compute_reward(clipped_actions, fail=crash)
+            else:
+                reward = self.compute_reward(rl_actions, fail=crash)
 
         for rl_id in self.k.vehicle.get_arrived_rl_ids(self.env_params.sims_per_step):
             done[rl_id] = True
             reward[rl_id] = 0
             states[rl_id] = np.zeros(self.observation_space.shape[0])
 
+        prof.end_step()
+        if self.k.tracer is not None:
+            self.k.tracer.end_step()
+
         return states, reward, done, infos
 
     def reset(self, new_inflow_rate=None):
@@ -148,6 +244,10 @@ class MultiEnv(MultiAgentEnv, Env):
         # reset the time counter
         self.time_counter = 0
 
+        # close the episode recorded by the TraCI tracer, if any
+        if self.k.tracer is not None:
+            self.k.tracer.end_episode()
+
         # Now that we've passed the possibly fake init steps some rl libraries
         # do, we can feel free to actually render things
         if self.should_render:
@@ -155,9 +255,11 @@ class MultiEnv(MultiAgentEnv, Env):
             # got to restart the simulation to make it actually display anything
             self.restart_simulation(self.sim_params)
 
-        # warn about not using restart_instance when using inflows
+        # warn about not using restart_instance when using inflows (loading
+        # new inflows also starts a new simulation)
         if len(self.net_params.inflows.get()) > 0 and \
-                not self.sim_params.restart_instance:
+                not self.sim_params.restart_instance and \
+                self._next_inflows is None:
             print(
                 "**********************************************************\n"
                 "**********************************************************\n"
@@ -170,7 +272,18 @@ class MultiEnv(MultiAgentEnv, Env):
                 "**********************************************************"
             )
 
-        if self.sim_params.restart_instance or \
+        if self._next_inflows is not None:
+            self.step_counter = 0
+            # issue a random seed to induce randomness into the next rollout
+            self.sim_params.seed = random.randint(0, 1e5)
+
+            self.k.vehicle = deepcopy(self.initial_vehicles)
+            self.k.vehicle.master_kernel = self.k
+            # load the new inflows in the running sumo instance
+            self.reload_simulation(self._next_inflows)
+            self._next_inflows = None
+
+        elif self.sim_params.restart_instance or \
                 (self.step_counter > 2e6 and self.simulator != 'aimsun'):
             self.step_counter = 0
             # issue a random seed to induce randomness into the next rollout
@@ -185,55 +298,29 @@ class MultiEnv(MultiAgentEnv, Env):
         elif self.initial_config.shuffle:
             self.setup_initial_state()
 
-        # clear all vehicles from the network and the vehicles class
-        if self.simulator == 'traci':
-            for veh_id in self.k.kernel_api.vehicle.getIDList():  # FIXME: hack
-                try:
-                    self.k.vehicle.remove(veh_id)
-                except (FatalTraCIError, TraCIException):
-                    print(traceback.format_exc())
-
-        # clear all vehicles from the network and the vehicles class
-        # FIXME (ev, ak) this is weird and shouldn't be necessary
-        for veh_id in list(self.k.vehicle.get_ids()):
-            # do not try to remove the vehicles from the network in the first
-            # step after initializing the network, as there will be no vehicles
-            if self.step_counter == 0:
-                continue
-            try:
-                self.k.vehicle.remove(veh_id)
-            except (FatalTraCIError, TraCIException):
-                print("Error during start: {}".format(traceback.format_exc()))
+        # clear all vehicles from the network and the vehicles class. The
+        # vehicles of the vehicles class are not removed from the network in
+        # the first step after initializing the network, as there will be no
+        # vehicles
+        try:
+            self.k.vehicle.remove_all(tracked=self.step_counter > 0)
+        except (FatalTraCIError, TraCIException):
+            print("Error during start: {}".format(traceback.format_exc()))
 
         # do any additional resetting of the vehicle class needed
         self.k.vehicle.reset()
 
         # reintroduce the initial vehicles to the network
-        for veh_id in self.initial_ids:
-            type_id, edge, lane_index, pos, speed = \
-                self.initial_state[veh_id]
-
-            try:
-                self.k.vehicle.add(
-                    veh_id=veh_id,
-                    type_id=type_id,
-                    edge=edge,
-                    lane=lane_index,
-                    pos=pos,
-                    speed=speed)
-            except (FatalTraCIError, TraCIException):
-                # if a vehicle was not removed in the first attempt, remove it
-                # now and then reintroduce it
-                self.k.vehicle.remove(veh_id)
-                if self.simulator == 'traci':
-                    self.k.kernel_api.vehicle.remove(veh_id)  # FIXME: hack
-                self.k.vehicle.add(
-                    veh_id=veh_id,
-                    type_id=type_id,
-                    edge=edge,
-                    lane=lane_index,
-                    pos=pos,
-                    speed=speed)
+        if len(self.initial_ids) > 0:
+            type_ids, edges, lanes, pos, speeds = zip(
+                *[self.initial_state[veh_id] for veh_id in self.initial_ids])
+            self.k.vehicle.add_many(
+                veh_ids=self.initial_ids,
+                type_ids=type_ids,
+                edges=edges,
+                pos=pos,
+                lanes=lanes,
+                speeds=speeds)
 
         # advance the simulation in the simulator by one step
         self.k.simulation.simulation_step()
@@ -255,6 +342,10 @@ class MultiEnv(MultiAgentEnv, Env):
                 msg += '- {}: {}\n'.format(veh_id, self.initial_state[veh_id])
             raise FatalFlowError(msg=msg)
 
+        # the calls issued so far are not part of the warm-up steps
+        if self.k.tracer is not None:
+            self.k.tracer.end_reset()
+
         # perform (optional) warm-up steps before training
         for _ in range(self.env_params.warmup_steps):
             observation, _, _, _ = self.step(rl_actions=None)
@@ -262,6 +353,83 @@ class MultiEnv(MultiAgentEnv, Env):
         # render a frame
         self.render(reset=True)
 
+        observation = self._observe()
+
+        # attribute the calls issued by the reset to the reset, rather than
+        # to the first step of the episode
+        if self.k.tracer is not None:
+            self.k.tracer.end_reset()
+
+        return observation
+
+    def get_batched_state(self):
+        """Return the observations of all agents as a single batch.
+
+        By default, the dict returned by ``get_state`` is stacked into an
+        array. Environments whose agents share an observation space can
+        override this method to fill the batch from the kernel in a single
+        vectorized pass, in which case ``get_state`` may simply return
+        ``self.get_batched_state().to_dict()``.
+
+        Returns
+        -------
+        BatchedObservations
+            observations of all agents
+        """
+        return BatchedObservations.from_dict(
+            self.get_state(), self.observation_space.shape[0])
+
+    def _batch_buffer(self, num_agents):
+        """Return a preallocated (num_agents, obs_dim) observation array.
+
+        The buffer is reused (and grown if needed) from one step to the next,
+        and is overwritten by the next call. Observations handed out of the
+        environment are copies of it (see ``_observe`` and ``to_dict``).
+        """
+        buf = getattr(self, '_obs_buffer', None)
+        if buf is None or len(buf) < num_agents:
+            size = max(num_agents, 0 if buf is None else 2 * len(buf))
+            buf = np.zeros((size, self.observation_space.shape[0]))
+            self._obs_buffer = buf
+        return buf[:num_agents]
+
+    def _batched_lead_obs(self, rl_ids):
+        """Return the lead observations of RL vehicles as a single batch.
+
+        The observation of every vehicle consists of its speed (normalized by
+        50 m/s), its headway (normalized by 1000 m), and the speed of its
+        leader (normalized by 50 m/s, and set to 0 if there is no leader).
+
+        Parameters
+        ----------
+        rl_ids : list of str
+            the vehicles to observe
+
+        Returns
+        -------
+        BatchedObservations
+            observations of the vehicles, stored in the buffer of the
+            environment (see ``_batch_buffer``)
+        """
+        veh = self.k.vehicle
+        obs = self._batch_buffer(len(rl_ids))
+        lead_speed = np.array(veh.get_speed(veh.get_leader(rl_ids)),
+                              dtype=float)
+        lead_speed[lead_speed == -1001] = 0
+        obs[:, 0] = np.array(veh.get_speed(rl_ids), dtype=float) / 50.0
+        obs[:, 1] = np.array(veh.get_headway(rl_ids), dtype=float) / 1000.0
+        obs[:, 2] = lead_speed / 50.0
+        return BatchedObservations(rl_ids, obs)
+
+    def _observe(self):
+        """Return the observations of the agents, batched if requested.
+
+        The batch returned to the caller owns its array, such that it remains
+        valid after the buffer of the environment is reused in the next step.
+        """
+        if self.env_params.additional_params.get('batch_obs', False):
+            batch = self.get_batched_state()
+            return BatchedObservations(batch.ids, batch.obs.copy())
         return self.get_state()
 
     def clip_actions(self, rl_actions=None):
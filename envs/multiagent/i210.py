@@ -1,10 +1,12 @@
 """Environment for training vehicles to reduce congestion in the I210."""
 
+from itertools import chain
+
 from gym.spaces import Box
 import numpy as np
 
 from flow.core.rewards import average_velocity
-from flow.envs.multiagent.base import MultiEnv
+from flow.envs.multiagent.base import MultiEnv, BatchedObservations
 
 # largest number of lanes on any given edge in the network
 MAX_LANES = 6
@@ -113,20 +115,63 @@ class I210MultiEnv(MultiEnv):
 
     def get_state(self):
         """See class definition."""
+        return self.get_batched_state().to_dict()
+
+    def get_batched_state(self):
+        """See parent class.
+
+        The observations of all RL vehicles are filled in a single pass. If
+        lead_obs is set to False, the observation of every vehicle matches
+        the concatenation of ``state_util`` and ``veh_statistics``.
+        """
+        rl_ids = self.k.vehicle.get_rl_ids()
         if self.lead_obs:
-            veh_info = {}
-            for rl_id in self.k.vehicle.get_rl_ids():
-                speed = self.k.vehicle.get_speed(rl_id)
-                headway = self.k.vehicle.get_headway(rl_id)
-                lead_speed = self.k.vehicle.get_speed(self.k.vehicle.get_leader(rl_id))
-                if lead_speed == -1001:
-                    lead_speed = 0
-                veh_info.update({rl_id: np.array([speed / 50.0, headway / 1000.0, lead_speed / 50.0])})
-        else:
-            veh_info = {rl_id: np.concatenate((self.state_util(rl_id),
-                                               self.veh_statistics(rl_id)))
-                        for rl_id in self.k.vehicle.get_rl_ids()}
-        return veh_info
+            return self._batched_lead_obs(rl_ids)
+
+        veh = self.k.vehicle
+        obs = self._batch_buffer(len(rl_ids))
+
+        # missing lanes are padded with -1 before normalization, see
+        # state_util
+        obs[:, :2 * MAX_LANES] = -1 / 1000
+        obs[:, 2 * MAX_LANES:4 * MAX_LANES] = -1 / 100
+        obs[:, 4 * MAX_LANES:6 * MAX_LANES] = -1
+
+        # the lane leaders and followers of all vehicles are flattened, such
+        # that their attributes are collected in a single call. Element i of
+        # the flattened lists corresponds to lane cols[i] of vehicle rows[i]
+        leaders = veh.get_lane_leaders(rl_ids)
+        num_lanes = np.array([len(lane_ids) for lane_ids in leaders],
+                             dtype=int)
+        rows = np.repeat(np.arange(len(rl_ids)), num_lanes)
+        cols = np.arange(len(rows)) - np.repeat(
+            np.cumsum(num_lanes) - num_lanes, num_lanes)
+
+        leader_ids = np.array(list(chain.from_iterable(leaders)), dtype=str)
+        follower_ids = np.array(list(chain.from_iterable(
+            veh.get_lane_followers(rl_ids))), dtype=str)
+        headways = list(chain.from_iterable(veh.get_lane_headways(rl_ids)))
+        tailways = list(chain.from_iterable(veh.get_lane_tailways(rl_ids)))
+        leader_speed = np.array(veh.get_speed(leader_ids.tolist()),
+                                dtype=float)
+        leader_speed[leader_ids == ''] = 0
+        follower_speed = np.array(veh.get_speed(follower_ids.tolist()),
+                                  dtype=float)
+        follower_speed[follower_ids == ''] = 0
+        all_rl_ids = list(self.k.cache.rl_ids())
+
+        obs[rows, cols] = np.array(headways, dtype=float) / 1000
+        obs[rows, MAX_LANES + cols] = np.array(tailways, dtype=float) / 1000
+        obs[rows, 2 * MAX_LANES + cols] = leader_speed / 100
+        obs[rows, 3 * MAX_LANES + cols] = follower_speed / 100
+        obs[rows, 4 * MAX_LANES + cols] = np.isin(leader_ids, all_rl_ids)
+        obs[rows, 5 * MAX_LANES + cols] = np.isin(follower_ids, all_rl_ids)
+
+        # speed and lane of the vehicles themselves, see veh_statistics
+        obs[:, -2] = np.array(veh.get_speed(rl_ids), dtype=float) / 100.0
+        obs[:, -1] = (np.array(veh.get_lane(rl_ids), dtype=float) + 1) / 10.0
+
+        return BatchedObservations(rl_ids, obs)
 
     def compute_reward(self, rl_actions, **kwargs):
         # TODO(@evinitsky) we need something way better than this. Something that adds
@@ -198,7 +243,7 @@ class I210MultiEnv(MultiEnv):
         lane_follower_speed = veh.get_lane_followers_speed(rl_id).copy()
         leader_ids = veh.get_lane_leaders(rl_id).copy()
         follower_ids = veh.get_lane_followers(rl_id).copy()
-        rl_ids = self.k.vehicle.get_rl_ids()
+        rl_ids = self.k.cache.rl_ids()
         is_leader_rl = [1 if l_id in rl_ids else 0 for l_id in leader_ids]
         is_follow_rl = [1 if f_id in rl_ids else 0 for f_id in follower_ids]
         diff = MAX_LANES - len(is_leader_rl)
@@ -1,6 +1,6 @@
 """Environment for training vehicles to reduce congestion in a merge."""
 
-from flow.envs.multiagent.base import MultiEnv
+from flow.envs.multiagent.base import MultiEnv, BatchedObservations
 from flow.core import rewards
 from gym.spaces.box import Box
 import numpy as np
@@ -97,48 +97,56 @@ class MultiAgentMergePOEnv(MultiEnv):
 
     def get_state(self, rl_id=None, **kwargs):
         """See class definition."""
-        observation = {}
-        self.leader = []
-        self.follower = []
+        return self.get_batched_state().to_dict()
+
+    def get_batched_state(self):
+        """See parent class.
+
+        The observations of all RL vehicles are filled in a single pass.
+        """
+        veh = self.k.vehicle
+        rl_ids = veh.get_rl_ids()
+        obs = self._batch_buffer(len(rl_ids))
 
         # normalizing constants
         max_speed = self.k.network.max_speed()
         max_length = self.k.network.length()
 
-        for rl_id in self.k.vehicle.get_rl_ids():
-            this_speed = self.k.vehicle.get_speed(rl_id)
-            lead_id = self.k.vehicle.get_leader(rl_id)
-            follower = self.k.vehicle.get_follower(rl_id)
-
-            if lead_id in ["", None]:
-                # in case leader is not visible
-                lead_speed = max_speed
-                lead_head = max_length
-            else:
-                self.leader.append(lead_id)
-                lead_speed = self.k.vehicle.get_speed(lead_id)
-                lead_head = self.k.vehicle.get_x_by_id(lead_id) \
-                    - self.k.vehicle.get_x_by_id(rl_id) \
-                    - self.k.vehicle.get_length(rl_id)
-
-            if follower in ["", None]:
-                # in case follower is not visible
-                follow_speed = 0
-                follow_head = max_length
-            else:
-                self.follower.append(follower)
-                follow_speed = self.k.vehicle.get_speed(follower)
-                follow_head = self.k.vehicle.get_headway(follower)
-
-            observation[rl_id] = np.array([
-                this_speed / max_speed,
-                (lead_speed - this_speed) / max_speed,
-                lead_head / max_length,
-                (this_speed - follow_speed) / max_speed,
-                follow_head / max_length
-            ])
-
-        return observation
+        lead_ids = veh.get_leader(rl_ids)
+        follow_ids = veh.get_follower(rl_ids)
+        self.leader = [v for v in lead_ids if v not in ["", None]]
+        self.follower = [v for v in follow_ids if v not in ["", None]]
+
+        this_speed = np.array(veh.get_speed(rl_ids), dtype=float)
+
+        # in case the leader or follower is not visible
+        has_lead = np.array([v not in ["", None] for v in lead_ids],
+                            dtype=bool)
+        has_follow = np.array([v not in ["", None] for v in follow_ids],
+                              dtype=bool)
+
+        lead_speed = np.where(
+            has_lead, np.array(veh.get_speed(lead_ids), dtype=float),
+            max_speed)
+        lead_head = np.where(
+            has_lead,
+            np.array(veh.get_x_by_id(lead_ids), dtype=float)
+            - np.array(veh.get_x_by_id(rl_ids), dtype=float)
+            - np.array(veh.get_length(rl_ids), dtype=float),
+            max_length)
+        follow_speed = np.where(
+            has_follow, np.array(veh.get_speed(follow_ids), dtype=float), 0)
+        follow_head = np.where(
+            has_follow, np.array(veh.get_headway(follow_ids), dtype=float),
+            max_length)
+
+        obs[:, 0] = this_speed / max_speed
+        obs[:, 1] = (lead_speed - this_speed) / max_speed
+        obs[:, 2] = lead_head / max_length
+        obs[:, 3] = (this_speed - follow_speed) / max_speed
+        obs[:, 4] = follow_head / max_length
+
+        return BatchedObservations(rl_ids, obs)
 
     def compute_reward(self, rl_actions, **kwargs):
         """See class definition."""
@@ -11,6 +11,7 @@ from gym.spaces.discrete import Discrete
 from flow.core import rewards
 from flow.envs.traffic_light_grid import TrafficLightGridPOEnv
 from flow.envs.multiagent import MultiEnv
+from flow.envs.multiagent.base import BatchedObservations
 
 ADDITIONAL_ENV_PARAMS = {
     # num of nearby lights the agent can observe {0, ..., num_traffic_lights-1}
@@ -57,6 +58,66 @@ class MultiTrafficLightGridPOEnv(TrafficLightGridPOEnv, MultiEnv):
         self.num_local_edges = env_params.additional_params.get(
             "num_local_edges", 4)
 
+        # index of the topology of the grid, used to assemble observations
+        self._build_topology()
+
+    def _build_topology(self):
+        """Precompute the topology of the grid as integer arrays.
+
+        The following attributes are created, so that observations can be
+        assembled by indexing arrays of per-edge and per-light quantities:
+
+        * _tl_ids: traffic light IDs, in the order of the observations
+        * _tl_nums: node number of every traffic light ID
+        * _tl_node_nums: node number of every light, as an array
+        * _tl_local_edges: for every light, the indices (in the edge list of
+          the network) of the edges leaving its node
+        * _tl_local_lights: for every light, the node numbers of itself and of
+          the lights on its top, bottom, left and right (-1 if missing)
+        * _node_edges: edges leaving every node, indexed by node number
+        * _node_edge_lengths: lengths of these edges
+        * _node_edge_numbers: normalized edge numbers (see _convert_edge) of
+          these edges
+        * _edge_lengths: length of every edge in the edge list
+        * _max_speed: largest speed limit in the network
+        """
+        edge_list = self.k.network.get_edge_list()
+        edge_index = {edge: i for i, edge in enumerate(edge_list)}
+        num_edges = self.k.network.network.num_edges - 1
+
+        self._edge_lengths = np.array(
+            [self.k.network.edge_length(edge) for edge in edge_list],
+            dtype=float)
+        self._max_speed = max(
+            self.k.network.speed_limit(edge) for edge in edge_list)
+
+        # edges leaving every node, ordered by node number
+        node_edges = {int(node_id.split("center")[ID_IDX]): edges
+                      for node_id, edges in self.network.node_mapping}
+        self._node_edges = [node_edges[node] for node in sorted(node_edges)]
+        self._node_edge_lengths = np.array(
+            [[self.k.network.edge_length(edge) for edge in edges]
+             for edges in self._node_edges], dtype=float)
+        self._node_edge_numbers = np.array(
+            [[self._convert_edge(edge) / num_edges for edge in edges]
+             for edges in self._node_edges], dtype=float)
+
+        self._tl_ids = list(self.k.traffic_light.get_ids())
+        self._tl_nums = {tl_id: int(tl_id.split("center")[ID_IDX])
+                         for tl_id in self._tl_ids}
+        self._tl_node_nums = np.array(
+            [self._tl_nums[tl_id] for tl_id in self._tl_ids], dtype=int)
+        self._tl_local_edges = np.array(
+            [[edge_index[edge] for edge in node_edges[self._tl_nums[tl_id]]]
+             for tl_id in self._tl_ids], dtype=int).reshape(
+                 len(self._tl_ids), -1)
+        self._tl_local_lights = np.array(
+            [[self._tl_nums[tl_id]] +
+             [self._get_relative_node(tl_id, direction)
+              for direction in ("top", "bottom", "left", "right")]
+             for tl_id in self._tl_ids], dtype=int).reshape(
+                 len(self._tl_ids), -1)
+
     @property
     def observation_space(self):
         """State space that is partially observed.
@@ -99,72 +160,53 @@ class MultiTrafficLightGridPOEnv(TrafficLightGridPOEnv, MultiEnv):
         included), gives the traffic light information, including the last
         change time, light direction (i.e. phase), and a currently_yellow flag.
         """
+        return self.get_batched_state().to_dict()
+
+    def get_batched_state(self):
+        """See parent class.
+
+        The observations of all lights are assembled by indexing per-node,
+        per-edge and per-light arrays with the topology computed in
+        _build_topology.
+        """
         # Normalization factors
-        max_speed = max(
-            self.k.network.speed_limit(edge)
-            for edge in self.k.network.get_edge_list())
+        max_speed = self._max_speed
         grid_array = self.net_params.additional_params["grid_array"]
         max_dist = max(grid_array["short_length"], grid_array["long_length"],
                        grid_array["inner_length"])
 
-        # TODO(cathywu) refactor TrafficLightGridPOEnv with convenience
-        # methods for observations, but remember to flatten for single-agent
-
-        # Observed vehicle information
-        speeds = []
-        dist_to_intersec = []
-        edge_number = []
+        # Observed vehicle information, one row per node. Missing vehicles
+        # are padded with a speed and distance of 1, and an edge number of 0.
+        num_observed = self.num_observed
+        num_nodes = len(self._node_edges)
+        speeds = np.ones((num_nodes, 4 * num_observed))
+        dist_to_intersec = np.ones((num_nodes, 4 * num_observed))
+        edge_number = np.zeros((num_nodes, 4 * num_observed))
         all_observed_ids = []
-        for _, edges in self.network.node_mapping:
-            local_speeds = []
-            local_dists_to_intersec = []
-            local_edge_numbers = []
-            for edge in edges:
+        for node, edges in enumerate(self._node_edges):
+            for i, edge in enumerate(edges):
                 observed_ids = \
-                    self.get_closest_to_intersection(edge, self.num_observed)
+                    self.get_closest_to_intersection(edge, num_observed)
                 all_observed_ids.append(observed_ids)
 
-                # check which edges we have so we can always pad in the right
-                # positions
-                local_speeds.extend(
-                    [self.k.vehicle.get_speed(veh_id) / max_speed for veh_id in
-                     observed_ids])
-                local_dists_to_intersec.extend([(self.k.network.edge_length(
-                    self.k.vehicle.get_edge(
-                        veh_id)) - self.k.vehicle.get_position(
-                    veh_id)) / max_dist for veh_id in observed_ids])
-                local_edge_numbers.extend([self._convert_edge(
-                    self.k.vehicle.get_edge(veh_id)) / (
-                    self.k.network.network.num_edges - 1) for veh_id in
-                                           observed_ids])
-
-                if len(observed_ids) < self.num_observed:
-                    diff = self.num_observed - len(observed_ids)
-                    local_speeds.extend([1] * diff)
-                    local_dists_to_intersec.extend([1] * diff)
-                    local_edge_numbers.extend([0] * diff)
-
-            speeds.append(local_speeds)
-            dist_to_intersec.append(local_dists_to_intersec)
-            edge_number.append(local_edge_numbers)
+                cols = slice(i * num_observed,
+                             i * num_observed + len(observed_ids))
+                speeds[node, cols] = np.array(
+                    self.k.vehicle.get_speed(observed_ids)) / max_speed
+                dist_to_intersec[node, cols] = (
+                    self._node_edge_lengths[node, i] -
+                    np.array(self.k.vehicle.get_position(observed_ids))
+                ) / max_dist
+                edge_number[node, cols] = self._node_edge_numbers[node, i]
+        self.observed_ids = all_observed_ids
 
         # Edge information
-        density = []
-        velocity_avg = []
-        for edge in self.k.network.get_edge_list():
-            ids = self.k.vehicle.get_ids_by_edge(edge)
-            if len(ids) > 0:
-                # TODO(cathywu) Why is there a 5 here?
-                density += [5 * len(ids) / self.k.network.edge_length(edge)]
-                velocity_avg += [np.mean(
-                    [self.k.vehicle.get_speed(veh_id) for veh_id in
-                     ids]) / max_speed]
-            else:
-                density += [0]
-                velocity_avg += [0]
-        density = np.array(density)
-        velocity_avg = np.array(velocity_avg)
-        self.observed_ids = all_observed_ids
+        edge_list = self.k.network.get_edge_list()
+        num_vehicles = self.k.vehicle.get_num_vehicles_by_edge(edge_list)
+        velocity_avg = \
+            self.k.vehicle.get_mean_speed_by_edge(edge_list) / max_speed
+        # TODO(cathywu) Why is there a 5 here?
+        density = 5 * num_vehicles / self._edge_lengths
 
         # Traffic light information
         direction = self.direction.flatten()
@@ -176,28 +218,17 @@ class MultiTrafficLightGridPOEnv(TrafficLightGridPOEnv, MultiEnv):
         direction = np.append(direction, [0])
         currently_yellow = np.append(currently_yellow, [1])
 
-        obs = {}
         # TODO(cathywu) allow differentiation between rl and non-rl lights
-        node_to_edges = self.network.node_mapping
-        for rl_id in self.k.traffic_light.get_ids():
-            rl_id_num = int(rl_id.split("center")[ID_IDX])
-            local_edges = node_to_edges[rl_id_num][1]
-            local_edge_numbers = [self.k.network.get_edge_list().index(e)
-                                  for e in local_edges]
-            local_id_nums = [rl_id_num, self._get_relative_node(rl_id, "top"),
-                             self._get_relative_node(rl_id, "bottom"),
-                             self._get_relative_node(rl_id, "left"),
-                             self._get_relative_node(rl_id, "right")]
-
-            observation = np.array(np.concatenate(
-                [speeds[rl_id_num], dist_to_intersec[rl_id_num],
-                 edge_number[rl_id_num], density[local_edge_numbers],
-                 velocity_avg[local_edge_numbers],
-                 direction[local_id_nums], currently_yellow[local_id_nums]
-                 ]))
-            obs.update({rl_id: observation})
-
-        return obs
+        nodes = self._tl_node_nums
+        local_edges = self._tl_local_edges
+        local_lights = self._tl_local_lights
+        obs = np.concatenate(
+            [speeds[nodes], dist_to_intersec[nodes], edge_number[nodes],
+             density[local_edges], velocity_avg[local_edges],
+             direction[local_lights], currently_yellow[local_lights]],
+            axis=1)
+
+        return BatchedObservations(self._tl_ids, obs)
 
     def _apply_rl_actions(self, rl_actions):
         """
@@ -206,7 +237,7 @@ class MultiTrafficLightGridPOEnv(TrafficLightGridPOEnv, MultiEnv):
         Issues action for each traffic light agent.
         """
         for rl_id, rl_action in rl_actions.items():
-            i = int(rl_id.split("center")[ID_IDX])
+            i = self._tl_nums[rl_id]
             if self.discrete:
                 raise NotImplementedError
             else:
@@ -1,5 +1,7 @@
 """Empty init file to ensure documentation for the renderer is created."""
 
 from flow.renderer.pyglet_renderer import PygletRenderer
+from flow.renderer.numpy_renderer import NumpyRenderer
+from flow.renderer.ring_buffer import RingBuffer
 
-__all__ = ['PygletRenderer']
+__all__ = ['PygletRenderer', 'NumpyRenderer', 'RingBuffer']
@@ -0,0 +1,475 @@
+"""Contains the headless numpy renderer class."""
+
+import matplotlib.cm as cm
+import matplotlib.colors as colors
+import numpy as np
+import os
+from os.path import expanduser
+import time
+from flow.renderer.recorder import RenderRecorder
+from flow.renderer.sights import crop_sights
+HOME = expanduser("~")
+
+# color of the background, lanes, and vehicles in the static rendering modes
+BACKGROUND_COLOR = [32, 32, 32]
+LANE_COLOR = [224, 224, 224]
+STATIC_COLORS = {
+    "rgb": ([0, 225, 0], [0, 150, 200]),
+    "gray": ([100, 100, 100], [150, 150, 150]),
+}
+
+# maximum distance between consecutive points sampled along lines, in pixels
+LINE_STEP = 0.5
+
+
+class NumpyRenderer(object):
+    """Numpy Renderer class.
+
+    Headless, CPU-only alternative to the PygletRenderer, exposing the same
+    interface. No display or OpenGL context is needed, making this renderer
+    suited to pixel-based training on compute nodes.
+
+    The lane polygons are rasterised once, when the renderer is created, into
+    a cached background image. Every frame is then produced by copying this
+    image and filling the vehicle triangles (and, optionally, the outline of
+    the observation radius of RL vehicles) for all vehicles at once through
+    vectorised point-in-triangle tests. Local observations are cropped
+    directly from the frame array, using a precomputed circular mask.
+
+    Frames are stored in BGR order, in the same way as the PygletRenderer.
+
+    Attributes
+    ----------
+    recorder : flow.renderer.recorder.RenderRecorder
+        Recorder streaming frames and vehicle data to disk when save_render
+        is set to True.
+    mode : str
+
+        * "gray": static grayscale rendering, which is good for training
+        * "dgray": dynamic grayscale rendering
+        * "rgb": static RGB rendering
+        * "drgb": dynamic RGB rendering, which is good for visualization
+
+    save_render : bool
+        Specify whether to save rendering data to disk
+    path : str
+        Specify where to store the rendering data
+    sight_radius : int
+        Set the radius of observation for RL vehicles (meter)
+    show_radius : bool
+        Specify whether to render the radius of RL observation
+    time : int
+        Rendering time that increments by one with every render() call
+    lane_polys : list
+        A list of road network polygons, in pixel coordinates
+    width : int
+        Width of the frame
+    height : int
+        Height of the frame
+    x_shift : float
+        The shift substracted to the input x coordinate
+    x_scale : float
+        The scale multiplied to the input x coordinate
+    y_shift : float
+        The shift substracted to the input y coordinate
+    y_scale : float
+        The scale multiplied to the input y coordinate
+    network : numpy.ndarray
+        The cached background image, containing the rasterised lanes
+    frame : numpy.ndarray
+        An array of size height x width x 3 containing the last frame
+    pxpm : int
+        Specify rendering resolution (pixel / meter)
+    """
+
+    def __init__(self, network, mode,
+                 save_render=False,
+                 path=HOME+"/flow_rendering",
+                 sight_radius=50,
+                 show_radius=False,
+                 pxpm=2,
+                 alpha=1.0,
+                 fps=10):
+        """Initialize Numpy Renderer.
+
+        Parameters
+        ----------
+        network : list of list
+            A list of road network polygons. Each polygon is expressed as
+            a list of x and y coordinates, e.g., [x1, y1, x2, y2, ...]
+        mode : str
+
+            * "gray": static grayscale rendering, which is good for training
+            * "dgray": dynamic grayscale rendering
+            * "rgb": static RGB rendering
+            * "drgb": dynamic RGB rendering, which is good for visualization
+
+        save_render : bool
+            Specify whether to save rendering data to disk
+        path : str
+            Specify where to store the rendering data
+        sight_radius : int
+            Set the radius of observation for RL vehicles (meter)
+        show_radius : bool
+            Specify whether to render the radius of RL observation
+        pxpm : int
+            Specify rendering resolution (pixel / meter)
+        alpha : int
+            Specify opacity of the vehicles and lanes.
+            1.0 is fully opaque; 0.0 is fully transparent.
+        fps : float
+            Frame rate of the saved video. One frame is rendered per
+            simulation step.
+        """
+        self.mode = mode
+        if self.mode not in ["rgb", "drgb", "gray", "dgray"]:
+            raise ValueError("Mode %s is not supported!" % self.mode)
+        self.save_render = save_render
+        self.path = path + '/' + time.strftime("%Y-%m-%d-%H%M%S")
+        if self.save_render:
+            if not os.path.exists(path):
+                os.mkdir(path)
+            os.mkdir(self.path)
+            self.recorder = RenderRecorder(self.path, network, fps=fps)
+        self.sight_radius = sight_radius
+        self.pxpm = pxpm  # Pixel per meter
+        self.show_radius = show_radius
+        self.alpha = alpha
+        self.time = 0
+
+        lane_polys_flat = [pt for poly in network for pt in poly]
+
+        polys_x = np.asarray(lane_polys_flat[::2])
+        width = int(polys_x.max() - polys_x.min())
+        shift = polys_x.min() - 2
+        scale = (width - 4) / width
+        self.width = (width + 2*self.sight_radius) * self.pxpm
+        self.x_shift = shift - self.sight_radius
+        self.x_scale = scale
+
+        polys_y = np.asarray(lane_polys_flat[1::2])
+        height = int(polys_y.max() - polys_y.min())
+        shift = polys_y.min() - 2
+        scale = (height - 4) / height
+        self.height = (height + 2*self.sight_radius) * self.pxpm
+        self.y_shift = shift - self.sight_radius
+        self.y_scale = scale
+
+        self.lane_polys = []
+        for lane_poly in network:
+            lane_poly = np.asarray(lane_poly, dtype=float).reshape(-1, 2)
+            self.lane_polys.append(np.stack(self._to_pixels(
+                lane_poly[:, 0], lane_poly[:, 1]), axis=1))
+
+        # colormaps used by the dynamic rendering modes
+        if self.mode == "drgb":
+            self._cmaps = (self._truncate_colormap(cm.Greens, 0.2, 0.8),
+                           self._truncate_colormap(cm.Blues, 0.2, 0.8))
+        elif self.mode == "dgray":
+            self._cmaps = (self._truncate_colormap(cm.binary, 0.55, 0.95),
+                           self._truncate_colormap(cm.binary, 0.05, 0.45))
+
+        # pixel offsets covering the bounding box of any vehicle triangle,
+        # relative to the pixel containing the front of the vehicle
+        reach = int(np.ceil(1.05 * 5 * self.pxpm *
+                            max(self.x_scale, self.y_scale))) + 1
+        dy, dx = np.mgrid[-reach:reach + 1, -reach:reach + 1]
+        self._tri_dx = dx.ravel()
+        self._tri_dy = dy.ravel()
+
+        # pre-rasterise the lanes into the background image
+        self.network = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        self.network[:] = BACKGROUND_COLOR[::-1]
+        self._draw_lines(self.network, self.lane_polys, LANE_COLOR)
+        self.frame = self.network.copy()
+        print('Rendering with frame {} x {}...'.format(self.width, self.height))
+
+    def render(self,
+               human_orientations,
+               machine_orientations,
+               human_dynamics,
+               machine_dynamics,
+               human_logs,
+               machine_logs):
+        """Update the rendering frame.
+
+        Parameters
+        ----------
+        human_orientations : list
+            A list contains orientations of all human vehicles
+            An orientation is a list contains [x, y, angle].
+        machine_orientations : list
+            A list contains orientations of all RL vehicles
+            An orientation is a list contains [x, y, angle].
+        human_dynamics : list
+            A list contains the speed of all human vehicles normalized by
+            max speed, i.e., speed/max_speed
+            This is used to dynamically color human vehicles based on its
+            velocity.
+        machine_dynamics : list
+            A list contains the speed of all RL vehicles normalized by
+            max speed, i.e., speed/max_speed
+            This is used to dynamically color RL vehicles based on its
+            velocity.
+        human_logs : list
+            A list contains the timestep (ms), timedelta (ms), and id of
+            all human vehicles
+        machine_logs : list
+            A list contains the timestep (ms), timedelta (ms), and id of
+            all RL vehicles
+        """
+        self.time += 1
+
+        if self.mode in ["drgb", "dgray"]:
+            human_cmap, machine_cmap = self._cmaps
+            human_colors = self._colors(human_cmap, human_dynamics)
+            machine_colors = self._colors(machine_cmap, machine_dynamics)
+        else:
+            human_color, machine_color = STATIC_COLORS[self.mode]
+            human_colors = np.tile(human_color, (len(human_dynamics), 1))
+            machine_colors = np.tile(machine_color, (len(machine_dynamics), 1))
+
+        frame = self.network.copy()
+        self._draw_triangles(frame, human_orientations, human_colors)
+        self._draw_triangles(frame, machine_orientations, machine_colors)
+        if self.show_radius:
+            self._draw_circles(frame, machine_orientations, machine_colors,
+                               self.sight_radius)
+        self.frame = frame
+
+        if self.save_render:
+            self.recorder.record(self.frame,
+                                 human_orientations, machine_orientations,
+                                 human_dynamics, machine_dynamics,
+                                 human_logs, machine_logs)
+        if "gray" in self.mode:
+            return self.frame[:, :, 0]
+        else:
+            return self.frame
+
+    def close(self):
+        """Terminate the renderer."""
+        print('Closing renderer...')
+        save_path = ''
+        if self.save_render:
+            save_path = self.recorder.close()
+        print('Goodbye!')
+        return save_path
+
+    def get_sight(self, orientation, veh_id):
+        """Return the local observation of a vehicle.
+
+        Parameters
+        ----------
+        orientation : list
+            An orientation is a list contains [x, y, angle]
+        veh_id : str
+            The vehicle to observe for
+        """
+        return self.get_sights([orientation], [veh_id])[0]
+
+    def get_sights(self, orientations, veh_ids):
+        """Return the local observations of several vehicles at once.
+
+        The circular window around every vehicle is rotated counterclockwise
+        by the angle of the vehicle, and sampled directly from the frame
+        (nearest-neighbor sampling), for all vehicles in a single pass (see
+        flow.renderer.sights.crop_sights).
+
+        Parameters
+        ----------
+        orientations : list
+            A list of orientations
+            An orientation is a list contains [x, y, angle].
+        veh_ids : list of str
+            The vehicles to observe for
+
+        Returns
+        -------
+        numpy.ndarray
+            An array of size n_vehicles x 2*sight x 2*sight (x 3 in the rgb
+            modes), where sight is the sight radius in pixels
+        """
+        orientations = np.asarray(orientations, dtype=float).reshape(-1, 3)
+        x, y = self._to_pixels(orientations[:, 0], orientations[:, 1])
+        sights = crop_sights(self.frame, x, y, orientations[:, 2],
+                             int(self.sight_radius * self.pxpm))
+
+        if "gray" in self.mode:
+            sights = sights[..., 0]
+        if self.save_render:
+            self.recorder.record_sights(sights, veh_ids)
+        return sights
+
+    def _to_pixels(self, x, y):
+        """Convert network coordinates to pixel coordinates (y pointing up)."""
+        return ((x - self.x_shift) * self.x_scale * self.pxpm,
+                (y - self.y_shift) * self.y_scale * self.pxpm)
+
+    def _colors(self, cmap, dynamics):
+        """Return the [r, g, b] colors of vehicles in the dynamic modes."""
+        if len(dynamics) == 0:
+            return np.zeros((0, 3))
+        return 255 * cmap(np.asarray(dynamics, dtype=float))[:, :3]
+
+    def _paint(self, frame, x, y, colors):
+        """Blend colors into the pixels containing points.
+
+        Parameters
+        ----------
+        frame : numpy.ndarray
+            the frame to paint
+        x : numpy.ndarray
+            x pixel coordinates of the points (pointing right)
+        y : numpy.ndarray
+            y pixel coordinates of the points (pointing up)
+        colors : numpy.ndarray
+            [r, g, b] color of every point, or a single color for all points
+        """
+        cols = np.floor(x).astype(int)
+        rows = self.height - 1 - np.floor(y).astype(int)
+        valid = (cols >= 0) & (cols < self.width) & \
+            (rows >= 0) & (rows < self.height)
+        colors = np.asarray(colors, dtype=float)
+        if colors.ndim == 2:
+            colors = colors[valid]
+        rows, cols = rows[valid], cols[valid]
+
+        # frames are stored in BGR order
+        colors = colors[..., ::-1]
+        if self.alpha < 1:
+            colors = self.alpha * colors + \
+                (1 - self.alpha) * frame[rows, cols]
+        frame[rows, cols] = colors
+
+    def _draw_lines(self, frame, polys, color):
+        """Rasterise polylines by sampling points along their segments.
+
+        Parameters
+        ----------
+        frame : numpy.ndarray
+            the frame to paint
+        polys : list of numpy.ndarray
+            (n_points, 2) pixel coordinates of every polyline
+        color : list
+            [r, g, b] color of the lines
+        """
+        segments = [(poly[:-1], poly[1:]) for poly in polys if len(poly) > 1]
+        if len(segments) == 0:
+            return
+        start = np.concatenate([seg[0] for seg in segments])
+        end = np.concatenate([seg[1] for seg in segments])
+
+        # number of points sampled on every segment
+        length = np.linalg.norm(end - start, axis=1)
+        num = np.ceil(length / LINE_STEP).astype(int) + 1
+
+        # fraction of the segment covered by every sampled point
+        seg_index = np.repeat(np.arange(len(num)), num)
+        offsets = np.arange(num.sum()) - np.repeat(np.cumsum(num) - num, num)
+        frac = offsets / np.maximum(num[seg_index] - 1, 1)
+
+        points = start[seg_index] + \
+            frac[:, None] * (end[seg_index] - start[seg_index])
+        self._paint(frame, points[:, 0], points[:, 1], color)
+
+    def _draw_triangles(self, frame, orientations, colors):
+        """Fill the triangles of all vehicles at once.
+
+        Parameters
+        ----------
+        frame : numpy.ndarray
+            the frame to paint
+        orientations : list
+            A list of orientations
+            An orientation is a list contains [x, y, angle].
+        colors : numpy.ndarray
+            [r, g, b] color of every vehicle
+        """
+        if len(orientations) == 0:
+            return
+        orientations = np.asarray(orientations, dtype=float).reshape(-1, 3)
+        cx, cy = self._to_pixels(orientations[:, 0], orientations[:, 1])
+        ang = np.radians(orientations[:, 2])
+
+        # vertices of the triangles (same geometry as the PygletRenderer)
+        s = 5 * self.pxpm
+        sx, sy = s * self.x_scale, s * self.y_scale
+        bx, by = cx - sx * np.sin(ang), cy - sy * np.cos(ang)
+        ox = 0.25 * sx * np.sin(np.pi/2 - ang)
+        oy = 0.25 * sy * np.cos(np.pi/2 - ang)
+        vx = np.stack([cx, bx + ox, bx - ox], axis=1)[:, :, None]
+        vy = np.stack([cy, by - oy, by + oy], axis=1)[:, :, None]
+
+        # centers of the candidate pixels of every vehicle
+        px = np.floor(cx)[:, None] + self._tri_dx[None, :] + 0.5
+        py = np.floor(cy)[:, None] + self._tri_dy[None, :] + 0.5
+
+        # a pixel is inside a triangle if it is on the same side of all edges
+        inside_pos = np.ones(px.shape, dtype=bool)
+        inside_neg = np.ones(px.shape, dtype=bool)
+        for i in range(3):
+            j = (i + 1) % 3
+            cross = (vx[:, j] - vx[:, i]) * (py - vy[:, i]) - \
+                (vy[:, j] - vy[:, i]) * (px - vx[:, i])
+            inside_pos &= cross >= 0
+            inside_neg &= cross <= 0
+        inside = inside_pos | inside_neg
+
+        veh_index = np.nonzero(inside)[0]
+        self._paint(frame, px[inside], py[inside],
+                    np.asarray(colors, dtype=float)[veh_index])
+
+    def _draw_circles(self, frame, orientations, colors, radius):
+        """Draw the outline of a circle around all vehicles at once.
+
+        Parameters
+        ----------
+        frame : numpy.ndarray
+            the frame to paint
+        orientations : list
+            A list of orientations
+            An orientation is a list contains [x, y, angle].
+        colors : numpy.ndarray
+            [r, g, b] color of every vehicle
+        radius : float
+            The radius of the circles (meter)
+        """
+        if len(orientations) == 0 or radius == 0:
+            return
+        orientations = np.asarray(orientations, dtype=float).reshape(-1, 3)
+        cx, cy = self._to_pixels(orientations[:, 0], orientations[:, 1])
+
+        radius = radius * self.pxpm
+        num = max(8, int(np.ceil(2 * np.pi * radius / LINE_STEP)))
+        angles = np.linspace(0, 2 * np.pi, num, endpoint=False)
+        x = cx[:, None] + radius * self.x_scale * np.cos(angles)[None, :]
+        y = cy[:, None] + radius * self.y_scale * np.sin(angles)[None, :]
+        self._paint(frame, x.ravel(), y.ravel(),
+                    np.repeat(np.asarray(colors, dtype=float), num, axis=0))
+
+    @staticmethod
+    def _truncate_colormap(cmap, minval=0.25, maxval=0.75, n=100):
+        """Truncate a matplotlib colormap.
+
+        Parameters
+        ----------
+        cmap : matplotlib.colors.LinearSegmentedColormap
+            Original colormap
+        minval : float
+            Minimum value of the truncated colormap
+        maxval : float
+            Maximum value of the truncated colormap
+        n : int
+            Number of RGB quantization levels of the truncated colormap
+
+        Returns
+        -------
+        matplotlib.colors.LinearSegmentedColormap
+            truncated colormap
+        """
+        new_cmap = colors.LinearSegmentedColormap.from_list(
+            'trunc({n},{a:.2f},{b:.2f})'
+            .format(n=cmap.name, a=minval, b=maxval),
+            cmap(np.linspace(minval, maxval, n)))
+        return new_cmap
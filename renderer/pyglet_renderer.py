@@ -11,6 +11,8 @@ from os.path import expanduser
 import time
 import copy
 import warnings
+from flow.renderer.recorder import RenderRecorder
+from flow.renderer.sights import crop_sights
 HOME = expanduser("~")
 
 
@@ -23,9 +25,9 @@ class PygletRenderer(object):
 
     Attributes
     ----------
-    data : list
-        A list of rendering data to be saved when save_render is set to
-        True.
+    recorder : flow.renderer.recorder.RenderRecorder
+        Recorder streaming frames and vehicle data to disk when save_render
+        is set to True.
     mode : str or bool
 
         * False: no rendering
@@ -76,7 +78,8 @@ class PygletRenderer(object):
                  sight_radius=50,
                  show_radius=False,
                  pxpm=2,
-                 alpha=1.0):
+                 alpha=1.0,
+                 fps=10):
         """Initialize Pyglet Renderer.
 
         Parameters
@@ -106,6 +109,9 @@ class PygletRenderer(object):
         alpha : int
             Specify opacity of the alpha channel.
             1.0 is fully opaque; 0.0 is fully transparent.
+        fps : float
+            Frame rate of the saved video. One frame is rendered per
+            simulation step.
         """
         self.mode = mode
         if self.mode not in [True, False, "rgb", "drgb", "gray", "dgray"]:
@@ -116,7 +122,7 @@ class PygletRenderer(object):
             if not os.path.exists(path):
                 os.mkdir(path)
             os.mkdir(self.path)
-            self.data = [network]
+            self.recorder = RenderRecorder(self.path, network, fps=fps)
         self.sight_radius = sight_radius
         self.pxpm = pxpm  # Pixel per meter
         self.show_radius = show_radius
@@ -145,6 +151,12 @@ class PygletRenderer(object):
         self.y_shift = shift - self.sight_radius
         self.y_scale = scale
 
+        # circular mask used to extract the local observations of vehicles
+        sight_px = int(self.sight_radius * self.pxpm)
+        self._sight_mask = np.zeros((2*sight_px, 2*sight_px), np.uint8)
+        cv2.circle(self._sight_mask, (sight_px, sight_px), sight_px,
+                   (255, 255, 255), thickness=-1)
+
         self.lane_colors = []
         for lane_poly in self.lane_polys:
             lane_poly[::2] = [(x-self.x_shift)*self.x_scale*self.pxpm
@@ -212,14 +224,6 @@ class PygletRenderer(object):
             A list contains the timestep (ms), timedelta (ms), and id of
             all RL vehicles
         """
-        if self.save_render:
-            _human_orientations = copy.deepcopy(human_orientations)
-            _machine_orientations = copy.deepcopy(machine_orientations)
-            _human_dynamics = copy.deepcopy(human_dynamics)
-            _machine_dynamics = copy.deepcopy(machine_dynamics)
-            _human_logs = copy.deepcopy(human_logs)
-            _machine_logs = copy.deepcopy(machine_logs)
-
         self.time += 1
 
         pyglet.gl.glClearColor(0.125, 0.125, 0.125, self.alpha)
@@ -293,11 +297,10 @@ class PygletRenderer(object):
         self.window.flip()
 
         if self.save_render:
-            cv2.imwrite("%s/frame_%06d.png" %
-                        (self.path, self.time), self.frame)
-            self.data.append([_human_orientations, _machine_orientations,
-                              _human_dynamics, _machine_dynamics,
-                              _human_logs, _machine_logs])
+            self.recorder.record(self.frame,
+                                 human_orientations, machine_orientations,
+                                 human_dynamics, machine_dynamics,
+                                 human_logs, machine_logs)
         if "gray" in self.mode:
             return self.frame[:, :, 0]
         else:
@@ -308,8 +311,7 @@ class PygletRenderer(object):
         print('Closing renderer...')
         save_path = ''
         if self.save_render:
-            save_path = '%s/data_%06d.npy' % (self.path, self.time)
-            np.save(save_path, self.data)
+            save_path = self.recorder.close()
         self.window.close()
         print('Goodbye!')
         return save_path
@@ -336,20 +338,50 @@ class PygletRenderer(object):
         y_max = int(y_med + sight_radius)
         fixed_sight = self.frame[y_min:y_max, x_min:x_max]
         height, width = fixed_sight.shape[0:2]
-        mask = np.zeros((height, width), np.uint8)
-        cv2.circle(mask, (int(sight_radius), int(sight_radius)),
-                   int(sight_radius), (255, 255, 255), thickness=-1)
+        mask = self._sight_mask[:height, :width]
         rotated_sight = cv2.bitwise_and(fixed_sight, fixed_sight, mask=mask)
         rotated_sight = imutils.rotate(rotated_sight, ang)
 
+        if "gray" in self.mode:
+            rotated_sight = rotated_sight[:, :, 0]
         if self.save_render:
-            cv2.imwrite("%s/sight_%s_%06d.png" %
-                        (self.path, veh_id, self.time),
-                        rotated_sight)
+            self.recorder.record_sights(rotated_sight[None], [veh_id])
+        return rotated_sight
+
+    def get_sights(self, orientations, veh_ids):
+        """Return the local observations of several vehicles at once.
+
+        The circular window around every vehicle is rotated counterclockwise
+        by the angle of the vehicle, and sampled directly from the frame
+        (nearest-neighbor sampling), for all vehicles in a single pass (see
+        flow.renderer.sights.crop_sights).
+
+        Parameters
+        ----------
+        orientations : list
+            A list of orientations
+            An orientation is a list contains [x, y, angle].
+        veh_ids : list of str
+            The vehicles to observe for
+
+        Returns
+        -------
+        numpy.ndarray
+            An array of size n_vehicles x 2*sight x 2*sight (x 3 in the rgb
+            modes), where sight is the sight radius in pixels. Pixels outside
+            of the frame are set to zero.
+        """
+        orientations = np.asarray(orientations, dtype=float).reshape(-1, 3)
+        x = (orientations[:, 0]-self.x_shift)*self.x_scale*self.pxpm
+        y = (orientations[:, 1]-self.y_shift)*self.y_scale*self.pxpm
+        sights = crop_sights(self.frame, x, y, orientations[:, 2],
+                             int(self.sight_radius * self.pxpm))
+
         if "gray" in self.mode:
-            return rotated_sight[:, :, 0]
-        else:
-            return rotated_sight
+            sights = sights[..., 0]
+        if self.save_render:
+            self.recorder.record_sights(sights, veh_ids)
+        return sights
 
     def _add_lane_polys(self):
         """Render road network polygons."""
@@ -0,0 +1,346 @@
+"""Contains the streaming recorder used to save renderings to disk.
+
+When ``save_render`` is set, the renderers pass every frame to a
+RenderRecorder, which streams it to an encoder sink, and append the state of
+the rendered vehicles to a chunked log. Only a bounded number of frames or
+log rows is held in memory at any time.
+
+Two sinks are available:
+
+* FFmpegSink: raw frames are piped to an ffmpeg process, which encodes them
+  into a video file.
+* ChunkedArraySink: frames are stored, uncompressed, in a sequence of .npz
+  files containing a fixed number of frames each.
+
+Stored chunks can be read back with ``load_chunks``:
+
+    >>> frames = load_chunks(path, "frames")["frames"]
+    >>> vehicles = load_chunks(path, "vehicles")
+"""
+
+import glob
+import os
+import shutil
+import subprocess
+import numpy as np
+
+# number of rows accumulated in memory before a chunk is written to disk
+DEFAULT_CHUNK_SIZE = 256
+
+
+class ChunkedStore(object):
+    """Append-only store writing rows to disk in fixed-size chunks.
+
+    Rows are appended as named columns (numpy arrays sharing their first
+    dimension). Once ``chunk_size`` rows have been accumulated, they are
+    written to a new ``<prefix>_<index>.npz`` file and released from memory.
+    """
+
+    def __init__(self, path, prefix, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Instantiate the store.
+
+        Parameters
+        ----------
+        path : str
+            directory in which chunks are written
+        prefix : str
+            prefix of the names of the chunk files
+        chunk_size : int, optional
+            number of rows per chunk
+        """
+        self.path = path
+        self.prefix = prefix
+        self.chunk_size = chunk_size
+        self.num_chunks = 0
+        self.num_rows = 0
+        self._pending = []
+        self._pending_rows = 0
+
+    def append(self, **columns):
+        """Append rows to the store.
+
+        Parameters
+        ----------
+        columns : dict < str, array_like >
+            columns of the rows. All columns must have the same length.
+        """
+        columns = {key: np.asarray(value) for key, value in columns.items()}
+        num_rows = len(next(iter(columns.values())))
+        if num_rows == 0:
+            return
+        self._pending.append(columns)
+        self._pending_rows += num_rows
+        self.num_rows += num_rows
+        if self._pending_rows >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Write the pending rows to a new chunk."""
+        if self._pending_rows == 0:
+            return
+        keys = self._pending[0].keys()
+        chunk = {key: np.concatenate([rows[key] for rows in self._pending])
+                 for key in keys}
+        np.savez(os.path.join(self.path, "%s_%06d.npz" %
+                              (self.prefix, self.num_chunks)), **chunk)
+        self.num_chunks += 1
+        self._pending = []
+        self._pending_rows = 0
+
+    def close(self):
+        """Write the remaining rows to disk."""
+        self.flush()
+
+
+def load_chunks(path, prefix):
+    """Load and concatenate the chunks written by a ChunkedStore.
+
+    Parameters
+    ----------
+    path : str
+        directory containing the chunks
+    prefix : str
+        prefix of the names of the chunk files
+
+    Returns
+    -------
+    dict < str, numpy.ndarray >
+        the concatenated columns of all chunks
+    """
+    files = sorted(glob.glob(os.path.join(path, "%s_*.npz" % prefix)))
+    columns = {}
+    for f in files:
+        with np.load(f) as chunk:
+            for key in chunk.files:
+                columns.setdefault(key, []).append(chunk[key])
+    return {key: np.concatenate(value) for key, value in columns.items()}
+
+
+class ChunkedArraySink(object):
+    """Frame sink storing uncompressed frames in chunked .npz files.
+
+    Frames are copied into a preallocated buffer of ``chunk_size`` frames,
+    which is written to disk once full.
+    """
+
+    def __init__(self, path, chunk_size=64):
+        """Instantiate the sink.
+
+        Parameters
+        ----------
+        path : str
+            directory in which the "frames_<index>.npz" chunks are written
+        chunk_size : int, optional
+            number of frames per chunk
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.num_chunks = 0
+        self._buffer = None
+        self._index = 0
+
+    def write(self, frame):
+        """Add a frame to the sink."""
+        if self._buffer is None:
+            self._buffer = np.empty((self.chunk_size,) + frame.shape,
+                                    dtype=frame.dtype)
+        self._buffer[self._index] = frame
+        self._index += 1
+        if self._index == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered frames to a new chunk."""
+        if self._index == 0:
+            return
+        np.savez(os.path.join(self.path, "frames_%06d.npz" % self.num_chunks),
+                 frames=self._buffer[:self._index])
+        self.num_chunks += 1
+        self._index = 0
+
+    def close(self):
+        """Write the remaining frames to disk.
+
+        Returns
+        -------
+        str
+            the directory containing the chunks
+        """
+        self.flush()
+        return self.path
+
+
+class FFmpegSink(object):
+    """Frame sink piping raw frames to an ffmpeg encoder."""
+
+    def __init__(self, path, fps=10, codec="libx264"):
+        """Instantiate the sink.
+
+        The ffmpeg process is started when the first frame is written, once
+        the size of the frames is known.
+
+        Parameters
+        ----------
+        path : str
+            path of the encoded video
+        fps : float, optional
+            frame rate of the video
+        codec : str, optional
+            video codec used by ffmpeg
+        """
+        self.path = path
+        self.fps = fps
+        self.codec = codec
+        self._process = None
+
+    def _start(self, frame):
+        """Start an ffmpeg process reading frames of a given size."""
+        height, width = frame.shape[:2]
+        pix_fmt = "gray" if frame.ndim == 2 else "bgr24"
+        self._process = subprocess.Popen(
+            ["ffmpeg", "-y", "-loglevel", "error",
+             "-f", "rawvideo", "-pix_fmt", pix_fmt,
+             "-s", "%dx%d" % (width, height), "-r", str(self.fps),
+             "-i", "-", "-c:v", self.codec, "-pix_fmt", "yuv420p",
+             # yuv420p requires even frame dimensions
+             "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", self.path],
+            stdin=subprocess.PIPE)
+
+    def write(self, frame):
+        """Send a frame to the encoder."""
+        if self._process is None:
+            self._start(frame)
+        self._process.stdin.write(np.ascontiguousarray(frame).tobytes())
+
+    def close(self):
+        """Terminate the encoder.
+
+        Returns
+        -------
+        str
+            the path of the encoded video
+        """
+        if self._process is not None:
+            self._process.stdin.close()
+            self._process.wait()
+            self._process = None
+        return self.path
+
+
+class RenderRecorder(object):
+    """Stream renderings and the state of rendered vehicles to disk.
+
+    Every call to ``record`` writes the frame to the sink, and appends the
+    orientation, normalized speed, and log information of every rendered
+    vehicle to the "vehicles" chunked store, with the following columns:
+
+    * frame: index of the frame
+    * veh_id: id of the vehicle
+    * rl: whether the vehicle is rendered as an RL vehicle
+    * orientation: [x, y, angle] of the vehicle
+    * dynamics: speed of the vehicle, normalized by the max speed
+    * timestep, timedelta: the timestep and timedelta logs of the vehicle
+
+    Local observations are appended to the "sights" chunked store (columns
+    frame, veh_id, and sight).
+
+    Attributes
+    ----------
+    path : str
+        directory in which renderings are written
+    sink : FFmpegSink or ChunkedArraySink
+        sink receiving the frames
+    num_frames : int
+        number of recorded frames
+    """
+
+    def __init__(self, path, network, sink=None, fps=10,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        """Instantiate the recorder.
+
+        Parameters
+        ----------
+        path : str
+            directory in which renderings are written. Must exist.
+        network : list of list
+            road network polygons, saved to "network.npy"
+        sink : str, optional
+            sink receiving the frames, one of "ffmpeg" or "array". Defaults to
+            "ffmpeg" if ffmpeg is available, and "array" otherwise.
+        fps : float, optional
+            frame rate of the encoded video, used by the ffmpeg sink
+        chunk_size : int, optional
+            number of rows per chunk in the vehicle and sight stores
+        """
+        self.path = path
+        self.num_frames = 0
+
+        if sink is None:
+            sink = "ffmpeg" if shutil.which("ffmpeg") else "array"
+        if sink == "ffmpeg":
+            self.sink = FFmpegSink(os.path.join(path, "render.mp4"), fps=fps)
+        elif sink == "array":
+            self.sink = ChunkedArraySink(path)
+        else:
+            raise ValueError("Sink %s is not supported!" % sink)
+
+        np.save(os.path.join(path, "network.npy"),
+                np.array(network, dtype=object), allow_pickle=True)
+        self.vehicles = ChunkedStore(path, "vehicles", chunk_size)
+        self.sights = ChunkedStore(path, "sights", chunk_size)
+
+    def record(self, frame, human_orientations, machine_orientations,
+               human_dynamics, machine_dynamics, human_logs, machine_logs):
+        """Record a frame and the state of the rendered vehicles.
+
+        Parameters are the same as in the ``render`` method of the renderers.
+        """
+        self.sink.write(frame)
+
+        logs = list(human_logs) + list(machine_logs)
+        num_vehicles = len(logs)
+        if num_vehicles > 0:
+            self.vehicles.append(
+                frame=np.full(num_vehicles, self.num_frames),
+                veh_id=np.array([log[2] for log in logs], dtype=str),
+                rl=np.arange(num_vehicles) >= len(human_logs),
+                orientation=np.asarray(
+                    list(human_orientations) + list(machine_orientations),
+                    dtype=float).reshape(-1, 3),
+                dynamics=np.asarray(
+                    list(human_dynamics) + list(machine_dynamics),
+                    dtype=float),
+                timestep=np.array([log[0] for log in logs], dtype=float),
+                timedelta=np.array([log[1] for log in logs], dtype=float))
+
+        self.num_frames += 1
+
+    def record_sights(self, sights, veh_ids):
+        """Record the local observations of vehicles in the last frame.
+
+        Parameters
+        ----------
+        sights : numpy.ndarray
+            the observations, with the vehicles along the first dimension
+        veh_ids : list of str
+            the observed vehicles
+        """
+        if len(veh_ids) == 0:
+            return
+        self.sights.append(
+            frame=np.full(len(veh_ids), self.num_frames - 1),
+            veh_id=np.array(veh_ids, dtype=str),
+            sight=sights)
+
+    def close(self):
+        """Flush all pending data and terminate the sink.
+
+        Returns
+        -------
+        str
+            the directory containing the renderings
+        """
+        self.sink.close()
+        self.vehicles.close()
+        self.sights.close()
+        return self.path
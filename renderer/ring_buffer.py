@@ -0,0 +1,142 @@
+"""Contains the fixed-size ring buffer used to store rendering history."""
+
+import numpy as np
+
+
+class RingBuffer(object):
+    """Fixed-size circular buffer of numpy arrays.
+
+    The storage for all elements is allocated once, when the buffer is first
+    filled, and elements are subsequently copied into their slot rather than
+    appended to a list. Indexing is ordered from the oldest to the most recent
+    element, and returns views into the storage.
+
+    If ``ragged`` is set to True, the first dimension of the stored arrays may
+    vary between elements (e.g. the number of vehicles whose local
+    observations are stored). The storage is then sized for the largest
+    element seen so far, and grown if a larger element is added.
+
+    Usage
+    -----
+    >>> buffer = RingBuffer(5)
+    >>> buffer.fill(frame)  # all slots are set to the initial frame
+    >>> buffer.append(new_frame)  # overwrites the oldest frame
+    >>> buffer[-1]  # the most recent frame
+    >>> buffer.array()  # (5, height, width, ...) array, oldest first
+    """
+
+    def __init__(self, length, ragged=False):
+        """Instantiate an empty ring buffer.
+
+        Parameters
+        ----------
+        length : int
+            number of elements stored in the buffer
+        ragged : bool, optional
+            specifies whether the first dimension of the stored elements may
+            vary
+        """
+        self.length = length
+        self.ragged = ragged
+        self._data = None
+        self._rows = np.zeros(length, dtype=int)
+        self._start = 0
+        self._size = 0
+
+    def _allocate(self, item, capacity=None):
+        """Allocate (or grow) the storage to fit an element."""
+        shape = item.shape
+        if self.ragged:
+            shape = (max(capacity or 0, shape[0]),) + shape[1:]
+        data = np.zeros((self.length,) + shape, dtype=item.dtype)
+
+        # keep the previously stored elements when growing the storage
+        if self._data is not None and self._size > 0:
+            for i in range(self.length):
+                data[i, :self._rows[i]] = self._data[i, :self._rows[i]]
+        self._data = data
+
+    def _fits(self, item):
+        """Return whether an element fits in the current storage."""
+        if self._data is None or item.dtype != self._data.dtype:
+            return False
+        if self.ragged:
+            return item.ndim == self._data.ndim - 1 and \
+                item.shape[1:] == self._data.shape[2:] and \
+                item.shape[0] <= self._data.shape[1]
+        return item.shape == self._data.shape[1:]
+
+    def _write(self, slot, item):
+        """Copy an element into a slot of the storage."""
+        if self.ragged:
+            self._data[slot, :item.shape[0]] = item
+            self._data[slot, item.shape[0]:] = 0
+            self._rows[slot] = item.shape[0]
+        else:
+            self._data[slot] = item
+
+    def fill(self, item):
+        """Set every slot of the buffer to a copy of an element."""
+        item = np.asarray(item)
+        if not self._fits(item):
+            self._data = None
+            self._allocate(item)
+        for slot in range(self.length):
+            self._write(slot, item)
+        self._start = 0
+        self._size = self.length
+
+    def append(self, item):
+        """Add an element to the buffer, overwriting the oldest element."""
+        item = np.asarray(item)
+        if not self._fits(item):
+            if self.ragged and self._data is not None and \
+                    item.shape[1:] == self._data.shape[2:] and \
+                    item.dtype == self._data.dtype:
+                self._allocate(item, capacity=2 * self._data.shape[1])
+            else:
+                self._data = None
+                self._size = 0
+                self._start = 0
+                self._allocate(item)
+
+        if self._size < self.length:
+            slot = (self._start + self._size) % self.length
+            self._size += 1
+        else:
+            slot = self._start
+            self._start = (self._start + 1) % self.length
+        self._write(slot, item)
+
+    def __len__(self):
+        """Return the number of elements in the buffer."""
+        return self._size
+
+    def __getitem__(self, index):
+        """Return a view of an element, indexed from the oldest element."""
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('ring buffer index out of range')
+        slot = (self._start + index) % self.length
+        if self.ragged:
+            return self._data[slot, :self._rows[slot]]
+        return self._data[slot]
+
+    def __iter__(self):
+        """Iterate over the elements, from the oldest to the most recent."""
+        for index in range(self._size):
+            yield self[index]
+
+    def array(self):
+        """Return a copy of the elements, ordered from oldest to most recent.
+
+        For ragged buffers, elements are zero-padded to the largest element in
+        the buffer.
+        """
+        if self._size == 0:
+            return np.array([])
+        order = (self._start + np.arange(self._size)) % self.length
+        if self.ragged:
+            return self._data[order, :self._rows[order].max()]
+        return self._data[order]
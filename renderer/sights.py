@@ -0,0 +1,62 @@
+"""Contains the extraction of the local observations of vehicles."""
+
+import numpy as np
+
+
+def crop_sights(frame, x, y, angles, sight_px):
+    """Return the circular windows of a frame around several vehicles.
+
+    The window around every vehicle is rotated counterclockwise by the angle
+    of the vehicle, and sampled directly from the frame (nearest-neighbor
+    sampling), for all vehicles in a single pass. Pixels outside of the
+    circle or of the frame are set to zero.
+
+    Parameters
+    ----------
+    frame : numpy.ndarray
+        the rendered frame, of size height x width x 3
+    x : array_like
+        horizontal position of every vehicle, in pixels
+    y : array_like
+        vertical position of every vehicle, in pixels, with the y axis
+        pointing up (i.e. from the bottom row of the frame)
+    angles : array_like
+        angle of every vehicle, in degrees
+    sight_px : int
+        radius of the windows, in pixels
+
+    Returns
+    -------
+    numpy.ndarray
+        An array of size n_vehicles x 2*sight_px x 2*sight_px x 3
+    """
+    height, width = frame.shape[:2]
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    x_min = (x - sight_px).astype(int)[:, None, None]
+    y_min = (height - y - sight_px).astype(int)[:, None, None]
+
+    # offsets of every output pixel from the center of the window, and the
+    # circular mask, which is invariant to the rotation and is therefore
+    # applied to the output pixels directly
+    rows, cols = np.mgrid[0:2 * sight_px, 0:2 * sight_px] - sight_px
+    mask = rows ** 2 + cols ** 2 <= sight_px ** 2
+
+    # position of every output pixel in the unrotated window
+    ang = np.radians(np.asarray(angles, dtype=float))[:, None, None]
+    cos, sin = np.cos(ang), np.sin(ang)
+    src_cols = np.rint(cos * cols - sin * rows + sight_px).astype(int)
+    src_rows = np.rint(sin * cols + cos * rows + sight_px).astype(int)
+
+    rows = y_min + src_rows
+    cols = x_min + src_cols
+    valid = mask & \
+        (src_cols >= 0) & (src_cols < 2 * sight_px) & \
+        (src_rows >= 0) & (src_rows < 2 * sight_px) & \
+        (rows >= 0) & (rows < height) & \
+        (cols >= 0) & (cols < width)
+
+    sights = np.zeros((len(x), 2 * sight_px, 2 * sight_px, 3),
+                      dtype=np.uint8)
+    sights[valid] = frame[rows[valid], cols[valid]]
+    return sights
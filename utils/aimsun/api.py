@@ -4,6 +4,7 @@ import logging
 import struct
 
 import flow.utils.aimsun.constants as ac
+import flow.utils.aimsun.protocol as protocol
 import flow.utils.aimsun.struct as aimsun_struct
 from flow.core.kernel.vehicle.aimsun import INFOS_ATTR_BY_INDEX
 
@@ -54,6 +55,51 @@ def create_client(port, print_status=False):
     return s
 
 
+def make_static_info(values):
+    """Create a static info object from the values sent by the server.
+
+    Parameters
+    ----------
+    values : tuple
+        attributes of the object, in the order of protocol.STATIC_INFO_FORMAT
+
+    Returns
+    -------
+    flow.utils.aimsun.struct.StaticInfVeh
+        static info object
+    """
+    static_info = aimsun_struct.StaticInfVeh()
+
+    (static_info.report,
+     static_info.idVeh,
+     static_info.type,
+     static_info.length,
+     static_info.width,
+     static_info.maxDesiredSpeed,
+     static_info.maxAcceleration,
+     static_info.normalDeceleration,
+     static_info.maxDeceleration,
+     static_info.speedAcceptance,
+     static_info.minDistanceVeh,
+     static_info.giveWayTime,
+     static_info.guidanceAcceptance,
+     static_info.enrouted,
+     static_info.equipped,
+     static_info.tracked,
+     static_info.keepfastLane,
+     static_info.headwayMin,
+     static_info.sensitivityFactor,
+     static_info.reactionTime,
+     static_info.reactionTimeAtStop,
+     static_info.reactionTimeAtTrafficLight,
+     static_info.centroidOrigin,
+     static_info.centroidDest,
+     static_info.idsectionExit,
+     static_info.idLine) = values
+
+    return static_info
+
+
 class FlowAimsunAPI(object):
     """An API used to interact with Aimsun via a TCP connection.
 
@@ -154,6 +200,43 @@ class FlowAimsunAPI(object):
 
             return unpacked_data
 
+    def _send_bulk_command(self, command_type, body):
+        """Send a command whose input and output are length-prefixed messages.
+
+        The client sends the command type and waits for a confirmation
+        message from the server, as in _send_command. The body of the request
+        is then sent in a single length-prefixed message, and the body of the
+        (length-prefixed) response is returned.
+
+        Parameters
+        ----------
+        command_type : flow.utils.aimsun.constants.*
+            the command the client would like Aimsun to execute
+        body : bytes
+            body of the request
+
+        Returns
+        -------
+        bytes
+            body of the response
+        """
+        # send the command type to the server, and wait for a response
+        self.s.send(str(command_type).encode())
+        protocol.recv_exact(self.s, struct.calcsize('i'))
+
+        self.s.sendall(protocol.pack_frame(body))
+        return protocol.recv_frame(self.s)
+
+    def pipeline(self):
+        """Return a pipeline of commands to be sent in a single message.
+
+        Returns
+        -------
+        CommandPipeline
+            an empty pipeline, flushed through this connection
+        """
+        return CommandPipeline(self)
+
     def simulation_step(self):
         """Advance the simulation by one step.
 
@@ -414,40 +497,11 @@ class FlowAimsunAPI(object):
         flow.utils.aimsun.struct.StaticInfVeh
             static info object
         """
-        static_info = aimsun_struct.StaticInfVeh()
-
-        (static_info.report,
-         static_info.idVeh,
-         static_info.type,
-         static_info.length,
-         static_info.width,
-         static_info.maxDesiredSpeed,
-         static_info.maxAcceleration,
-         static_info.normalDeceleration,
-         static_info.maxDeceleration,
-         static_info.speedAcceptance,
-         static_info.minDistanceVeh,
-         static_info.giveWayTime,
-         static_info.guidanceAcceptance,
-         static_info.enrouted,
-         static_info.equipped,
-         static_info.tracked,
-         static_info.keepfastLane,
-         static_info.headwayMin,
-         static_info.sensitivityFactor,
-         static_info.reactionTime,
-         static_info.reactionTimeAtStop,
-         static_info.reactionTimeAtTrafficLight,
-         static_info.centroidOrigin,
-         static_info.centroidDest,
-         static_info.idsectionExit,
-         static_info.idLine) = self._send_command(
+        return make_static_info(self._send_command(
             ac.VEH_GET_STATIC,
             in_format='i',
             values=(veh_id,),
-            out_format='i i i f f f f f f f f f f i i i ? f f f f f i i i i')
-
-        return static_info
+            out_format=protocol.STATIC_INFO_FORMAT))
 
     def get_vehicle_tracking_info(self, veh_id, info_bitmap, tracked=True):
         """Return the tracking information of the specified vehicle.
@@ -503,6 +557,70 @@ class FlowAimsunAPI(object):
 
         return ret
 
+    def get_vehicles_bulk_info(self, veh_ids, info_bitmap):
+        """Return the tracking info, leaders and next sections of vehicles.
+
+        This replaces one call to get_vehicle_tracking_info,
+        get_vehicle_leader and get_next_section per vehicle (and to
+        get_vehicle_tracking_info and get_vehicle_length per leader that is
+        not part of veh_ids) with a single exchange with the server.
+
+        Parameters
+        ----------
+        veh_ids : list of int
+            names of the tracked vehicles in Aimsun
+        info_bitmap : str
+            bitmap representing the tracking info to be returned
+            (cf function make_bitmap_for_tracking in vehicle/aimsun.py)
+
+        Returns
+        -------
+        list of tuple
+            for every vehicle, a tuple consisting of:
+
+            * the tracking info of the vehicle
+              (flow.utils.aimsun.struct.InfVeh)
+            * the name of its leader (smaller than -1 if it has no leader)
+            * its next section (-1 if the vehicle is not in a section)
+            * the tracking info of the leader (flow.utils.aimsun.struct.InfVeh
+              with the attributes of protocol.LEADER_INFO_ATTRS), or None if
+              the leader is part of veh_ids or if there is no leader
+            * the length of the leader, or None
+        """
+        if len(veh_ids) == 0:
+            return []
+
+        body = self._send_bulk_command(
+            ac.VEH_GET_BULK,
+            protocol.pack_bulk_request(veh_ids, info_bitmap))
+
+        attrs = [INFOS_ATTR_BY_INDEX[i] for i, bit in enumerate(info_bitmap)
+                 if bit == '1']
+        num_attrs = len(attrs)
+        requested = set(veh_ids)
+
+        records = []
+        for record in struct.iter_unpack(
+                protocol.bulk_record_format(info_bitmap), body):
+            info = aimsun_struct.InfVeh()
+            for attr, value in zip(attrs, record):
+                setattr(info, attr, value)
+            leader, next_section = record[num_attrs:num_attrs + 2]
+
+            leader_info = None
+            leader_length = None
+            if leader >= -1 and leader not in requested:
+                leader_info = aimsun_struct.InfVeh()
+                for attr, value in zip(protocol.LEADER_INFO_ATTRS,
+                                       record[num_attrs + 2:]):
+                    setattr(leader_info, attr, value)
+                leader_length = record[-1]
+
+            records.append(
+                (info, leader, next_section, leader_info, leader_length))
+
+        return records
+
     def get_vehicle_leader(self, veh_id):
         """Return the leader of a specific vehicle.
 
@@ -650,3 +768,163 @@ class FlowAimsunAPI(object):
                            in_format='i',
                            values=(veh_id,),
                            out_format=None)
+
+
+class CommandPipeline(object):
+    """Commands queued to be sent to the Aimsun server in a single message.
+
+    Every command of FlowAimsunAPI issues at least two round trips with the
+    server. Commands queued in a pipeline are instead sent in a single
+    PIPELINE message when the pipeline is flushed, and their responses are
+    received in a single reply, such that the whole pipeline costs two round
+    trips. Queuing a command returns the index of its response in the list
+    returned by flush:
+
+        >>> pipeline = kernel_api.pipeline()
+        >>> entered = pipeline.get_entered_ids()
+        >>> exited = pipeline.get_exited_ids()
+        >>> pipeline.set_speed(veh_id, 10)
+        >>> responses = pipeline.flush()
+        >>> responses[entered], responses[exited]
+        ([3, 4], [1])
+
+    Commands are executed by the server in the order they are queued, and
+    commands without an output (e.g. set_speed) have a response of None.
+    Only the commands of protocol.PIPELINE_FORMATS can be pipelined.
+    """
+
+    def __init__(self, api):
+        """Instantiate the pipeline.
+
+        Parameters
+        ----------
+        api : FlowAimsunAPI
+            API whose connection is used to flush the pipeline
+        """
+        self.api = api
+        self._commands = []
+        self._command_types = []
+        self._converters = []
+
+    def __len__(self):
+        """Return the number of queued commands."""
+        return len(self._commands)
+
+    def send(self, command_type, values=None, converter=None):
+        """Queue a command.
+
+        Parameters
+        ----------
+        command_type : flow.utils.aimsun.constants.*
+            one of the commands of protocol.PIPELINE_FORMATS
+        values : tuple of Any or None
+            input values of the command
+        converter : callable, optional
+            function applied to the output values of the command
+
+        Returns
+        -------
+        int
+            index of the response of the command
+        """
+        self._commands.append(protocol.pack_command(command_type, values))
+        self._command_types.append(command_type)
+        self._converters.append(converter)
+        return len(self._commands) - 1
+
+    def flush(self):
+        """Send the queued commands, and return their responses.
+
+        Returns
+        -------
+        list of Any
+            responses of the queued commands, in order
+        """
+        if len(self._commands) == 0:
+            return []
+
+        body = self.api._send_bulk_command(
+            ac.PIPELINE, b''.join(self._commands))
+        responses = protocol.unpack_responses(self._command_types, body)
+        responses = [value if converter is None else converter(value)
+                     for value, converter in zip(responses, self._converters)]
+
+        self._commands = []
+        self._command_types = []
+        self._converters = []
+
+        return responses
+
+    def remove_vehicle(self, veh_id):
+        """See FlowAimsunAPI.remove_vehicle."""
+        return self.send(ac.REMOVE_VEHICLE, (veh_id,))
+
+    def set_speed(self, veh_id, speed):
+        """See FlowAimsunAPI.set_speed."""
+        return self.send(ac.VEH_SET_SPEED, (veh_id, speed))
+
+    def apply_lane_change(self, veh_id, direction):
+        """See FlowAimsunAPI.apply_lane_change."""
+        return self.send(ac.VEH_SET_LANE, (veh_id, direction))
+
+    def set_color(self, veh_id, color):
+        """See FlowAimsunAPI.set_color."""
+        r, g, b = color
+        return self.send(ac.VEH_SET_COLOR, (veh_id, r, g, b))
+
+    def set_vehicle_tracked(self, veh_id):
+        """See FlowAimsunAPI.set_vehicle_tracked."""
+        return self.send(ac.VEH_SET_TRACKED, (veh_id,))
+
+    def set_vehicle_no_tracked(self, veh_id):
+        """See FlowAimsunAPI.set_vehicle_no_tracked."""
+        return self.send(ac.VEH_SET_NO_TRACKED, (veh_id,))
+
+    def get_entered_ids(self):
+        """See FlowAimsunAPI.get_entered_ids."""
+        return self.send(ac.VEH_GET_ENTERED_IDS)
+
+    def get_exited_ids(self):
+        """See FlowAimsunAPI.get_exited_ids."""
+        return self.send(ac.VEH_GET_EXITED_IDS)
+
+    def get_vehicle_type_name(self, veh_id):
+        """See FlowAimsunAPI.get_vehicle_type_name."""
+        return self.send(ac.VEH_GET_TYPE_NAME, (veh_id,))
+
+    def get_vehicle_length(self, veh_id):
+        """See FlowAimsunAPI.get_vehicle_length."""
+        return self.send(ac.VEH_GET_LENGTH, (veh_id,), _first)
+
+    def get_vehicle_static_info(self, veh_id):
+        """See FlowAimsunAPI.get_vehicle_static_info."""
+        return self.send(ac.VEH_GET_STATIC, (veh_id,), make_static_info)
+
+    def get_vehicle_leader(self, veh_id):
+        """See FlowAimsunAPI.get_vehicle_leader."""
+        return self.send(ac.VEH_GET_LEADER, (veh_id,), _first)
+
+    def get_vehicle_follower(self, veh_id):
+        """See FlowAimsunAPI.get_vehicle_follower."""
+        return self.send(ac.VEH_GET_FOLLOWER, (veh_id,), _first)
+
+    def get_next_section(self, veh_id, section):
+        """See FlowAimsunAPI.get_next_section."""
+        return self.send(ac.VEH_GET_NEXT_SECTION, (veh_id, section), _first)
+
+    def get_traffic_light_ids(self):
+        """See FlowAimsunAPI.get_traffic_light_ids."""
+        return self.send(ac.TL_GET_IDS)
+
+    def get_traffic_light_state(self, tl_id):
+        """See FlowAimsunAPI.get_traffic_light_state."""
+        return self.send(ac.TL_GET_STATE, (tl_id,), _first)
+
+    def set_traffic_light_state(self, tl_id, link_index, state):
+        """See FlowAimsunAPI.set_traffic_light_state."""
+        return self.send(ac.TL_SET_STATE, (tl_id, link_index, state))
+
+
+def _first(values):
+    """Return the first of the output values of a command."""
+    return values[0]
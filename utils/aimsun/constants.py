@@ -105,3 +105,16 @@ TL_SET_STATE = 0x1B
 
 #: get traffic light state
 TL_GET_STATE = 0x1C
+
+
+###############################################################################
+#                                Bulk Commands                                #
+###############################################################################
+
+#: get the tracking information, leader and next section of several vehicles
+#: in a single length-prefixed message (see flow/utils/aimsun/protocol.py)
+VEH_GET_BULK = 0x1D
+
+#: execute several commands sent in a single length-prefixed message (see
+#: flow/utils/aimsun/protocol.py)
+PIPELINE = 0x1E
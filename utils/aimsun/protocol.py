@@ -0,0 +1,294 @@
+"""Binary message formats shared by the Flow and Aimsun ends of the API.
+
+This module is imported both by Flow (see flow/utils/aimsun/api.py) and by the
+Aimsun run script (see flow/utils/aimsun/run.py), which is executed by the
+Python 2.7 interpreter of Aimsun. It must therefore remain compatible with
+both versions of Python, and only depend on the standard library.
+
+Bulk messages are length-prefixed: a 4-byte unsigned integer in network byte
+order giving the size of the body, followed by the body itself.
+
+Several commands can be pipelined in a single PIPELINE message, whose body is
+the concatenation of the commands, each consisting of a header (the command
+type and the size of its payload) followed by its payload. The server executes
+the commands in order, and replies with a single message whose body is the
+concatenation of the length-prefixed responses of the commands. Payloads are
+struct-packed in network byte order, following PIPELINE_FORMATS.
+"""
+import struct
+
+import flow.utils.aimsun.constants as ac
+
+# format of the length prefix of bulk messages
+LENGTH_FORMAT = '!I'
+
+# size of the tracking information bitmaps (see INFOS_ATTR_BY_INDEX in
+# flow/core/kernel/vehicle/aimsun.py)
+BITMAP_SIZE = 21
+
+# index of the last float attribute in the tracking information bitmaps
+LAST_FLOAT_INDEX = 12
+
+# attributes of the tracking information of leaders sent by VEH_GET_BULK,
+# followed by the length of the leader
+LEADER_INFO_ATTRS = ['CurrentPos', 'distance2End', 'idSection', 'idJunction',
+                     'idSectionFrom', 'idSectionTo']
+LEADER_INFO_FORMAT = 'f f i i i i f'
+
+# format of the static information of vehicles (see VEH_GET_STATIC)
+STATIC_INFO_FORMAT = 'i i i f f f f f f f f f f i i i ? f f f f f i i i i'
+
+# format of the header of the commands of a PIPELINE message: the command type
+# and the size of its payload
+COMMAND_HEADER_FORMAT = '!iI'
+
+# input and output formats of the commands that can be pipelined. Besides
+# struct formats, 'ids' stands for an array of integers, 'str' for an utf-8
+# string, and None for an empty payload
+PIPELINE_FORMATS = {
+    ac.REMOVE_VEHICLE: ('!i', None),
+    ac.VEH_SET_SPEED: ('!i f', None),
+    ac.VEH_SET_LANE: ('!i i', None),
+    ac.VEH_SET_COLOR: ('!i i i i', None),
+    ac.VEH_SET_TRACKED: ('!i', None),
+    ac.VEH_SET_NO_TRACKED: ('!i', None),
+    ac.VEH_GET_ENTERED_IDS: (None, 'ids'),
+    ac.VEH_GET_EXITED_IDS: (None, 'ids'),
+    ac.VEH_GET_TYPE_NAME: ('!i', 'str'),
+    ac.VEH_GET_LENGTH: ('!i', '!f'),
+    ac.VEH_GET_STATIC: ('!i', '!' + STATIC_INFO_FORMAT),
+    ac.VEH_GET_LEADER: ('!i', '!i'),
+    ac.VEH_GET_FOLLOWER: ('!i', '!i'),
+    ac.VEH_GET_NEXT_SECTION: ('!i i', '!i'),
+    ac.TL_GET_IDS: (None, 'ids'),
+    ac.TL_GET_STATE: ('!i', '!i'),
+    ac.TL_SET_STATE: ('!i i i', None),
+}
+
+
+def tracking_format(info_bitmap):
+    """Return the struct format of the tracking information in a bitmap.
+
+    Parameters
+    ----------
+    info_bitmap : str
+        bitmap of the requested tracking information, e.g. "1100...0"
+
+    Returns
+    -------
+    str
+        space-separated format of the requested attributes, in order
+    """
+    return ' '.join('f' if i <= LAST_FLOAT_INDEX else 'i'
+                    for i, bit in enumerate(info_bitmap) if bit == '1')
+
+
+def bulk_record_format(info_bitmap):
+    """Return the struct format of a vehicle record of VEH_GET_BULK.
+
+    A record consists of the tracking information requested by the bitmap,
+    the ID of the leader of the vehicle (smaller than -1 if the vehicle has no
+    leader), the next section of the vehicle (-1 if the vehicle is not in a
+    section), and the tracking information and length of the leader (zeros if
+    the leader is itself part of the request).
+
+    Parameters
+    ----------
+    info_bitmap : str
+        bitmap of the requested tracking information
+
+    Returns
+    -------
+    str
+        struct format of a record, in network byte order
+    """
+    return '!' + ' '.join(
+        f for f in (tracking_format(info_bitmap), 'i i', LEADER_INFO_FORMAT)
+        if f)
+
+
+def pack_frame(body):
+    """Prefix a message body with its length."""
+    return struct.pack(LENGTH_FORMAT, len(body)) + body
+
+
+def recv_exact(sock, size):
+    """Receive exactly size bytes from a socket.
+
+    Raises
+    ------
+    IOError
+        if the connection is closed before the bytes are received
+    """
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = sock.recv(min(remaining, 65536))
+        if not chunk:
+            raise IOError('connection closed while receiving a message')
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_frame(sock):
+    """Receive a length-prefixed message, and return its body."""
+    size, = struct.unpack(LENGTH_FORMAT,
+                          recv_exact(sock, struct.calcsize(LENGTH_FORMAT)))
+    return recv_exact(sock, size)
+
+
+def pack_bulk_request(veh_ids, info_bitmap):
+    """Pack the body of a VEH_GET_BULK request.
+
+    Parameters
+    ----------
+    veh_ids : list of int
+        Aimsun IDs of the tracked vehicles
+    info_bitmap : str
+        bitmap of the requested tracking information
+    """
+    return info_bitmap.encode('ascii') + pack_values('ids', veh_ids)
+
+
+def unpack_bulk_request(body):
+    """Unpack the body of a VEH_GET_BULK request.
+
+    Returns
+    -------
+    list of int
+        Aimsun IDs of the tracked vehicles
+    str
+        bitmap of the requested tracking information
+    """
+    info_bitmap = body[:BITMAP_SIZE].decode('ascii')
+    veh_ids = unpack_values('ids', body[BITMAP_SIZE:])
+    return veh_ids, info_bitmap
+
+
+def pack_values(fmt, values):
+    """Pack the payload of a command or response.
+
+    Parameters
+    ----------
+    fmt : str or None
+        struct format of the payload, 'ids', 'str' or None (see
+        PIPELINE_FORMATS)
+    values : tuple or list of int or str or None
+        values to pack
+
+    Returns
+    -------
+    bytes
+        packed payload
+    """
+    if fmt is None:
+        return b''
+    elif fmt == 'ids':
+        return struct.pack('!%di' % len(values), *values)
+    elif fmt == 'str':
+        return values.encode('utf-8')
+    else:
+        return struct.pack(fmt, *values)
+
+
+def unpack_values(fmt, payload):
+    """Unpack the payload of a command or response.
+
+    This is the inverse of pack_values. Arrays of integers are returned as
+    lists, and struct formats as tuples.
+    """
+    if fmt is None:
+        return None
+    elif fmt == 'ids':
+        return list(struct.unpack('!%di' % (len(payload) // 4), payload))
+    elif fmt == 'str':
+        return payload.decode('utf-8')
+    else:
+        return struct.unpack(fmt, payload)
+
+
+def pack_command(command_type, values=None):
+    """Pack a command of a PIPELINE message.
+
+    Parameters
+    ----------
+    command_type : int
+        one of the commands of PIPELINE_FORMATS
+    values : tuple of Any or None
+        input values of the command
+
+    Returns
+    -------
+    bytes
+        header and payload of the command
+    """
+    payload = pack_values(PIPELINE_FORMATS[command_type][0], values)
+    return struct.pack(COMMAND_HEADER_FORMAT, command_type, len(payload)) + \
+        payload
+
+
+def unpack_commands(body):
+    """Unpack the commands of a PIPELINE message.
+
+    Returns
+    -------
+    list of (int, tuple or list or None)
+        type and input values of every command, in order
+    """
+    header_size = struct.calcsize(COMMAND_HEADER_FORMAT)
+    commands = []
+    offset = 0
+    while offset < len(body):
+        command_type, size = struct.unpack_from(
+            COMMAND_HEADER_FORMAT, body, offset)
+        offset += header_size
+        commands.append((command_type, unpack_values(
+            PIPELINE_FORMATS[command_type][0], body[offset:offset + size])))
+        offset += size
+    return commands
+
+
+def pack_responses(responses):
+    """Pack the responses to the commands of a PIPELINE message.
+
+    Parameters
+    ----------
+    responses : list of (int, Any)
+        type and output values of every command, in order
+
+    Returns
+    -------
+    bytes
+        body of the reply
+    """
+    return b''.join(
+        pack_frame(pack_values(PIPELINE_FORMATS[command_type][1], values))
+        for command_type, values in responses)
+
+
+def unpack_responses(command_types, body):
+    """Unpack the reply to a PIPELINE message.
+
+    Parameters
+    ----------
+    command_types : list of int
+        types of the pipelined commands, in order
+    body : bytes
+        body of the reply
+
+    Returns
+    -------
+    list of Any
+        output values of every command, in order
+    """
+    length_size = struct.calcsize(LENGTH_FORMAT)
+    responses = []
+    offset = 0
+    for command_type in command_types:
+        size, = struct.unpack_from(LENGTH_FORMAT, body, offset)
+        offset += length_size
+        responses.append(unpack_values(
+            PIPELINE_FORMATS[command_type][1], body[offset:offset + size]))
+        offset += size
+    return responses
@@ -8,6 +8,7 @@ sys.path.append(os.path.join(config.AIMSUN_NEXT_PATH,
                              'programming/Aimsun Next API/AAPIPython/Micro'))
 
 import flow.utils.aimsun.constants as ac
+import flow.utils.aimsun.protocol as protocol
 import AAPI as aimsun_api
 from AAPI import *
 from PyANGKernel import *
@@ -100,6 +101,257 @@ def retrieve_message(conn, out_format):
     return unpacked_data
 
 
+def get_tracking_data(tracking_info):
+    """Return the attributes of a tracking info object, in bitmap order.
+
+    Parameters
+    ----------
+    tracking_info : InfVeh
+        tracking information of a vehicle, as returned by Aimsun
+
+    Returns
+    -------
+    tuple
+        attributes of the object, in the order of INFOS_ATTR_BY_INDEX (see
+        flow/core/kernel/vehicle/aimsun.py)
+    """
+    return (
+        # tracking_info.report,
+        # tracking_info.idVeh,
+        # tracking_info.type,
+        tracking_info.CurrentPos,
+        tracking_info.distance2End,
+        tracking_info.xCurrentPos,
+        tracking_info.yCurrentPos,
+        tracking_info.zCurrentPos,
+        tracking_info.xCurrentPosBack,
+        tracking_info.yCurrentPosBack,
+        tracking_info.zCurrentPosBack,
+        tracking_info.CurrentSpeed,
+        # tracking_info.PreviousSpeed,
+        tracking_info.TotalDistance,
+        # tracking_info.SystemGenerationT,
+        # tracking_info.SystemEntranceT,
+        tracking_info.SectionEntranceT,
+        tracking_info.CurrentStopTime,
+        tracking_info.stopped,
+        tracking_info.idSection,
+        tracking_info.segment,
+        tracking_info.numberLane,
+        tracking_info.idJunction,
+        tracking_info.idSectionFrom,
+        tracking_info.idLaneFrom,
+        tracking_info.idSectionTo,
+        tracking_info.idLaneTo)
+
+
+def get_bulk_info(veh_ids, info_bitmap):
+    """Pack the body of the response to a VEH_GET_BULK command.
+
+    Parameters
+    ----------
+    veh_ids : list of int
+        ids of the tracked vehicles
+    info_bitmap : str
+        bitmap of the requested tracking information
+
+    Returns
+    -------
+    bytes
+        records of all vehicles (see protocol.bulk_record_format)
+    """
+    packer = struct.Struct(protocol.bulk_record_format(info_bitmap))
+    indices = [i for i, bit in enumerate(info_bitmap) if bit == '1']
+    requested = set(veh_ids)
+
+    records = []
+    for veh_id in veh_ids:
+        tracking_info = aimsun_api.AKIVehTrackedGetInf(veh_id)
+        data = get_tracking_data(tracking_info)
+
+        leader = aimsun_api.AKIVehGetLeaderId(veh_id)
+        if tracking_info.idSection != -1:
+            next_section = AKIVehInfPathGetNextSection(
+                veh_id, tracking_info.idSection)
+        else:
+            next_section = -1
+
+        # tracking info and length of leaders that are not part of the request
+        if leader >= -1 and leader not in requested:
+            leader_info = aimsun_api.AKIVehGetInf(leader)
+            leader_data = (leader_info.CurrentPos,
+                           leader_info.distance2End,
+                           leader_info.idSection,
+                           leader_info.idJunction,
+                           leader_info.idSectionFrom,
+                           leader_info.idSectionTo,
+                           aimsun_api.AKIVehGetStaticInf(leader).length)
+        else:
+            leader_data = (0, 0, 0, 0, 0, 0, 0)
+
+        records.append(packer.pack(*(
+            [data[i] for i in indices] + [leader, next_section] +
+            list(leader_data))))
+
+    return b''.join(records)
+
+
+def get_static_data(veh_id):
+    """Return the static information of a vehicle.
+
+    Parameters
+    ----------
+    veh_id : int
+        id of the vehicle
+
+    Returns
+    -------
+    tuple
+        attributes of the static information, in the order of
+        protocol.STATIC_INFO_FORMAT
+    """
+    static_info = aimsun_api.AKIVehGetStaticInf(veh_id)
+    return (static_info.report,
+            static_info.idVeh,
+            static_info.type,
+            static_info.length,
+            static_info.width,
+            static_info.maxDesiredSpeed,
+            static_info.maxAcceleration,
+            static_info.normalDeceleration,
+            static_info.maxDeceleration,
+            static_info.speedAcceptance,
+            static_info.minDistanceVeh,
+            static_info.giveWayTime,
+            static_info.guidanceAcceptance,
+            static_info.enrouted,
+            static_info.equipped,
+            static_info.tracked,
+            static_info.keepfastLane,
+            static_info.headwayMin,
+            static_info.sensitivityFactor,
+            static_info.reactionTime,
+            static_info.reactionTimeAtStop,
+            static_info.reactionTimeAtTrafficLight,
+            static_info.centroidOrigin,
+            static_info.centroidDest,
+            static_info.idsectionExit,
+            static_info.idLine)
+
+
+def get_type_name(veh_id):
+    """Return the name of the type of a vehicle, as an ascii string."""
+    static_info = aimsun_api.AKIVehGetStaticInf(veh_id)
+    typename = aimsun_api.AKIVehGetVehTypeName(static_info.type)
+
+    anyNonAsciiChar = aimsun_api.boolp()
+    return str(aimsun_api.AKIConvertToAsciiString(
+        typename, True, anyNonAsciiChar))
+
+
+def get_metering_ids():
+    """Return the ids of all meterings (traffic lights) in the network."""
+    meter_ids = []
+    for i in range(1, aimsun_api.ECIGetNumberMeterings() + 1):
+        struct_metering = ECIGetMeteringProperties(i)
+        meter_ids.append(struct_metering.Id)
+    return meter_ids
+
+
+def execute_pipelined_command(command_type, values):
+    """Execute a command of a PIPELINE message.
+
+    Parameters
+    ----------
+    command_type : int
+        one of the commands of protocol.PIPELINE_FORMATS
+    values : tuple or None
+        input values of the command
+
+    Returns
+    -------
+    Any
+        output values of the command, following protocol.PIPELINE_FORMATS
+    """
+    global entered_vehicles
+    global exited_vehicles
+
+    if command_type == ac.REMOVE_VEHICLE:
+        veh_id, = values
+        aimsun_api.AKIVehTrackedRemove(veh_id)
+
+    elif command_type == ac.VEH_SET_SPEED:
+        veh_id, speed = values
+        aimsun_api.AKIVehTrackedModifySpeed(veh_id, speed * 3.6)
+
+    elif command_type == ac.VEH_SET_LANE:
+        veh_id, target_lane = values
+        aimsun_api.AKIVehTrackedModifyLane(veh_id, target_lane)
+
+    elif command_type == ac.VEH_SET_COLOR:
+        pass  # TODO
+
+    elif command_type == ac.VEH_SET_TRACKED:
+        veh_id, = values
+        aimsun_api.AKIVehSetAsTracked(veh_id)
+
+    elif command_type == ac.VEH_SET_NO_TRACKED:
+        veh_id, = values
+        aimsun_api.AKIVehSetAsNoTracked(veh_id)
+
+    elif command_type == ac.VEH_GET_ENTERED_IDS:
+        output = entered_vehicles
+        entered_vehicles = []
+        return output
+
+    elif command_type == ac.VEH_GET_EXITED_IDS:
+        output = exited_vehicles
+        exited_vehicles = []
+        return output
+
+    elif command_type == ac.VEH_GET_TYPE_NAME:
+        veh_id, = values
+        return get_type_name(veh_id)
+
+    elif command_type == ac.VEH_GET_LENGTH:
+        veh_id, = values
+        return (aimsun_api.AKIVehGetStaticInf(veh_id).length,)
+
+    elif command_type == ac.VEH_GET_STATIC:
+        veh_id, = values
+        return get_static_data(veh_id)
+
+    elif command_type == ac.VEH_GET_LEADER:
+        veh_id, = values
+        return (aimsun_api.AKIVehGetLeaderId(veh_id),)
+
+    elif command_type == ac.VEH_GET_FOLLOWER:
+        veh_id, = values
+        return (aimsun_api.AKIVehGetFollowerId(veh_id),)
+
+    elif command_type == ac.VEH_GET_NEXT_SECTION:
+        veh_id, section = values
+        return (AKIVehInfPathGetNextSection(veh_id, section),)
+
+    elif command_type == ac.TL_GET_IDS:
+        return get_metering_ids()
+
+    elif command_type == ac.TL_GET_STATE:
+        meter_aimsun_id, = values
+        lane_id = 1  # TODO double check
+        return (ECIGetCurrentStateofMeteringById(meter_aimsun_id, lane_id),)
+
+    elif command_type == ac.TL_SET_STATE:
+        meter_aimsun_id, state = values[0], values[2]
+        time = AKIGetCurrentSimulationTime()  # simulation time
+        sim_step = AKIGetSimulationStepTime()
+        identity = 0
+        ECIChangeStateMeteringById(
+            meter_aimsun_id, state, time, sim_step, identity)
+
+    return None
+
+
 def threaded_client(conn):
     """Create a threaded process.
 
@@ -248,12 +500,7 @@ def threaded_client(conn):
                 send_message(conn, in_format='i', values=(0,))
                 veh_id, = retrieve_message(conn, 'i')
 
-                static_info = aimsun_api.AKIVehGetStaticInf(veh_id)
-                typename = aimsun_api.AKIVehGetVehTypeName(static_info.type)
-
-                anyNonAsciiChar = aimsun_api.boolp()
-                output = str(aimsun_api.AKIConvertToAsciiString(
-                    typename, True, anyNonAsciiChar))
+                output = get_type_name(veh_id)
 
                 send_message(conn, in_format='str', values=(output,))
 
@@ -270,37 +517,10 @@ def threaded_client(conn):
                 send_message(conn, in_format='i', values=(0,))
                 veh_id, = retrieve_message(conn, 'i')
 
-                static_info = aimsun_api.AKIVehGetStaticInf(veh_id)
-                output = (static_info.report,
-                          static_info.idVeh,
-                          static_info.type,
-                          static_info.length,
-                          static_info.width,
-                          static_info.maxDesiredSpeed,
-                          static_info.maxAcceleration,
-                          static_info.normalDeceleration,
-                          static_info.maxDeceleration,
-                          static_info.speedAcceptance,
-                          static_info.minDistanceVeh,
-                          static_info.giveWayTime,
-                          static_info.guidanceAcceptance,
-                          static_info.enrouted,
-                          static_info.equipped,
-                          static_info.tracked,
-                          static_info.keepfastLane,
-                          static_info.headwayMin,
-                          static_info.sensitivityFactor,
-                          static_info.reactionTime,
-                          static_info.reactionTimeAtStop,
-                          static_info.reactionTimeAtTrafficLight,
-                          static_info.centroidOrigin,
-                          static_info.centroidDest,
-                          static_info.idsectionExit,
-                          static_info.idLine)
+                output = get_static_data(veh_id)
 
                 send_message(conn,
-                             in_format='i i i f f f f f f f f f f i i i ? '
-                                       'f f f f f i i i i',
+                             in_format=protocol.STATIC_INFO_FORMAT,
                              values=output)
 
             elif data == ac.VEH_GET_TRACKING:
@@ -335,35 +555,8 @@ def threaded_client(conn):
                 else:
                     tracking_info = aimsun_api.AKIVehGetInf(veh_id)
 
-                data = (
-                          # tracking_info.report,
-                          # tracking_info.idVeh,
-                          # tracking_info.type,
-                          tracking_info.CurrentPos,
-                          tracking_info.distance2End,
-                          tracking_info.xCurrentPos,
-                          tracking_info.yCurrentPos,
-                          tracking_info.zCurrentPos,
-                          tracking_info.xCurrentPosBack,
-                          tracking_info.yCurrentPosBack,
-                          tracking_info.zCurrentPosBack,
-                          tracking_info.CurrentSpeed,
-                          # tracking_info.PreviousSpeed,
-                          tracking_info.TotalDistance,
-                          # tracking_info.SystemGenerationT,
-                          # tracking_info.SystemEntranceT,
-                          tracking_info.SectionEntranceT,
-                          tracking_info.CurrentStopTime,
-                          tracking_info.stopped,
-                          tracking_info.idSection,
-                          tracking_info.segment,
-                          tracking_info.numberLane,
-                          tracking_info.idJunction,
-                          tracking_info.idSectionFrom,
-                          tracking_info.idLaneFrom,
-                          tracking_info.idSectionTo,
-                          tracking_info.idLaneTo)
-                
+                data = get_tracking_data(tracking_info)
+
                 # form the output and output format according to the bitmap
                 output = []
                 in_format = ''
@@ -402,6 +595,23 @@ def threaded_client(conn):
                 next_section = AKIVehInfPathGetNextSection(veh_id, section)
                 send_message(conn, in_format='i', values=(next_section,))
 
+            elif data == ac.VEH_GET_BULK:
+                send_message(conn, in_format='i', values=(0,))
+                veh_ids, info_bitmap = protocol.unpack_bulk_request(
+                    protocol.recv_frame(conn))
+                conn.sendall(protocol.pack_frame(
+                    get_bulk_info(veh_ids, info_bitmap)))
+
+            elif data == ac.PIPELINE:
+                send_message(conn, in_format='i', values=(0,))
+                commands = protocol.unpack_commands(protocol.recv_frame(conn))
+                responses = [
+                    (command_type,
+                     execute_pipelined_command(command_type, values))
+                    for command_type, values in commands]
+                conn.sendall(protocol.pack_frame(
+                    protocol.pack_responses(responses)))
+
             elif data == ac.VEH_GET_ROUTE:
                 send_message(conn, in_format='i', values=(0,))
                 # veh_id, = retrieve_message(conn, 'i')
@@ -414,15 +624,10 @@ def threaded_client(conn):
                 while data is None:
                     data = conn.recv(256)
 
-                num_meters = aimsun_api.ECIGetNumberMeterings()
-                if num_meters == 0:
+                meter_ids = get_metering_ids()
+                if len(meter_ids) == 0:
                     output = '-1'
                 else:
-                    meter_ids = []
-                    for i in range(1, num_meters + 1):
-                        struct_metering = ECIGetMeteringProperties(i)
-                        meter_id = struct_metering.Id
-                        meter_ids.append(meter_id)
                     output = ':'.join([str(e) for e in meter_ids])
                 send_message(conn, in_format='str', values=(output,))
 
@@ -11,16 +11,28 @@ the plot by setting the input `--steps=n`.
 Note: This script assumes that the provided network has only one lane on the
 each edge, or one lane on the main highway in the case of MergeNetwork.
 
+Absolute positions are computed from the edge starts stored next to the
+emission file (see flow.core.util.save_edge_starts), which allows diagrams to
+be generated for any network. For the networks in ACCEPTABLE_NETWORKS, the
+edge starts are otherwise reconstructed from the network parameters.
+
+Large trajectory files can be processed in chunks by setting
+`--chunksize=n`, in which case at most n rows are held in memory at a time.
+Segments can then be restricted to some edges, lanes, or time window (see
+`--edges`, `--lanes`, `--start`, and `--end`), and dense diagrams can be
+aggregated per pixel by setting `--density <width> <height>`.
+
 Usage
 -----
 ::
     python time_space_diagram.py </path/to/emission>.csv </path/to/params>.json
 """
+from flow.core.util import load_edge_starts
 from flow.utils.rllib import get_flow_params
 from flow.networks import RingNetwork, FigureEightNetwork, MergeNetwork, I210SubNetwork, HighwayNetwork
 
 import argparse
-from collections import defaultdict
+import sys
 try:
     from matplotlib import pyplot as plt
 except ImportError:
@@ -34,7 +46,14 @@ import numpy as np
 import pandas as pd
 
 
-# networks that can be plotted by this method
+# column names converted for backwards compatibility with emission csv files
+COLUMN_CONVERSIONS = {
+    'time': 'time_step',
+    'lane_number': 'lane_id',
+}
+
+# networks with specific plotting procedures. Other networks can be plotted if
+# edge starts are stored with the emission file
 ACCEPTABLE_NETWORKS = [
     RingNetwork,
     FigureEightNetwork,
@@ -56,11 +75,15 @@ def import_data_from_trajectory(fp, params=dict()):
 
         * "network" (str): name of the network that was used when generating
           the emission file. Must be one of the network names mentioned in
-          ACCEPTABLE_NETWORKS,
+          ACCEPTABLE_NETWORKS, unless edge starts are stored with the
+          emission file,
         * "net_params" (flow.core.params.NetParams): network-specific
           parameters. This is used to collect the lengths of various network
           links.
 
+        Edge starts stored next to the trajectory file are used to compute the
+        absolute positions of vehicles, if available.
+
     Returns
     -------
     pd.DataFrame
@@ -69,13 +92,9 @@ def import_data_from_trajectory(fp, params=dict()):
     df = pd.read_csv(fp)
 
     # Convert column names for backwards compatibility using emissions csv
-    column_conversions = {
-        'time': 'time_step',
-        'lane_number': 'lane_id',
-    }
-    df = df.rename(columns=column_conversions)
+    df = df.rename(columns=COLUMN_CONVERSIONS)
     if 'distance' not in df.columns:
-        df['distance'] = _get_abs_pos(df, params)
+        df['distance'] = _get_abs_pos(df, params, load_edge_starts(fp))
 
     # Compute line segment ends by shifting dataframe by 1 row
     df[['next_pos', 'next_time']] = df.groupby('id')[['distance', 'time_step']].shift(-1)
@@ -98,7 +117,8 @@ def get_time_space_data(data, params):
 
         * "network" (str): name of the network that was used when generating
           the emission file. Must be one of the network names mentioned in
-          ACCEPTABLE_NETWORKS,
+          ACCEPTABLE_NETWORKS, unless edge starts are stored with the
+          emission file,
         * "net_params" (flow.core.params.NetParams): network-specific
           parameters. This is used to collect the lengths of various network
           links.
@@ -113,16 +133,7 @@ def get_time_space_data(data, params):
         in the case of I210, the nested arrays are wrapped into a dict,
         keyed on the lane number, so that each lane can be plotted
         separately.
-
-    Raises
-    ------
-    AssertionError
-        if the specified network is not supported by this method
     """
-    # check that the network is appropriate
-    assert params['network'] in ACCEPTABLE_NETWORKS, \
-        'Network must be one of: ' + ', '.join([network.__name__ for network in ACCEPTABLE_NETWORKS])
-
     # switcher used to compute the positions based on the type of network
     switcher = {
         RingNetwork: _ring_road,
@@ -132,8 +143,9 @@ def get_time_space_data(data, params):
         HighwayNetwork: _highway,
     }
 
-    # Get the function from switcher dictionary
-    func = switcher[params['network']]
+    # Get the function from switcher dictionary. Networks without a specific
+    # procedure are plotted as is.
+    func = switcher.get(params['network'], _generic)
 
     # Execute the function
     segs, data = func(data)
@@ -192,6 +204,28 @@ def _highway(data):
     return segs, data
 
 
+def _generic(data):
+    r"""Generate time and position data for networks with no specific handling.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        cleaned dataframe of the trajectory data
+
+    Returns
+    -------
+    ndarray
+        3d array (n_segments x 2 x 2) containing segments to be plotted.
+        every inner 2d array is comprised of two 1d arrays representing
+        [start time, start distance] and [end time, end distance] pairs.
+    pd.DataFrame
+        unmodified trajectory dataframe
+    """
+    segs = data[['time_step', 'distance', 'next_time', 'next_pos']].values.reshape((len(data), 2, 2))
+
+    return segs, data
+
+
 def _ring_road(data):
     r"""Generate time and position data for the ring road.
 
@@ -276,24 +310,40 @@ def _figure_eight(data):
     return segs, data
 
 
-def _get_abs_pos(df, params):
+def _get_abs_pos(df, params, edgestarts=None):
     """Compute the absolute positions from edges and relative positions.
 
     This is the variable we will ultimately use to plot individual vehicles.
 
+    The start of every edge is looked up once per unique edge id, and added to
+    the relative positions in a single vectorized operation.
+
     Parameters
     ----------
     df : pd.DataFrame
         dataframe of trajectory data
     params : dict
         flow-specific parameters
+    edgestarts : dict < str, float >, optional
+        starting position of every edge, e.g. loaded from the edge starts file
+        stored with the emission file, or the ``total_edgestarts_dict``
+        attribute of the network kernel. If not specified, the edge starts are
+        reconstructed from the network parameters for the networks in
+        ACCEPTABLE_NETWORKS.
 
     Returns
     -------
     pd.Series
-        the absolute positive for every sample
+        the absolute positive for every sample. Samples on edges without a
+        known starting position are set to NaN.
     """
-    if params['network'] == MergeNetwork:
+    if params['network'] == HighwayNetwork:
+        return df['x']
+    elif edgestarts is not None and params['network'] != FigureEightNetwork:
+        # use the provided edge starts. The figure eight always requires the
+        # reconstructed edge starts below to reorganize vehicle positions.
+        edgestarts = dict(edgestarts)
+    elif params['network'] == MergeNetwork:
         inflow_edge_len = 100
         premerge = params['net'].additional_params['pre_merge_length']
         postmerge = params['net'].additional_params['post_merge_length']
@@ -350,8 +400,6 @@ def _get_abs_pos(df, params):
             'bottom_to_top': intersection / 2 + inner,
             'right_to_left': junction + 3 * inner,
         }
-    elif params['network'] == HighwayNetwork:
-        return df['x']
     elif params['network'] == I210SubNetwork:
         edgestarts = {
             '119257914': -5.0999999999995795,
@@ -369,9 +417,18 @@ def _get_abs_pos(df, params):
             '119257908#3': 1784.7899999996537,
         }
     else:
-        edgestarts = defaultdict(float)
-
-    ret = df.apply(lambda x: x['relative_position'] + edgestarts[x['edge_id']], axis=1)
+        raise ValueError(
+            'No edge starts are available for network {}. Edge starts are '
+            'stored next to emission files generated by the simulation '
+            'kernel.'.format(getattr(params['network'], '__name__',
+                                     params['network'])))
+
+    # look up the start of every unique edge, and broadcast it to the samples
+    codes, edges = pd.factorize(df['edge_id'])
+    starts = np.array([edgestarts.get(edge, np.nan) for edge in edges] +
+                      [np.nan])  # samples with a missing edge id (code -1)
+    ret = pd.Series(df['relative_position'].values + starts[codes],
+                    index=df.index)
 
     if params['network'] == FigureEightNetwork:
         # reorganize data for space-time plot
@@ -385,6 +442,263 @@ def _get_abs_pos(df, params):
     return ret
 
 
+def iter_time_space_chunks(fp, params, chunksize=1000000, steps=1,
+                           edges=None, lanes=None, start=None, end=None):
+    """Read a trajectory file in chunks, and yield the segments of each chunk.
+
+    Trajectories spanning several chunks are connected by carrying the last
+    sample of every vehicle over to the next chunk, so that peak memory is
+    bounded by the chunk size (plus one sample per vehicle) rather than by
+    the size of the file.
+
+    Parameters
+    ----------
+    fp : str
+        file path (for the .csv formatted file)
+    params : dict
+        flow-specific parameters (see import_data_from_trajectory)
+    chunksize : int, optional
+        number of rows read at a time
+    steps : int, optional
+        rate at which steps are plotted. Only every n-th sample of every
+        vehicle is kept, and segments connect the kept samples.
+    edges : collection of str, optional
+        edges to keep. Segments are kept if they start on one of the edges.
+    lanes : collection of int, optional
+        lanes to keep. Segments are kept if they start on one of the lanes.
+    start : float, optional
+        segments starting before this time are removed
+    end : float, optional
+        segments starting after this time are removed
+
+    Yields
+    ------
+    ndarray (or dict < str, np.ndarray >)
+        segments of the chunk (see get_time_space_data)
+    pd.DataFrame
+        samples at the start of every segment of the chunk
+    """
+    edgestarts = load_edge_starts(fp)
+
+    # last sample of every vehicle in the previous chunks
+    carry = None
+    # number of samples of every vehicle in the previous chunks
+    counts = pd.Series(dtype=float)
+
+    for chunk in pd.read_csv(fp, chunksize=chunksize):
+        chunk = chunk.rename(columns=COLUMN_CONVERSIONS)
+        if 'distance' not in chunk.columns:
+            chunk['distance'] = _get_abs_pos(chunk, params, edgestarts)
+
+        # keep every n-th sample of every vehicle
+        if steps > 1:
+            index = chunk.groupby('id').cumcount().values + \
+                chunk['id'].map(counts).fillna(0).values.astype(int)
+            counts = counts.add(chunk['id'].value_counts(), fill_value=0)
+            chunk = chunk[index % steps == 0]
+
+        # compute line segment ends, continuing the trajectories of the
+        # previous chunks
+        if carry is not None:
+            chunk = pd.concat([carry, chunk])
+        shifted = chunk.groupby('id')[['distance', 'time_step']].shift(-1)
+        chunk = chunk.assign(next_pos=shifted['distance'].values,
+                             next_time=shifted['time_step'].values)
+        is_last = chunk['next_time'].isna().values
+        carry = chunk[is_last].drop(columns=['next_pos', 'next_time'])
+        chunk = chunk[~is_last]
+
+        # filter the segments by their starting sample
+        keep = np.ones(len(chunk), dtype=bool)
+        if edges is not None:
+            keep &= chunk['edge_id'].isin(edges).values
+        if lanes is not None:
+            keep &= chunk['lane_id'].isin(lanes).values
+        if start is not None:
+            keep &= (chunk['time_step'] >= start).values
+        if end is not None:
+            keep &= (chunk['time_step'] <= end).values
+        chunk = chunk[keep]
+
+        if len(chunk) > 0:
+            yield get_time_space_data(chunk, params)
+
+
+class SegmentAccumulator(object):
+    """Incrementally built collection of time-space segments.
+
+    Segments are stored as float32 arrays, and concatenated when plotted.
+    """
+
+    def __init__(self, ghost_edges=None):
+        """Instantiate an empty collection.
+
+        Parameters
+        ----------
+        ghost_edges : list or set of str
+            ghost edge names, excluded from the bounds of the domain
+        """
+        self.ghost_edges = ghost_edges
+        self.bounds = None
+        self.ghost_bounds = None
+        self._segs = []
+        self._speeds = []
+
+    def add(self, segs, data):
+        """Add the segments of a chunk, and the samples they start at."""
+        self._segs.append(np.asarray(segs, dtype=np.float32))
+        self._speeds.append(data['speed'].values.astype(np.float32))
+        self._update_bounds(data)
+
+    def _update_bounds(self, data):
+        """Update the bounds of the diagram with the samples of a chunk."""
+        bounds = (data['time_step'].min(), data['time_step'].max(),
+                  data['distance'].min(), data['distance'].max())
+        self.bounds = bounds if self.bounds is None else (
+            min(self.bounds[0], bounds[0]), max(self.bounds[1], bounds[1]),
+            min(self.bounds[2], bounds[2]), max(self.bounds[3], bounds[3]))
+
+        if self.ghost_edges:
+            domain = data[~data['edge_id'].isin(self.ghost_edges)]['distance']
+            if len(domain) > 0:
+                ghost_bounds = (domain.min(), domain.max())
+                self.ghost_bounds = ghost_bounds \
+                    if self.ghost_bounds is None else (
+                        min(self.ghost_bounds[0], ghost_bounds[0]),
+                        max(self.ghost_bounds[1], ghost_bounds[1]))
+
+    def plot(self, ax, args, lane=None, ghost_bounds=None):
+        """Plot the time-space diagram.
+
+        Parameters
+        ----------
+        ax : matplotlib.axes.Axes
+            figure axes that will be plotted on
+        args : dict
+            parsed arguments
+        lane : int, optional
+            lane number to be shown in plot title
+        ghost_bounds : tuple
+            lower and upper bounds of domain, excluding ghost edges. Defaults
+            to the bounds computed from the ghost edges, if any.
+        """
+        _plot_segments(ax, np.concatenate(self._segs),
+                       np.concatenate(self._speeds), self.bounds, args, lane,
+                       ghost_bounds or self.ghost_bounds)
+
+
+class DensityAccumulator(SegmentAccumulator):
+    """Per-pixel aggregation of the speeds of vehicles.
+
+    Rather than storing every segment, the mean speed of the samples falling
+    in every cell of a fixed time-distance grid is accumulated. Memory usage
+    is bounded by the resolution of the grid, which makes this suited to
+    dense diagrams.
+    """
+
+    def __init__(self, bounds, resolution=(1600, 900), ghost_edges=None):
+        """Instantiate an empty grid.
+
+        Parameters
+        ----------
+        bounds : tuple
+            minimum and maximum time, and minimum and maximum distance covered
+            by the grid
+        resolution : (int, int), optional
+            number of cells along the time and distance axes
+        ghost_edges : list or set of str
+            ghost edge names, excluded from the bounds of the domain
+        """
+        super(DensityAccumulator, self).__init__(ghost_edges)
+        self.grid_bounds = bounds
+        self._speed_sum = np.zeros(resolution)
+        self._count = np.zeros(resolution)
+
+    def add(self, segs, data):
+        """See parent class."""
+        xmin, xmax, ymin, ymax = self.grid_bounds
+        args = dict(bins=self._count.shape, range=[[xmin, xmax], [ymin, ymax]])
+        self._speed_sum += np.histogram2d(
+            data['time_step'].values, data['distance'].values,
+            weights=data['speed'].values, **args)[0]
+        self._count += np.histogram2d(
+            data['time_step'].values, data['distance'].values, **args)[0]
+        self._update_bounds(data)
+
+    def plot(self, ax, args, lane=None, ghost_bounds=None):
+        """See parent class."""
+        norm = plt.Normalize(args.min_speed, args.max_speed)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            speed = self._speed_sum / self._count
+
+        xmin, xmax, ymin, ymax = self.grid_bounds
+        image = ax.imshow(speed.T, origin='lower', aspect='auto',
+                          extent=(xmin, xmax, ymin, ymax), cmap=my_cmap,
+                          norm=norm, interpolation='nearest')
+
+        _decorate_tsd(ax, image, norm, self.bounds, args, lane,
+                      ghost_bounds or self.ghost_bounds)
+
+
+def build_time_space_accumulators(fp, params, chunksize=1000000, steps=1,
+                                  density=None, ghost_edges=None, **filters):
+    """Build the data of a time-space diagram from a trajectory file in chunks.
+
+    Parameters
+    ----------
+    fp : str
+        file path (for the .csv formatted file)
+    params : dict
+        flow-specific parameters (see import_data_from_trajectory)
+    chunksize : int, optional
+        number of rows read at a time
+    steps : int, optional
+        rate at which steps are plotted
+    density : (int, int), optional
+        resolution of the per-pixel aggregation grid. If specified, the
+        speeds are aggregated per pixel instead of storing every segment.
+        This requires an additional pass over the file to compute the bounds
+        of the grid.
+    ghost_edges : list or set of str
+        ghost edge names, excluded from the bounds of the domain
+    filters : dict
+        edges, lanes, start, and end filters (see iter_time_space_chunks)
+
+    Returns
+    -------
+    dict < int or None, SegmentAccumulator >
+        accumulated data of every plot. Networks plotted per lane (I210) are
+        keyed on the lane number, and others on None.
+    """
+    def chunks():
+        for segs, data in iter_time_space_chunks(
+                fp, params, chunksize, steps, **filters):
+            if isinstance(segs, dict):
+                for lane, lane_segs in segs.items():
+                    yield lane, lane_segs, data[data['lane_id'] == lane]
+            else:
+                yield None, segs, data
+
+    if density is not None:
+        bounds = SegmentAccumulator()
+        for _, _, data in chunks():
+            bounds._update_bounds(data)
+        if bounds.bounds is None:
+            return {}
+
+    accumulators = {}
+    for key, segs, data in chunks():
+        if key not in accumulators:
+            if density is not None:
+                accumulators[key] = DensityAccumulator(
+                    bounds.bounds, density, ghost_edges)
+            else:
+                accumulators[key] = SegmentAccumulator(ghost_edges)
+        accumulators[key].add(segs, data)
+
+    return accumulators
+
+
 def plot_tsd(ax, df, segs, args, lane=None, ghost_edges=None, ghost_bounds=None):
     """Plot the time-space diagram.
 
@@ -411,30 +725,77 @@ def plot_tsd(ax, df, segs, args, lane=None, ghost_edges=None, ghost_bounds=None)
     -------
     None
     """
+    bounds = (df['time_step'].min(), df['time_step'].max(),
+              df['distance'].min(), df['distance'].max())
+    if ghost_edges:
+        ghost_bounds = (df[~df['edge_id'].isin(ghost_edges)]['distance'].min(),
+                        df[~df['edge_id'].isin(ghost_edges)]['distance'].max())
+
+    _plot_segments(ax, segs, df['speed'].values, bounds, args, lane, ghost_bounds)
+
+
+def _plot_segments(ax, segs, speeds, bounds, args, lane=None, ghost_bounds=None):
+    """Plot line segments colored by speed, and decorate the diagram.
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        figure axes that will be plotted on
+    segs : array_like
+        line segments to be plotted, where each segment is a list of two [x,y] pairs
+    speeds : array_like
+        speed associated with every segment
+    bounds : tuple
+        minimum and maximum time, and minimum and maximum distance
+    args : dict
+        parsed arguments
+    lane : int, optional
+        lane number to be shown in plot title
+    ghost_bounds : tuple
+        lower and upper bounds of domain, excluding ghost edges, default None
+    """
     norm = plt.Normalize(args.min_speed, args.max_speed)
 
-    xmin, xmax = df['time_step'].min(), df['time_step'].max()
+    xmin, xmax, ymin, ymax = bounds
     xbuffer = (xmax - xmin) * 0.025  # 2.5% of range
-    ymin, ymax = df['distance'].min(), df['distance'].max()
     ybuffer = (ymax - ymin) * 0.025  # 2.5% of range
 
     ax.set_xlim(xmin - xbuffer, xmax + xbuffer)
     ax.set_ylim(ymin - ybuffer, ymax + ybuffer)
 
     lc = LineCollection(segs, cmap=my_cmap, norm=norm)
-    lc.set_array(df['speed'].values)
+    lc.set_array(np.asarray(speeds))
     lc.set_linewidth(1)
     ax.add_collection(lc)
     ax.autoscale()
 
+    _decorate_tsd(ax, lc, norm, bounds, args, lane, ghost_bounds)
+
+
+def _decorate_tsd(ax, mappable, norm, bounds, args, lane=None, ghost_bounds=None):
+    """Add the ghost regions, labels, and colorbar of a time-space diagram.
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        figure axes that will be plotted on
+    mappable : matplotlib.cm.ScalarMappable
+        the plotted speed data, used for the colorbar
+    norm : matplotlib.colors.Normalize
+        normalization of the speeds
+    bounds : tuple
+        minimum and maximum time, and minimum and maximum distance
+    args : dict
+        parsed arguments
+    lane : int, optional
+        lane number to be shown in plot title
+    ghost_bounds : tuple
+        lower and upper bounds of domain, excluding ghost edges, default None
+    """
+    xmin, xmax, ymin, ymax = bounds
+
     rects = []
-    if ghost_edges:
-        y_domain_min = df[~df['edge_id'].isin(ghost_edges)]['distance'].min()
-        y_domain_max = df[~df['edge_id'].isin(ghost_edges)]['distance'].max()
-        rects.append(Rectangle((xmin, y_domain_min), args.start - xmin, y_domain_max - y_domain_min))
-        rects.append(Rectangle((xmin, ymin), xmax - xmin, y_domain_min - ymin))
-        rects.append(Rectangle((xmin, y_domain_max), xmax - xmin, ymax - y_domain_max))
-    elif ghost_bounds:
+    if ghost_bounds:
         rects.append(Rectangle((xmin, ghost_bounds[0]), args.start - xmin, ghost_bounds[1] - ghost_bounds[0]))
         rects.append(Rectangle((xmin, ymin), xmax - xmin, ghost_bounds[0] - ymin))
         rects.append(Rectangle((xmin, ghost_bounds[1]), xmax - xmin, ymax - ghost_bounds[1]))
@@ -455,7 +816,7 @@ def plot_tsd(ax, df, segs, args, lane=None, ghost_edges=None, ghost_bounds=None)
     plt.xticks(fontsize=18)
     plt.yticks(fontsize=18)
 
-    cbar = plt.colorbar(lc, ax=ax, norm=norm)
+    cbar = plt.colorbar(mappable, ax=ax, norm=norm)
     cbar.set_label('Velocity (m/s)', fontsize=20)
     cbar.ax.tick_params(labelsize=18)
 
@@ -484,10 +845,34 @@ if __name__ == '__main__':
     parser.add_argument('--min_speed', type=int, default=0,
                         help='The minimum speed in the color range.')
     parser.add_argument('--start', type=float, default=0,
-                        help='initial time (in sec) in the plot.')
+                        help='initial time (in sec) in the plot. Earlier '
+                             'data is shaded, or skipped if --chunksize is '
+                             'specified.')
+    parser.add_argument('--end', type=float, default=None,
+                        help='final time (in sec) in the plot. Requires '
+                             '--chunksize.')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='number of rows of the trajectory file read at '
+                             'a time. If specified, the file is processed in '
+                             'chunks, bounding peak memory usage.')
+    parser.add_argument('--density', type=int, nargs=2, default=None,
+                        metavar=('WIDTH', 'HEIGHT'),
+                        help='aggregate the speeds per pixel on a grid of the '
+                             'given resolution instead of plotting every '
+                             'segment. Requires --chunksize.')
+    parser.add_argument('--edges', type=str, nargs='+', default=None,
+                        help='edges to plot. Requires --chunksize.')
+    parser.add_argument('--lanes', type=int, nargs='+', default=None,
+                        help='lanes to plot. Requires --chunksize.')
 
     args = parser.parse_args()
 
+    # the in-memory pipeline plots every segment of the trajectory file
+    if args.chunksize is None:
+        for name in ['end', 'density', 'edges', 'lanes']:
+            if getattr(args, name) is not None:
+                parser.error('--{} requires --chunksize'.format(name))
+
     # flow_params is imported as a dictionary
     if '.json' in args.flow_params:
         flow_params = get_flow_params(args.flow_params)
@@ -503,6 +888,35 @@ if __name__ == '__main__':
     }
     my_cmap = colors.LinearSegmentedColormap('my_colormap', cdict, 1024)
 
+    if flow_params['network'] == I210SubNetwork:
+        ghost_edges = {'ghost0', '119257908#3'}
+    else:
+        ghost_edges = None
+    if flow_params['network'] == HighwayNetwork:
+        ghost_bounds = (500, 2300)
+    else:
+        ghost_bounds = None
+
+    if args.chunksize is not None:
+        # Read the trajectory csv in chunks, and accumulate the segments (or
+        # the per-pixel speeds) of every plot
+        accumulators = build_time_space_accumulators(
+            args.trajectory_path, flow_params, args.chunksize, args.steps,
+            density=args.density, ghost_edges=ghost_edges, edges=args.edges,
+            lanes=args.lanes, start=args.start, end=args.end)
+
+        nplots = max(len(accumulators), 1)
+        fig = plt.figure(figsize=(16, 9*nplots))
+        for i, lane in enumerate(sorted(accumulators,
+                                        key=lambda x: -1 if x is None else x)):
+            ax = plt.subplot(nplots, 1, i+1)
+            accumulators[lane].plot(
+                ax, args, None if lane is None else int(lane+1), ghost_bounds)
+        plt.tight_layout()
+
+        plt.savefig(args.trajectory_path.replace('csv', 'png'))
+        sys.exit()
+
     # Read trajectory csv into pandas dataframe
     traj_df = import_data_from_trajectory(args.trajectory_path, flow_params)
 
@@ -516,7 +930,7 @@ if __name__ == '__main__':
         for lane, df in traj_df.groupby('lane_id'):
             ax = plt.subplot(nlanes, 1, lane+1)
 
-            plot_tsd(ax, df, segs[lane], args, int(lane+1), ghost_edges={'ghost0', '119257908#3'})
+            plot_tsd(ax, df, segs[lane], args, int(lane+1), ghost_edges=ghost_edges)
         plt.tight_layout()
     else:
         # perform plotting operation
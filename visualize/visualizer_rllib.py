@@ -8,14 +8,23 @@ EXAMPLE_USAGE : str
 
         python ./visualizer_rllib.py /tmp/ray/result_dir 1
 
+    To evaluate a checkpoint over many rollouts in parallel, use
+    ::
+
+        python ./visualizer_rllib.py /tmp/ray/result_dir 1 \\
+            --num_rollouts 32 --num_workers 8
+
 parser : ArgumentParser
     Command-line argument parser
 """
 
 import argparse
+import copy
 import gym
+import json
 import numpy as np
 import os
+import random
 import sys
 import time
 
@@ -26,7 +35,7 @@ except ImportError:
     from ray.rllib.agents.registry import get_agent_class
 from ray.tune.registry import register_env
 
-from flow.core.util import emission_to_csv
+from flow.core.util import emission_to_csv, save_edge_starts
 from flow.utils.registry import make_create_env
 from flow.utils.rllib import get_flow_params
 from flow.utils.rllib import get_rllib_config
@@ -43,13 +52,32 @@ Here the arguments are:
 """
 
 
-def visualizer_rllib(args):
-    """Visualizer for RLlib experiments.
-
-    This function takes args (see function create_parser below for
-    more detailed information on what information can be fed to this
-    visualizer), and renders the experiment associated with it.
+def load_agent(args, render_mode=None, emission_path=None):
+    """Restore the agent of an RLlib experiment, and create its environment.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        parsed command-line arguments (see create_parser)
+    render_mode : str, optional
+        render mode of the environment. Defaults to args.render_mode.
+    emission_path : str, optional
+        directory in which emission files are generated. Defaults to the
+        test_time_rollout directory if args.gen_emission is set, and to no
+        emission otherwise.
+
+    Returns
+    -------
+    ray.rllib.agents.Agent
+        the restored agent
+    gym.Env
+        the environment the agent acts in
+    dict
+        rllib configuration of the experiment
+    bool
+        whether the environment is a multiagent environment
     """
+    render_mode = render_mode or args.render_mode
     result_dir = args.result_dir if args.result_dir[-1] != '/' \
         else args.result_dir[:-1]
 
@@ -101,23 +129,24 @@ def visualizer_rllib(args):
         sys.exit(1)
 
     sim_params.restart_instance = True
-    dir_path = os.path.dirname(os.path.realpath(__file__))
-    emission_path = '{0}/test_time_rollout/'.format(dir_path)
-    sim_params.emission_path = emission_path if args.gen_emission else None
+    if emission_path is None and args.gen_emission:
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        emission_path = '{0}/test_time_rollout/'.format(dir_path)
+    sim_params.emission_path = emission_path
 
     # pick your rendering mode
-    if args.render_mode == 'sumo_web3d':
+    if render_mode == 'sumo_web3d':
         sim_params.num_clients = 2
         sim_params.render = False
-    elif args.render_mode == 'drgb':
+    elif render_mode == 'drgb':
         sim_params.render = 'drgb'
         sim_params.pxpm = 4
-    elif args.render_mode == 'sumo_gui':
+    elif render_mode == 'sumo_gui':
         sim_params.render = False  # will be set to True below
-    elif args.render_mode == 'no_render':
+    elif render_mode == 'no_render':
         sim_params.render = False
-    if args.save_render:
-        if args.render_mode != 'sumo_gui':
+    if args.save_render and render_mode != 'no_render':
+        if render_mode != 'sumo_gui':
             sim_params.render = 'drgb'
             sim_params.pxpm = 4
         sim_params.save_render = True
@@ -126,16 +155,6 @@ def visualizer_rllib(args):
     create_env, env_name = make_create_env(params=flow_params, version=0)
     register_env(env_name, create_env)
 
-    # check if the environment is a single or multiagent environment, and
-    # get the right address accordingly
-    # single_agent_envs = [env for env in dir(flow.envs)
-    #                      if not env.startswith('__')]
-
-    # if flow_params['env_name'] in single_agent_envs:
-    #     env_loc = 'flow.envs'
-    # else:
-    #     env_loc = 'flow.envs.multiagent'
-
     # Start the environment with the gui turned on and a path for the
     # emission file
     env_params = flow_params['env']
@@ -160,178 +179,445 @@ def visualizer_rllib(args):
     else:
         env = gym.make(env_name)
 
-    if args.render_mode == 'sumo_gui':
+    if render_mode == 'sumo_gui':
         env.sim_params.render = False  # set to True after initializing agent and env
 
+    # if restart_instance, don't restart here because env.reset will restart later
+    if not sim_params.restart_instance:#*Here, change from false to sim_params.render.
+        env.restart_simulation(sim_params=sim_params, render=False)
+
+    return agent, env, config, multiagent
+
+
+def rollout(agent, env, config, multiagent):
+    """Perform a rollout of the agent, and collect its metrics.
+
+    Parameters
+    ----------
+    agent : ray.rllib.agents.Agent
+        the agent computing the actions
+    env : gym.Env
+        the environment the agent acts in
+    config : dict
+        rllib configuration of the experiment
+    multiagent : bool
+        whether the environment is a multiagent environment
+
+    Returns
+    -------
+    dict
+        metrics of the rollout, with the following keys:
+
+        * return: return of the rollout (per policy in multiagent
+          environments)
+        * mean_speed, std_speed: mean and std of the per-step mean speed of
+          all vehicles
+        * mean_bus_speed, mean_human_speed, mean_rl_speed, and
+          mean_non_rl_speed: mean speed of every vehicle type
+        * outflow, inflow: arrival and departure rates of vehicles in the last
+          500 sec of the rollout (veh/hr)
+        * steps: number of steps in the rollout
+    """
+    horizon = env.unwrapped.env_params.horizon
+
     if multiagent:
-        rets = {}
         # map the agent id to its policy
         policy_map_fn = config['multiagent']['policy_mapping_fn']
-        for key in config['multiagent']['policies'].keys():
-            rets[key] = []
+        ret = {key: 0 for key in config['multiagent']['policies'].keys()}
     else:
-        rets = []
+        ret = 0
 
     if config['model']['use_lstm']:
         use_lstm = True
+        size = config['model']['lstm_cell_size']
         if multiagent:
+            # recurrent states are kept per agent, and initialized when the
+            # agent first appears
             state_init = {}
-            # map the agent id to its policy
-            policy_map_fn = config['multiagent']['policy_mapping_fn']
-            size = config['model']['lstm_cell_size']
-            for key in config['multiagent']['policies'].keys():
-                state_init[key] = [np.zeros(size, np.float32),
-                                   np.zeros(size, np.float32)]
         else:
-            state_init = [
-                np.zeros(config['model']['lstm_cell_size'], np.float32),
-                np.zeros(config['model']['lstm_cell_size'], np.float32)
-            ]
+            state_init = [np.zeros(size, np.float32),
+                          np.zeros(size, np.float32)]
     else:
         use_lstm = False
 
-    # if restart_instance, don't restart here because env.reset will restart later
-    if not sim_params.restart_instance:#*Here, change from false to sim_params.render.
-        env.restart_simulation(sim_params=sim_params, render=False)
+    vel = []
+    speeds_by_type = {'bus': [], 'human': [], 'rl': [], 'non_rl': []}
+
+    state = env.reset()
+    vehicles = env.unwrapped.k.vehicle
+    steps = 0
+    for _ in range(horizon):
+        vehicle_ids = vehicles.get_ids()
+        speeds = vehicles.get_speed(vehicle_ids)
+
+        # only include non-empty speeds
+        if speeds:
+            vel.append(np.mean(speeds))
+            for veh_id, speed in zip(vehicle_ids, speeds):
+                veh_type = vehicles.get_type(veh_id)
+                if veh_type in speeds_by_type:
+                    speeds_by_type[veh_type].append(speed)
+                if veh_type in ('bus', 'human'):
+                    speeds_by_type['non_rl'].append(speed)
 
-    # Simulate and collect metrics
-    final_outflows = []
-    final_inflows = []
-    mean_speed = []
-    std_speed = []
+        if multiagent:
+            action = compute_actions(
+                agent, state, policy_map_fn,
+                state_init if use_lstm else None,
+                clip_actions=config.get('clip_actions', False))
+        elif use_lstm:
+            action, state_init, logits = agent.compute_action(
+                state, state=state_init)
+        else:
+            action = agent.compute_action(state)
+        state, reward, done, _ = env.step(action)
+        steps += 1
+        if multiagent:
+            for actor, rew in reward.items():
+                ret[policy_map_fn(actor)] += rew
+        else:
+            ret += reward
+        if multiagent and done['__all__']:
+            break
+        if not multiagent and done:
+            break
+
+    def mean(values):
+        return float(np.mean(values)) if len(values) > 0 else float('nan')
+
+    return {
+        'return': {key: float(val) for key, val in ret.items()}
+        if multiagent else float(ret),
+        'mean_speed': mean(vel),
+        'std_speed': float(np.std(vel)) if vel else float('nan'),
+        'mean_bus_speed': mean(speeds_by_type['bus']),
+        'mean_human_speed': mean(speeds_by_type['human']),
+        'mean_rl_speed': mean(speeds_by_type['rl']),
+        'mean_non_rl_speed': mean(speeds_by_type['non_rl']),
+        'outflow': float(vehicles.get_outflow_rate(500)),
+        'inflow': float(vehicles.get_inflow_rate(500)),
+        'steps': steps,
+    }
+
+
+def _local_evaluator(agent):
+    """Return the local evaluator (or rollout worker) of an agent."""
+    if hasattr(agent, "local_evaluator"):
+        return agent.local_evaluator
+    return agent.workers.local_worker()
+
+
+def compute_actions(agent, observations, policy_map_fn, states=None,
+                    clip_actions=False):
+    """Compute the actions of all agents, in one forward pass per policy.
+
+    The observations of the agents sharing a policy are preprocessed and
+    filtered as in ``agent.compute_action``, stacked into a batch, and
+    evaluated in a single call to the policy. The resulting actions are then
+    scattered back to the agent ids.
+
+    Parameters
+    ----------
+    agent : ray.rllib.agents.Agent
+        the agent computing the actions
+    observations : dict < str, array_like >
+        observation of every agent
+    policy_map_fn : function
+        maps agent ids to policy ids
+    states : dict < str, list of array_like >, optional
+        recurrent state of every agent, updated in place. Agents missing from
+        the dict are assigned the initial state of their policy. If not
+        specified, policies are assumed not to be recurrent.
+    clip_actions : bool, optional
+        whether to clip the actions to the bounds of the action spaces
+
+    Returns
+    -------
+    dict < str, array_like >
+        action of every agent
+    """
+    evaluator = _local_evaluator(agent)
+
+    # group the agents by policy
+    agents_by_policy = {}
+    for agent_id in observations.keys():
+        agents_by_policy.setdefault(policy_map_fn(agent_id), []).append(
+            agent_id)
+
+    actions = {}
+    for policy_id, agent_ids in agents_by_policy.items():
+        policy = evaluator.policy_map[policy_id]
+        preprocessor = evaluator.preprocessors[policy_id]
+        obs_filter = evaluator.filters[policy_id]
+        obs_batch = np.stack([
+            obs_filter(preprocessor.transform(observations[agent_id]),
+                       update=False)
+            for agent_id in agent_ids])
+
+        state_batches = []
+        if states is not None:
+            for agent_id in agent_ids:
+                if agent_id not in states:
+                    states[agent_id] = policy.get_initial_state()
+            state_batches = [
+                np.stack([states[agent_id][i] for agent_id in agent_ids])
+                for i in range(len(states[agent_ids[0]]))]
+
+        action_batch, state_out, _ = policy.compute_actions(
+            obs_batch, state_batches)
+
+        if clip_actions and hasattr(policy.action_space, 'low'):
+            action_batch = np.clip(action_batch, policy.action_space.low,
+                                   policy.action_space.high)
+
+        for i, agent_id in enumerate(agent_ids):
+            actions[agent_id] = action_batch[i]
+            if states is not None:
+                states[agent_id] = [state[i] for state in state_out]
+
+    return actions
+
+
+def summarize_rollouts(results):
+    """Compute the mean and std of the metrics of a set of rollouts.
+
+    Parameters
+    ----------
+    results : list of dict
+        metrics of every rollout (see rollout)
+
+    Returns
+    -------
+    dict
+        mean and std of every metric, as {"mean": float, "std": float}.
+        Returns are summarized per policy in multiagent environments, with
+        keys "return/<policy>".
+    """
+    metrics = {}
+    for result in results:
+        for key, value in result.items():
+            if isinstance(value, dict):
+                for policy, val in value.items():
+                    metrics.setdefault(key + '/' + policy, []).append(val)
+            elif key not in ('rollout', 'seed', 'worker'):
+                metrics.setdefault(key, []).append(value)
+
+    # throughput efficiency is only defined if vehicles entered the network
+    inflows = np.array(metrics.get('inflow', []))
+    if len(inflows) > 0:
+        metrics['throughput_efficiency'] = list(
+            np.array(metrics['outflow']) / inflows
+            if np.all(inflows > 1e-5) else np.zeros(len(inflows)))
+
+    return {key: {'mean': float(np.nanmean(values)),
+                  'std': float(np.nanstd(values))}
+            for key, values in metrics.items()}
+
+
+class RolloutWorker(object):
+    """Evaluation worker, with its own restored agent and environment.
+
+    Workers are run as ray actors by evaluate_parallel. Rendering and emission
+    output are only enabled for the workers listed in the args.render_workers
+    and args.emission_workers arguments.
+    """
 
+    def __init__(self, args, worker_index):
+        """Restore the agent and create the environment of the worker.
+
+        Parameters
+        ----------
+        args : argparse.Namespace
+            parsed command-line arguments (see create_parser)
+        worker_index : int
+            index of the worker
+        """
+        self.worker_index = worker_index
+
+        render_mode = args.render_mode \
+            if worker_index in (args.render_workers or []) else 'no_render'
+        emission_path = None
+        if worker_index in (args.emission_workers or []):
+            dir_path = os.path.dirname(os.path.realpath(__file__))
+            emission_path = '{0}/test_time_rollout/worker_{1}/'.format(
+                dir_path, worker_index)
+            os.makedirs(emission_path, exist_ok=True)
+        self.emission_path = emission_path
+
+        args = copy.copy(args)
+        args.gen_emission = emission_path is not None
+        self.agent, self.env, self.config, self.multiagent = load_agent(
+            args, render_mode=render_mode, emission_path=emission_path)
+
+    def rollout(self, index, seed):
+        """Perform a rollout with a given seed.
+
+        Parameters
+        ----------
+        index : int
+            index of the rollout
+        seed : int
+            seed of the random number generators, from which the seed of the
+            simulation is also drawn
+
+        Returns
+        -------
+        dict
+            metrics of the rollout (see rollout)
+        """
+        random.seed(seed)
+        np.random.seed(seed)
+        result = rollout(self.agent, self.env, self.config, self.multiagent)
+        result.update(rollout=index, seed=seed, worker=self.worker_index)
+        return result
+
+    def terminate(self):
+        """Terminate the environment, and convert emission files to csv."""
+        self.env.unwrapped.terminate()
+        if self.emission_path is not None:
+            convert_emission(self.env, self.emission_path)
+
+
+def evaluate_parallel(args):
+    """Evaluate a checkpoint over many rollouts, spread over local workers.
+
+    Every worker restores its own agent and environment, and performs a share
+    of the rollouts. The metrics of all rollouts, and their mean and std, are
+    written to a json summary file.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        parsed command-line arguments (see create_parser)
+
+    Returns
+    -------
+    dict
+        the summary, with keys "rollouts" (metrics of every rollout, see
+        rollout) and "summary" (see summarize_rollouts)
+    """
+    num_workers = min(args.num_workers, args.num_rollouts)
+    worker_cls = ray.remote(num_cpus=1)(RolloutWorker)
+    workers = [worker_cls.remote(args, i) for i in range(num_workers)]
+
+    # assign rollouts to workers as they become idle
+    pending = {}
+    results = []
+    rollouts = iter(range(args.num_rollouts))
+    for worker in workers:
+        index = next(rollouts)
+        pending[worker.rollout.remote(index, args.seed + index)] = worker
+    while pending:
+        [ready], _ = ray.wait(list(pending))
+        worker = pending.pop(ready)
+        result = ray.get(ready)
+        results.append(result)
+        print('Round {}, Return: {} (worker {})'.format(
+            result['rollout'], result['return'], result['worker']))
+        index = next(rollouts, None)
+        if index is not None:
+            pending[worker.rollout.remote(index, args.seed + index)] = worker
+
+    ray.get([worker.terminate.remote() for worker in workers])
+
+    results = sorted(results, key=lambda result: result['rollout'])
+    summary = {'rollouts': results, 'summary': summarize_rollouts(results)}
 
-    vehicle_ids=[]
-    bus_speeds = []
-    mean_bus_speed = []
-    nonRL_speeds=[]
-    mean_nonRL_vehicle_speed=[]
-    RL_speeds=[]
-    mean_RL_vehicle_speed=[]
-    human_speeds=[]
-    mean_human_vehicle_speed=[]
-    mean_bus_delay=[]
+    print('==== Summary of results ====')
+    for key, value in sorted(summary['summary'].items()):
+        print('{}: {} (std {})'.format(key, value['mean'], value['std']))
 
+    summary_file = args.summary_file or os.path.join(
+        args.result_dir, 'evaluation_{}.json'.format(args.checkpoint_num))
+    with open(summary_file, 'w') as f:
+        json.dump(summary, f, indent=4, sort_keys=True)
+    print("\nGenerated evaluation summary at " + summary_file)
 
-    for i in range(args.num_rollouts):
+    return summary
 
-        vel = []
-        RL_vel=[]
-        bus_vel=[]
-        human_vel=[]
-        nonRL_vel=[]
-        state = env.reset()
-        if multiagent:
-            ret = {key: [0] for key in rets.keys()}
-        else:
-            ret = 0
-        for _ in range(env_params.horizon):
-            vehicles = env.unwrapped.k.vehicle
-            speeds = vehicles.get_speed(vehicles.get_ids())
-        
-            vehicle_ids=vehicles.get_ids()
-            for veh in vehicle_ids:
-                if vehicles.get_type(veh)=="bus":
-                    bus_speeds.append(vehicles.get_speed(veh))
-                    nonRL_speeds.append(vehicles.get_speed(veh))
-                if vehicles.get_type(veh)=="human":
-                    human_speeds.append(vehicles.get_speed(veh))
-                    nonRL_speeds.append(vehicles.get_speed(veh))
-                if vehicles.get_type(veh)=="rl":
-                    RL_speeds.append(vehicles.get_speed(veh))
-            # only include non-empty speeds
-            if speeds:
-                vel.append(np.mean(speeds))
-
-
-                RL_vel.append(np.mean(RL_speeds))
-                bus_vel.append(np.mean(bus_speeds))
-                human_vel.append(np.mean(human_speeds))
-                nonRL_vel.append(np.mean(nonRL_speeds))
-
-            if multiagent:
-                action = {}
-                for agent_id in state.keys():
-                    if use_lstm:
-                        action[agent_id], state_init[agent_id], logits = \
-                            agent.compute_action(
-                            state[agent_id], state=state_init[agent_id],
-                            policy_id=policy_map_fn(agent_id))
-                    else:
-                        action[agent_id] = agent.compute_action(
-                            state[agent_id], policy_id=policy_map_fn(agent_id))
-            else:
-                action = agent.compute_action(state)
-            state, reward, done, _ = env.step(action)
-            if multiagent:
-                for actor, rew in reward.items():
-                    ret[policy_map_fn(actor)][0] += rew
-            else:
-                ret += reward
-            if multiagent and done['__all__']:
-                break
-            if not multiagent and done:
-                break
 
-        if multiagent:
-            for key in rets.keys():
-                rets[key].append(ret[key])
-        else:
-            rets.append(ret)
-        outflow = vehicles.get_outflow_rate(500)
-        final_outflows.append(outflow)
-        inflow = vehicles.get_inflow_rate(500)
-        final_inflows.append(inflow)
-        if np.all(np.array(final_inflows) > 1e-5):
-            throughput_efficiency = [x / y for x, y in
-                                     zip(final_outflows, final_inflows)]
-        else:
-            throughput_efficiency = [0] * len(final_inflows)
-        mean_speed.append(np.mean(vel))
-        std_speed.append(np.std(vel))
+def convert_emission(env, emission_dir):
+    """Convert the emission file of an environment into a csv file.
+
+    Parameters
+    ----------
+    env : gym.Env
+        the terminated environment
+    emission_dir : str
+        directory containing the emission file
+    """
+    time.sleep(0.1)
+
+    emission_filename = '{0}-emission.xml'.format(env.network.name)
+    emission_path = os.path.join(emission_dir, emission_filename)
+
+    # convert the emission file into a csv file
+    emission_to_csv(emission_path)
 
+    # print the location of the emission csv file
+    emission_path_csv = emission_path[:-4] + ".csv"
+    if env.unwrapped.simulator == 'traci':
+        save_edge_starts(
+            emission_path_csv,
+            env.unwrapped.k.network.total_edgestarts_dict)
+    print("\nGenerated emission file at " + emission_path_csv)
 
-        mean_bus_speed.append(np.mean(bus_vel))
-        mean_nonRL_vehicle_speed.append(np.mean(nonRL_vel))
-        mean_human_vehicle_speed.append(np.mean(human_vel))
-        mean_RL_vehicle_speed.append(np.mean(RL_vel))
+    # delete the .xml version of the emission file
+    os.remove(emission_path)
+
+
+def visualizer_rllib(args):
+    """Visualizer for RLlib experiments.
 
+    This function takes args (see function create_parser below for
+    more detailed information on what information can be fed to this
+    visualizer), and renders the experiment associated with it.
+    """
+    agent, env, config, multiagent = load_agent(args)
 
+    # Simulate and collect metrics
+    results = []
+    for i in range(args.num_rollouts):
+        result = rollout(agent, env, config, multiagent)
+        results.append(result)
         if multiagent:
-            for agent_id, rew in rets.items():
+            for agent_id, rew in result['return'].items():
                 print('Round {}, Return: {} for agent {}'.format(
-                    i, ret, agent_id))
+                    i, rew, agent_id))
         else:
-            print('Round {}, Return: {}'.format(i, ret))
+            print('Round {}, Return: {}'.format(i, result['return']))
+
+    mean_speed = [result['mean_speed'] for result in results]
+    std_speed = [result['std_speed'] for result in results]
+    final_outflows = [result['outflow'] for result in results]
+    final_inflows = [result['inflow'] for result in results]
+    if np.all(np.array(final_inflows) > 1e-5):
+        throughput_efficiency = [x / y for x, y in
+                                 zip(final_outflows, final_inflows)]
+    else:
+        throughput_efficiency = [0] * len(final_inflows)
 
     print('==== Summary of results ====')
     print("Return:")
     print(mean_speed)
     if multiagent:
-        for agent_id, rew in rets.items():
+        for agent_id in config['multiagent']['policies'].keys():
+            rew = [result['return'][agent_id] for result in results]
             print('For agent', agent_id)
             print(rew)
             print('Average, std return: {}, {} for agent {}'.format(
                 np.mean(rew), np.std(rew), agent_id))
     else:
+        rets = [result['return'] for result in results]
         print(rets)
         print('Average, std: {}, {}'.format(
             np.mean(rets), np.std(rets)))
 
     print("\nSpeed, mean (m/s):")
     print(str(mean_speed)[1:-1])
-    print(str(mean_bus_speed)[1:-1])
-    print(str(mean_human_vehicle_speed)[1:-1])
-    print(str(mean_RL_vehicle_speed)[1:-1])
-
-
-    # print("\nBus speed, mean (m/s):")
-    # print(mean_bus_speed)
-    # print("\nHuman speed, mean (m/s):")
-    # print(mean_human_vehicle_speed)
-    # print("\nRL speed, mean (m/s):")
-    # print(mean_RL_vehicle_speed)
-
+    print(str([result['mean_bus_speed'] for result in results])[1:-1])
+    print(str([result['mean_human_speed'] for result in results])[1:-1])
+    print(str([result['mean_rl_speed'] for result in results])[1:-1])
 
     print('Average, std: {}, {}'.format(np.mean(mean_speed), np.std(
         mean_speed)))
@@ -361,23 +647,8 @@ def visualizer_rllib(args):
 
     # if prompted, convert the emission file into a csv file
     if args.gen_emission:
-        time.sleep(0.1)
-
         dir_path = os.path.dirname(os.path.realpath(__file__))
-        emission_filename = '{0}-emission.xml'.format(env.network.name)
-
-        emission_path = \
-            '{0}/test_time_rollout/{1}'.format(dir_path, emission_filename)
-
-        # convert the emission file into a csv file
-        emission_to_csv(emission_path)
-
-        # print the location of the emission csv file
-        emission_path_csv = emission_path[:-4] + ".csv"
-        print("\nGenerated emission file at " + emission_path_csv)
-
-        # delete the .xml version of the emission file
-        os.remove(emission_path)
+        convert_emission(env, '{0}/test_time_rollout/'.format(dir_path))
 
 
 def create_parser():
@@ -432,11 +703,48 @@ def create_parser():
         '--horizon',
         type=int,
         help='Specifies the horizon.')
+    parser.add_argument(
+        '--num_workers',
+        type=int,
+        default=1,
+        help='The number of local worker processes the rollouts are spread '
+             'over. If greater than 1, rollouts are evaluated in parallel, '
+             'and their metrics are written to a summary file.')
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=0,
+        help='Seed of the first rollout when evaluating in parallel. '
+             'Rollout i is seeded with seed + i.')
+    parser.add_argument(
+        '--summary_file',
+        type=str,
+        help='Path of the json summary file written when evaluating in '
+             'parallel. Defaults to evaluation_<checkpoint>.json in the '
+             'results directory.')
+    parser.add_argument(
+        '--render_workers',
+        type=int,
+        nargs='*',
+        default=[],
+        help='Indices of the workers that render their rollouts when '
+             'evaluating in parallel. Others do not render.')
+    parser.add_argument(
+        '--emission_workers',
+        type=int,
+        nargs='*',
+        default=[],
+        help='Indices of the workers that generate an emission file when '
+             'evaluating in parallel.')
     return parser
 
 
 if __name__ == '__main__':
     parser = create_parser()
     args = parser.parse_args()
-    ray.init(num_cpus=1)
-    visualizer_rllib(args)
+    if args.num_workers > 1:
+        ray.init(num_cpus=args.num_workers)
+        evaluate_parallel(args)
+    else:
+        ray.init(num_cpus=1)
+        visualizer_rllib(args)